@@ -0,0 +1,73 @@
+# benchmarks/bench_decoders.py
+
+"""
+比較查表解碼與原本逐位元計算的速度。
+
+使用方法：
+python3 benchmarks/bench_decoders.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from utils.decoder import decode_packed_bcd
+from utils.format_converter import (
+	convert_reveal_flags,
+	convert_limit_flags,
+	convert_status_flags,
+	_build_reveal_flags,
+	_build_limit_flags,
+	_build_status_flags,
+)
+
+
+def reference_decode_packed_bcd(data: bytes) -> str:
+	# 原本逐 nibble 以 f-string 串接的實作
+	result = ''
+	for byte in data:
+		high_nibble = (byte >> 4) & 0xF
+		low_nibble = byte & 0xF
+		result += f'{high_nibble}{low_nibble}'
+	return result
+
+
+def reference_flags(builder):
+	# 原本每次呼叫都重新建立 dict 並計算位元
+	def convert(byte_data: bytes) -> dict:
+		if len(byte_data) != 1:
+			raise ValueError
+		return builder(byte_data[0])
+	return convert
+
+
+def bench(label: str, func, samples, number: int) -> float:
+	seconds = timeit.timeit(lambda: [func(sample) for sample in samples], number=number)
+	per_call = seconds / (number * len(samples)) * 1e9
+	print(f'{label:<40} {per_call:10.1f} ns/call')
+	return per_call
+
+
+def main():
+	number = 200
+	bcd_samples = [bytes([0x00, 0x00, 0x40, 0x61, 0x00]), bytes([0x09, 0x09, 0x34, 0x44, 0x76, 0x98]), bytes([0x01, 0x00, 0x00, 0x01])]
+	byte_samples = [bytes([byte]) for byte in range(256)]
+
+	cases = [
+		('decode_packed_bcd', reference_decode_packed_bcd, decode_packed_bcd, bcd_samples),
+		('convert_reveal_flags', reference_flags(_build_reveal_flags), convert_reveal_flags, byte_samples),
+		('convert_limit_flags', reference_flags(_build_limit_flags), convert_limit_flags, byte_samples),
+		('convert_status_flags', reference_flags(_build_status_flags), convert_status_flags, byte_samples),
+	]
+
+	for name, reference, table, samples in cases:
+		# 確認兩種實作輸出相同
+		assert all(reference(sample) == table(sample) for sample in samples), name
+		before = bench(f'{name} (reference)', reference, samples, number)
+		after = bench(f'{name} (table)', table, samples, number)
+		print(f'{"":<40} {before / after:10.1f}x\n')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_ring.py
+
+"""
+測量共享記憶體環形緩衝區從發布到各讀取行程取得記錄的延遲與吞吐量。
+記錄先以 columnar 引擎解碼至記憶體，計時只包含發布與讀取；延遲以 time.monotonic_ns() 計算，
+為記錄所在批次的發布時間到讀取端取得該批次的時間。
+
+使用方法：
+python3 benchmarks/bench_ring.py --records 1M --readers 4
+python3 benchmarks/bench_ring.py --records 1M --readers 2 --rate 200000 --batch-size 100
+python3 benchmarks/bench_ring.py --records 1M --capacity 16384 --slow-reader 0.05
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import numpy as np
+from columnar import parse_file_columnar
+from ring import DEFAULT_CAPACITY, DEFAULT_PUBLISH_BATCH, RingPublisher, RingReader
+from synthetic import write_feed
+
+
+def parse_size(text: str) -> int:
+	# 1K、1M、10M 或純數字
+	multiplier = {'K': 1_000, 'M': 1_000_000}.get(text[-1].upper(), 1)
+	return int(text.rstrip('kKmM')) * multiplier
+
+
+def ensure_feed(data_dir: str, records: int, seed: int) -> str:
+	file_path = os.path.join(data_dir, f'synthetic_{records}_{seed}.new')
+	if not os.path.exists(file_path):
+		print(f'Generating {records} records into {file_path}', file=sys.stderr)
+		write_feed(file_path + '.tmp', records, seed)
+		os.replace(file_path + '.tmp', file_path)
+	return file_path
+
+
+def run_reader(index: int, name: str, ready, results, delay: float) -> None:
+	"""
+	讀取行程：讀到發布端結束為止，回報延遲分佈、筆數與遺失筆數。delay 大於 0 時每批讀取後暫停，模擬處理較慢的讀取端。
+	"""
+	reader = RingReader(name)
+	ready.wait()
+	latencies = []
+	received = 0
+	started = None
+	for batch in reader.iter_batches(poll_interval=0):
+		now = time.monotonic_ns()
+		if started is None:
+			started = time.perf_counter()
+		# 同一批次的發布時間相同，只需計算每個發布批次一次
+		publish_times, counts = np.unique(batch['publish_time'], return_counts=True)
+		latencies.append(np.repeat(now - publish_times, counts))
+		received += len(batch)
+		if delay:
+			time.sleep(delay)
+	elapsed = time.perf_counter() - started if started is not None else 0.0
+	latency = np.concatenate(latencies) / 1000 if latencies else np.zeros(1)
+	results.put({
+		'reader': index,
+		'received': received,
+		'lost': reader.lost,
+		'seconds': elapsed,
+		'p50_us': float(np.percentile(latency, 50)),
+		'p99_us': float(np.percentile(latency, 99)),
+		'max_us': float(latency.max()),
+	})
+	reader.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure publish-to-read latency of the shared-memory ring buffer.")
+	parser.add_argument('--records', type=str, default='1M', help='Number of records to publish (e.g., "100K", "1M")')
+	parser.add_argument('--readers', type=int, default=2, help='Number of reader processes')
+	parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='Ring buffer capacity in records')
+	parser.add_argument('--batch-size', type=int, default=DEFAULT_PUBLISH_BATCH, help='Records per published batch')
+	parser.add_argument('--rate', type=float, default=0, help='Published records per second (0 for unlimited)')
+	parser.add_argument('--slow-reader', type=float, default=0, help='Seconds the last reader sleeps after each batch (to observe lag and loss)')
+	parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic feed')
+	parser.add_argument('--data-dir', type=str, default=os.path.join(tempfile.gettempdir(), 'format6-bench'), help='Directory that caches generated feeds')
+	args = parser.parse_args()
+
+	os.makedirs(args.data_dir, exist_ok=True)
+	columns = parse_file_columnar(ensure_feed(args.data_dir, parse_size(args.records), args.seed))
+	count = len(columns['matching_time'])
+
+	context = multiprocessing.get_context('spawn')
+	ready = context.Barrier(args.readers + 1)
+	results = context.Queue()
+	with RingPublisher(capacity=args.capacity) as publisher:
+		readers = [
+			context.Process(target=run_reader, args=(index, publisher.name, ready, results, args.slow_reader if index == args.readers - 1 else 0))
+			for index in range(args.readers)
+		]
+		for process in readers:
+			process.start()
+
+		ready.wait()
+		started = time.perf_counter()
+		for begin in range(0, count, args.batch_size):
+			publisher.publish_columns({key: value[begin:begin + args.batch_size] for key, value in columns.items()})
+			if args.rate:
+				# 超前預定進度時暫停，讓平均速率維持在 rate
+				ahead = started + (begin + args.batch_size) / args.rate - time.perf_counter()
+				if ahead > 0:
+					time.sleep(ahead)
+		elapsed = time.perf_counter() - started
+		# 已連接的讀取端在共享記憶體刪除後仍可讀完剩餘的記錄
+		publisher.close()
+
+	reports = sorted((results.get() for _ in readers), key=lambda report: report['reader'])
+	for process in readers:
+		process.join()
+
+	print(f'published {count} records in {elapsed:.3f}s ({count / elapsed:,.0f} rec/s, batch {args.batch_size}, capacity {args.capacity})')
+	print(f'{"reader":<8} {"received":>10} {"lost":>10} {"rec/s":>14} {"p50 us":>10} {"p99 us":>10} {"max us":>10}')
+	for report in reports:
+		rate = report['received'] / report['seconds'] if report['seconds'] else 0.0
+		print(f'{report["reader"]:<8} {report["received"]:>10} {report["lost"]:>10} {rate:>14,.0f} {report["p50_us"]:>10.1f} {report["p99_us"]:>10.1f} {report["max_us"]:>10.1f}')
+
+
+if __name__ == '__main__':
+	main()
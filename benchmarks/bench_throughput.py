@@ -0,0 +1,223 @@
+# benchmarks/bench_throughput.py
+
+"""
+以模擬資料測量各解析函數的吞吐量（records/sec、MB/sec）與記憶體峰值。
+每個項目在獨立的行程中執行，記憶體峰值不受其他項目影響。
+MB/sec 以該項目處理的原始位元組計算（write_json、write_ndjson 以原始記錄大小計算）。
+
+使用方法：
+python3 benchmarks/bench_throughput.py --sizes 1K,1M
+python3 benchmarks/bench_throughput.py --sizes 1M --cases parse_file,parse_file_columnar --save baseline.json
+python3 benchmarks/bench_throughput.py --sizes 1M --baseline baseline.json --tolerance 0.1
+
+模擬檔案會保留在 --data-dir 中，重複執行時不需重新產生（10M 筆約需數分鐘產生）。
+parse_file、process_chunk、write_json 與 write_ndjson 會保留所有解析後的記錄，10M 筆時需要大量記憶體。
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from columnar import parse_file_columnar
+from parser import parse_file, process_chunk
+from synthetic import write_feed
+from utils.decoder import decode_ascii, decode_packed_bcd, decode_hexacode
+from utils.format_converter import (
+	format_number_string,
+	convert_match_time,
+	convert_reveal_flags,
+	convert_limit_flags,
+	convert_status_flags,
+	convert_instant_quotes,
+	calculate_checksum,
+)
+from utils.framer import map_file, iter_frames
+from writers import write_json, write_ndjson
+
+
+def read_frames(file_path: str):
+	# 將所有記錄複製為 bytes，使函數層級的測量不含切分成本
+	with map_file(file_path) as buffer:
+		return [bytes(frame) for frame in iter_frames(buffer)]
+
+
+def field_case(func, extract):
+	# 對每筆記錄的指定欄位呼叫一次 func
+	def prepare(file_path: str):
+		inputs = [extract(frame) for frame in read_frames(file_path)]
+		return (lambda: [func(value) for value in inputs]), len(inputs), sum(len(value) for value in inputs)
+	return prepare
+
+
+def prepare_file(parse):
+	def prepare(file_path: str):
+		frames = read_frames(file_path)
+		return (lambda: parse(file_path)), len(frames), os.path.getsize(file_path)
+	return prepare
+
+
+def prepare_process_chunk(file_path: str):
+	frames = read_frames(file_path)
+	return (lambda: process_chunk_all(frames)), len(frames), sum(map(len, frames))
+
+
+def process_chunk_all(frames):
+	data = []
+	for frame in frames:
+		process_chunk(frame, data)
+	return data
+
+
+def prepare_format_number_string(file_path: str):
+	prices = [decode_packed_bcd(frame[29:34]) for frame in read_frames(file_path) if len(frame) >= 36]
+	return (lambda: [format_number_string(price, integer_digits=5, decimal_digits=4) for price in prices]), len(prices), sum(map(len, prices))
+
+
+def prepare_convert_instant_quotes(file_path: str):
+	# 參數的組法與 decode_record 相同
+	arguments = []
+	size = 0
+	for frame in read_frames(file_path):
+		end = len(frame) - 2
+		prices = [frame[offset:offset + 5] for offset in range(29, end - 8, 9)]
+		quantities = [frame[offset + 5:offset + 9] for offset in range(29, end - 8, 9)]
+		arguments.append((prices, quantities, convert_reveal_flags(frame[22:23]), convert_limit_flags(frame[23:24]), convert_status_flags(frame[24:25]), decode_ascii(frame[10:16])))
+		size += end - 29
+	return (lambda: [convert_instant_quotes(*argument) for argument in arguments]), len(arguments), size
+
+
+def prepare_write_json(file_path: str):
+	records = parse_file(file_path)
+	output_file = os.path.join(tempfile.gettempdir(), f'bench_write_json_{os.getpid()}.json')
+	return (lambda: write_json(records, output_file)), len(records), os.path.getsize(file_path)
+
+
+def prepare_write_ndjson(file_path: str):
+	records = parse_file(file_path)
+	output_file = os.path.join(tempfile.gettempdir(), f'bench_write_ndjson_{os.getpid()}.ndjson')
+	return (lambda: write_ndjson(records, output_file)), len(records), os.path.getsize(file_path)
+
+
+# 項目名稱對應的準備函數：返回 (要計時的函數, 記錄筆數, 處理的位元組數)
+CASES = {
+	'parse_file': prepare_file(parse_file),
+	'parse_file_lazy': prepare_file(lambda file_path: parse_file(file_path, lazy=True)),
+	'parse_file_numeric': prepare_file(lambda file_path: parse_file(file_path, numeric=True)),
+	'parse_file_columnar': prepare_file(parse_file_columnar),
+	'process_chunk': prepare_process_chunk,
+	'decode_ascii': field_case(decode_ascii, lambda frame: frame[10:16]),
+	'decode_packed_bcd': field_case(decode_packed_bcd, lambda frame: frame[6:10]),
+	'decode_hexacode': field_case(decode_hexacode, lambda frame: frame[-2:]),
+	'format_number_string': prepare_format_number_string,
+	'convert_match_time': field_case(convert_match_time, lambda frame: frame[16:22]),
+	'convert_reveal_flags': field_case(convert_reveal_flags, lambda frame: frame[22:23]),
+	'convert_limit_flags': field_case(convert_limit_flags, lambda frame: frame[23:24]),
+	'convert_status_flags': field_case(convert_status_flags, lambda frame: frame[24:25]),
+	'convert_instant_quotes': prepare_convert_instant_quotes,
+	'calculate_checksum': field_case(calculate_checksum, lambda frame: frame[1:-2]),
+	'write_json': prepare_write_json,
+	'write_ndjson': prepare_write_ndjson,
+}
+
+
+def run_case(name: str, file_path: str, min_seconds: float) -> dict:
+	"""
+	在子行程中執行單一項目，重複執行至累計 min_seconds，取最快的一次。
+	"""
+	func, records, size = CASES[name](file_path)
+	best = float('inf')
+	elapsed = 0.0
+	while elapsed < min_seconds or best == float('inf'):
+		start = time.perf_counter()
+		func()
+		seconds = time.perf_counter() - start
+		best = min(best, seconds)
+		elapsed += seconds
+
+	# Linux 的 ru_maxrss 以 KB 為單位
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+	return {
+		'case': name,
+		'records': records,
+		'seconds': best,
+		'records_per_sec': records / best if best else 0.0,
+		'mb_per_sec': size / best / 1e6 if best else 0.0,
+		'peak_rss_mb': peak_rss / 1e6,
+	}
+
+
+def parse_size(text: str) -> int:
+	# 1K、1M、10M 或純數字
+	multiplier = {'K': 1_000, 'M': 1_000_000}.get(text[-1].upper(), 1)
+	return int(text.rstrip('kKmM')) * multiplier
+
+
+def ensure_feed(data_dir: str, records: int, seed: int) -> str:
+	file_path = os.path.join(data_dir, f'synthetic_{records}_{seed}.new')
+	if not os.path.exists(file_path):
+		print(f'Generating {records} records into {file_path}', file=sys.stderr)
+		write_feed(file_path + '.tmp', records, seed)
+		os.replace(file_path + '.tmp', file_path)
+	return file_path
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+	"""
+	與基準結果比較 records/sec，返回下降超過 tolerance 的項目。
+	"""
+	previous = {(result['case'], result['records']): result for result in baseline}
+	regressions = []
+	for result in results:
+		before = previous.get((result['case'], result['records']))
+		if before and result['records_per_sec'] < before['records_per_sec'] * (1 - tolerance):
+			regressions.append((result, before))
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Measure parser throughput on synthetic Format 6 feeds.")
+	parser.add_argument('--sizes', type=str, default='1K,1M', help='Comma-separated record counts (e.g., "1K,1M,10M")')
+	parser.add_argument('--cases', type=str, default=','.join(CASES), help='Comma-separated benchmark cases')
+	parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic feed')
+	parser.add_argument('--data-dir', type=str, default=os.path.join(tempfile.gettempdir(), 'format6-bench'), help='Directory that caches generated feeds')
+	parser.add_argument('--min-seconds', type=float, default=0.5, help='Repeat each case until this much time has been spent')
+	parser.add_argument('--save', type=str, default=None, help='Write the results to this JSON file')
+	parser.add_argument('--baseline', type=str, default=None, help='Compare records/sec with a JSON file written by --save')
+	parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed records/sec drop relative to the baseline')
+	args = parser.parse_args()
+
+	os.makedirs(args.data_dir, exist_ok=True)
+	context = multiprocessing.get_context('spawn')
+	results = []
+
+	print(f'{"case":<24} {"records":>10} {"rec/s":>14} {"MB/s":>10} {"peak RSS MB":>12}')
+	for size in args.sizes.split(','):
+		file_path = ensure_feed(args.data_dir, parse_size(size), args.seed)
+		for name in args.cases.split(','):
+			# 每個項目使用新的行程，記憶體峰值互不影響
+			with context.Pool(1) as pool:
+				result = pool.apply(run_case, (name, file_path, args.min_seconds))
+			results.append(result)
+			print(f'{name:<24} {result["records"]:>10} {result["records_per_sec"]:>14,.0f} {result["mb_per_sec"]:>10.1f} {result["peak_rss_mb"]:>12.1f}')
+
+	if args.save:
+		with open(args.save, 'w', encoding='utf-8') as json_file:
+			json.dump(results, json_file, indent=4)
+
+	if args.baseline:
+		with open(args.baseline, encoding='utf-8') as json_file:
+			regressions = compare(results, json.load(json_file), args.tolerance)
+		for result, before in regressions:
+			print(f'REGRESSION {result["case"]} @ {result["records"]}: {result["records_per_sec"]:,.0f} rec/s (baseline {before["records_per_sec"]:,.0f})', file=sys.stderr)
+		if regressions:
+			sys.exit(1)
+
+if __name__ == '__main__':
+	main()
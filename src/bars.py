@@ -0,0 +1,356 @@
+# src/bars.py
+
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from columnar import Columns
+from orderbook import price_to_ticks, time_to_us
+from utils.format_converter import format_number_string, format_match_time_us
+
+# 允許記錄晚到的時間（微秒）：K 棒結束後再經過這段時間才輸出
+DEFAULT_LATENESS = 1_000_000
+
+# add_columns 每次尋找可輸出週期時檢查的記錄筆數範圍
+MIN_CLOSE_SEARCH_WINDOW = 64
+MAX_CLOSE_SEARCH_WINDOW = 4096
+
+# 週期單位對應的微秒數
+INTERVAL_UNITS = {'ms': 1_000, 's': 1_000_000, 'm': 60_000_000, 'h': 3_600_000_000}
+
+
+def parse_interval(text: str) -> int:
+	"""
+	將 K 棒週期字串（如 "1s"、"1m"、"5m"、"1h"）轉為微秒數。
+
+	參數:
+	text (str): 數字加上單位 ms、s、m 或 h。
+
+	返回:
+	int: 週期的微秒數。
+	"""
+	match = re.fullmatch(r'(\d+)(ms|s|m|h)', text.strip())
+	if match is None or int(match.group(1)) == 0:
+		raise ValueError(f'無效的 K 棒週期：{text}（格式如 1s、1m、5m）')
+	return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
+
+def format_price(ticks: int) -> str:
+	# 與 convert_instant_quotes 的價格格式相同（5 位整數 + 4 位小數）
+	return format_number_string(f'{ticks:09d}', integer_digits=5, decimal_digits=4)
+
+
+class Bar:
+	"""
+	單一證券在一個週期內的開高低收、成交量、成交金額與成交筆數。價格以 0.0001 元為單位的整數儲存。
+	"""
+
+	__slots__ = ('stock_code', 'start', 'open', 'high', 'low', 'close', 'volume', 'notional', 'trades')
+
+	def __init__(self, stock_code: str, start: int, price: int):
+		self.stock_code = stock_code
+		self.start = start  # 週期起點，午夜起算的微秒數
+		self.open = price
+		self.high = price
+		self.low = price
+		self.close = price
+		self.volume = 0
+		self.notional = 0  # 價格 tick 數乘以成交量的總和
+		self.trades = 0
+
+	@property
+	def vwap(self) -> int:
+		"""
+		成交量加權平均價（四捨五入至 0.0001 元）。
+		"""
+		return (self.notional * 2 + self.volume) // (self.volume * 2)
+
+	def to_dict(self, numeric: bool = False) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+
+		參數:
+		numeric (bool): 為 True 時價格為 0.0001 元為單位的整數、週期起點為午夜起算的微秒數；
+		否則與解析記錄相同，價格為字串、時間為 "HH:MM:SS.mmmuuu"。
+
+		返回:
+		dict: K 棒資料。
+		"""
+		if numeric:
+			return {
+				'stock_code': self.stock_code,
+				'start': self.start,
+				'open': self.open,
+				'high': self.high,
+				'low': self.low,
+				'close': self.close,
+				'volume': self.volume,
+				'vwap': self.vwap,
+				'trades': self.trades,
+			}
+		return {
+			'stock_code': self.stock_code,
+			'start': format_match_time_us(self.start),
+			'open': format_price(self.open),
+			'high': format_price(self.high),
+			'low': format_price(self.low),
+			'close': format_price(self.close),
+			'volume': str(self.volume),
+			'vwap': format_price(self.vwap),
+			'trades': self.trades,
+		}
+
+
+class BarAggregator:
+	"""
+	逐筆或逐批將成交價量彙整為各證券的 K 棒。
+
+	- 只計入「成交價成交量」有揭示的記錄；試算揭示的記錄不計入。
+	- 瞬間價格趨勢為暫緩撮合時成交量以 0 揭示，並非實際成交，不計入開高低收與成交量。
+	- 已見過的最大撮合時間超過 K 棒結束時間 lateness 之後，該週期所有證券的 K 棒依代碼排序輸出；
+	  之後才到的同週期記錄計入 late，不再更新已輸出的 K 棒。
+
+	同時保留的 K 棒最多為證券數乘以 (lateness / interval + 2)，記憶體用量不隨檔案大小增加。
+	"""
+
+	def __init__(self, interval: int, lateness: int = DEFAULT_LATENESS):
+		self.interval = interval
+		self.lateness = lateness
+		self.late = 0  # 因晚到而未計入的成交筆數
+		self._open: Dict[int, Dict[str, Bar]] = {}  # 週期起點 -> 證券代碼 -> K 棒
+		self._watermark = -1  # 已見過的最大撮合時間
+		self._closed_before = 0  # 起點小於此值的週期皆已輸出
+		self._next_close: Optional[int] = None  # 最早的未輸出週期可以輸出的時間
+
+	def _bar_for(self, stock_code: str, start: int, price: int) -> Bar:
+		bars = self._open.get(start)
+		if bars is None:
+			bars = self._open[start] = {}
+			close_at = start + self.interval + self.lateness
+			if self._next_close is None or close_at < self._next_close:
+				self._next_close = close_at
+		bar = bars.get(stock_code)
+		if bar is None:
+			bar = bars[stock_code] = Bar(stock_code, start, price)
+		return bar
+
+	def _close_ready(self) -> List[Bar]:
+		# 輸出結束時間加上 lateness 已不晚於 watermark 的週期
+		if self._next_close is None or self._watermark < self._next_close:
+			return []
+		cutoff = self._watermark - self.interval - self.lateness
+		return self._close_until(cutoff)
+
+	def _close_until(self, cutoff: int) -> List[Bar]:
+		# 輸出起點不大於 cutoff 的週期，依週期起點與證券代碼排序
+		closed = []
+		for start in sorted(start for start in self._open if start <= cutoff):
+			bars = self._open.pop(start)
+			closed.extend(bars[stock_code] for stock_code in sorted(bars))
+			self._closed_before = max(self._closed_before, start + self.interval)
+		self._next_close = min(self._open) + self.interval + self.lateness if self._open else None
+		return closed
+
+	def add_trade(self, stock_code: str, matching_time: int, price: int, quantity: int) -> List[Bar]:
+		"""
+		計入一筆成交。
+
+		參數:
+		stock_code (str): 證券代碼。
+		matching_time (int): 撮合時間，午夜起算的微秒數。
+		price (int): 成交價，0.0001 元為單位的整數。
+		quantity (int): 成交量。
+
+		返回:
+		list: 因時間推進而完成的 K 棒（通常為空）。
+		"""
+		start = matching_time - matching_time % self.interval
+		if start < self._closed_before:
+			self.late += 1
+		else:
+			bar = self._bar_for(stock_code, start, price)
+			if price > bar.high:
+				bar.high = price
+			elif price < bar.low:
+				bar.low = price
+			bar.close = price
+			bar.volume += quantity
+			bar.notional += price * quantity
+			bar.trades += 1
+		return self.advance(matching_time)
+
+	def advance(self, matching_time: int) -> List[Bar]:
+		"""
+		以一筆記錄（不論是否成交）的撮合時間推進時間，輸出已完成的 K 棒。
+
+		參數:
+		matching_time (int): 撮合時間，午夜起算的微秒數。
+
+		返回:
+		list: 已完成的 K 棒。
+		"""
+		if matching_time > self._watermark:
+			self._watermark = matching_time
+		return self._close_ready()
+
+	def add_record(self, record: Dict[str, Any]) -> List[Bar]:
+		"""
+		計入 decode_record 產生的一筆記錄（預設模式或 numeric 模式皆可）。
+
+		參數:
+		record (dict): 解析後的記錄。
+
+		返回:
+		list: 已完成的 K 棒。
+		"""
+		body = record['body']
+		matching_time = time_to_us(body['matching_time'])
+		trade = body['instant_quotes']['成交價量']
+
+		# 試算揭示與暫緩撮合（成交量以 0 揭示）皆非實際成交
+		if trade is None or body['status_flags']['試算狀態註記'] == '試算揭示' or body['limit_flags']['瞬間價格趨勢'] != '一般揭示':
+			return self.advance(matching_time)
+		quantity = int(trade['quantity'])
+		if quantity == 0:
+			return self.advance(matching_time)
+		return self.add_trade(body['stock_code'], matching_time, price_to_ticks(trade['price']), quantity)
+
+	def add_columns(self, columns: Columns) -> List[Bar]:
+		"""
+		計入 columnar 解碼的一批記錄，依週期與證券分組後一次彙整。
+		晚到的判斷與逐筆 add_record 相同（依各筆記錄當時已輸出的週期），結果不因批次大小改變。
+
+		參數:
+		columns (dict): columnar.decode_frames 格式的欄位陣列。
+
+		返回:
+		list: 已完成的 K 棒。
+		"""
+		matching_time = columns['matching_time']
+		count = len(matching_time)
+		if count == 0:
+			return []
+
+		price = columns['price'][:, 0]
+		quantity = columns['quantity'][:, 0]
+		trade = (
+			((columns['reveal_flags'] & 0b10000000) != 0)
+			& (columns['slot_count'] > 0)
+			& ((columns['status_flags'] & 0b10000000) == 0)  # 試算揭示
+			& ((columns['limit_flags'] & 0b11) == 0)  # 暫緩撮合
+			& (quantity > 0)
+		)
+		start = matching_time - matching_time % self.interval
+		# 每筆記錄推進時間後，起點不大於此值的週期可以輸出
+		cutoff = np.maximum(np.maximum.accumulate(matching_time), self._watermark) - self.interval - self.lateness
+
+		# 模擬逐筆處理時各週期的輸出時點，決定哪些成交晚到；段內 closed_before 不變，
+		# 在第一筆使未輸出週期（含段內新增）可以輸出的記錄之後切開
+		accepted = np.zeros(count, dtype=bool)
+		open_starts = set(self._open)
+		closed_before = self._closed_before
+		begin = 0
+		window = MIN_CLOSE_SEARCH_WINDOW
+		while begin < count:
+			end = min(begin + window, count)
+			segment = trade[begin:end] & (start[begin:end] >= closed_before)
+			lowest = np.minimum.accumulate(np.where(segment, start[begin:end], np.iinfo(np.int64).max))
+			if open_starts:
+				lowest = np.minimum(lowest, min(open_starts))
+			ready = np.flatnonzero(lowest <= cutoff[begin:end])
+			if len(ready):
+				end = begin + int(ready[0]) + 1
+				segment = segment[:end - begin]
+			accepted[begin:end] = segment
+			open_starts.update(start[begin:end][segment].tolist())
+			if len(ready):
+				done = [period for period in open_starts if period <= cutoff[end - 1]]
+				closed_before = max(closed_before, max(done) + self.interval)
+				open_starts.difference_update(done)
+			window = min(max(2 * (end - begin), MIN_CLOSE_SEARCH_WINDOW), MAX_CLOSE_SEARCH_WINDOW)
+			begin = end
+
+		# 週期輸出後同週期的成交皆判為晚到，因此可一次彙整所有計入的成交後再輸出
+		self.late += int(np.count_nonzero(trade)) - int(np.count_nonzero(accepted))
+		if accepted.any():
+			self._add_trades(columns['stock_code'][accepted], start[accepted], price[accepted], quantity[accepted])
+		return self.advance(int(matching_time.max()))
+
+	def _add_trades(self, stock_code: np.ndarray, start: np.ndarray, price: np.ndarray, quantity: np.ndarray) -> None:
+		# 依週期與證券分組；lexsort 為穩定排序，組內保留原始順序
+		price = price.astype(np.int64)
+		quantity = quantity.astype(np.int64)
+		symbols, stock_index = np.unique(stock_code, return_inverse=True)
+		order = np.lexsort((stock_index, start))
+		start, stock_index, price, quantity = start[order], stock_index[order], price[order], quantity[order]
+		boundary = np.flatnonzero((np.diff(start) != 0) | (np.diff(stock_index) != 0)) + 1
+		first = np.concatenate(([0], boundary))
+		last = np.concatenate((boundary, [len(start)])) - 1
+
+		highs = np.maximum.reduceat(price, first)
+		lows = np.minimum.reduceat(price, first)
+		volumes = np.add.reduceat(quantity, first)
+		notionals = np.add.reduceat(price * quantity, first)
+		trades = np.diff(np.concatenate((first, [len(start)])))
+
+		for group in range(len(first)):
+			head = first[group]
+			bar = self._bar_for(str(symbols[stock_index[head]]), int(start[head]), int(price[head]))
+			bar.high = max(bar.high, int(highs[group]))
+			bar.low = min(bar.low, int(lows[group]))
+			bar.close = int(price[last[group]])
+			bar.volume += int(volumes[group])
+			bar.notional += int(notionals[group])
+			bar.trades += int(trades[group])
+
+	def flush(self) -> List[Bar]:
+		"""
+		資料結束時輸出所有尚未完成的 K 棒。
+
+		返回:
+		list: 剩餘的 K 棒，依週期起點與證券代碼排序。
+		"""
+		if not self._open:
+			return []
+		return self._close_until(max(self._open))
+
+
+def iter_bars(records: Iterable[Dict[str, Any]], interval: int, lateness: int = DEFAULT_LATENESS, aggregator: BarAggregator = None) -> Iterator[Bar]:
+	"""
+	將解析後的記錄串流彙整為 K 棒，週期完成即產出。
+
+	參數:
+	records (Iterable): decode_record 產生的記錄（如 iter_records、follow_file 的輸出）。
+	interval (int): K 棒週期（微秒）。
+	lateness (int): 允許記錄晚到的時間（微秒）。
+	aggregator (BarAggregator): 提供時使用此彙整器（可於結束後讀取 late）；None 表示建立新的彙整器。
+
+	返回:
+	Iterator: 依週期起點與證券代碼排序的 K 棒。
+	"""
+	if aggregator is None:
+		aggregator = BarAggregator(interval, lateness)
+	for record in records:
+		closed = aggregator.add_record(record)
+		if closed:
+			yield from closed
+	yield from aggregator.flush()
+
+
+def iter_bars_columnar(batches: Iterable[Columns], interval: int, lateness: int = DEFAULT_LATENESS, aggregator: BarAggregator = None) -> Iterator[Bar]:
+	"""
+	將 columnar 引擎的欄位批次彙整為 K 棒，不需逐筆產生記錄 dict。
+
+	參數:
+	batches (Iterable): columnar.iter_columnar_batches 產出的欄位批次。
+	interval (int): K 棒週期（微秒）。
+	lateness (int): 允許記錄晚到的時間（微秒）。
+	aggregator (BarAggregator): 提供時使用此彙整器；None 表示建立新的彙整器。
+
+	返回:
+	Iterator: 依週期起點與證券代碼排序的 K 棒。
+	"""
+	if aggregator is None:
+		aggregator = BarAggregator(interval, lateness)
+	for columns in batches:
+		yield from aggregator.add_columns(columns)
+	yield from aggregator.flush()
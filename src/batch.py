@@ -0,0 +1,268 @@
+# src/batch.py
+
+import glob
+import heapq
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import count
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from columnar import iter_columnar_batches
+from parallel import plan_ranges, _parse_range
+from parser import iter_records
+from record import Record
+from utils.compression import SUFFIXES, iter_buffers
+from utils.decoder import decode_packed_bcd
+from utils.format_converter import convert_match_time, convert_match_time_us
+from utils.framer import IntegrityReport, iter_frames
+from utils.sequence import SequenceTracker
+from writers import WRITERS, COLUMNAR_WRITERS
+
+# 原始資料檔的副檔名（指定目錄時只處理這些檔案）
+RAW_SUFFIX = '.new'
+
+# 壓縮後的原始資料檔的副檔名（如 .new.gz）
+RAW_SUFFIXES = (RAW_SUFFIX,) + tuple(RAW_SUFFIX + suffix for suffix in SUFFIXES)
+
+# 合併輸出時每個檔案預先解析的區段數
+MERGE_WINDOW = 2
+
+MergeKey = Tuple[str, str]
+
+
+def expand_inputs(pattern: str, root: str = 'data/raw') -> List[str]:
+	"""
+	將輸入參數展開為檔案列表：可為單一檔案、萬用字元（如 "f6_*.new"）或目錄（含 .new.gz 等壓縮檔）。
+
+	參數:
+	pattern (str): 相對於 root 的檔案名稱、萬用字元或目錄。
+	root (str): 原始資料目錄。
+
+	返回:
+	list: 依檔名排序的檔案路徑；檔名以傳輸序號範圍命名，排序即為傳輸順序。
+	"""
+	path = os.path.normpath(os.path.join(root, pattern))
+	if os.path.isdir(path):
+		return sorted(match for match in glob.glob(os.path.join(glob.escape(path), '*' + RAW_SUFFIX + '*')) if match.endswith(RAW_SUFFIXES))
+	if glob.has_magic(pattern):
+		return sorted(match for match in glob.glob(path) if os.path.isfile(match))
+	return [path]
+
+
+def is_batch_input(pattern: str, root: str = 'data/raw') -> bool:
+	"""
+	判斷輸入參數是否為萬用字元或目錄（可能對應多個檔案）。
+	"""
+	return glob.has_magic(pattern) or os.path.isdir(os.path.join(root, pattern))
+
+
+def output_path_for(data_file: str, output_dir: str, output_format: str) -> str:
+	"""
+	個別輸出時每個檔案的輸出路徑：輸出目錄中與原始檔同名、副檔名為輸出格式的檔案。
+	"""
+	name = os.path.basename(data_file)
+	for suffix in RAW_SUFFIXES:
+		if name.endswith(suffix):
+			name = name[:-len(suffix)]
+			break
+	return os.path.join(output_dir, f'{name}.{output_format}')
+
+
+def _count_items(items: Iterable[Any], size: Callable[[Any], int], counter: List[int]) -> Iterator[Any]:
+	# 寫出時順便累計記錄筆數
+	for item in items:
+		counter[0] += size(item)
+		yield item
+
+
+def _convert_file(data_file: str, output_file: str, output_format: str, skip_conditions, stock_codes, time_range, verify: bool, track: Optional[bool], numeric: bool = False, compact: bool = False) -> Tuple[int, Optional[IntegrityReport], Optional[SequenceTracker]]:
+	"""
+	行程池工作函數：解析單一檔案並直接寫出，只將筆數與驗證、序號結果傳回主行程。
+	"""
+	report = IntegrityReport() if verify else None
+	sequence = SequenceTracker(track, keep_numbers=True) if track is not None else None
+	counter = [0]
+
+	if output_format in COLUMNAR_WRITERS:
+		batches = iter_columnar_batches(data_file, skip_conditions, stock_codes=stock_codes, time_range=time_range, report=report, sequence=sequence)
+		COLUMNAR_WRITERS[output_format](_count_items(batches, lambda batch: len(batch['offset']), counter), output_file)
+	else:
+		records = iter_records(data_file, skip_conditions, stock_codes, time_range, report=report, sequence=sequence, numeric=numeric)
+		WRITERS[output_format](_count_items(records, lambda record: 1, counter), output_file, compact=compact)
+
+	return counter[0], report, sequence
+
+
+def convert_files(file_paths: List[str], output_dir: str, output_format: str = 'json', workers: int = 1, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, report: IntegrityReport = None, sequence: SequenceTracker = None, numeric: bool = False, compact: bool = False) -> Dict[str, int]:
+	"""
+	將多個數據文件分別解析並各自寫出至輸出目錄；workers 大於 1 時以行程池同時處理多個檔案。
+
+	參數:
+	file_paths (list): 數據文件路徑。
+	output_dir (str): 輸出目錄，不存在時建立。
+	output_format (str): 輸出格式（writers.WRITERS 或 writers.COLUMNAR_WRITERS 的名稱）。
+	workers (int): 同時處理的檔案數。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，各檔案的結果依檔案順序合併於此。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號，各檔案的結果依檔案順序合併於此。
+	numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間（欄位式格式本身即為數值）。
+	compact (bool): 為 True 時 JSON 輸出不換行、不留空白。
+
+	返回:
+	dict: 輸出檔案路徑對應寫出的記錄筆數。
+	"""
+	os.makedirs(output_dir, exist_ok=True)
+	stock_codes = list(stock_codes) if stock_codes is not None else None
+	verify = report is not None
+	track = sequence.drop_duplicates if sequence is not None else None
+	output_files = [output_path_for(data_file, output_dir, output_format) for data_file in file_paths]
+	tasks = [(data_file, output_file, output_format, skip_conditions, stock_codes, time_range, verify, track, numeric, compact) for data_file, output_file in zip(file_paths, output_files)]
+
+	if workers > 1:
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			results = list(executor.map(_convert_file, *zip(*tasks)))
+	else:
+		results = [_convert_file(*task) for task in tasks]
+
+	counts = {}
+	for output_file, (written, file_report, file_sequence) in zip(output_files, results):
+		counts[output_file] = written
+		if verify:
+			report.merge(file_report)
+		if sequence is not None:
+			sequence.merge(file_sequence)
+	return counts
+
+
+def merge_key(record: Union[Dict[str, Any], Record]) -> MergeKey:
+	"""
+	合併排序的依據：(撮合時間, 傳輸序號)。兩者皆為固定寬度的字串，字串順序即時間與序號順序；
+	numeric 模式的撮合時間為整數，同一次合併中的記錄型別一致，仍可直接比較。
+	"""
+	if isinstance(record, Record):
+		return record.matching_time, record.transmission_number
+	return record['body']['matching_time'], record['header']['transmission_number']
+
+
+def peek_key(file_path: str, numeric: bool = False) -> Optional[MergeKey]:
+	"""
+	讀取檔案第一筆記錄的排序鍵，作為該檔案所有記錄排序鍵的下界（不套用跳過條件）。
+	numeric 為 True 時撮合時間為午夜起算的微秒數，與 numeric 模式的記錄一致。
+
+	返回:
+	tuple: (撮合時間, 傳輸序號)；沒有記錄時返回 None。
+	"""
+	for _, buffer, end in iter_buffers(file_path):
+		for frame in iter_frames(buffer, 0, end):
+			if len(frame) >= 22:
+				matching_time = convert_match_time_us(frame[16:22]) if numeric else convert_match_time(frame[16:22])
+				return matching_time, decode_packed_bcd(frame[6:10])
+	return None
+
+
+class _RangeStream:
+	"""
+	以行程池依序解析單一檔案的各區段。建立時即提交前 window 個區段，
+	之後每取出一個區段的結果再補上一個，同一檔案最多 window 個區段的記錄留在記憶體中。
+	"""
+
+	def __init__(self, executor: Executor, file_path: str, task: tuple, window: int, report: Optional[IntegrityReport], sequence: Optional[SequenceTracker]):
+		self._executor = executor
+		self._file_path = file_path
+		self._task = task
+		self._report = report
+		self._sequence = sequence
+		self._ranges = iter(plan_ranges(file_path, 1))
+		self._pending = deque()
+		for _ in range(window):
+			self._submit()
+
+	def _submit(self) -> None:
+		for start, end in self._ranges:
+			self._pending.append(self._executor.submit(_parse_range, self._file_path, start, end, *self._task))
+			return
+
+	def __iter__(self) -> Iterator[Any]:
+		while self._pending:
+			records, report, sequence = self._pending.popleft().result()
+			self._submit()
+			if self._report is not None:
+				self._report.merge(report)
+			if self._sequence is not None:
+				self._sequence.merge(sequence)
+			yield from records
+
+
+def iter_merged_records(file_paths: List[str], skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, workers: int = 1, report: IntegrityReport = None, lazy: bool = False, sequence: SequenceTracker = None, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+	"""
+	解析多個數據文件，並以 heap 做 k 路合併，依 (撮合時間, 傳輸序號) 順序逐筆產出。
+	每個檔案本身應依撮合時間排列（即原始傳送順序）。
+
+	檔案依第一筆記錄的排序鍵在需要時才開啟：時間不重疊的分段檔案會依序處理，
+	同時開啟的檔案數與記憶體用量只與時間重疊的檔案數有關，不需載入所有記錄。
+	workers 大於 1 時以行程池解析，並預先開始解析接下來的 workers 個檔案。
+
+	參數:
+	file_paths (list): 數據文件路徑。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	workers (int): 平行解析的行程數。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，結果累計於此。
+	lazy (bool): 為 True 時產出延遲解碼的 Record。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號；sequence.drop_duplicates 為 True 時略過同一檔案內重複的記錄。
+	numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+	返回:
+	Iterator: 依撮合時間順序產出解析後的數據記錄（dict，lazy 時為 Record）。
+	"""
+	# 依第一筆記錄的排序鍵排列，作為各檔案的開啟順序
+	starts = []
+	for index, file_path in enumerate(file_paths):
+		key = peek_key(file_path, numeric)
+		if key is not None:
+			starts.append((key, index))
+	starts.sort()
+	if not starts:
+		return
+
+	stock_codes = list(stock_codes) if stock_codes is not None else None
+	executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+	task = (skip_conditions, stock_codes, time_range, report is not None, lazy, sequence.drop_duplicates if sequence is not None else None, numeric)
+	started: Dict[int, Iterator[Any]] = {}
+	upcoming = deque(index for _, index in starts)
+
+	def open_stream(index: int) -> Iterator[Any]:
+		if executor is None:
+			return iter(iter_records(file_paths[index], skip_conditions, stock_codes, time_range, report=report, lazy=lazy, sequence=sequence, numeric=numeric))
+
+		# 開啟此檔案，並預先提交接下來幾個檔案的區段
+		while upcoming and len(started) <= workers:
+			next_index = upcoming.popleft()
+			started[next_index] = iter(_RangeStream(executor, file_paths[next_index], task, MERGE_WINDOW, report, sequence))
+		if index not in started:
+			upcoming.remove(index)
+			started[index] = iter(_RangeStream(executor, file_paths[index], task, MERGE_WINDOW, report, sequence))
+		return started.pop(index)
+
+	# heap 中的項目為 (排序鍵, 檔案順序, 編號, 記錄, 串流)；記錄為 None 表示尚未開啟的檔案，排序鍵為下界
+	tiebreak = count()
+	heap = [(key, index, next(tiebreak), None, None) for key, index in starts]
+	heapq.heapify(heap)
+
+	try:
+		while heap:
+			key, index, _, record, stream = heapq.heappop(heap)
+			if stream is None:
+				stream = open_stream(index)
+			else:
+				yield record
+
+			for record in stream:
+				heapq.heappush(heap, (merge_key(record), index, next(tiebreak), record, stream))
+				break
+	finally:
+		if executor is not None:
+			executor.shutdown(cancel_futures=True)
@@ -0,0 +1,352 @@
+# src/cache.py
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from columnar import DEFAULT_BATCH_SIZE, Columns, decode_frames, iter_columnar_batches, skip_mask
+from constants import TERMINAL_CODE, QUOTE_OFFSET, QUOTE_LENGTH, MAX_QUOTE_SLOTS
+from parser import decode_record
+from utils.format_converter import format_number_string
+from utils.compression import open_buffer
+from utils.framer import read_message_length, is_valid_frame
+from utils.sequence import SequenceTracker
+
+# 預設的快取目錄
+DEFAULT_CACHE_DIR = 'data/cache'
+
+# 預設的快取容量上限（位元組），超過時刪除最久未使用的項目
+DEFAULT_MAX_BYTES = 4 << 30
+
+# 快取格式版本；格式改變時遞增，舊項目自動失效
+CACHE_VERSION = 1
+
+# 計算內容雜湊時每次讀取的位元組數
+HASH_BLOCK_SIZE = 1 << 22
+
+# 解碼結果取決於這些模組，任一模組的內容改變時快取即失效
+PARSER_MODULES = ('constants.py', 'columnar.py', 'parser.py', 'utils/decoder.py', 'utils/format_converter.py', 'utils/framer.py')
+
+# 由快取產生記錄時，每次取出的列數
+CACHED_RECORDS_BATCH_SIZE = 1 << 16
+
+# 內容雜湊的記錄檔：以檔案大小、修改時間與 inode 判斷是否需要重新計算
+DIGESTS_FILE = 'digests.json'
+
+_parser_version = None
+
+
+def parser_version() -> str:
+	"""
+	以解碼相關模組的原始碼計算解析器版本，任一模組修改後版本即不同。
+
+	返回:
+	str: 解析器版本（16 進位字串）。
+	"""
+	global _parser_version
+	if _parser_version is None:
+		digest = hashlib.blake2b(str(CACHE_VERSION).encode(), digest_size=16)
+		source_dir = os.path.dirname(os.path.abspath(__file__))
+		for module in PARSER_MODULES:
+			with open(os.path.join(source_dir, module), 'rb') as source_file:
+				digest.update(source_file.read())
+		_parser_version = digest.hexdigest()
+	return _parser_version
+
+
+def file_digest(file_path: str) -> str:
+	"""
+	計算檔案內容的雜湊（BLAKE2b）。
+
+	參數:
+	file_path (str): 檔案路徑。
+
+	返回:
+	str: 內容雜湊（16 進位字串）。
+	"""
+	digest = hashlib.blake2b(digest_size=16)
+	with open(file_path, 'rb') as data_file:
+		while True:
+			block = data_file.read(HASH_BLOCK_SIZE)
+			if not block:
+				break
+			digest.update(block)
+	return digest.hexdigest()
+
+
+class ParseCache:
+	"""
+	以原始檔案內容雜湊與解析器版本為鍵的解碼結果快取。每個項目為一個目錄，
+	以 .npy 保存 columnar 解碼的所有欄位（不套用任何條件），讀取時以記憶體映射載入。
+
+	- 跳過條件、證券代碼與撮合時間範圍在讀取後以欄位陣列篩選，不同條件共用同一個項目。
+	- 總容量超過 max_bytes 時，依最後使用時間刪除最舊的項目。
+	"""
+
+	def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		os.makedirs(cache_dir, exist_ok=True)
+
+	def _digest_for(self, file_path: str) -> str:
+		# 檔案大小、修改時間與 inode 都未改變時沿用上次計算的內容雜湊
+		status = os.stat(file_path)
+		signature = [status.st_size, status.st_mtime_ns, status.st_ino]
+		digests_file = os.path.join(self.cache_dir, DIGESTS_FILE)
+		try:
+			with open(digests_file, encoding='utf-8') as json_file:
+				digests = json.load(json_file)
+		except (FileNotFoundError, ValueError):
+			digests = {}
+
+		path = os.path.abspath(file_path)
+		known = digests.get(path)
+		if known is not None and known['signature'] == signature:
+			return known['digest']
+
+		digest = file_digest(file_path)
+		digests = {known_path: known for known_path, known in digests.items() if os.path.exists(known_path)}
+		digests[path] = {'signature': signature, 'digest': digest}
+		temporary_file = f'{digests_file}.{os.getpid()}.tmp'
+		with open(temporary_file, 'w', encoding='utf-8') as json_file:
+			json.dump(digests, json_file)
+		os.replace(temporary_file, digests_file)
+		return digest
+
+	def key_for(self, file_path: str) -> str:
+		"""
+		返回原始檔案對應的快取鍵（內容雜湊與解析器版本）。
+
+		參數:
+		file_path (str): 原始數據文件的路徑。
+
+		返回:
+		str: 快取鍵。
+		"""
+		return hashlib.blake2b((self._digest_for(file_path) + parser_version()).encode(), digest_size=16).hexdigest()
+
+	def get(self, file_path: str) -> Optional[Columns]:
+		"""
+		讀取快取的欄位陣列，並更新該項目的最後使用時間。
+
+		參數:
+		file_path (str): 原始數據文件的路徑。
+
+		返回:
+		dict: 欄位陣列（記憶體映射，唯讀）；沒有快取時返回 None。
+		"""
+		entry = os.path.join(self.cache_dir, self.key_for(file_path))
+		try:
+			with open(os.path.join(entry, 'meta.json'), encoding='utf-8') as json_file:
+				meta = json.load(json_file)
+		except FileNotFoundError:
+			return None
+
+		os.utime(entry)
+		return {name: np.load(os.path.join(entry, f'{name}.npy'), mmap_mode='r', allow_pickle=False) for name in meta['columns']}
+
+	def put(self, file_path: str, columns: Columns) -> str:
+		"""
+		寫入欄位陣列。先寫入暫存目錄再改名，中斷時不會留下不完整的項目。
+
+		參數:
+		file_path (str): 原始數據文件的路徑。
+		columns (dict): 整份檔案的欄位陣列（未套用任何條件）。
+
+		返回:
+		str: 快取項目的目錄。
+		"""
+		key = self.key_for(file_path)
+		entry = os.path.join(self.cache_dir, key)
+		temporary_entry = f'{entry}.{os.getpid()}.tmp'
+		os.makedirs(temporary_entry, exist_ok=True)
+		for name, column in columns.items():
+			np.save(os.path.join(temporary_entry, f'{name}.npy'), column, allow_pickle=False)
+		with open(os.path.join(temporary_entry, 'meta.json'), 'w', encoding='utf-8') as json_file:
+			json.dump({'source': os.path.abspath(file_path), 'parser_version': parser_version(), 'records': len(columns['offset']), 'columns': list(columns), 'created': time.time()}, json_file)
+
+		try:
+			os.rename(temporary_entry, entry)
+		except OSError:
+			# 其他行程已寫入相同的項目
+			shutil.rmtree(temporary_entry, ignore_errors=True)
+
+		self.evict(keep=key)
+		return entry
+
+	def load(self, file_path: str, workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[Columns, bool]:
+		"""
+		讀取快取；沒有快取時解碼整份檔案並寫入快取。
+
+		參數:
+		file_path (str): 原始數據文件的路徑。
+		workers (int): 沒有快取時平行解碼的行程數。
+		batch_size (int): 沒有快取時每批解碼的記錄數。
+
+		返回:
+		tuple: (欄位陣列, 是否來自快取)。
+		"""
+		columns = self.get(file_path)
+		if columns is not None:
+			return columns, True
+
+		batches = list(iter_columnar_batches(file_path, batch_size=batch_size, workers=workers))
+		columns = {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]} if batches else _empty_columns()
+		self.put(file_path, columns)
+		return columns, False
+
+	def entries(self) -> List[Dict[str, Any]]:
+		"""
+		列出快取項目，依最後使用時間由新到舊排列。
+
+		返回:
+		list: 每個項目的 key、size（位元組）、used（最後使用時間）、records、source 與 parser_version。
+		"""
+		entries = []
+		for key in os.listdir(self.cache_dir):
+			entry = os.path.join(self.cache_dir, key)
+			meta_file = os.path.join(entry, 'meta.json')
+			if key.endswith('.tmp') or not os.path.isfile(meta_file):
+				continue
+			with open(meta_file, encoding='utf-8') as json_file:
+				meta = json.load(json_file)
+			size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+			entries.append({'key': key, 'size': size, 'used': os.path.getmtime(entry), 'records': meta['records'], 'source': meta['source'], 'parser_version': meta['parser_version']})
+		entries.sort(key=lambda entry: entry['used'], reverse=True)
+		return entries
+
+	def evict(self, keep: str = None) -> List[str]:
+		"""
+		刪除以舊版解析器產生的項目；總容量仍超過上限時，刪除最久未使用的項目。
+
+		參數:
+		keep (str): 不刪除的快取鍵（如剛寫入的項目）。
+
+		返回:
+		list: 被刪除的快取鍵。
+		"""
+		evicted = []
+		total = 0
+		for entry in self.entries():
+			total += entry['size']
+			if entry['key'] != keep and (entry['parser_version'] != parser_version() or total > self.max_bytes):
+				shutil.rmtree(os.path.join(self.cache_dir, entry['key']), ignore_errors=True)
+				total -= entry['size']
+				evicted.append(entry['key'])
+		return evicted
+
+	def clear(self) -> int:
+		"""
+		刪除所有快取項目。
+
+		返回:
+		int: 被刪除的項目數。
+		"""
+		entries = self.entries()
+		for entry in entries:
+			shutil.rmtree(os.path.join(self.cache_dir, entry['key']), ignore_errors=True)
+		return len(entries)
+
+
+def _empty_columns() -> Columns:
+	# 空檔案的欄位陣列，型別與 decode_frames 相同
+	return decode_frames(b'\x00', np.zeros((0, 2), dtype=np.int64))
+
+
+def select_rows(columns: Columns, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, sequence: SequenceTracker = None) -> np.ndarray:
+	"""
+	以快取的欄位陣列套用條件，返回保留的列號。
+
+	參數:
+	columns (dict): 整份檔案的欄位陣列。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號（被跳過的記錄也計入）；sequence.drop_duplicates 為 True 時略過重複的記錄。
+
+	返回:
+	np.ndarray: 依檔案順序的列號。
+	"""
+	keep = np.ones(len(columns['offset']), dtype=bool)
+	if sequence is not None:
+		first_seen = sequence.observe_array(columns['transmission_number'])
+		if sequence.drop_duplicates:
+			keep &= first_seen
+	if skip_conditions or stock_codes is not None or any(time_range or ()):
+		keep &= ~skip_mask(columns, skip_conditions, stock_codes, time_range)
+	return np.flatnonzero(keep)
+
+
+def iter_cached_batches(columns: Columns, rows: np.ndarray, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Columns]:
+	"""
+	將保留的列分批產出為欄位陣列，可直接交給 writers 的欄位式輸出或 K 棒彙整。
+
+	參數:
+	columns (dict): 整份檔案的欄位陣列。
+	rows (np.ndarray): select_rows 返回的列號。
+	batch_size (int): 每批記錄數。
+
+	返回:
+	Iterator: 逐批產出欄位陣列（dict）。
+	"""
+	for start in range(0, len(rows), batch_size):
+		selected = rows[start:start + batch_size]
+		yield {name: np.asarray(column[selected]) for name, column in columns.items()}
+
+
+class _PriceStrings(dict):
+	"""
+	價格 tick 數對應格式化字串的查表，第一次遇到時才格式化。一天的成交價種類有限，多數記錄只需查表。
+	"""
+
+	def __missing__(self, ticks: int) -> str:
+		text = self[ticks] = format_number_string(f'{ticks:010d}', integer_digits=5, decimal_digits=4)
+		return text
+
+
+def iter_cached_records(file_path: str, columns: Columns, rows: np.ndarray, numeric: bool = False, batch_size: int = CACHED_RECORDS_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+	"""
+	只解碼保留的列，結果與以相同條件呼叫 iter_records 相同。
+	價量直接使用快取中已解碼的整數並查表格式化，其餘欄位由原始檔案讀取；
+	價量含無效 PACK BCD 的記錄（quote_bcd_error）由原始記錄完整解析。
+
+	參數:
+	file_path (str): 原始數據文件的路徑（內容須與快取相同）。
+	columns (dict): 整份檔案的欄位陣列。
+	rows (np.ndarray): select_rows 返回的列號。
+	numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+	batch_size (int): 每次由快取取出的列數。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄。
+	"""
+	if numeric:
+		converters = (int, int, 0)
+	else:
+		converters = (_PriceStrings().__getitem__, str, '0')
+
+	with open_buffer(file_path) as buffer:
+		for start in range(0, len(rows), batch_size):
+			selected = rows[start:start + batch_size]
+			offsets = np.asarray(columns['offset'][selected]).tolist()
+			slot_counts = np.asarray(columns['slot_count'][selected]).tolist()
+			prices = np.asarray(columns['price'][selected]).tolist()
+			quantities = np.asarray(columns['quantity'][selected]).tolist()
+			errors = np.asarray(columns['quote_bcd_error'][selected]).tolist()
+
+			for offset, slots, price, quantity, error in zip(offsets, slot_counts, prices, quantities, errors):
+				length = read_message_length(buffer, offset)
+				if not is_valid_frame(buffer, offset, length):
+					raise ValueError(f'Cache does not match {file_path} at offset {offset}')
+
+				record = buffer[offset:offset + length]
+				if error or (length - len(TERMINAL_CODE) - QUOTE_OFFSET) // QUOTE_LENGTH > MAX_QUOTE_SLOTS:
+					# 價量無法由整數還原，或超過欄位陣列容納的檔數：由原始記錄解析
+					decoded = decode_record(record, numeric=numeric)
+				else:
+					decoded = decode_record(record, numeric=numeric, quotes=(price[:slots], quantity[:slots], converters))
+				if decoded is not None:
+					yield decoded
@@ -0,0 +1,72 @@
+# src/client.py
+
+"""
+常駐解析服務（python3 src/main.py daemon）的用戶端。參數與 main.py 相同，由服務的工作行程執行，
+不需每次啟動直譯器載入解析模組。只使用標準函式庫中載入快速的模組。
+
+使用方法：
+python3 src/client.py f6_01000001_01001000_TP03.new output.json --scenarios "1:include" --stocks 2330
+python3 src/client.py --socket /tmp/f6.sock --status
+python3 src/client.py --shutdown
+"""
+
+import json
+import os
+import socket
+import sys
+
+# 與 daemon.DEFAULT_SOCKET_PATH 相同；不匯入 daemon 以免載入多餘模組
+DEFAULT_SOCKET_PATH = 'data/daemon.sock'
+
+
+def request(payload: dict, socket_path: str = DEFAULT_SOCKET_PATH) -> dict:
+	"""
+	送出一個請求並等待回應。
+
+	參數:
+	payload (dict): 請求內容，如 {"argv": [...], "cwd": "..."} 或 {"command": "status"}。
+	socket_path (str): 服務的 Unix socket 路徑。
+
+	返回:
+	dict: 服務的回應。
+	"""
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+		connection.connect(socket_path)
+		connection.sendall(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+		with connection.makefile('rb') as stream:
+			line = stream.readline()
+	if not line:
+		raise ConnectionError(f'The daemon on {socket_path} closed the connection without a response')
+	return json.loads(line)
+
+
+def main(argv=None) -> int:
+	if argv is None:
+		argv = sys.argv[1:]
+
+	socket_path = os.environ.get('F6_DAEMON_SOCKET', DEFAULT_SOCKET_PATH)
+	if len(argv) >= 2 and argv[0] == '--socket':
+		socket_path = argv[1]
+		argv = argv[2:]
+
+	if argv in (['--status'], ['--shutdown']):
+		payload = {'command': argv[0][2:]}
+	else:
+		payload = {'argv': argv, 'cwd': os.getcwd()}
+
+	try:
+		response = request(payload, socket_path)
+	except (FileNotFoundError, ConnectionRefusedError):
+		print(f'No daemon is listening on {socket_path}; start one with: python3 src/main.py daemon --socket {socket_path}', file=sys.stderr)
+		return 1
+
+	if 'exit_code' not in response:
+		print(json.dumps(response))
+		return 0
+	sys.stdout.write(response['stdout'])
+	sys.stderr.write(response['stderr'])
+	return response['exit_code']
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,316 @@
+# src/columnar.py
+
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from constants import TERMINAL_CODE, QUOTE_OFFSET, QUOTE_LENGTH, MAX_QUOTE_SLOTS
+from parser import validate_stock_codes
+from record import MIN_RECORD_LENGTH
+from utils.compression import is_splittable, iter_buffers
+from utils.framer import IntegrityReport, iter_frame_spans
+from utils.sequence import SequenceTracker
+from utils.format_converter import encode_match_time
+
+# 固定欄位所需的記錄寬度（不含檢查碼與 TERMINAL-CODE）
+RECORD_WIDTH = QUOTE_OFFSET + MAX_QUOTE_SLOTS * QUOTE_LENGTH
+
+# 每批解碼的記錄數；每批約配置 RECORD_WIDTH 倍記錄數的位元組矩陣與同樣列數的價量陣列
+DEFAULT_BATCH_SIZE = 65_536
+
+Columns = Dict[str, np.ndarray]
+
+
+def decode_bcd_columns(raw: np.ndarray) -> np.ndarray:
+	"""
+	以向量化的 nibble 運算，將 [N, k] 的 PACK BCD 位元組矩陣解碼為整數。
+
+	參數:
+	raw (np.ndarray): uint8 矩陣，最後一維為同一欄位的 k 個位元組（高位在前）。
+
+	返回:
+	np.ndarray: int64 陣列，形狀為 raw.shape[:-1]。
+	"""
+	# 每個位元組先轉為 0-99 的兩位數
+	pairs = (raw >> 4).astype(np.int64) * 10 + (raw & 0xF)
+	powers = 100 ** np.arange(raw.shape[-1] - 1, -1, -1, dtype=np.int64)
+	return pairs @ powers
+
+
+def decode_match_time_columns(raw: np.ndarray) -> np.ndarray:
+	"""
+	將 [..., 6] 的 PACK BCD 撮合時間（HHMMSS + 6 位微秒）轉為午夜起算的微秒數。
+
+	參數:
+	raw (np.ndarray): uint8 陣列，最後一維為撮合時間的 6 個位元組。
+
+	返回:
+	np.ndarray: int64 陣列，形狀為 raw.shape[:-1]。
+	"""
+	pairs = (raw[..., 0:3] >> 4).astype(np.int64) * 10 + (raw[..., 0:3] & 0xF)
+	seconds = (pairs[..., 0] * 60 + pairs[..., 1]) * 60 + pairs[..., 2]
+	return seconds * 1_000_000 + decode_bcd_columns(raw[..., 3:6])
+
+
+def decode_frames(buffer, spans: np.ndarray) -> Columns:
+	"""
+	將一批記錄一次解碼為欄位陣列。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes 或 mmap）。
+	spans (np.ndarray): [N, 2] 的 (offset, length) 陣列。
+
+	返回:
+	dict: 欄位名稱對應的 NumPy 陣列。
+	"""
+	data = np.frombuffer(buffer, dtype=np.uint8)
+	offsets = spans[:, 0]
+	lengths = spans[:, 1]
+
+	# 依固定位置將每筆記錄收集成 [N, RECORD_WIDTH] 的矩陣：以滑動視窗直接取列，不建立逐位元組的索引矩陣
+	raw = np.zeros((len(offsets), RECORD_WIDTH), dtype=np.uint8)
+	inside = offsets <= len(data) - RECORD_WIDTH
+	if len(data) >= RECORD_WIDTH:
+		raw[inside] = np.lib.stride_tricks.sliding_window_view(data, RECORD_WIDTH)[offsets[inside]]
+	# 接近檔尾的記錄逐筆複製，超出檔案的位置以 0 填補
+	for i in np.flatnonzero(~inside).tolist():
+		tail = data[offsets[i]:]
+		raw[i, :len(tail)] = tail
+
+	# 短於 BODY 固定欄位的記錄不讀取下一筆記錄的內容（decode_checked_frames 不輸出這些記錄）
+	short = np.flatnonzero(lengths < MIN_RECORD_LENGTH)
+	if len(short):
+		raw[short] = np.where(np.arange(RECORD_WIDTH) < lengths[short, None], raw[short], 0)
+
+	# 即時行情價量：依記錄長度計算實際檔數，其餘以 0 填補
+	quotes = raw[:, QUOTE_OFFSET:RECORD_WIDTH].reshape(-1, MAX_QUOTE_SLOTS, QUOTE_LENGTH)
+	slot_count = np.clip((lengths - len(TERMINAL_CODE) - QUOTE_OFFSET) // QUOTE_LENGTH, 0, MAX_QUOTE_SLOTS)
+	present = np.arange(MAX_QUOTE_SLOTS) < slot_count[:, None]
+	price = np.where(present, decode_bcd_columns(quotes[:, :, 0:5]), 0)
+	quantity = np.where(present, decode_bcd_columns(quotes[:, :, 5:9]), 0)
+
+	# 價量含大於 9 的 nibble 時，整數無法還原 decode_packed_bcd 的字串（如 0xA 輸出為 "10"）
+	invalid = (((quotes >> 4) > 9) | ((quotes & 0xF) > 9)).any(axis=2)
+	quote_bcd_error = (invalid & present).any(axis=1)
+
+	return {
+		'offset': offsets.copy(),
+		'transmission_number': decode_bcd_columns(raw[:, 6:10]),
+		'stock_code': np.char.rstrip(raw[:, 10:16].copy().view('S6').ravel().astype('U6')),
+		'matching_time': decode_match_time_columns(raw[:, 16:22]),
+		'reveal_flags': raw[:, 22].copy(),
+		'limit_flags': raw[:, 23].copy(),
+		'status_flags': raw[:, 24].copy(),
+		'total_volume': decode_bcd_columns(raw[:, 25:29]),
+		'slot_count': slot_count.astype(np.int8),
+		'price': price,
+		'quantity': quantity,
+		'quote_bcd_error': quote_bcd_error,
+	}
+
+
+def verify_frames(buffer, spans: np.ndarray, report: IntegrityReport, expected: int) -> np.ndarray:
+	"""
+	以 NumPy 的 XOR reduceat 一次驗證一批記錄的檢查碼，並將結果與略過的資料累計至 report。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes 或 mmap）。
+	spans (np.ndarray): [N, 2] 的 (offset, length) 陣列，依檔案順序排列。
+	report (IntegrityReport): 累計驗證結果的物件。
+	expected (int): 上一批最後一筆記錄的結尾位置（第一批為走訪起點）。
+
+	返回:
+	np.ndarray: bool 陣列，True 表示檢查碼正確。
+	"""
+	if len(spans) == 0:
+		return np.zeros(0, dtype=bool)
+
+	data = np.frombuffer(buffer, dtype=np.uint8)
+	offsets = spans[:, 0]
+	lengths = spans[:, 1]
+
+	# 每筆記錄的 XOR 範圍為第 2 個 Byte 到檢查碼之前；以成對的起訖位置交給 reduceat，取偶數位置的結果
+	checksum_index = offsets + lengths - len(TERMINAL_CODE) - 1
+	bounds = np.empty(len(spans) * 2, dtype=np.int64)
+	bounds[0::2] = offsets + 1
+	bounds[1::2] = checksum_index
+	valid = np.bitwise_xor.reduceat(data, bounds)[0::2] == data[checksum_index]
+
+	# 與前一筆記錄結尾不相接的位置即為重新同步時略過的資料
+	previous_end = np.concatenate(([expected], offsets[:-1] + lengths[:-1]))
+	gaps = offsets - previous_end
+	for i in np.flatnonzero(gaps):
+		report.add_gap(int(previous_end[i]), int(gaps[i]))
+
+	report.frames += len(spans)
+	report.valid += int(valid.sum())
+	for i in np.flatnonzero(~valid):
+		offset = int(offsets[i])
+		report.add_bad_frame(offset, buffer[offset:offset + int(lengths[i])])
+
+	return valid
+
+
+def skip_mask(columns: Columns, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None) -> np.ndarray:
+	"""
+	以向量化方式套用與 parser.compile_filter 相同的跳過條件。
+
+	參數:
+	columns (dict): decode_frames 產出的欄位陣列。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+
+	返回:
+	np.ndarray: bool 陣列，True 表示該筆記錄應跳過。
+	"""
+	flag_columns = {22: 'reveal_flags', 23: 'limit_flags', 24: 'status_flags'}
+	size = len(columns['offset'])
+	include_result = np.ones(size, dtype=bool)
+	exclude_result = np.zeros(size, dtype=bool)
+
+	for condition in skip_conditions or []:
+		mask, value = condition['value']
+		match = (columns[flag_columns[condition['position']]] & mask) == value
+
+		if condition['mode'] == 'include':
+			include_result &= match
+		elif condition['mode'] == 'exclude':
+			exclude_result |= match
+
+	if stock_codes is not None:
+		include_result &= np.isin(columns['stock_code'], validate_stock_codes(stock_codes))
+
+	time_from, time_to = time_range or (None, None)
+	if time_from:
+		include_result &= columns['matching_time'] >= decode_match_time_columns(np.frombuffer(encode_match_time(time_from), dtype=np.uint8))
+	if time_to:
+		include_result &= columns['matching_time'] < decode_match_time_columns(np.frombuffer(encode_match_time(time_to), dtype=np.uint8))
+
+	return ~include_result | exclude_result
+
+
+def iter_columnar_batches(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, batch_size: int = DEFAULT_BATCH_SIZE, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, workers: int = 1, report: IntegrityReport = None, sequence: SequenceTracker = None) -> Iterator[Columns]:
+	"""
+	分批將數據文件解碼為欄位陣列，記憶體用量只與批次大小有關。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	batch_size (int): 每批記錄數。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	workers (int): 平行解碼的行程數；大於 1 時每個檔案區段為一批，batch_size 不適用（區塊壓縮檔以外的壓縮檔依序解碼）。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+
+	返回:
+	Iterator: 逐批產出欄位陣列（dict）。
+	"""
+	if workers > 1 and is_splittable(file_path):
+		from parallel import iter_columnar_batches_parallel
+		yield from iter_columnar_batches_parallel(file_path, workers, skip_conditions, stock_codes, time_range, report=report, sequence=sequence)
+		return
+
+	# 壓縮檔逐段解壓縮；各段的位置加上 base 即為解壓縮後資料中的位置
+	for base, buffer, end in iter_buffers(file_path):
+		chunk_report = report if report is None or base == 0 else IntegrityReport()
+		spans = iter_frame_spans(buffer, 0, end)
+		expected = 0
+		while True:
+			batch = np.array(list(islice(spans, batch_size)), dtype=np.int64).reshape(-1, 2)
+			if len(batch) == 0:
+				break
+
+			columns = decode_checked_frames(buffer, batch, skip_conditions, stock_codes, time_range, chunk_report, expected, sequence)
+			if base:
+				columns['offset'] += base
+			yield columns
+			expected = int(batch[-1, 0] + batch[-1, 1])
+
+		if report is not None:
+			chunk_report.add_gap(expected, (len(buffer) if end is None else end) - expected)
+			if chunk_report is not report:
+				report.merge(chunk_report, base)
+
+
+def decode_checked_frames(buffer, spans: np.ndarray, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, report: IntegrityReport = None, expected: int = 0, sequence: SequenceTracker = None) -> Columns:
+	"""
+	解碼一批記錄，並依需要驗證檢查碼與套用跳過條件。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes 或 mmap）。
+	spans (np.ndarray): [N, 2] 的 (offset, length) 陣列。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	report (IntegrityReport): 提供時驗證檢查碼，錯誤記錄不會出現在結果中。
+	expected (int): 上一批最後一筆記錄的結尾位置，用於計算略過的資料。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號（檢查碼錯誤的記錄不計入），依設定略過重複的記錄。
+
+	返回:
+	dict: 欄位名稱對應的 NumPy 陣列。
+	"""
+	columns = decode_frames(buffer, spans)
+	keep = None
+
+	if report is not None:
+		keep = verify_frames(buffer, spans, report, expected)
+
+	if sequence is not None:
+		# 在條件判斷之前追蹤，被跳過的記錄也需計入
+		numbers = columns['transmission_number'] if keep is None else columns['transmission_number'][keep]
+		first_seen = sequence.observe_array(numbers)
+		if sequence.drop_duplicates and not first_seen.all():
+			if keep is None:
+				keep = first_seen
+			else:
+				keep = keep.copy()
+				keep[keep] = first_seen
+
+	if skip_conditions or stock_codes is not None or any(time_range or ()):
+		selected = ~skip_mask(columns, skip_conditions, stock_codes, time_range)
+		keep = selected if keep is None else keep & selected
+
+	# 與 decode_record 相同，不輸出 BODY 固定欄位不完整的記錄（仍計入驗證與傳輸序號）
+	complete = spans[:, 1] >= MIN_RECORD_LENGTH
+	if not complete.all():
+		keep = complete if keep is None else keep & complete
+
+	if keep is not None:
+		columns = {name: column[keep] for name, column in columns.items()}
+
+	return columns
+
+
+def parse_file_columnar(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, batch_size: int = DEFAULT_BATCH_SIZE, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, report: IntegrityReport = None, sequence: SequenceTracker = None) -> Columns:
+	"""
+	將整份數據文件解碼為欄位陣列。
+
+	欄位說明：
+	- stock_code: 證券代碼（字串）。
+	- transmission_number、total_volume: 整數。
+	- matching_time: 午夜起算的微秒數（int64）。
+	- reveal_flags、limit_flags、status_flags: 原始 BIT MAP 位元組（uint8）。
+	- price: [N, 11] 價格，單位為 0.0001 元（5 位整數 + 4 位小數）。
+	- quantity: [N, 11] 數量。
+	- slot_count: 每筆記錄實際的價量檔數，超出部分的 price/quantity 為 0。
+	- quote_bcd_error: 價量含大於 9 的 nibble（無效 PACK BCD）時為 True。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	batch_size (int): 每批記錄數。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+
+	返回:
+	dict: 欄位名稱對應的 NumPy 陣列。
+	"""
+	batches = list(iter_columnar_batches(file_path, skip_conditions, batch_size, stock_codes, time_range, report=report, sequence=sequence))
+	if not batches:
+		# 以空批次產生型別一致的空欄位
+		return decode_frames(b'', np.zeros((0, 2), dtype=np.int64))
+
+	return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
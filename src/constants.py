@@ -2,4 +2,18 @@
 
 ESC_CODE = bytes([27]) # ESC-CODE：ASCII 27 
 
-TERMINAL_CODE = b'\x0D\x0A' # TERMINAL-CODE：HEXACODE 0D 0A
\ No newline at end of file
+TERMINAL_CODE = b'\x0D\x0A' # TERMINAL-CODE：HEXACODE 0D 0A
+
+HEADER_LENGTH = 10 # HEADER 結束位置：ESC-CODE(1) + HEADER(9)
+
+MESSAGE_LENGTH_SLICE = slice(1, 3) # message_length：位置 2-3，長度 2 (PACKED BCD)
+
+MIN_MESSAGE_LENGTH = HEADER_LENGTH + 1 + len(TERMINAL_CODE) # 最短記錄：HEADER + 檢查碼 + TERMINAL-CODE
+
+STOCK_CODE_LENGTH = 6 # 證券代碼：位置 11-16，長度 6 (ASCII，右側補空白)
+
+QUOTE_OFFSET = 29 # 即時行情價量起始位置：位置 30 起
+
+QUOTE_LENGTH = 9 # 每一檔價量長度：價格 5 (PACKED BCD) + 數量 4 (PACKED BCD)
+
+MAX_QUOTE_SLOTS = 11 # 最多 11 檔：成交價量 1 + 最佳五檔買進 5 + 最佳五檔賣出 5
@@ -0,0 +1,226 @@
+# src/daemon.py
+
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+# 預設的 Unix socket 路徑（相對於專案根目錄）
+DEFAULT_SOCKET_PATH = 'data/daemon.sock'
+
+# 預設的工作行程數
+DEFAULT_WORKERS = 4
+
+# 單一請求行的長度上限
+MAX_REQUEST_SIZE = 1 << 20
+
+# 長時間執行、會佔住工作行程的子命令與參數
+LONG_RUNNING_COMMANDS = ('live', 'replay', 'publish', 'daemon')
+LONG_RUNNING_OPTIONS = ('--follow',)
+
+# 工作行程中預先建立的命令列解析器
+_parser = None
+
+
+def _init_worker() -> None:
+	# 工作行程啟動時載入所有解析模組與查表，並保留檔案映射供之後的請求使用
+	global _parser
+	import main
+	from utils.framer import retain_maps
+	retain_maps(True)
+	_parser = main.build_parser()
+
+
+def _ping() -> int:
+	return os.getpid()
+
+
+def run_request(argv: List[str], cwd: str) -> Dict[str, Any]:
+	"""
+	工作行程：以與 main.py 相同的流程執行一次解析，並收集標準輸出與錯誤輸出。
+
+	參數:
+	argv (list): main.py 的命令列參數（不含程式名稱）。
+	cwd (str): 執行時的工作目錄（data/raw、data/processed 相對於此目錄）。
+
+	返回:
+	dict: exit_code、stdout、stderr 與 seconds。
+	"""
+	from main import main
+
+	started = time.perf_counter()
+	stdout = io.StringIO()
+	stderr = io.StringIO()
+	exit_code = 0
+	os.chdir(cwd)
+	with redirect_stdout(stdout), redirect_stderr(stderr):
+		try:
+			main(argv, _parser)
+		except SystemExit as error:
+			# argparse 的錯誤與 --help 以 SystemExit 結束
+			if isinstance(error.code, int):
+				exit_code = error.code
+			elif error.code is not None:
+				print(error.code, file=stderr)
+				exit_code = 1
+		except Exception:
+			traceback.print_exc()
+			exit_code = 1
+	return {
+		'exit_code': exit_code,
+		'stdout': stdout.getvalue(),
+		'stderr': stderr.getvalue(),
+		'seconds': time.perf_counter() - started,
+	}
+
+
+class ParseDaemon:
+	"""
+	常駐的解析服務。以 Unix socket 接受與 main.py 相同參數的解析請求，交由工作行程池執行。
+
+	- 工作行程只在啟動時載入模組、建立查表與命令列解析器，並保留已映射的檔案與已載入的索引。
+	- 每個連線可依序送出多個請求；不同連線的請求同時由工作行程池處理。
+	- 協定為每行一個 JSON：請求 {"argv": [...], "cwd": "..."}，或 {"command": "status"}、{"command": "shutdown"}；
+	  回應 {"exit_code": ..., "stdout": ..., "stderr": ..., "seconds": ...}。
+	"""
+
+	def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: int = DEFAULT_WORKERS):
+		self.socket_path = socket_path
+		self.workers = workers
+		self.requests = 0  # 已完成的請求數
+		self.failed = 0  # exit_code 不為 0 的請求數
+		self.active = 0  # 處理中的請求數
+		self.started = time.time()
+		self._pool: Optional[ProcessPoolExecutor] = None
+		self._stopped: Optional[asyncio.Event] = None
+		self._connections = set()  # 各連線的處理 task
+		self._idle: Dict[asyncio.Task, asyncio.StreamWriter] = {}  # 等待下一個請求的連線
+
+	def status(self) -> Dict[str, Any]:
+		"""
+		返回服務狀態。
+		"""
+		return {
+			'pid': os.getpid(),
+			'workers': self.workers,
+			'requests': self.requests,
+			'failed': self.failed,
+			'active': self.active,
+			'uptime': time.time() - self.started,
+		}
+
+	async def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+		command = request.get('command')
+		if command == 'status':
+			return self.status()
+		if command == 'shutdown':
+			self._stopped.set()
+			return {'stopping': True}
+
+		argv = request.get('argv')
+		if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+			return {'exit_code': 2, 'stdout': '', 'stderr': 'Request must contain "argv" as a list of strings\n', 'seconds': 0.0}
+		if (argv and argv[0] in LONG_RUNNING_COMMANDS) or any(arg in LONG_RUNNING_OPTIONS for arg in argv):
+			return {'exit_code': 2, 'stdout': '', 'stderr': f'The daemon does not run {", ".join(LONG_RUNNING_COMMANDS)} or {", ".join(LONG_RUNNING_OPTIONS)}; run main.py directly\n', 'seconds': 0.0}
+
+		self.active += 1
+		try:
+			response = await asyncio.get_running_loop().run_in_executor(self._pool, run_request, argv, request.get('cwd') or os.getcwd())
+		except Exception as error:
+			# 工作行程異常結束等情況
+			response = {'exit_code': 1, 'stdout': '', 'stderr': f'{type(error).__name__}: {error}\n', 'seconds': 0.0}
+		finally:
+			self.active -= 1
+		self.requests += 1
+		if response['exit_code'] != 0:
+			self.failed += 1
+		return response
+
+	async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		task = asyncio.current_task()
+		self._connections.add(task)
+		try:
+			while not self._stopped.is_set():
+				self._idle[task] = writer
+				line = await reader.readline()
+				del self._idle[task]
+				if not line:
+					break
+				try:
+					request = json.loads(line)
+				except ValueError:
+					response = {'exit_code': 2, 'stdout': '', 'stderr': 'Request is not valid JSON\n', 'seconds': 0.0}
+				else:
+					response = await self._dispatch(request if isinstance(request, dict) else {})
+				writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+				await writer.drain()
+		except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+			pass
+		finally:
+			self._idle.pop(task, None)
+			self._connections.discard(task)
+			writer.close()
+
+	def _prepare_socket(self) -> None:
+		# 既有的 socket 檔可以連線表示服務已在執行，否則為上次未清除的檔案
+		if not os.path.exists(self.socket_path):
+			return
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(self.socket_path)
+		except OSError:
+			os.unlink(self.socket_path)
+		else:
+			raise RuntimeError(f'A daemon is already listening on {self.socket_path}')
+		finally:
+			probe.close()
+
+	async def serve(self, ready: Optional[Callable[[], None]] = None) -> None:
+		"""
+		啟動工作行程並接受請求，直到收到 SIGINT、SIGTERM 或 shutdown 請求。
+
+		參數:
+		ready (callable): 開始接受請求時呼叫（不帶參數）；None 表示不呼叫。
+
+		返回:
+		None
+		"""
+		self._prepare_socket()
+		self._stopped = asyncio.Event()
+		loop = asyncio.get_running_loop()
+
+		# 工作行程以 spawn 啟動，避免在事件迴圈執行中 fork；啟動後先執行一次以完成預熱
+		self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+		await asyncio.gather(*(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)))
+
+		server = await asyncio.start_unix_server(self._handle, path=self.socket_path, limit=MAX_REQUEST_SIZE)
+		try:
+			for signum in (signal.SIGINT, signal.SIGTERM):
+				loop.add_signal_handler(signum, self._stopped.set)
+		except (NotImplementedError, RuntimeError, ValueError):
+			# 非主執行緒無法設定訊號處理
+			pass
+		if ready is not None:
+			ready()
+
+		try:
+			await self._stopped.wait()
+		finally:
+			# 停止接受連線，關閉閒置的連線，並等待處理中的請求完成
+			server.close()
+			for writer in list(self._idle.values()):
+				writer.close()
+			if self._connections:
+				await asyncio.wait(self._connections)
+			await server.wait_closed()
+			self._pool.shutdown(wait=True, cancel_futures=True)
+			if os.path.exists(self.socket_path):
+				os.unlink(self.socket_path)
@@ -0,0 +1,196 @@
+# src/delta.py
+
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# 每檔證券每隔幾筆記錄輸出一次完整記錄（關鍵幀），讀取端可由此重新同步
+DEFAULT_KEYFRAME_INTERVAL = 64
+
+# 只在改變時輸出的欄位：(差異記錄中的名稱, 完整記錄中的路徑)
+CHANGED_FIELDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+	('esc_code', ('esc_code',)),
+	('message_length', ('header', 'message_length')),
+	('business_code', ('header', 'business_code')),
+	('format_code', ('header', 'format_code')),
+	('format_version', ('header', 'format_version')),
+	('total_volume', ('body', 'total_volume')),
+	('terminal_code', ('terminal_code',)),
+)
+
+# 註記欄位：只輸出改變的項目
+FLAG_FIELDS = ('reveal_flags', 'limit_flags', 'status_flags')
+
+# 最佳五檔：(差異記錄中的名稱, instant_quotes 中的名稱)
+LEVEL_FIELDS = (('bids', '最佳五檔買進價量'), ('asks', '最佳五檔賣出價量'))
+
+
+def _get(record: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+	for key in path:
+		record = record[key]
+	return record
+
+
+def encode_delta(previous: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	產生一筆記錄相對於同一證券前一筆記錄的差異。
+
+	差異記錄一定包含 stock_code、transmission_number、matching_time 與 check_code，
+	其餘欄位（含 trade 成交價量）只在改變時輸出；註記只輸出改變的項目；
+	最佳五檔只輸出改變的檔位 [檔位, 價格, 數量]，檔數改變時另外輸出 bid_count / ask_count。
+
+	參數:
+	previous (dict): 同一證券前一筆記錄（decode_record 格式）。
+	record (dict): 目前的記錄。
+
+	返回:
+	dict: 差異記錄。
+	"""
+	body = record['body']
+	delta = {
+		'stock_code': body['stock_code'],
+		'transmission_number': record['header']['transmission_number'],
+		'matching_time': body['matching_time'],
+		'check_code': record['check_code'],
+	}
+
+	previous_quotes = previous['body']['instant_quotes']
+	trade = body['instant_quotes']['成交價量']
+	if trade != previous_quotes['成交價量']:
+		delta['trade'] = trade
+
+	for name, path in CHANGED_FIELDS:
+		value = _get(record, path)
+		if value != _get(previous, path):
+			delta[name] = value
+
+	for name in FLAG_FIELDS:
+		flags = body[name]
+		previous_flags = previous['body'][name]
+		if flags != previous_flags:
+			delta[name] = {key: value for key, value in flags.items() if previous_flags.get(key) != value}
+
+	for name, key in LEVEL_FIELDS:
+		levels = body['instant_quotes'][key]
+		previous_levels = previous_quotes[key]
+		if levels == previous_levels:
+			continue
+		delta[name] = [[index, level['price'], level['quantity']] for index, level in enumerate(levels) if index >= len(previous_levels) or level != previous_levels[index]]
+		if len(levels) != len(previous_levels):
+			delta[name[:-1] + '_count'] = len(levels)
+
+	return delta
+
+
+def apply_delta(previous: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+	"""
+	將差異記錄套用至同一證券前一筆記錄，重建完整記錄（與原始記錄相同，欄位順序亦同）。
+
+	參數:
+	previous (dict): 同一證券前一筆完整記錄。
+	delta (dict): encode_delta 產生的差異記錄。
+
+	返回:
+	dict: 重建的完整記錄；previous 不會被修改。
+	"""
+	header = dict(previous['header'])
+	header['transmission_number'] = delta['transmission_number']
+	body = dict(previous['body'])
+	body['matching_time'] = delta['matching_time']
+	for name in FLAG_FIELDS:
+		if name in delta:
+			body[name] = {**body[name], **delta[name]}
+
+	quotes = previous['body']['instant_quotes']
+	instant_quotes = {'成交價量': delta['trade'] if 'trade' in delta else quotes['成交價量']}
+	for name, key in LEVEL_FIELDS:
+		levels = quotes[key]
+		changes = delta.get(name)
+		if changes is not None:
+			count = delta.get(name[:-1] + '_count', len(levels))
+			levels = levels[:count] + [None] * (count - len(levels))
+			for index, price, quantity in changes:
+				levels[index] = {'price': price, 'quantity': quantity}
+		instant_quotes[key] = levels
+	body['instant_quotes'] = instant_quotes
+
+	record = {
+		'esc_code': delta.get('esc_code', previous['esc_code']),
+		'header': header,
+		'body': body,
+		'check_code': delta['check_code'],
+		'terminal_code': delta.get('terminal_code', previous['terminal_code']),
+	}
+	for name, path in CHANGED_FIELDS[1:-1]:
+		if name in delta:
+			_get(record, path[:-1])[path[-1]] = delta[name]
+	return record
+
+
+def iter_deltas(records: Iterable[Dict[str, Any]], keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> Iterator[Dict[str, Any]]:
+	"""
+	將記錄串流轉為差異串流。每檔證券的第一筆記錄與之後每 keyframe_interval 筆記錄輸出 {"keyframe": 完整記錄}，
+	其餘輸出 encode_delta 的差異記錄。只保留每檔證券最後一筆記錄，記憶體用量只與證券數有關。
+
+	參數:
+	records (Iterable): decode_record 產生的記錄（預設或 numeric 模式）。
+	keyframe_interval (int): 每檔證券的關鍵幀間隔（筆數）；0 表示只在第一筆輸出關鍵幀。
+
+	返回:
+	Iterator: 關鍵幀或差異記錄。
+	"""
+	states: Dict[str, List[Any]] = {}  # 證券代碼 -> [前一筆記錄, 距上次關鍵幀的筆數]
+	for record in records:
+		stock_code = record['body']['stock_code']
+		state = states.get(stock_code)
+		if state is None or (keyframe_interval and state[1] >= keyframe_interval):
+			states[stock_code] = [record, 1]
+			yield {'keyframe': record}
+		else:
+			yield encode_delta(state[0], record)
+			state[0] = record
+			state[1] += 1
+
+
+def iter_snapshots(entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+	"""
+	由差異串流重建完整記錄。從串流中途開始讀取時，略過各證券第一個關鍵幀之前的差異記錄。
+
+	參數:
+	entries (Iterable): iter_deltas 產生的關鍵幀與差異記錄。
+
+	返回:
+	Iterator: 完整記錄，與原始記錄相同。
+	"""
+	states: Dict[str, Dict[str, Any]] = {}
+	for entry in entries:
+		record = entry.get('keyframe')
+		if record is None:
+			previous = states.get(entry['stock_code'])
+			if previous is None:
+				continue  # 尚未收到此證券的關鍵幀
+			record = apply_delta(previous, entry)
+		states[record['body']['stock_code']] = record
+		yield record
+
+
+def read_deltas(input_file: str) -> Iterator[Dict[str, Any]]:
+	"""
+	讀取以 json（單一陣列）或 ndjson 寫出的差異串流。
+
+	參數:
+	input_file (str): 差異串流檔案路徑。
+
+	返回:
+	Iterator: 關鍵幀與差異記錄。
+	"""
+	with open(input_file, encoding='utf-8') as delta_file:
+		first = delta_file.read(1)
+		while first.isspace():
+			first = delta_file.read(1)
+		delta_file.seek(0)
+		if first == '[':
+			yield from json.load(delta_file)
+		else:
+			for line in delta_file:
+				if line.strip():
+					yield json.loads(line)
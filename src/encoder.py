@@ -0,0 +1,221 @@
+# src/encoder.py
+
+import json
+from itertools import count
+from json.encoder import encode_basestring
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from utils.format_converter import REVEAL_FLAGS_TABLE, LIMIT_FLAGS_TABLE, STATUS_FLAGS_TABLE
+
+# 每次寫出的記錄筆數
+DEFAULT_CHUNK_SIZE = 1000
+
+# 與 json.dump 相同的分隔符號：有縮排時項目間不留空白
+DEFAULT_SEPARATORS = (', ', ': ')
+PRETTY_SEPARATORS = (',', ': ')
+COMPACT_SEPARATORS = (',', ':')
+
+# 純量的序列化方式與 json 模組相同
+_SCALARS: Dict[type, Callable[[Any], str]] = {
+	str: encode_basestring,
+	int: int.__repr__,
+	float: float.__repr__,
+	bool: lambda value: 'true' if value else 'false',
+	type(None): lambda value: 'null',
+}
+
+# 產生樣板時代表各欄位值的佔位字串
+_PLACEHOLDER = '\x00{}\x00'
+
+
+class RecordEncoder:
+	"""
+	decode_record 產生的記錄結構固定，鍵與縮排可以事先組好。RecordEncoder 只需填入各欄位的值，
+	三種 BIT MAP 註記來自共用的查表物件，其 JSON 片段也只需產生一次。
+
+	輸出與 json.dumps(record, ensure_ascii=False, indent=indent, separators=separators) 完全相同；
+	level 為記錄本身所在的縮排層級（寫成 JSON 陣列的元素時為 1）。
+	"""
+
+	def __init__(self, indent: Optional[int] = None, separators: Optional[Tuple[str, str]] = None, level: int = 0):
+		if separators is None:
+			separators = PRETTY_SEPARATORS if indent is not None else DEFAULT_SEPARATORS
+		self.indent = indent
+		self.separators = separators
+		self.level = level
+
+		item_separator, key_separator = separators
+		if indent is None:
+			self._newline = [''] * 8
+		else:
+			self._newline = ['\n' + ' ' * (indent * depth) for depth in range(8)]
+		self._item = [item_separator + newline for newline in self._newline]
+
+		# 以佔位字串組出整筆記錄，再依佔位字串切成固定片段
+		values = count()
+		sample = {
+			'esc_code': _PLACEHOLDER.format(next(values)),
+			'header': {key: _PLACEHOLDER.format(next(values)) for key in ('message_length', 'business_code', 'format_code', 'format_version', 'transmission_number')},
+			'body': {key: _PLACEHOLDER.format(next(values)) for key in ('stock_code', 'matching_time', 'reveal_flags', 'limit_flags', 'status_flags', 'total_volume', 'instant_quotes')},
+			'check_code': _PLACEHOLDER.format(next(values)),
+			'terminal_code': _PLACEHOLDER.format(next(values)),
+		}
+		template = self._dumps(sample, level)
+		self._fragments = []
+		for index in range(next(values)):
+			head, template = template.split(encode_basestring(_PLACEHOLDER.format(index)), 1)
+			self._fragments.append(head)
+		self._fragments.append(template)
+
+		# 查表註記的 JSON 片段：以物件 id 對應 (物件, 片段)
+		self._flags: Dict[int, Tuple[Any, str]] = {}
+		for table in (REVEAL_FLAGS_TABLE, LIMIT_FLAGS_TABLE, STATUS_FLAGS_TABLE):
+			for flags in table:
+				self._flags[id(flags)] = (flags, self._dumps(flags, level + 2))
+
+	def _dumps(self, value: Any, depth: int) -> str:
+		# 以 json 模組產生位於 depth 層的片段
+		text = json.dumps(value, ensure_ascii=False, indent=self.indent, separators=self.separators)
+		if self.indent is None:
+			return text
+		return text.replace('\n', self._newline[depth])
+
+	def _scalar(self, value: Any) -> str:
+		convert = _SCALARS.get(type(value))
+		return convert(value) if convert is not None else json.dumps(value, ensure_ascii=False)
+
+	def _flags_json(self, flags: Dict[str, Any]) -> str:
+		cached = self._flags.get(id(flags))
+		if cached is not None and cached[0] is flags:
+			return cached[1]
+		return self._dumps(flags, self.level + 2)
+
+	def _quote_json(self, quote: Optional[Dict[str, Any]], depth: int) -> str:
+		# {"price": ..., "quantity": ...}，位於 depth 層
+		if quote is None:
+			return 'null'
+		key_separator = self.separators[1]
+		return (
+			'{' + self._newline[depth + 1] + '"price"' + key_separator + self._scalar(quote['price'])
+			+ self._item[depth + 1] + '"quantity"' + key_separator + self._scalar(quote['quantity'])
+			+ self._newline[depth] + '}'
+		)
+
+	def _levels_json(self, levels: list, depth: int) -> str:
+		if not levels:
+			return '[]'
+		item = self._item[depth + 1]
+		return '[' + self._newline[depth + 1] + item.join([self._quote_json(level, depth + 1) for level in levels]) + self._newline[depth] + ']'
+
+	def _instant_quotes_json(self, quotes: Dict[str, Any]) -> str:
+		depth = self.level + 2
+		key_separator = self.separators[1]
+		item = self._item[depth + 1]
+		return (
+			'{' + self._newline[depth + 1] + '"成交價量"' + key_separator + self._quote_json(quotes['成交價量'], depth + 1)
+			+ item + '"最佳五檔買進價量"' + key_separator + self._levels_json(quotes['最佳五檔買進價量'], depth + 1)
+			+ item + '"最佳五檔賣出價量"' + key_separator + self._levels_json(quotes['最佳五檔賣出價量'], depth + 1)
+			+ self._newline[depth] + '}'
+		)
+
+	def encode(self, record: Dict[str, Any]) -> str:
+		"""
+		將一筆記錄序列化為 JSON 字串。
+
+		參數:
+		record (dict): decode_record 產生的記錄（預設或 numeric 模式）。
+
+		返回:
+		str: JSON 字串，與 json.dumps 的結果相同。
+		"""
+		try:
+			header = record['header']
+			body = record['body']
+			scalar = self._scalar
+			values = (
+				scalar(record['esc_code']),
+				scalar(header['message_length']),
+				scalar(header['business_code']),
+				scalar(header['format_code']),
+				scalar(header['format_version']),
+				scalar(header['transmission_number']),
+				scalar(body['stock_code']),
+				scalar(body['matching_time']),
+				self._flags_json(body['reveal_flags']),
+				self._flags_json(body['limit_flags']),
+				self._flags_json(body['status_flags']),
+				scalar(body['total_volume']),
+				self._instant_quotes_json(body['instant_quotes']),
+				scalar(record['check_code']),
+				scalar(record['terminal_code']),
+			)
+			if len(record) != 5 or len(header) != 5 or len(body) != 7:
+				raise KeyError('unexpected keys')
+		except (KeyError, TypeError):
+			# 非 decode_record 產生的結構：改用 json 模組
+			return self._dumps(record, self.level)
+
+		fragments = self._fragments
+		parts = [fragments[0]]
+		for fragment, value in zip(fragments[1:], values):
+			parts.append(value)
+			parts.append(fragment)
+		return ''.join(parts)
+
+
+def iter_json_array(records: Iterable[Dict[str, Any]], indent: Optional[int] = 4, separators: Optional[Tuple[str, str]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+	"""
+	將記錄序列化為單一 JSON 陣列，每 chunk_size 筆產出一段字串；不需保留所有記錄。
+	串接的結果與 json.dump(list(records), ensure_ascii=False, indent=indent, separators=separators) 相同。
+
+	參數:
+	records (Iterable): 解析後的記錄。
+	indent (int): 縮排空白數；None 表示不換行。
+	separators (tuple): (項目分隔, 鍵值分隔)；None 時與 json 模組的預設相同。
+	chunk_size (int): 每段字串包含的記錄筆數。
+
+	返回:
+	Iterator: 依序產出的 JSON 片段。
+	"""
+	encoder = RecordEncoder(indent, separators, level=1)
+	item_separator = encoder.separators[0]
+	opening = '[' + encoder._newline[1]
+	delimiter = item_separator + encoder._newline[1]
+	chunk = []
+	first = True
+
+	for record in records:
+		chunk.append(encoder.encode(record))
+		if len(chunk) >= chunk_size:
+			yield (opening if first else delimiter) + delimiter.join(chunk)
+			first = False
+			chunk = []
+
+	if chunk:
+		yield (opening if first else delimiter) + delimiter.join(chunk)
+		first = False
+	yield '[]' if first else encoder._newline[0] + ']'
+
+
+def iter_json_lines(records: Iterable[Dict[str, Any]], separators: Optional[Tuple[str, str]] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+	"""
+	將記錄序列化為 NDJSON（每筆一行），每 chunk_size 筆產出一段字串。
+	每一行與 json.dumps(record, ensure_ascii=False, separators=separators) 相同。
+
+	參數:
+	records (Iterable): 解析後的記錄。
+	separators (tuple): (項目分隔, 鍵值分隔)；None 時與 json 模組的預設相同。
+	chunk_size (int): 每段字串包含的記錄筆數；1 表示每筆記錄立即產出。
+
+	返回:
+	Iterator: 依序產出的 NDJSON 片段。
+	"""
+	encode = RecordEncoder(None, separators).encode
+	chunk = []
+	for record in records:
+		chunk.append(encode(record))
+		chunk.append('\n')
+		if len(chunk) >= chunk_size * 2:
+			yield ''.join(chunk)
+			chunk = []
+	if chunk:
+		yield ''.join(chunk)
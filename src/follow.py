@@ -0,0 +1,183 @@
+# src/follow.py
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from parser import compile_filter, decode_record
+from record import Record, MIN_RECORD_LENGTH
+from utils.decoder import decode_packed_bcd_int
+from utils.framer import scan_frames
+from utils.sequence import SequenceTracker
+
+# 沒有新資料時的輪詢間隔（秒）
+DEFAULT_POLL_INTERVAL = 0.05
+
+# 每次讀取的位元組數上限
+DEFAULT_READ_SIZE = 1 << 20
+
+# 持續有新資料時，寫出進度檔的最短間隔（秒）
+CHECKPOINT_INTERVAL = 1.0
+
+
+def load_checkpoint(checkpoint_file: str) -> Dict[str, Any]:
+	"""
+	讀取進度檔；檔案不存在時返回從頭開始的進度。
+
+	參數:
+	checkpoint_file (str): 進度檔路徑。
+
+	返回:
+	dict: 包含 offset（已處理到的檔案位置）、transmission_number（最後一筆記錄的傳輸序號）與 inode。
+	"""
+	try:
+		with open(checkpoint_file, encoding='utf-8') as json_file:
+			return json.load(json_file)
+	except FileNotFoundError:
+		return {'offset': 0, 'transmission_number': None, 'inode': None}
+
+
+def save_checkpoint(checkpoint_file: str, offset: int, transmission_number: Optional[int], inode: Optional[int]) -> None:
+	"""
+	寫出進度檔。先寫入暫存檔再取代，中斷時不會留下不完整的進度檔。
+
+	參數:
+	checkpoint_file (str): 進度檔路徑。
+	offset (int): 已處理到的檔案位置（下一筆記錄的起始位置）。
+	transmission_number (int): 最後一筆已處理記錄的傳輸序號。
+	inode (int): 數據文件的 inode，用於判斷檔案是否已被替換。
+
+	返回:
+	None
+	"""
+	temporary_file = checkpoint_file + '.tmp'
+	with open(temporary_file, 'w', encoding='utf-8') as json_file:
+		json.dump({'offset': offset, 'transmission_number': transmission_number, 'inode': inode}, json_file)
+	os.replace(temporary_file, checkpoint_file)
+
+
+def follow_file(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, checkpoint_file: str = None, poll_interval: float = DEFAULT_POLL_INTERVAL, idle_timeout: Optional[float] = None, lazy: bool = False, sequence: SequenceTracker = None, read_size: int = DEFAULT_READ_SIZE, numeric: bool = False, on_reset: Callable[[], bool] = None) -> Iterator[Union[Dict[str, Any], Record]]:
+	"""
+	持續解析寫入中的數據文件（類似 tail -f）：讀到結尾後定時輪詢，檔案增長時只讀取新增的部分，
+	結尾尚未寫完的記錄會等待後續資料。
+
+	提供 checkpoint_file 時，從進度檔記錄的位置繼續，並定時與結束時寫出進度。
+	進度只涵蓋呼叫端已取走下一筆的記錄，因此中斷時正在處理的記錄會在重新啟動後再產出一次。
+	檔案被截短或替換（inode 改變）時從頭開始解析；提供 on_reset 時先呼叫它，
+	返回 True 則結束走訪（進度已重設為從頭開始），由呼叫端處理既有輸出後重新開始。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑；檔案尚不存在時等待建立。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	checkpoint_file (str): 進度檔路徑；None 表示不保存進度，從頭開始。
+	poll_interval (float): 沒有新資料時的輪詢間隔（秒）。
+	idle_timeout (float): 連續這麼久沒有新資料時結束；None 表示持續等待。
+	lazy (bool): 為 True 時產出延遲解碼的 Record。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+	read_size (int): 每次讀取的位元組數上限。
+	numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+	on_reset (Callable): 檔案被截短或替換、即將從頭解析時呼叫；返回 True 時結束走訪。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄（dict，lazy 時為 Record）。
+	"""
+	skip = compile_filter(skip_conditions, stock_codes, time_range)
+	state = load_checkpoint(checkpoint_file) if checkpoint_file else {'offset': 0, 'transmission_number': None, 'inode': None}
+	position = state['offset']  # 已處理到的檔案位置
+	transmission_number = state['transmission_number']
+	inode = state['inode']
+
+	source = None
+	pending = bytearray()  # 已讀取但尚未切分的資料，起始位置為 position
+	saved = (position, transmission_number, inode)
+	saved_at = time.monotonic()
+	last_data = time.monotonic()
+
+	def checkpoint() -> None:
+		nonlocal saved, saved_at
+		current = (position, transmission_number, inode)
+		if checkpoint_file and current != saved:
+			save_checkpoint(checkpoint_file, *current)
+			saved = current
+		saved_at = time.monotonic()
+
+	try:
+		while True:
+			if source is None:
+				try:
+					source = open(file_path, 'rb')
+				except FileNotFoundError:
+					pass
+				else:
+					status = os.fstat(source.fileno())
+					reset = (inode is not None and status.st_ino != inode) or status.st_size < position
+					if reset:
+						# 與進度檔記錄的不是同一份檔案
+						position, transmission_number = 0, None
+					inode = status.st_ino
+					if reset and on_reset is not None and on_reset():
+						return
+					source.seek(position)
+					pending.clear()
+
+			chunk = source.read(read_size) if source is not None else b''
+			if not chunk:
+				checkpoint()
+				if idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+					return
+				if source is not None and _replaced(file_path, source, inode):
+					# 檔案被截短或替換：重新開啟並從頭解析
+					source.close()
+					source = None
+					position, transmission_number, inode = 0, None, None
+					if on_reset is not None and on_reset():
+						return
+					continue
+				time.sleep(poll_interval)
+				continue
+
+			last_data = time.monotonic()
+			pending += chunk
+			spans, consumed = scan_frames(pending)
+			data = bytes(pending[:consumed])
+			del pending[:consumed]
+			base = position
+
+			for offset, length in spans:
+				record = data[offset:offset + length]
+				number = decode_packed_bcd_int(record[6:10])
+
+				# 追蹤傳輸序號（在條件判斷之前，被跳過的記錄也需計入）
+				duplicate = sequence is not None and not sequence.observe(number) and sequence.drop_duplicates
+				if not duplicate and (skip is None or not skip(record)):
+					if lazy:
+						if len(record) >= MIN_RECORD_LENGTH:
+							yield Record(record)
+					else:
+						decoded = decode_record(record, numeric=numeric)
+						if decoded is not None:
+							yield decoded
+
+				# 呼叫端已取走下一筆，這筆記錄視為處理完成
+				position = base + offset + length
+				transmission_number = number
+
+			# 重新同步時略過的資料也視為已處理
+			position = base + consumed
+			if time.monotonic() - saved_at >= CHECKPOINT_INTERVAL:
+				checkpoint()
+	finally:
+		checkpoint()
+		if source is not None:
+			source.close()
+
+
+def _replaced(file_path: str, source, inode: int) -> bool:
+	# 路徑指向其他檔案，或檔案比已讀取的位置短
+	try:
+		status = os.stat(file_path)
+	except FileNotFoundError:
+		return False
+	return status.st_ino != inode or status.st_size < source.tell()
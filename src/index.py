@@ -0,0 +1,348 @@
+# src/index.py
+
+import json
+import os
+import shutil
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from cache import file_digest
+from columnar import DEFAULT_BATCH_SIZE, iter_columnar_batches
+from parser import compile_filter, decode_record
+from record import Record, MIN_RECORD_LENGTH
+from utils.compression import open_buffer
+from utils.framer import read_message_length, is_valid_frame
+from utils.format_converter import encode_match_time, convert_match_time_us
+
+# 索引目錄附加在原始檔名之後的副檔名
+INDEX_SUFFIX = '.idx'
+
+# 索引格式版本；格式改變時遞增，舊索引需重新建立
+INDEX_VERSION = 2
+
+# 索引目錄中以 .npy 保存的陣列（載入時以記憶體映射開啟）
+INDEX_ARRAYS = ('offsets', 'symbols', 'posting_starts', 'postings', 'block_min_time', 'block_max_time', 'transmission_numbers', 'transmission_rows')
+
+# 列號以 uint32 保存，單一檔案的記錄筆數上限
+MAX_INDEX_ROWS = np.iinfo(np.uint32).max
+
+# 撮合時間稀疏索引每個區塊的記錄筆數
+DEFAULT_BLOCK_SIZE = 4096
+
+# open_index 已載入的索引：索引目錄絕對路徑 -> ((索引修改時間, 原始檔案簽章), RecordIndex)
+_open_indexes: Dict[str, Tuple[Tuple[int, Tuple[int, int, int]], 'RecordIndex']] = {}
+
+
+def index_path_for(file_path: str) -> str:
+	"""
+	返回原始檔案對應的索引目錄路徑（與原始檔案放在同一目錄）。
+	"""
+	return file_path + INDEX_SUFFIX
+
+
+def source_signature(file_path: str) -> Tuple[int, int, int]:
+	"""
+	返回原始檔案的大小、修改時間與 inode。
+	"""
+	status = os.stat(file_path)
+	return (status.st_size, status.st_mtime_ns, status.st_ino)
+
+
+def build_index(file_path: str, index_path: str = None, block_size: int = DEFAULT_BLOCK_SIZE, batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+	"""
+	走訪一次原始檔案，建立記錄位置索引。索引為一個目錄，各陣列以 .npy 保存以便記憶體映射，
+	meta.json 記錄格式版本、稀疏索引區塊大小，以及原始檔案的簽章（大小、修改時間、inode）與內容雜湊。
+
+	索引內容：
+	- offsets: 每筆記錄的起始位置（依檔案順序，以下以列號表示第幾筆記錄）。
+	- symbols / posting_starts / postings: 依證券代碼排序的代碼表，以及每檔證券依檔案順序排列的列號。
+	- block_min_time / block_max_time: 每 block_size 筆記錄的撮合時間最小值與最大值（午夜起算的微秒數）。
+	- transmission_numbers / transmission_rows: 排序後的傳輸序號與對應的列號。
+
+	參數:
+	file_path (str): 原始數據文件的路徑。
+	index_path (str): 索引目錄路徑；None 表示寫在原始檔案旁。
+	block_size (int): 稀疏時間索引每個區塊的記錄筆數（至少 1）。
+	batch_size (int): 每批解碼的記錄數。
+
+	返回:
+	str: 索引目錄路徑。
+	"""
+	if block_size < 1:
+		raise ValueError(f'Block size must be at least 1, got {block_size}')
+	index_path = index_path or index_path_for(file_path)
+	signature = source_signature(file_path)
+
+	offsets = []
+	transmission_numbers = []
+	matching_times = []
+	stock_ids = []
+	symbol_ids: Dict[str, int] = {}
+
+	for batch in iter_columnar_batches(file_path, batch_size=batch_size):
+		offsets.append(batch['offset'])
+		transmission_numbers.append(batch['transmission_number'])
+		matching_times.append(batch['matching_time'])
+
+		# 證券代碼先轉為整數代號，避免保留整個字串陣列
+		codes, inverse = np.unique(batch['stock_code'], return_inverse=True)
+		ids = np.array([symbol_ids.setdefault(code, len(symbol_ids)) for code in codes.tolist()], dtype=np.int32)
+		stock_ids.append(ids[inverse])
+
+	offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+	transmission_numbers = np.concatenate(transmission_numbers) if transmission_numbers else np.zeros(0, dtype=np.int64)
+	matching_times = np.concatenate(matching_times) if matching_times else np.zeros(0, dtype=np.int64)
+	stock_ids = np.concatenate(stock_ids) if stock_ids else np.zeros(0, dtype=np.int32)
+	if len(offsets) > MAX_INDEX_ROWS:
+		raise ValueError(f'{file_path} has {len(offsets)} records; the index supports at most {MAX_INDEX_ROWS}')
+
+	# 代碼表依代碼排序，查詢時以二分搜尋定位
+	symbols = np.array(sorted(symbol_ids), dtype='U6')
+	remap = np.zeros(len(symbol_ids), dtype=np.int32)
+	for rank, code in enumerate(symbols.tolist()):
+		remap[symbol_ids[code]] = rank
+	stock_ids = remap[stock_ids]
+
+	# 穩定排序：同一檔證券的列號維持檔案順序
+	postings = np.argsort(stock_ids, kind='stable').astype(np.uint32)
+	posting_starts = np.zeros(len(symbols) + 1, dtype=np.uint32)
+	posting_starts[1:] = np.cumsum(np.bincount(stock_ids, minlength=len(symbols)))
+
+	# 撮合時間在檔案中大致遞增但不保證，以區塊的最小值與最大值篩選
+	block_starts = np.arange(0, len(offsets), block_size)
+	block_min_time = np.minimum.reduceat(matching_times, block_starts) if len(offsets) else np.zeros(0, dtype=np.int64)
+	block_max_time = np.maximum.reduceat(matching_times, block_starts) if len(offsets) else np.zeros(0, dtype=np.int64)
+
+	transmission_rows = np.argsort(transmission_numbers, kind='stable').astype(np.uint32)
+
+	arrays = {
+		'offsets': offsets,
+		'symbols': symbols,
+		'posting_starts': posting_starts,
+		'postings': postings,
+		'block_min_time': block_min_time,
+		'block_max_time': block_max_time,
+		'transmission_numbers': transmission_numbers[transmission_rows],
+		'transmission_rows': transmission_rows,
+	}
+
+	# 先寫入暫存目錄再改名，中斷時不會留下不完整的索引
+	temporary_path = f'{index_path}.{os.getpid()}.tmp'
+	os.makedirs(temporary_path, exist_ok=True)
+	for name, array in arrays.items():
+		np.save(os.path.join(temporary_path, f'{name}.npy'), array, allow_pickle=False)
+	with open(os.path.join(temporary_path, 'meta.json'), 'w', encoding='utf-8') as json_file:
+		json.dump({'version': INDEX_VERSION, 'block_size': block_size, 'source_signature': list(signature), 'source_digest': file_digest(file_path)}, json_file)
+
+	shutil.rmtree(index_path, ignore_errors=True)
+	os.rename(temporary_path, index_path)
+	return index_path
+
+
+class RecordIndex:
+	"""
+	原始檔案的記錄位置索引。查詢時只映射原始檔案並解碼符合條件的記錄。
+	"""
+
+	def __init__(self, file_path: str, index_path: str = None):
+		"""
+		載入索引，各陣列以記憶體映射開啟（唯讀）。
+		原始檔案的大小、修改時間或 inode 與建立索引時不同時，比對內容雜湊，內容改變則拒絕使用；
+		內容相同時將新的簽章寫回 meta.json，之後不需再計算雜湊。
+
+		參數:
+		file_path (str): 原始數據文件的路徑。
+		index_path (str): 索引目錄路徑；None 表示原始檔案旁的索引目錄。
+		"""
+		self.file_path = file_path
+		self.index_path = index_path or index_path_for(file_path)
+
+		with open(os.path.join(self.index_path, 'meta.json'), encoding='utf-8') as json_file:
+			meta = json.load(json_file)
+		if meta.get('version') != INDEX_VERSION:
+			raise ValueError(f'Unsupported index version in {self.index_path}; rebuild the index')
+
+		signature = list(source_signature(file_path))
+		if signature != meta['source_signature']:
+			# 複製或 touch 過的檔案簽章不同但內容可能相同；大小不同則必定已改變
+			if signature[0] != meta['source_signature'][0] or file_digest(file_path) != meta['source_digest']:
+				raise ValueError(f'Index {self.index_path} does not match {file_path}; rebuild the index')
+			meta['source_signature'] = signature
+			meta_file = os.path.join(self.index_path, 'meta.json')
+			temporary_file = f'{meta_file}.{os.getpid()}.tmp'
+			with open(temporary_file, 'w', encoding='utf-8') as json_file:
+				json.dump(meta, json_file)
+			os.replace(temporary_file, meta_file)
+
+		self.block_size = int(meta['block_size'])
+		for name in INDEX_ARRAYS:
+			setattr(self, name, np.load(os.path.join(self.index_path, f'{name}.npy'), mmap_mode='r', allow_pickle=False))
+
+	def __len__(self) -> int:
+		return len(self.offsets)
+
+	def rows_for_stocks(self, stock_codes: Iterable[str]) -> np.ndarray:
+		"""
+		返回指定證券的記錄列號（依檔案順序）。
+
+		參數:
+		stock_codes (Iterable): 證券代碼。
+
+		返回:
+		np.ndarray: 排序後的列號。
+		"""
+		rows = []
+		for code in stock_codes:
+			position = int(np.searchsorted(self.symbols, code))
+			if position < len(self.symbols) and self.symbols[position] == code:
+				rows.append(self.postings[self.posting_starts[position]:self.posting_starts[position + 1]])
+
+		if not rows:
+			return np.zeros(0, dtype=np.uint32)
+		return rows[0] if len(rows) == 1 else np.sort(np.concatenate(rows))
+
+	def rows_for_time(self, time_range: Tuple[Optional[str], Optional[str]]) -> np.ndarray:
+		"""
+		以稀疏索引返回可能落在撮合時間範圍內的記錄列號（依檔案順序）。
+		結果為候選列號，需再以記錄內容確認。
+
+		參數:
+		time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+
+		返回:
+		np.ndarray: 排序後的列號。
+		"""
+		time_from, time_to = time_range
+		selected = np.ones(len(self.block_min_time), dtype=bool)
+		if time_from:
+			selected &= self.block_max_time >= convert_match_time_us(encode_match_time(time_from))
+		if time_to:
+			selected &= self.block_min_time < convert_match_time_us(encode_match_time(time_to))
+
+		blocks = np.flatnonzero(selected)
+		if not len(blocks):
+			return np.zeros(0, dtype=np.int64)
+		rows = (blocks[:, None] * self.block_size + np.arange(self.block_size)).ravel()
+		return rows[rows < len(self.offsets)]
+
+	def row_for_transmission(self, transmission_number: Union[int, str]) -> Optional[int]:
+		"""
+		返回指定傳輸序號的記錄列號。
+
+		參數:
+		transmission_number (int 或 str): 傳輸序號。
+
+		返回:
+		int: 列號；找不到時返回 None。
+		"""
+		transmission_number = int(transmission_number)
+		position = int(np.searchsorted(self.transmission_numbers, transmission_number))
+		if position < len(self.transmission_numbers) and self.transmission_numbers[position] == transmission_number:
+			return int(self.transmission_rows[position])
+		return None
+
+	def candidate_rows(self, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None) -> np.ndarray:
+		"""
+		合併證券代碼與撮合時間條件，返回候選記錄列號。
+		"""
+		rows = None
+		if stock_codes is not None:
+			rows = self.rows_for_stocks(stock_codes)
+		if time_range is not None and any(time_range):
+			time_rows = self.rows_for_time(time_range)
+			rows = time_rows if rows is None else rows[np.isin(rows, time_rows, assume_unique=True)]
+		return np.arange(len(self.offsets)) if rows is None else rows
+
+	def iter_rows(self, rows: Iterable[int], skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, lazy: bool = False, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+		"""
+		映射原始檔案，只解碼指定列號中符合條件的記錄。
+
+		參數:
+		rows (Iterable): 記錄列號。
+		skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+		stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+		time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+		lazy (bool): 為 True 時產出延遲解碼的 Record。
+		numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+		返回:
+		Iterator: 逐筆產出解析後的數據記錄。
+		"""
+		skip = compile_filter(skip_conditions, stock_codes, time_range)
+		offsets = self.offsets[np.asarray(rows, dtype=np.int64)]
+
+		# 壓縮檔的記錄位置為解壓縮後的位置；區塊壓縮檔只解壓縮用到的區塊
+		with open_buffer(self.file_path) as buffer:
+			for offset in offsets.tolist():
+				length = read_message_length(buffer, offset)
+				if not is_valid_frame(buffer, offset, length):
+					raise ValueError(f'Index {self.index_path} does not match {self.file_path} at offset {offset}; rebuild the index')
+
+				record = buffer[offset:offset + length]
+				if skip is not None and skip(record):
+					continue
+
+				if lazy:
+					if len(record) >= MIN_RECORD_LENGTH:
+						yield Record(record)
+					continue
+
+				decoded = decode_record(record, numeric=numeric)
+				if decoded is not None:
+					yield decoded
+
+	def query(self, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, lazy: bool = False, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+		"""
+		以索引縮小範圍後解碼符合條件的記錄，結果與 iter_records 相同（依檔案順序）。
+
+		參數:
+		skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+		stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+		time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+		lazy (bool): 為 True 時產出延遲解碼的 Record。
+		numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+		返回:
+		Iterator: 逐筆產出解析後的數據記錄。
+		"""
+		stock_codes = list(stock_codes) if stock_codes is not None else None
+		rows = self.candidate_rows(stock_codes, time_range)
+		return self.iter_rows(rows, skip_conditions, stock_codes, time_range, lazy, numeric)
+
+	def get_transmission(self, transmission_number: Union[int, str], lazy: bool = False) -> Optional[Union[Dict[str, Any], Record]]:
+		"""
+		取得指定傳輸序號的記錄。
+
+		參數:
+		transmission_number (int 或 str): 傳輸序號。
+		lazy (bool): 為 True 時返回延遲解碼的 Record。
+
+		返回:
+		dict 或 Record: 解析後的記錄；找不到時返回 None。
+		"""
+		row = self.row_for_transmission(transmission_number)
+		if row is None:
+			return None
+		return next(self.iter_rows([row], lazy=lazy), None)
+
+
+def open_index(file_path: str) -> RecordIndex:
+	"""
+	載入原始檔案旁的索引；同一行程中重複查詢同一檔案時沿用已載入的索引（如常駐服務），
+	索引重建或原始檔案的大小、修改時間、inode 改變時重新載入。
+
+	參數:
+	file_path (str): 原始數據文件的路徑。
+
+	返回:
+	RecordIndex: 索引。
+	"""
+	file_path = os.path.abspath(file_path)
+	index_path = index_path_for(file_path)
+	meta_file = os.path.join(index_path, 'meta.json')
+	key = (os.stat(meta_file).st_mtime_ns, source_signature(file_path))
+	cached = _open_indexes.get(index_path)
+	if cached is None or cached[0] != key:
+		index = RecordIndex(file_path, index_path)
+		# 載入時可能寫回新的簽章，以載入後的 meta.json 修改時間為鍵
+		cached = _open_indexes[index_path] = ((os.stat(meta_file).st_mtime_ns, key[1]), index)
+	return cached[1]
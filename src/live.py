@@ -0,0 +1,401 @@
+# src/live.py
+
+import asyncio
+import inspect
+import json
+import signal
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from parser import compile_filter, decode_record
+from utils.framer import map_file, iter_frame_spans, scan_frames
+
+# 每次從 socket 讀取的位元組數
+READ_SIZE = 1 << 16
+
+# 解碼後等待寫出的記錄上限；佇列滿時 TCP 暫停讀取，UDP 捨棄記錄
+DEFAULT_QUEUE_SIZE = 10000
+
+# 關閉時等待連線結束的秒數
+CLOSE_TIMEOUT = 5.0
+
+
+class NdjsonFileSink:
+	"""
+	將記錄以 NDJSON 格式逐行寫入檔案。
+	"""
+
+	def __init__(self, output_file: str):
+		# 行緩衝：每寫完一行即送出，下游可即時讀取
+		self.file = open(output_file, 'w', encoding='utf-8', buffering=1)
+
+	async def write(self, record: Dict[str, Any]) -> None:
+		self.file.write(json.dumps(record, ensure_ascii=False))
+		self.file.write('\n')
+
+	async def close(self) -> None:
+		self.file.close()
+
+
+class StdoutSink:
+	"""
+	將記錄以 NDJSON 格式逐行寫至標準輸出。
+	"""
+
+	async def write(self, record: Dict[str, Any]) -> None:
+		sys.stdout.write(json.dumps(record, ensure_ascii=False))
+		sys.stdout.write('\n')
+		sys.stdout.flush()
+
+	async def close(self) -> None:
+		sys.stdout.flush()
+
+
+class CallbackSink:
+	"""
+	將記錄交給指定的函數處理，函數可為一般函數或 async 函數。
+	"""
+
+	def __init__(self, callback: Callable[[Dict[str, Any]], Any]):
+		self.callback = callback
+
+	async def write(self, record: Dict[str, Any]) -> None:
+		result = self.callback(record)
+		if inspect.isawaitable(result):
+			await result
+
+	async def close(self) -> None:
+		pass
+
+
+class LiveStats:
+	"""
+	即時接收的統計資料。
+	"""
+
+	def __init__(self):
+		self.started = time.perf_counter()
+		self.first_received: Optional[float] = None  # 第一次收到完整記錄的時間
+		self.last_written: Optional[float] = None  # 最後一次寫出記錄的時間
+		self.received_bytes = 0  # 收到的位元組數
+		self.frames = 0  # 切分出的完整記錄筆數
+		self.skipped = 0  # 依條件跳過的記錄筆數
+		self.decoded = 0  # 解碼並送入佇列的記錄筆數
+		self.dropped = 0  # 佇列已滿而捨棄的記錄筆數（僅 UDP）
+		self.discarded_bytes = 0  # UDP 封包中無法組成完整記錄而捨棄的位元組數
+		self.written = 0  # 已寫出至 sink 的記錄筆數
+		self.sink_errors = 0  # sink 寫出失敗的次數
+		self.latency_total = 0.0  # 從收到資料到寫出的累計延遲（秒）
+		self.latency_max = 0.0  # 從收到資料到寫出的最大延遲（秒）
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+		"""
+		elapsed = time.perf_counter() - self.started
+		# 吞吐量以第一次收到資料到最後一次寫出之間的時間計算，不含閒置等待
+		active = self.last_written - self.first_received if self.written else 0.0
+		return {
+			'received_bytes': self.received_bytes,
+			'frames': self.frames,
+			'skipped': self.skipped,
+			'decoded': self.decoded,
+			'dropped': self.dropped,
+			'discarded_bytes': self.discarded_bytes,
+			'written': self.written,
+			'sink_errors': self.sink_errors,
+			'elapsed_seconds': elapsed,
+			'records_per_second': self.written / active if active > 0 else 0.0,
+			'mean_latency_ms': self.latency_total / self.written * 1000 if self.written else 0.0,
+			'max_latency_ms': self.latency_max * 1000,
+		}
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+	"""
+	UDP 接收：每個封包獨立切分記錄。
+	"""
+
+	def __init__(self, receiver: 'LiveReceiver'):
+		self.receiver = receiver
+
+	def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+		received_at = time.perf_counter()
+		records, consumed = self.receiver.decode(data)
+		self.receiver.stats.discarded_bytes += len(data) - consumed
+
+		for record in records:
+			try:
+				self.receiver.queue.put_nowait((received_at, record))
+			except asyncio.QueueFull:
+				# UDP 無法要求對方暫停，佇列已滿時捨棄
+				self.receiver.stats.dropped += 1
+
+
+class LiveReceiver:
+	"""
+	以 asyncio 接收 TCP/UDP 即時行情，沿用 parse_file 的記錄切分與跳過條件，
+	解碼後經由有上限的佇列送至 sink。
+	"""
+
+	def __init__(self, sinks: Iterable[Any], skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, queue_size: int = DEFAULT_QUEUE_SIZE):
+		"""
+		參數:
+		sinks (Iterable): 提供 async write(record) 與 async close() 的輸出目標。
+		skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+		stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+		time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+		queue_size (int): 等待寫出的記錄上限。
+		"""
+		self.sinks = list(sinks)
+		self.skip = compile_filter(skip_conditions, stock_codes, time_range)
+		self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+		self.stats = LiveStats()
+		self._servers: List[asyncio.AbstractServer] = []
+		self._transports: List[asyncio.BaseTransport] = []
+		self._consumer: Optional[asyncio.Task] = None
+		self._connections: set = set()
+		self.addresses: List[Tuple[str, int]] = []
+		self.error: Optional[BaseException] = None  # 第一個 sink 寫出錯誤，close() 時重新拋出
+
+	def decode(self, buffer: Union[bytes, bytearray]) -> Tuple[List[Dict[str, Any]], int]:
+		"""
+		切分並解碼緩衝區中已完整到達的記錄。
+
+		參數:
+		buffer (bytes): 目前已收到、尚未處理的資料。
+
+		返回:
+		tuple: (解碼後的記錄列表, 已處理的位元組數)。
+		"""
+		spans, consumed = scan_frames(buffer)
+		records = []
+
+		with memoryview(buffer) as view:
+			for offset, length in spans:
+				record = view[offset:offset + length]
+				if self.skip is not None and self.skip(record):
+					self.stats.skipped += 1
+					continue
+
+				decoded = decode_record(record)
+				if decoded is not None:
+					records.append(decoded)
+
+		if spans and self.stats.first_received is None:
+			self.stats.first_received = time.perf_counter()
+		self.stats.received_bytes += consumed
+		self.stats.frames += len(spans)
+		self.stats.decoded += len(records)
+		return records, consumed
+
+	async def start(self, host: str, port: int, proto: str = 'tcp') -> Tuple[str, int]:
+		"""
+		開始接收資料。
+
+		參數:
+		host (str): 監聽位址。
+		port (int): 監聽埠號；0 表示由系統指定。
+		proto (str): 'tcp' 或 'udp'。
+
+		返回:
+		tuple: 實際監聽的 (位址, 埠號)。
+		"""
+		if self._consumer is None:
+			self._consumer = asyncio.create_task(self._consume())
+
+		if proto == 'tcp':
+			server = await asyncio.start_server(self._handle_tcp, host, port)
+			self._servers.append(server)
+			address = server.sockets[0].getsockname()[:2]
+		elif proto == 'udp':
+			loop = asyncio.get_running_loop()
+			transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), local_addr=(host, port))
+			self._transports.append(transport)
+			address = transport.get_extra_info('sockname')[:2]
+		else:
+			raise ValueError(f"不支援的通訊協定：{proto}")
+
+		self.addresses.append(address)
+		return address
+
+	async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+		"""
+		處理單一 TCP 連線：持續讀取、切分記錄並送入佇列。
+		"""
+		buffer = bytearray()
+		connection = asyncio.current_task()
+		self._connections.add(connection)
+		try:
+			while True:
+				data = await reader.read(READ_SIZE)
+				if not data:
+					break
+
+				received_at = time.perf_counter()
+				buffer += data
+				records, consumed = self.decode(buffer)
+				del buffer[:consumed]
+
+				for record in records:
+					# 佇列已滿時在此等待，期間不再讀取 socket，由 TCP 流量控制讓對方暫停
+					await self.queue.put((received_at, record))
+		finally:
+			self._connections.discard(connection)
+			writer.close()
+
+	async def _consume(self) -> None:
+		"""
+		從佇列取出記錄並依序寫至所有 sink。sink 寫出失敗時計入 stats.sink_errors 並保留第一個錯誤，
+		繼續處理後續記錄，避免佇列停止消化而使接收端阻塞。
+		"""
+		while True:
+			received_at, record = await self.queue.get()
+			failed = False
+			try:
+				for sink in self.sinks:
+					try:
+						await sink.write(record)
+					except Exception as error:
+						failed = True
+						self.stats.sink_errors += 1
+						if self.error is None:
+							self.error = error
+			finally:
+				self.queue.task_done()
+			if failed:
+				continue
+
+			now = time.perf_counter()
+			latency = now - received_at
+			self.stats.last_written = now
+			self.stats.written += 1
+			self.stats.latency_total += latency
+			if latency > self.stats.latency_max:
+				self.stats.latency_max = latency
+
+	async def close(self) -> None:
+		"""
+		停止接收，寫出佇列中剩餘的記錄後關閉所有 sink。接收期間 sink 寫出失敗時，關閉後重新拋出第一個錯誤。
+		"""
+		for server in self._servers:
+			server.close()
+		for transport in self._transports:
+			transport.close()
+
+		# 等待已建立的連線將資料送入佇列，逾時仍未結束的連線直接中斷
+		if self._connections:
+			_, pending = await asyncio.wait(set(self._connections), timeout=CLOSE_TIMEOUT)
+			for connection in pending:
+				connection.cancel()
+			await asyncio.gather(*pending, return_exceptions=True)
+		for server in self._servers:
+			await server.wait_closed()
+
+		if self._consumer is not None:
+			# 寫出工作已異常結束時不再等待佇列清空
+			join = asyncio.ensure_future(self.queue.join())
+			await asyncio.wait({join, self._consumer}, return_when=asyncio.FIRST_COMPLETED)
+			join.cancel()
+			self._consumer.cancel()
+			results = await asyncio.gather(join, self._consumer, return_exceptions=True)
+			if self.error is None and isinstance(results[1], Exception):
+				self.error = results[1]
+
+		for sink in self.sinks:
+			await sink.close()
+
+		if self.error is not None:
+			raise self.error
+
+
+async def run_live(receiver: LiveReceiver, host: str, port: int, proto: str = 'tcp') -> None:
+	"""
+	持續接收即時行情，直到收到 SIGINT/SIGTERM 或被取消為止。
+
+	參數:
+	receiver (LiveReceiver): 接收器。
+	host (str): 監聽位址。
+	port (int): 監聽埠號。
+	proto (str): 'tcp' 或 'udp'。
+
+	返回:
+	None
+	"""
+	stopped = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for signum in (signal.SIGINT, signal.SIGTERM):
+		try:
+			loop.add_signal_handler(signum, stopped.set)
+		except (NotImplementedError, RuntimeError):
+			# 不支援訊號處理的平台（如 Windows）仍可由 KeyboardInterrupt 結束
+			pass
+
+	await receiver.start(host, port, proto)
+	try:
+		await stopped.wait()
+	finally:
+		await receiver.close()
+
+
+async def replay(file_path: str, host: str, port: int, proto: str = 'tcp', rate: float = 0) -> Dict[str, Any]:
+	"""
+	將原始數據文件依指定速率送至接收端，用於在沒有交易所連線時測量吞吐量與延遲。
+
+	參數:
+	file_path (str): 要重播的數據文件路徑。
+	host (str): 接收端位址。
+	port (int): 接收端埠號。
+	proto (str): 'tcp'（連續位元組串流）或 'udp'（每筆記錄一個封包）。
+	rate (float): 每秒送出的記錄筆數；0 表示不限速。
+
+	返回:
+	dict: 送出的記錄筆數、位元組數、耗時與速率。
+	"""
+	loop = asyncio.get_running_loop()
+	if proto == 'tcp':
+		_, writer = await asyncio.open_connection(host, port)
+		send = writer.write
+	elif proto == 'udp':
+		transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+		send = transport.sendto
+	else:
+		raise ValueError(f"不支援的通訊協定：{proto}")
+
+	records = 0
+	sent_bytes = 0
+	started = time.perf_counter()
+	try:
+		with map_file(file_path) as buffer:
+			for offset, length in iter_frame_spans(buffer):
+				send(buffer[offset:offset + length])
+				records += 1
+				sent_bytes += length
+
+				if rate:
+					# 超前預定進度時暫停，讓平均速率維持在 rate
+					ahead = started + records / rate - time.perf_counter()
+					if ahead > 0.001:
+						await asyncio.sleep(ahead)
+				if proto == 'tcp' and records % 256 == 0:
+					await writer.drain()
+				elif proto == 'udp' and records % 256 == 0:
+					# 讓出事件迴圈，避免本機 UDP 接收端來不及處理
+					await asyncio.sleep(0)
+
+		if proto == 'tcp':
+			await writer.drain()
+	finally:
+		if proto == 'tcp':
+			writer.close()
+			await writer.wait_closed()
+		else:
+			transport.close()
+
+	elapsed = time.perf_counter() - started
+	return {
+		'records': records,
+		'bytes': sent_bytes,
+		'elapsed_seconds': elapsed,
+		'records_per_second': records / elapsed if elapsed > 0 else 0.0,
+	}
@@ -1,8 +1,22 @@
 # src/main.py
 
-import json
 import argparse
-from parser import parse_file
+import asyncio
+import cProfile
+import json
+import os
+import sys
+from parser import iter_records, validate_stock_codes
+from columnar import iter_columnar_batches
+from writers import WRITERS, COLUMNAR_WRITERS, write_ndjson
+from utils.compression import detect_compression
+from utils.framer import IntegrityReport
+from utils.sequence import SequenceTracker
+from profiling import Profiler, StackSampler, profile_items
+from batch import convert_files, expand_inputs, is_batch_input, iter_merged_records
+from bars import iter_bars, iter_bars_columnar, parse_interval
+from delta import DEFAULT_KEYFRAME_INTERVAL, iter_deltas
+from cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ParseCache, select_rows, iter_cached_batches, iter_cached_records
 
 # 定義情境條件
 scenario_conditions = {
@@ -62,23 +76,571 @@ def parse_scenarios(scenarios_str):
 
 
 
-def main():
+def parse_address(address: str):
+	"""
+	解析「位址:埠號」字串。
+
+	參數:
+	address (str): 例如 "127.0.0.1:9000"。
+
+	返回:
+	tuple: (位址, 埠號)。
+	"""
+	host, _, port = address.rpartition(':')
+	return host or '0.0.0.0', int(port)
+
+
+
+def live_main(argv):
+	"""
+	live 子命令：接收 TCP/UDP 即時行情並逐筆寫出。
+	"""
+	from live import LiveReceiver, NdjsonFileSink, StdoutSink, run_live
+
+	parser = argparse.ArgumentParser(prog='main.py live', description="Receive a live Format 6 feed over TCP or UDP.")
+	parser.add_argument(
+		'--listen',
+		type=str,
+		required=True,
+		help='Address to listen on (host:port)'
+	)
+	parser.add_argument(
+		'--proto',
+		type=str,
+		choices=['tcp', 'udp'],
+		default='tcp',
+		help='Transport protocol'
+	)
+	parser.add_argument(
+		'--output',
+		type=str,
+		default=None,
+		help='Name of the NDJSON output file (located in data/processed directory); defaults to stdout'
+	)
+	parser.add_argument(
+		'--scenarios',
+		type=str,
+		default='',
+		help='Comma-separated list of scenarios and modes (e.g., "1:include,2:exclude,3:include")'
+	)
+	parser.add_argument(
+		'--stocks',
+		type=str,
+		default='',
+		help='Comma-separated list of stock codes to keep (e.g., "2330,2317")'
+	)
+	parser.add_argument(
+		'--queue-size',
+		type=int,
+		default=10000,
+		help='Maximum number of decoded records waiting to be written'
+	)
+	args = parser.parse_args(argv)
+
+	host, port = parse_address(args.listen)
+	sink = NdjsonFileSink(f'data/processed/{args.output}') if args.output else StdoutSink()
+	try:
+		stock_codes = validate_stock_codes(args.stocks.split(',')) if args.stocks else None
+	except ValueError as error:
+		parser.error(str(error))
+	receiver = LiveReceiver([sink], parse_scenarios(args.scenarios), stock_codes, queue_size=args.queue_size)
+
+	try:
+		asyncio.run(run_live(receiver, host, port, args.proto))
+	except KeyboardInterrupt:
+		pass
+	finally:
+		# 統計資料寫至標準錯誤，避免與標準輸出的記錄混在一起；sink 寫出失敗時仍輸出
+		print(json.dumps(receiver.stats.to_dict()), file=sys.stderr)
+
+
+
+def replay_main(argv):
+	"""
+	replay 子命令：將 data/raw 中的原始資料依指定速率送至接收端。
+	"""
+	from live import replay
+
+	parser = argparse.ArgumentParser(prog='main.py replay', description="Replay a raw Format 6 file to a live receiver.")
+	parser.add_argument(
+		'input_file',
+		type=str,
+		help='Name of the input data file (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'--target',
+		type=str,
+		required=True,
+		help='Receiver address (host:port)'
+	)
+	parser.add_argument(
+		'--proto',
+		type=str,
+		choices=['tcp', 'udp'],
+		default='tcp',
+		help='Transport protocol'
+	)
+	parser.add_argument(
+		'--rate',
+		type=float,
+		default=0,
+		help='Records per second (0 for unlimited)'
+	)
+	args = parser.parse_args(argv)
+
+	host, port = parse_address(args.target)
+	result = asyncio.run(replay(f'data/raw/{args.input_file}', host, port, args.proto, args.rate))
+	print(json.dumps(result))
+
+
+
+def index_main(argv):
+	"""
+	index 子命令：建立原始檔案的記錄位置索引，寫在 data/raw 中的原始檔案旁。
+	"""
+	from index import DEFAULT_BLOCK_SIZE, RecordIndex, build_index
+
+	parser = argparse.ArgumentParser(prog='main.py index', description="Build a sidecar offset index for a raw Format 6 file.")
+	parser.add_argument(
+		'input_file',
+		type=str,
+		help='Name of the input data file (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'--block-size',
+		type=int,
+		default=DEFAULT_BLOCK_SIZE,
+		help='Number of records per block of the sparse matching_time index'
+	)
+	args = parser.parse_args(argv)
+	if args.block_size < 1:
+		parser.error('--block-size must be at least 1')
+
+	index_path = build_index(f'data/raw/{args.input_file}', block_size=args.block_size)
+	index = RecordIndex(f'data/raw/{args.input_file}', index_path)
+	print(f'Indexed {len(index)} records ({len(index.symbols)} stock codes) into {index_path}')
+
+
+
+def cache_main(argv):
+	"""
+	cache 子命令：列出或清除解碼結果快取。
+	"""
+	parser = argparse.ArgumentParser(prog='main.py cache', description="List or clear the parse cache.")
+	parser.add_argument(
+		'--cache-dir',
+		type=str,
+		default=DEFAULT_CACHE_DIR,
+		help='Directory of the parse cache'
+	)
+	parser.add_argument(
+		'--clear',
+		action='store_true',
+		help='Delete all cached entries'
+	)
+	args = parser.parse_args(argv)
+
+	parse_cache = ParseCache(args.cache_dir)
+	if args.clear:
+		print(f'Removed {parse_cache.clear()} cached entries from {args.cache_dir}')
+		return
+
+	entries = parse_cache.entries()
+	for entry in entries:
+		print(f'{entry["key"]}  {entry["size"] / (1 << 20):10.1f} MB  {entry["records"]:>12,} records  {entry["source"]}')
+	print(f'{len(entries)} entries, {sum(entry["size"] for entry in entries) / (1 << 20):.1f} MB in {args.cache_dir}')
+
+
+
+def generate_main(argv):
+	"""
+	generate 子命令：產生模擬的 Format 6 檔案，寫至 data/raw 目錄。
+	"""
+	from synthetic import write_feed
+
+	parser = argparse.ArgumentParser(prog='main.py generate', description="Generate a synthetic Format 6 feed file.")
+	parser.add_argument(
+		'output_file',
+		type=str,
+		help='Name of the generated data file (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'--records',
+		type=int,
+		default=1000,
+		help='Number of records to generate'
+	)
+	parser.add_argument(
+		'--seed',
+		type=int,
+		default=0,
+		help='Random seed; the same seed produces the same file'
+	)
+	parser.add_argument(
+		'--symbols',
+		type=int,
+		default=1800,
+		help='Number of distinct stock codes'
+	)
+	args = parser.parse_args(argv)
+
+	output_file = f'data/raw/{args.output_file}'
+	written = write_feed(output_file, args.records, args.seed, symbols=args.symbols)
+	print(f'Generated {args.records} records ({written} bytes) into {output_file}')
+
+
+
+def publish_main(argv):
+	"""
+	publish 子命令：將原始數據文件解碼後發布至共享記憶體環形緩衝區，供同一主機上的讀取行程以 ring.RingReader 讀取。
+	"""
+	import time
+	from ring import DEFAULT_CAPACITY, DEFAULT_PUBLISH_BATCH, RingPublisher, publish_file
+
+	parser = argparse.ArgumentParser(prog='main.py publish', description="Publish decoded records into a shared-memory ring buffer.")
+	parser.add_argument(
+		'input_file',
+		type=str,
+		help='Name of the input data file (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'--name',
+		type=str,
+		default=None,
+		help='Name of the shared memory segment (random if omitted)'
+	)
+	parser.add_argument(
+		'--capacity',
+		type=int,
+		default=DEFAULT_CAPACITY,
+		help='Ring buffer capacity in records; readers lagging further behind lose the oldest records'
+	)
+	parser.add_argument(
+		'--batch-size',
+		type=int,
+		default=DEFAULT_PUBLISH_BATCH,
+		help='Records per published batch'
+	)
+	parser.add_argument(
+		'--rate',
+		type=float,
+		default=0,
+		help='Records per second (0 for unlimited)'
+	)
+	parser.add_argument(
+		'--wait',
+		type=float,
+		default=0,
+		help='Seconds to wait before publishing, for readers to attach'
+	)
+	args = parser.parse_args(argv)
+
+	with RingPublisher(args.name, args.capacity) as publisher:
+		print(f'Publishing {args.input_file} to shared memory {publisher.name}', flush=True)
+		time.sleep(args.wait)
+		published = publish_file(f'data/raw/{args.input_file}', publisher, args.batch_size, args.rate)
+		print(f'Published {published} records ({publisher.symbol_count} stock codes)', flush=True)
+
+
+
+def daemon_main(argv):
+	"""
+	daemon 子命令：常駐的解析服務，以 Unix socket 接受 src/client.py 送出的解析請求。
+	"""
+	from daemon import DEFAULT_SOCKET_PATH, DEFAULT_WORKERS, ParseDaemon
+
+	parser = argparse.ArgumentParser(prog='main.py daemon', description="Serve parse requests from src/client.py over a Unix socket.")
+	parser.add_argument(
+		'--socket',
+		type=str,
+		default=DEFAULT_SOCKET_PATH,
+		help='Path of the Unix socket'
+	)
+	parser.add_argument(
+		'--workers',
+		type=int,
+		default=DEFAULT_WORKERS,
+		help='Number of worker processes serving requests concurrently'
+	)
+	args = parser.parse_args(argv)
+
+	daemon = ParseDaemon(args.socket, args.workers)
+	asyncio.run(daemon.serve(ready=lambda: print(f'Listening on {args.socket} with {args.workers} workers', flush=True)))
+	print(json.dumps(daemon.status()))
+
+
+
+def rebuild_main(argv):
+	"""
+	rebuild 子命令：由 --delta 輸出的差異串流重建完整記錄。
+	"""
+	from delta import iter_snapshots, read_deltas
+
+	parser = argparse.ArgumentParser(prog='main.py rebuild', description="Rebuild full snapshots from a --delta output file.")
+	parser.add_argument(
+		'input_file',
+		type=str,
+		help='Name of the delta file, json or ndjson (located in data/processed directory)'
+	)
+	parser.add_argument(
+		'output_file',
+		type=str,
+		help='Name of the rebuilt output file (located in data/processed directory)'
+	)
+	parser.add_argument(
+		'--format',
+		choices=['json', 'ndjson'],
+		default='json',
+		help='Output format of the rebuilt records'
+	)
+	parser.add_argument(
+		'--compact',
+		action='store_true',
+		help='Write JSON without indentation or spaces after separators'
+	)
+	args = parser.parse_args(argv)
+
+	output_file = f'data/processed/{args.output_file}'
+	profiler = Profiler()
+	records = profile_items(iter_snapshots(read_deltas(f'data/processed/{args.input_file}')), profiler)
+	WRITERS[args.format](records, output_file, compact=args.compact)
+	print(f'Rebuilt {profiler.counters["processed"]} records into {output_file}')
+
+
+
+def archive_main(argv):
+	"""
+	archive 子命令：將數據文件寫成區塊壓縮檔（仍為標準 gzip 檔），寫至 data/raw 目錄，可直接平行解析、建立索引與快取。
+	"""
+	from utils.compression import BLOCK_LENGTH, DEFAULT_BLOCK_SIZE, DEFAULT_THREADS, RAW_LENGTH, write_archive
+
+	parser = argparse.ArgumentParser(prog='main.py archive', description="Write a block-compressed gzip archive that the parallel and indexed parsers can read directly.")
+	parser.add_argument(
+		'input_file',
+		type=str,
+		help='Name of the input data file, raw or compressed (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'output_file',
+		type=str,
+		help='Name of the archive, e.g. f6_01000001_01001000_TP03.new.gz (located in data/raw directory)'
+	)
+	parser.add_argument(
+		'--block-size',
+		type=int,
+		default=DEFAULT_BLOCK_SIZE >> 10,
+		help='Uncompressed size of each block in KiB; blocks are cut at record boundaries'
+	)
+	parser.add_argument(
+		'--level',
+		type=int,
+		choices=range(1, 10),
+		default=6,
+		help='zlib compression level'
+	)
+	parser.add_argument(
+		'--threads',
+		type=int,
+		default=DEFAULT_THREADS,
+		help='Number of threads compressing blocks'
+	)
+	args = parser.parse_args(argv)
+
+	output_file = f'data/raw/{args.output_file}'
+	table = write_archive(f'data/raw/{args.input_file}', output_file, args.block_size << 10, args.level, args.threads)
+	raw_size = int(table[:, RAW_LENGTH].sum())
+	archive_size = int(table[:, BLOCK_LENGTH].sum())
+	print(f'Archived {raw_size} bytes into {len(table)} blocks ({archive_size} bytes, {archive_size / max(raw_size, 1):.1%}) in {output_file}')
+
+
+
+# 子命令名稱與對應的進入點；其他參數沿用原本的檔案解析模式
+COMMANDS = {
+	'live': live_main,
+	'replay': replay_main,
+	'index': index_main,
+	'generate': generate_main,
+	'cache': cache_main,
+	'rebuild': rebuild_main,
+	'publish': publish_main,
+	'daemon': daemon_main,
+	'archive': archive_main,
+}
+
+
+
+def reshape_records(args, records):
+	"""
+	依 --bars 或 --delta 將記錄串流轉為 K 棒或差異串流；皆未指定時原樣返回。
+	"""
+	if args.bars:
+		return (bar.to_dict(args.numeric) for bar in iter_bars(records, parse_interval(args.bars)))
+	if args.delta:
+		return iter_deltas(records, args.keyframe_interval)
+	return records
+
+
+
+def write_output(args, data_file: str, output_file: str, skip_conditions, stock_codes, time_range, report: IntegrityReport, profiler: Profiler, sequence: SequenceTracker = None) -> None:
+	"""
+	依參數選擇解析方式與輸出格式，解析原始資料並寫出。
+
+	參數:
+	args (argparse.Namespace): 命令列參數。
+	data_file (str): 原始數據文件路徑。
+	output_file (str): 輸出檔案路徑。
+	skip_conditions (list): 跳過條件。
+	stock_codes (list): 證券代碼條件。
+	time_range (tuple): 撮合時間範圍。
+	report (IntegrityReport): 驗證結果；None 表示不驗證。
+	profiler (Profiler): 效能量測結果；None 表示不量測。
+	sequence (SequenceTracker): 傳輸序號追蹤結果；None 表示不追蹤。
+
+	返回:
+	None
+	"""
+	if profiler is not None and os.path.exists(data_file):
+		profiler.counters['input_bytes'] = os.path.getsize(data_file)
+
+	if args.cache:
+		# 由快取的欄位陣列篩選條件，只解碼保留的記錄
+		columns, hit = ParseCache(args.cache_dir, args.cache_size << 20).load(data_file, args.workers)
+		rows = select_rows(columns, skip_conditions, stock_codes, time_range, sequence)
+		print(f'Cache {"hit" if hit else "miss"} for {data_file}: {len(rows)} of {len(columns["offset"])} records selected')
+
+	if args.follow:
+		# 持續解析寫入中的檔案，從進度檔繼續時接在既有輸出之後
+		from follow import follow_file, load_checkpoint
+		checkpoint_file = f'data/processed/{args.checkpoint}' if args.checkpoint else None
+		append = checkpoint_file is not None and os.path.exists(checkpoint_file)
+		if append:
+			state = load_checkpoint(checkpoint_file)
+			print(f'Resuming {data_file} from offset {state["offset"]} (transmission number {state["transmission_number"]})')
+		while True:
+			# 輸入檔案被截短或替換時結束這一輪，重新寫出輸出檔案，避免既有記錄重複出現
+			resets = []
+			followed = follow_file(data_file, skip_conditions, stock_codes, time_range, checkpoint_file, args.poll_interval / 1000, args.idle_timeout, sequence=sequence, numeric=args.numeric, on_reset=lambda: resets.append(True) or True)
+			records = profile_items(followed, profiler) if profiler is not None else followed
+			records = reshape_records(args, records)
+			try:
+				write_ndjson(records, output_file, append=append, compact=args.compact, line_buffered=True)
+			except KeyboardInterrupt:
+				pass
+			finally:
+				# 結束時寫出進度
+				followed.close()
+			if not resets:
+				break
+			print(f'{data_file} was truncated or replaced; rewriting {output_file} from the start')
+			append = False
+	elif args.bars:
+		# 以 columnar 引擎解碼並彙整為 K 棒
+		if args.cache:
+			batches = iter_cached_batches(columns, rows)
+		else:
+			batches = iter_columnar_batches(data_file, skip_conditions, stock_codes=stock_codes, time_range=time_range, workers=args.workers, report=report, sequence=sequence)
+		if profiler is not None:
+			batches = profile_items(batches, profiler, size=lambda batch: len(batch['offset']))
+		bars = iter_bars_columnar(batches, parse_interval(args.bars))
+		WRITERS[args.format]((bar.to_dict(args.numeric) for bar in bars), output_file, compact=args.compact)
+	elif args.format in COLUMNAR_WRITERS:
+		# 欄位式格式：整批向量化解碼，逐批寫出
+		if args.cache:
+			batches = iter_cached_batches(columns, rows)
+		else:
+			batches = iter_columnar_batches(data_file, skip_conditions, stock_codes=stock_codes, time_range=time_range, workers=args.workers, report=report, sequence=sequence)
+		if profiler is not None:
+			batches = profile_items(batches, profiler, size=lambda batch: len(batch['offset']))
+		COLUMNAR_WRITERS[args.format](batches, output_file)
+	else:
+		if args.use_index:
+			# 以索引定位符合條件的記錄，只解碼這些記錄
+			from index import open_index
+			records = open_index(data_file).query(skip_conditions, stock_codes, time_range, numeric=args.numeric)
+		elif args.cache:
+			records = iter_cached_records(data_file, columns, rows, numeric=args.numeric)
+		else:
+			# 逐筆解析並寫出
+			records = iter_records(data_file, skip_conditions, stock_codes, time_range, args.workers, report, profiler=profiler, sequence=sequence, numeric=args.numeric)
+
+		if profiler is not None:
+			records = profile_items(records, profiler)
+		WRITERS[args.format](reshape_records(args, records), output_file, compact=args.compact)
+
+	if profiler is not None:
+		# 解析以外的時間即為寫出（含序列化）的時間
+		profiler.stop()
+		profiler.add('write', profiler.elapsed - profiler.stages.get('parse', 0.0))
+
+
+
+def write_batch_output(args, data_files: list, output_path: str, skip_conditions, stock_codes, time_range, report: IntegrityReport, profiler: Profiler, sequence: SequenceTracker = None) -> None:
+	"""
+	解析多個原始數據文件：--merge 時依撮合時間合併寫成單一檔案，否則在輸出目錄中各自寫出。
+
+	參數:
+	args (argparse.Namespace): 命令列參數。
+	data_files (list): 原始數據文件路徑。
+	output_path (str): 合併時為輸出檔案路徑，否則為輸出目錄。
+	skip_conditions (list): 跳過條件。
+	stock_codes (list): 證券代碼條件。
+	time_range (tuple): 撮合時間範圍。
+	report (IntegrityReport): 驗證結果；None 表示不驗證。
+	profiler (Profiler): 效能量測結果；None 表示不量測。
+	sequence (SequenceTracker): 傳輸序號追蹤結果；None 表示不追蹤。
+
+	返回:
+	None
+	"""
+	if profiler is not None:
+		profiler.counters['input_bytes'] = sum(os.path.getsize(data_file) for data_file in data_files)
 
+	if args.merge:
+		# 以 k 路合併依撮合時間逐筆寫出
+		records = iter_merged_records(data_files, skip_conditions, stock_codes, time_range, args.workers, report, sequence=sequence, numeric=args.numeric)
+		if profiler is not None:
+			records = profile_items(records, profiler)
+		records = reshape_records(args, records)
+		WRITERS[args.format](records, output_path, compact=args.compact)
+	else:
+		# 每個檔案由一個行程解析並直接寫出
+		counts = convert_files(data_files, output_path, args.format, args.workers, skip_conditions, stock_codes, time_range, report, sequence, args.numeric, args.compact)
+		if profiler is not None:
+			profiler.counters['processed'] = sum(counts.values())
+
+	if profiler is not None:
+		profiler.stop()
+		if args.merge:
+			profiler.add('write', profiler.elapsed - profiler.stages.get('parse', 0.0))
+
+
+
+def build_parser():
+	"""
+	建立檔案解析模式的命令列參數解析器。常駐服務只建立一次並重複使用。
+	"""
 	# 初始化 ArgumentParser 物件，用於處理命令行參數
-	parser = argparse.ArgumentParser(description="Parse binary data file with dynamic skip conditions.")
+	parser = argparse.ArgumentParser(prog='main.py', description="Parse binary data file with dynamic skip conditions.")
 	
 	# 添加輸入檔案參數
 	parser.add_argument(
 		'input_file',
 		type=str,
-		help='Name of the input data file (located in data/raw directory)'
+		help='Name of the input data file, a quoted glob (e.g., "f6_*.new") or a directory of .new files (located in data/raw directory)'
 	)
 	
 	# 添加輸出檔案參數
 	parser.add_argument(
 		'output_file',
 		type=str,
-		help='Name of the output JSON file (located in data/processed directory)'
+		help='Name of the output file, or of the output directory when several input files are written separately (located in data/processed directory)'
+	)
+
+	# 添加多檔合併參數（可選）
+	parser.add_argument(
+		'--merge',
+		action='store_true',
+		help='Merge records of all input files by matching time and transmission number into a single output file'
 	)
 	
 	# 添加情境條件參數（可選）
@@ -88,24 +650,370 @@ def main():
 		default='',
 		help='Comma-separated list of scenarios and modes (e.g., "1:include,2:exclude,3:include")'
 	)
+
+	# 添加證券代碼參數（可選）
+	parser.add_argument(
+		'--stocks',
+		type=str,
+		default='',
+		help='Comma-separated list of stock codes to keep (e.g., "2330,2317")'
+	)
+
+	# 添加撮合時間範圍參數（可選）
+	parser.add_argument(
+		'--time-from',
+		type=str,
+		default=None,
+		help='Keep records matched at or after this time (HH:MM[:SS[.ffffff]])'
+	)
+	parser.add_argument(
+		'--time-to',
+		type=str,
+		default=None,
+		help='Keep records matched before this time (HH:MM[:SS[.ffffff]])'
+	)
+
+	# 添加平行解析行程數參數（可選）
+	parser.add_argument(
+		'--workers',
+		type=int,
+		default=1,
+		help='Number of worker processes used to parse the file in parallel'
+	)
+
+	# 添加檢查碼驗證參數（可選）
+	parser.add_argument(
+		'--verify',
+		action='store_true',
+		help='Verify each record checksum, skip corrupt records and print an integrity report'
+	)
+	parser.add_argument(
+		'--report-file',
+		type=str,
+		default=None,
+		help='Name of the JSON integrity report file (located in data/processed directory); implies --verify'
+	)
+
+	# 添加傳輸序號檢查參數（可選）
+	parser.add_argument(
+		'--check-sequence',
+		action='store_true',
+		help='Track transmission numbers and print missing ranges, duplicates and out-of-order records'
+	)
+	parser.add_argument(
+		'--drop-duplicates',
+		action='store_true',
+		help='Drop records whose transmission number has already been seen; implies --check-sequence'
+	)
+	parser.add_argument(
+		'--sequence-report',
+		type=str,
+		default=None,
+		help='Name of the JSON sequence report file (located in data/processed directory); implies --check-sequence'
+	)
+
+	# 添加持續解析參數（可選）
+	parser.add_argument(
+		'--follow',
+		action='store_true',
+		help='Keep parsing the input file as it grows and stream new records as NDJSON (stop with Ctrl+C or --idle-timeout)'
+	)
+	parser.add_argument(
+		'--checkpoint',
+		type=str,
+		default=None,
+		help='Name of the --follow checkpoint file (located in data/processed directory); a restarted job resumes from it and appends to the output'
+	)
+	parser.add_argument(
+		'--poll-interval',
+		type=float,
+		default=50.0,
+		help='Milliseconds between checks for new data in --follow mode'
+	)
+	parser.add_argument(
+		'--idle-timeout',
+		type=float,
+		default=None,
+		help='Stop --follow after this many seconds without new data'
+	)
+
+	# 添加索引參數（可選）
+	parser.add_argument(
+		'--use-index',
+		action='store_true',
+		help='Use the sidecar index built by "main.py index" to decode only records matching --stocks/--time-from/--time-to'
+	)
+
+	# 添加輸出格式參數（可選）
+	parser.add_argument(
+		'--format',
+		type=str,
+		choices=sorted(WRITERS) + sorted(COLUMNAR_WRITERS),
+		default='json',
+		help='Output format: json (single array), ndjson (one record per line, streamed), or typed columns as parquet, arrow or npz'
+	)
+
+	# 添加數值輸出參數（可選）
+	parser.add_argument(
+		'--numeric',
+		action='store_true',
+		help='Emit prices as integer ticks of 0.0001, quantities and total_volume as integers and matching_time as microseconds since midnight (json/ndjson)'
+	)
+
+	# 添加解碼結果快取參數（可選）
+	parser.add_argument(
+		'--cache',
+		action='store_true',
+		help='Reuse decoded columns cached by input content hash and parser version; conditions are applied to the cached columns'
+	)
+	parser.add_argument(
+		'--cache-dir',
+		type=str,
+		default=DEFAULT_CACHE_DIR,
+		help='Directory of the parse cache'
+	)
+	parser.add_argument(
+		'--cache-size',
+		type=int,
+		default=DEFAULT_MAX_BYTES >> 20,
+		help='Size limit of the parse cache in MB; least recently used entries are evicted'
+	)
+
+	# 添加 K 棒彙整參數（可選）
+	parser.add_argument(
+		'--bars',
+		type=str,
+		help='Aggregate trades into per-stock OHLCV/VWAP bars of this interval (e.g. 1s, 1m, 5m) instead of writing records (json/ndjson)'
+	)
+
+	# 添加差異輸出參數（可選）
+	parser.add_argument(
+		'--delta',
+		action='store_true',
+		help='Write per-stock deltas (changed levels, trade and changed flags) with periodic full keyframes instead of full records (json/ndjson); rebuild with the rebuild command'
+	)
+	parser.add_argument(
+		'--keyframe-interval',
+		type=int,
+		default=DEFAULT_KEYFRAME_INTERVAL,
+		help='Records per stock between full keyframes in --delta output (0 for the first record only)'
+	)
+
+	# 添加精簡輸出參數（可選）
+	parser.add_argument(
+		'--compact',
+		action='store_true',
+		help='Write json/ndjson without indentation or spaces between items (default output matches json.dumps byte for byte)'
+	)
+
+	# 添加效能量測參數（可選）
+	parser.add_argument(
+		'--profile',
+		action='store_true',
+		help='Print per-stage timings, record counters and throughput after parsing'
+	)
+	parser.add_argument(
+		'--profile-output',
+		type=str,
+		default=None,
+		help='Name of the metrics file (located in data/processed directory); implies --profile'
+	)
+	parser.add_argument(
+		'--profile-format',
+		type=str,
+		choices=['json', 'prometheus'],
+		default='json',
+		help='Format of --profile-output: JSON or Prometheus text exposition'
+	)
+	parser.add_argument(
+		'--cprofile',
+		type=str,
+		default=None,
+		help='Run the parse under cProfile and write pstats to this file (located in data/processed directory)'
+	)
+	parser.add_argument(
+		'--sample',
+		type=str,
+		default=None,
+		help='Sample call stacks during the parse and write collapsed stacks to this file (located in data/processed directory)'
+	)
+	parser.add_argument(
+		'--sample-interval',
+		type=float,
+		default=5.0,
+		help='Stack sampling interval in milliseconds of CPU time'
+	)
+	return parser
+
+
+
+def main(argv=None, parser=None):
+	"""
+	命令列進入點：執行子命令或檔案解析模式。
+
+	參數:
+	argv (list): 命令列參數（不含程式名稱）；None 表示使用 sys.argv。
+	parser (argparse.ArgumentParser): build_parser 建立的解析器；None 表示重新建立。
+
+	返回:
+	None
+	"""
+	if argv is None:
+		argv = sys.argv[1:]
+
+	# 子命令
+	if argv and argv[0] in COMMANDS:
+		COMMANDS[argv[0]](argv[1:])
+		return
+
+	if parser is None:
+		parser = build_parser()
+
 	# 解析命令列參數
-	args = parser.parse_args()
+	args = parser.parse_args(argv)
 	
+	# 索引只讀取符合條件的記錄，無法檢查完整的傳輸序號
+	if args.use_index and (args.check_sequence or args.drop_duplicates or args.sequence_report):
+		parser.error('--use-index cannot be combined with --check-sequence, --drop-duplicates or --sequence-report')
+	# 平行解析的各區段（或各檔案）只能略過自己範圍內的重複
+	if args.drop_duplicates and args.workers > 1:
+		parser.error('--drop-duplicates cannot be combined with --workers')
+	# 索引查詢逐筆解碼單一行程輸出，不驗證未讀取的資料
+	if args.use_index and (args.format in COLUMNAR_WRITERS or args.verify or args.report_file or args.workers > 1):
+		parser.error('--use-index requires --format json or ndjson and cannot be combined with --verify, --report-file or --workers')
+
+	# 持續解析只支援逐筆串流寫出
+	if args.follow and (args.format != 'ndjson' or args.workers > 1 or args.use_index or args.verify or args.report_file):
+		parser.error('--follow requires --format ndjson and cannot be combined with --workers, --use-index, --verify or --report-file')
+	if args.checkpoint and not args.follow:
+		parser.error('--checkpoint requires --follow')
+
+	# 快取只保存未驗證的完整解碼結果
+	if args.cache and (args.follow or args.use_index or args.verify or args.report_file):
+		parser.error('--cache cannot be combined with --follow, --use-index, --verify or --report-file')
+
+	# K 棒只輸出為 json 或 ndjson
+	if args.bars:
+		try:
+			parse_interval(args.bars)
+		except ValueError as error:
+			parser.error(str(error))
+		if args.format in COLUMNAR_WRITERS or args.use_index:
+			parser.error('--bars requires --format json or ndjson and cannot be combined with --use-index')
+
+	# 差異輸出只適用於逐筆記錄
+	if args.delta and (args.bars or args.format in COLUMNAR_WRITERS):
+		parser.error('--delta requires --format json or ndjson and cannot be combined with --bars')
+
+	# 萬用字元或目錄：處理多個檔案
+	batch = is_batch_input(args.input_file)
+	if batch and (args.follow or args.use_index or args.cache):
+		parser.error('--follow, --use-index and --cache require a single input file')
+	if args.merge and (not batch or args.format in COLUMNAR_WRITERS):
+		parser.error('--merge requires a glob or directory input and --format json or ndjson')
+	if batch and (args.bars or args.delta) and not args.merge:
+		parser.error('--bars and --delta with multiple input files require --merge')
+	data_files = expand_inputs(args.input_file) if batch else None
+	if batch and not data_files:
+		parser.error(f'No input files match {args.input_file}')
+
 	# 生成檔案路徑
 	data_file = f'data/raw/{args.input_file}'
 	output_file = f'data/processed/{args.output_file}'
+	if args.follow and os.path.exists(data_file) and detect_compression(data_file) is not None:
+		parser.error('--follow only supports uncompressed files')
+	if args.use_index:
+		# 先載入索引（同一行程中沿用），索引不存在或已過期時提示重新建立
+		from index import open_index
+		try:
+			open_index(data_file)
+		except FileNotFoundError:
+			parser.error(f'No index for {data_file}; run `main.py index {args.input_file}` first')
+		except ValueError as error:
+			parser.error(f'{error} with `main.py index {args.input_file}`')
 
 	# 解析 scenarios 參數
 	skip_conditions = parse_scenarios(args.scenarios)
 
-	# 解析原始資料
-	data = parse_file(data_file, skip_conditions)
+	# 解析證券代碼與撮合時間範圍
+	try:
+		stock_codes = validate_stock_codes(args.stocks.split(',')) if args.stocks else None
+	except ValueError as error:
+		parser.error(str(error))
+	time_range = (args.time_from, args.time_to)
+
+	# 需要驗證檢查碼時建立驗證結果
+	report = IntegrityReport() if args.verify or args.report_file else None
+
+	# 需要檢查傳輸序號時建立追蹤器
+	sequence = SequenceTracker(args.drop_duplicates) if args.check_sequence or args.drop_duplicates or args.sequence_report else None
+
+	# 需要量測時建立 Profiler；未啟用時解析流程不做任何量測
+	profiler = Profiler() if args.profile or args.profile_output else None
+
+	sampler = StackSampler(args.sample_interval / 1000) if args.sample else None
+	profile = cProfile.Profile() if args.cprofile else None
+
+	if sampler is not None:
+		sampler.start()
+	if profile is not None:
+		profile.enable()
+	try:
+		# 解析原始資料，並依輸出格式寫出
+		if batch:
+			write_batch_output(args, data_files, output_file, skip_conditions, stock_codes, time_range, report, profiler, sequence)
+		else:
+			write_output(args, data_file, output_file, skip_conditions, stock_codes, time_range, report, profiler, sequence)
+	finally:
+		if profile is not None:
+			profile.disable()
+		if sampler is not None:
+			sampler.stop()
+
+	if batch and not args.merge:
+		print(f'Data of {len(data_files)} files has been successfully written to {output_file}')
+	else:
+		print(f'Data has been successfully written to {output_file}')
+
+	if profiler is not None:
+		print(profiler.format_table())
+		if args.profile_output:
+			profile_file = f'data/processed/{args.profile_output}'
+			with open(profile_file, 'w', encoding='utf-8') as metrics_file:
+				if args.profile_format == 'prometheus':
+					metrics_file.write(profiler.to_prometheus())
+				else:
+					json.dump(profiler.to_dict(), metrics_file, ensure_ascii=False, indent=4)
+			print(f'Profile has been written to {profile_file}')
+
+	if profile is not None:
+		profile.dump_stats(f'data/processed/{args.cprofile}')
+		print(f'cProfile stats have been written to data/processed/{args.cprofile}')
+
+	if sampler is not None:
+		sampler.write(f'data/processed/{args.sample}')
+		print(f'Sampled stacks have been written to data/processed/{args.sample}')
 
-	# 將轉換後資料保存成 JSON
-	with open(output_file, 'w', encoding='utf-8') as json_file:
-		json.dump(data, json_file, ensure_ascii=False, indent=4)
+	if report is not None:
+		print(f'Integrity: {report.valid}/{report.frames} records valid, {report.bad_checksum} bad checksums, {report.resyncs} resyncs ({report.skipped_bytes} bytes skipped)')
+		if args.report_file:
+			report_file = f'data/processed/{args.report_file}'
+			with open(report_file, 'w', encoding='utf-8') as json_file:
+				json.dump(report.to_dict(), json_file, ensure_ascii=False, indent=4)
+			print(f'Integrity report has been written to {report_file}')
 
-	print(f'Data has been successfully written to {output_file}')
+	if sequence is not None:
+		gaps = sequence.gaps()
+		print(f'Sequence: {sequence.received} records, {sequence.duplicates} duplicates{" (dropped)" if sequence.drop_duplicates else ""}, {sequence.missing} missing in {len(gaps)} gaps, {sequence.out_of_order} out of order')
+		for first, last in gaps[:10]:
+			print(f'  missing {first}-{last}' if first != last else f'  missing {first}')
+		if len(gaps) > 10:
+			print(f'  ... {len(gaps) - 10} more gaps')
+		if args.sequence_report:
+			sequence_file = f'data/processed/{args.sequence_report}'
+			with open(sequence_file, 'w', encoding='utf-8') as json_file:
+				json.dump(sequence.to_dict(), json_file, ensure_ascii=False, indent=4)
+			print(f'Sequence report has been written to {sequence_file}')
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,302 @@
+# src/orderbook.py
+
+from array import array
+from typing import Any, Dict, Iterator, Optional, Union
+from constants import TERMINAL_CODE, QUOTE_OFFSET, QUOTE_LENGTH
+from utils.decoder import decode_ascii, decode_packed_bcd_int
+from utils.format_converter import convert_match_time_us
+from utils.compression import iter_buffers
+from utils.framer import iter_frames
+
+# 最佳五檔的檔數
+BOOK_LEVELS = 5
+
+# 中央登錄公債的代碼開頭，只揭示一檔買賣價量
+CENTRAL_BOND_PREFIXES = (ord('A'), ord('C'), ord('D'))
+
+
+def price_to_ticks(price: Union[str, int]) -> int:
+	"""
+	將格式化後的價格字串（如 "40.61"）轉為以 0.0001 元為單位的整數。
+
+	參數:
+	price (str 或 int): format_number_string 產生的價格字串；numeric 模式的整數價格直接返回。
+
+	返回:
+	int: 價格 tick 數。
+	"""
+	if isinstance(price, int):
+		return price
+	integer_part, _, decimal_part = price.partition('.')
+	return int(integer_part or '0') * 10000 + int(decimal_part.ljust(4, '0'))
+
+
+def time_to_us(matching_time: Union[str, int]) -> int:
+	"""
+	將格式化後的撮合時間（如 "09:09:34.447698"）轉為午夜起算的微秒數。
+
+	參數:
+	matching_time (str 或 int): convert_match_time 產生的時間字串；numeric 模式的整數時間直接返回。
+
+	返回:
+	int: 午夜起算的微秒數。
+	"""
+	if isinstance(matching_time, int):
+		return matching_time
+	hours, minutes, seconds = matching_time.split(':')
+	whole_seconds, _, fraction = seconds.partition('.')
+	return ((int(hours) * 60 + int(minutes)) * 60 + int(whole_seconds)) * 1_000_000 + int(fraction or '0')
+
+
+class BookSnapshot:
+	"""
+	單一證券目前的成交與最佳五檔狀態。價格以 0.0001 元為單位的整數儲存，
+	買賣各五檔以固定長度的 array 保存，每筆記錄只覆寫有揭示的檔位。
+	"""
+
+	__slots__ = (
+		'stock_code',
+		'transmission_number',
+		'matching_time',
+		'total_volume',
+		'last_price',
+		'last_quantity',
+		'bid_prices',
+		'bid_quantities',
+		'bid_levels',
+		'ask_prices',
+		'ask_quantities',
+		'ask_levels',
+		'in_trial',
+		'trial_price',
+		'trial_quantity',
+		'limit_flags',
+		'status_flags',
+		'updates',
+	)
+
+	def __init__(self, stock_code: str):
+		self.stock_code = stock_code
+		self.transmission_number = 0
+		self.matching_time = 0  # 午夜起算的微秒數
+		self.total_volume = 0
+		self.last_price = 0  # 最近一筆成交價（非試算）
+		self.last_quantity = 0
+		self.bid_prices = array('q', bytes(8 * BOOK_LEVELS))
+		self.bid_quantities = array('q', bytes(8 * BOOK_LEVELS))
+		self.bid_levels = 0  # 目前有效的買進檔數
+		self.ask_prices = array('q', bytes(8 * BOOK_LEVELS))
+		self.ask_quantities = array('q', bytes(8 * BOOK_LEVELS))
+		self.ask_levels = 0  # 目前有效的賣出檔數
+		self.in_trial = False  # 最近一筆記錄是否為試算揭示
+		self.trial_price = 0  # 最近一筆試算價
+		self.trial_quantity = 0
+		self.limit_flags = 0  # 最近一筆記錄的漲跌停註記（原始位元組）
+		self.status_flags = 0  # 最近一筆記錄的狀態註記（原始位元組）
+		self.updates = 0  # 已套用的記錄筆數
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+		"""
+		return {
+			'stock_code': self.stock_code,
+			'transmission_number': self.transmission_number,
+			'matching_time': self.matching_time,
+			'total_volume': self.total_volume,
+			'last_price': self.last_price,
+			'last_quantity': self.last_quantity,
+			'bids': [[self.bid_prices[i], self.bid_quantities[i]] for i in range(self.bid_levels)],
+			'asks': [[self.ask_prices[i], self.ask_quantities[i]] for i in range(self.ask_levels)],
+			'in_trial': self.in_trial,
+			'trial_price': self.trial_price,
+			'trial_quantity': self.trial_quantity,
+			'limit_flags': self.limit_flags,
+			'status_flags': self.status_flags,
+			'updates': self.updates,
+		}
+
+
+class OrderBookStore:
+	"""
+	以證券代碼保存每檔證券目前的成交與最佳五檔，逐筆套用記錄更新。
+
+	- 試算揭示的記錄只更新試算價量，不影響成交價與最佳五檔。
+	- 僅記成交價量的記錄只更新成交價量，保留原本的最佳五檔。
+	- 瞬間價格趨勢為暫緩撮合時，成交量以 0 記錄。
+	"""
+
+	def __init__(self):
+		self._books: Dict[str, BookSnapshot] = {}
+		# 以原始 6 位元組代碼查詢，避免每筆記錄都解碼 ASCII
+		self._books_by_raw: Dict[bytes, BookSnapshot] = {}
+
+	def __len__(self) -> int:
+		return len(self._books)
+
+	def __contains__(self, stock_code: str) -> bool:
+		return stock_code in self._books
+
+	def __iter__(self) -> Iterator[BookSnapshot]:
+		return iter(self._books.values())
+
+	def get(self, stock_code: str) -> Optional[BookSnapshot]:
+		"""
+		取得指定證券目前的狀態。
+
+		參數:
+		stock_code (str): 證券代碼。
+
+		返回:
+		BookSnapshot: 目前的狀態；尚未收到該證券的記錄時返回 None。
+		"""
+		return self._books.get(stock_code)
+
+	def _book_for(self, raw_code: bytes) -> BookSnapshot:
+		book = self._books_by_raw.get(raw_code)
+		if book is None:
+			stock_code = decode_ascii(raw_code)
+			book = self._books.get(stock_code)
+			if book is None:
+				book = self._books[stock_code] = BookSnapshot(stock_code)
+			self._books_by_raw[raw_code] = book
+		return book
+
+	def apply_frame(self, record: bytes) -> Optional[BookSnapshot]:
+		"""
+		直接由原始記錄更新對應證券的狀態，只解碼需要的欄位。
+
+		參數:
+		record (bytes): 單一筆完整記錄（bytes 或 memoryview）。
+
+		返回:
+		BookSnapshot: 更新後的狀態；記錄不完整時返回 None。
+		"""
+		if len(record) < QUOTE_OFFSET:
+			return None
+
+		book = self._book_for(bytes(record[10:16]))
+		reveal = record[22]
+		limit = record[23]
+		status = record[24]
+
+		book.transmission_number = decode_packed_bcd_int(record[6:10])
+		book.matching_time = convert_match_time_us(record[16:22])
+		book.total_volume = decode_packed_bcd_int(record[25:29])
+		book.limit_flags = limit
+		book.status_flags = status
+		book.updates += 1
+
+		slots = (len(record) - len(TERMINAL_CODE) - QUOTE_OFFSET) // QUOTE_LENGTH
+		has_trade = reveal & 0b10000000 and slots > 0
+
+		# 試算揭示：只記錄試算價量
+		if status & 0b10000000:
+			book.in_trial = True
+			if has_trade:
+				book.trial_price = decode_packed_bcd_int(record[QUOTE_OFFSET:QUOTE_OFFSET + 5])
+				book.trial_quantity = decode_packed_bcd_int(record[QUOTE_OFFSET + 5:QUOTE_OFFSET + 9])
+			return book
+
+		book.in_trial = False
+		index = 0
+		if has_trade:
+			book.last_price = decode_packed_bcd_int(record[QUOTE_OFFSET:QUOTE_OFFSET + 5])
+			# 暫緩撮合時成交量以 0 揭示
+			book.last_quantity = decode_packed_bcd_int(record[QUOTE_OFFSET + 5:QUOTE_OFFSET + 9]) if limit & 0b11 == 0 else 0
+			index = 1
+
+		# 僅記成交價量：保留原本的最佳五檔
+		if reveal & 0b00000001:
+			return book
+
+		bid_count = (reveal >> 4) & 0b111
+		ask_count = (reveal >> 1) & 0b111
+		single_level = record[10] in CENTRAL_BOND_PREFIXES
+
+		book.bid_levels = self._apply_levels(record, index, bid_count, slots, single_level, book.bid_prices, book.bid_quantities)
+		book.ask_levels = self._apply_levels(record, index + bid_count, ask_count, slots, single_level, book.ask_prices, book.ask_quantities)
+		return book
+
+	@staticmethod
+	def _apply_levels(record: bytes, start: int, count: int, slots: int, single_level: bool, prices: array, quantities: array) -> int:
+		"""
+		覆寫一側的檔位，返回有效檔數。檔位配置與 convert_instant_quotes 相同。
+		"""
+		if single_level:
+			count = min(count, 1)  # 中央登錄公債，只揭示一檔資料
+		count = min(count, BOOK_LEVELS, max(slots - start, 0))
+
+		for level in range(count):
+			offset = QUOTE_OFFSET + (start + level) * QUOTE_LENGTH
+			prices[level] = decode_packed_bcd_int(record[offset:offset + 5])
+			quantities[level] = decode_packed_bcd_int(record[offset + 5:offset + 9])
+
+		return count
+
+	def apply_record(self, record: Dict[str, Any]) -> BookSnapshot:
+		"""
+		由 decode_record 產生的記錄更新對應證券的狀態（如接收 live 模式的輸出時使用）。
+		試算揭示的記錄不含試算價量，因此只更新試算狀態。
+
+		參數:
+		record (dict): 解析後的記錄（預設模式或 numeric 模式皆可）。
+
+		返回:
+		BookSnapshot: 更新後的狀態。
+		"""
+		body = record['body']
+		stock_code = body['stock_code']
+		book = self._books.get(stock_code)
+		if book is None:
+			book = self._books[stock_code] = BookSnapshot(stock_code)
+
+		book.transmission_number = int(record['header']['transmission_number'])
+		book.matching_time = time_to_us(body['matching_time'])
+		book.total_volume = int(body['total_volume'])
+		book.updates += 1
+
+		if body['status_flags']['試算狀態註記'] == '試算揭示':
+			book.in_trial = True
+			return book
+
+		book.in_trial = False
+		quotes = body['instant_quotes']
+		if quotes['成交價量'] is not None:
+			book.last_price = price_to_ticks(quotes['成交價量']['price'])
+			book.last_quantity = int(quotes['成交價量']['quantity'])
+
+		if body['reveal_flags']['僅記成交價量']:
+			return book
+
+		book.bid_levels = self._apply_levels_from_quotes(quotes['最佳五檔買進價量'], book.bid_prices, book.bid_quantities)
+		book.ask_levels = self._apply_levels_from_quotes(quotes['最佳五檔賣出價量'], book.ask_prices, book.ask_quantities)
+		return book
+
+	@staticmethod
+	def _apply_levels_from_quotes(levels: list, prices: array, quantities: array) -> int:
+		"""
+		以解析後的價量列表覆寫一側的檔位，返回有效檔數。
+		"""
+		count = min(len(levels), BOOK_LEVELS)
+		for level in range(count):
+			prices[level] = price_to_ticks(levels[level]['price'])
+			quantities[level] = int(levels[level]['quantity'])
+		return count
+
+	def load_file(self, file_path: str) -> int:
+		"""
+		依序套用整份數據文件的記錄。
+
+		參數:
+		file_path (str): 數據文件的路徑。
+
+		返回:
+		int: 套用的記錄筆數。
+		"""
+		applied = 0
+		for _, buffer, end in iter_buffers(file_path):
+			for record in iter_frames(buffer, 0, end):
+				if self.apply_frame(record) is not None:
+					applied += 1
+		return applied
@@ -0,0 +1,207 @@
+# src/parallel.py
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from columnar import decode_checked_frames
+from parser import compile_filter, iter_buffer_records
+from utils.compression import RAW_LENGTH, RAW_OFFSET, is_splittable, open_range, plan_block_ranges, read_block_table
+from utils.framer import IntegrityReport, map_file, find_frame_start, iter_frame_spans
+from utils.sequence import SequenceTracker
+
+# 每個區段的最小長度，避免區段過小時行程間傳遞的成本大於解析本身
+MIN_RANGE_SIZE = 1 << 20
+
+# 每個行程平均分到的區段數；區段越多，結果越早開始串流輸出
+RANGES_PER_WORKER = 8
+
+
+def split_ranges(buffer, range_size: int) -> List[Tuple[int, int]]:
+	"""
+	將緩衝區切成約 range_size 大小的區段，並將每個切點對齊到下一個記錄起始位置。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes 或 mmap）。
+	range_size (int): 每個區段的大約長度。
+
+	返回:
+	list: 依檔案順序排列的 (start, end) 區段，相鄰區段首尾相接。
+	"""
+	size = len(buffer)
+	boundaries = [0]
+	for nominal in range(range_size, size, range_size):
+		boundary = find_frame_start(buffer, max(nominal, boundaries[-1] + 1))
+		if boundary >= size:
+			break
+		boundaries.append(boundary)
+	boundaries.append(size)
+
+	return list(zip(boundaries, boundaries[1:]))
+
+
+def plan_ranges(file_path: str, workers: int, range_size: int = None) -> List[Tuple[int, int]]:
+	"""
+	依檔案大小與行程數規劃解析區段。區塊壓縮檔以區塊邊界分段；
+	其他壓縮檔無法分段，整個檔案為單一區段 (0, None)。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑。
+	workers (int): 行程數。
+	range_size (int): 指定區段長度（解壓縮後）；None 表示依檔案大小自動決定。
+
+	返回:
+	list: 依檔案順序排列的 (start, end) 區段。
+	"""
+	if not is_splittable(file_path):
+		return [(0, None)]
+
+	table = read_block_table(file_path)
+	if table is not None:
+		size = int(table[-1, RAW_OFFSET] + table[-1, RAW_LENGTH])
+		if range_size is None:
+			range_size = max(MIN_RANGE_SIZE, -(-size // (workers * RANGES_PER_WORKER)))
+		return plan_block_ranges(table, range_size)
+
+	with map_file(file_path) as buffer:
+		if range_size is None:
+			range_size = max(MIN_RANGE_SIZE, -(-len(buffer) // (workers * RANGES_PER_WORKER)))
+		return split_ranges(buffer, range_size)
+
+
+def _parse_range(file_path: str, start: int, end: int, skip_conditions, stock_codes, time_range, verify: bool, lazy: bool = False, track: Optional[bool] = None, numeric: bool = False) -> Tuple[List[Any], Optional[IntegrityReport], Optional[SequenceTracker]]:
+	"""
+	行程池工作函數：解析單一區段的記錄；verify 為 True 時一併回傳該區段的驗證結果。
+	lazy 為 True 時回傳 Record，只以原始位元組傳回主行程。
+	track 不為 None 時追蹤該區段的傳輸序號，值為是否略過重複的記錄。
+	numeric 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+	"""
+	skip = compile_filter(skip_conditions, stock_codes, time_range)
+	report = IntegrityReport() if verify else None
+	sequence = SequenceTracker(track, keep_numbers=True) if track is not None else None
+	with open_range(file_path, start, end) as (buffer, base):
+		# 壓縮檔的緩衝區只包含該區段，位置需減去 base，驗證結果再加回
+		range_report = report if report is None or base == 0 else IntegrityReport()
+		records = list(iter_buffer_records(buffer, skip, start - base, None if end is None else end - base, range_report, lazy, sequence=sequence, numeric=numeric))
+	if range_report is not report:
+		report.merge(range_report, base)
+	return records, report, sequence
+
+
+def _decode_range_columnar(file_path: str, start: int, end: int, skip_conditions, stock_codes, time_range, verify: bool, track: Optional[bool] = None) -> Tuple[Dict[str, np.ndarray], Optional[IntegrityReport], Optional[SequenceTracker]]:
+	"""
+	行程池工作函數：將單一區段解碼為欄位陣列；verify 為 True 時一併回傳該區段的驗證結果。
+	track 不為 None 時追蹤該區段的傳輸序號，值為是否略過重複的記錄。
+	"""
+	report = IntegrityReport() if verify else None
+	sequence = SequenceTracker(track, keep_numbers=True) if track is not None else None
+	with open_range(file_path, start, end) as (buffer, base):
+		# 壓縮檔的緩衝區只包含該區段，位置需減去 base，驗證結果與 offset 欄位再加回
+		range_report = report if report is None or base == 0 else IntegrityReport()
+		start -= base
+		end = len(buffer) if end is None else end - base
+		spans = np.array(list(iter_frame_spans(buffer, start, end)), dtype=np.int64).reshape(-1, 2)
+		columns = decode_checked_frames(buffer, spans, skip_conditions, stock_codes, time_range, range_report, start, sequence)
+		if verify:
+			last_end = int(spans[-1, 0] + spans[-1, 1]) if len(spans) else start
+			range_report.add_gap(last_end, end - last_end)
+
+	if base:
+		columns['offset'] += base
+	if range_report is not report:
+		report.merge(range_report, base)
+	return columns, report, sequence
+
+
+def imap_ordered(executor: Executor, func: Callable, tasks: Iterable[tuple], window: int) -> Iterator[Any]:
+	"""
+	將工作提交至執行器，並依提交順序逐一產出結果。
+	同時執行中的工作最多 window 個，前面的結果一完成即可輸出，不需等待全部完成。
+
+	參數:
+	executor (Executor): 執行器。
+	func (Callable): 工作函數。
+	tasks (Iterable): 每個工作的參數 tuple。
+	window (int): 同時執行中的工作上限。
+
+	返回:
+	Iterator: 依提交順序產出的結果。
+	"""
+	pending = deque()
+	try:
+		for task in tasks:
+			pending.append(executor.submit(func, *task))
+			if len(pending) >= window:
+				yield pending.popleft().result()
+
+		while pending:
+			yield pending.popleft().result()
+	finally:
+		# 呼叫端提前結束時取消尚未開始的工作
+		for future in pending:
+			future.cancel()
+
+
+def iter_records_parallel(file_path: str, workers: int, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, range_size: int = None, report: IntegrityReport = None, lazy: bool = False, sequence: SequenceTracker = None, numeric: bool = False) -> Iterator[Any]:
+	"""
+	以多個行程平行解析單一數據文件，並依檔案順序（即傳輸序號順序）逐筆產出記錄。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑。
+	workers (int): 行程數。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	range_size (int): 指定區段長度；None 表示依檔案大小自動決定。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，各區段的驗證結果依檔案順序合併於此。
+	lazy (bool): 為 True 時產出延遲解碼的 Record。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號，各區段的結果依檔案順序合併於此。
+		重複記錄只能在同一區段內略過；跨區段的重複仍會計入 sequence.duplicates。
+	numeric (bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄（dict，lazy 時為 Record）。
+	"""
+	stock_codes = list(stock_codes) if stock_codes is not None else None
+	verify = report is not None
+	track = sequence.drop_duplicates if sequence is not None else None
+	tasks = ((file_path, start, end, skip_conditions, stock_codes, time_range, verify, lazy, track, numeric) for start, end in plan_ranges(file_path, workers, range_size))
+
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		for records, range_report, range_sequence in imap_ordered(executor, _parse_range, tasks, workers * 2):
+			if verify:
+				report.merge(range_report)
+			if sequence is not None:
+				sequence.merge(range_sequence)
+			yield from records
+
+
+def iter_columnar_batches_parallel(file_path: str, workers: int, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, range_size: int = None, report: IntegrityReport = None, sequence: SequenceTracker = None) -> Iterator[Dict[str, np.ndarray]]:
+	"""
+	以多個行程平行將單一數據文件解碼為欄位陣列，每個區段為一批，依檔案順序產出。
+
+	參數:
+	file_path (str): 解析的數據文件的路徑。
+	workers (int): 行程數。
+	skip_conditions (list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes (Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range (tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	range_size (int): 指定區段長度；None 表示依檔案大小自動決定。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，各區段的驗證結果依檔案順序合併於此。
+	sequence (SequenceTracker): 提供時追蹤傳輸序號，各區段的結果依檔案順序合併於此。
+
+	返回:
+	Iterator: 逐批產出欄位陣列（dict）。
+	"""
+	stock_codes = list(stock_codes) if stock_codes is not None else None
+	verify = report is not None
+	track = sequence.drop_duplicates if sequence is not None else None
+	tasks = ((file_path, start, end, skip_conditions, stock_codes, time_range, verify, track) for start, end in plan_ranges(file_path, workers, range_size))
+
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		for columns, range_report, range_sequence in imap_ordered(executor, _decode_range_columnar, tasks, workers * 2):
+			if verify:
+				report.merge(range_report)
+			if sequence is not None:
+				sequence.merge(range_sequence)
+			yield columns
@@ -1,49 +1,265 @@
 # src/parser.py
 
-from typing import List, Dict, Any, Tuple, Union
-from constants import ESC_CODE, TERMINAL_CODE
-from utils.decoder import decode_ascii, decode_packed_bcd, decode_hexacode
-from utils.format_converter import format_number_string, convert_match_time, convert_reveal_flags, convert_limit_flags, convert_status_flags, convert_instant_quotes, calculate_checksum
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional, Tuple, Union
+from constants import TERMINAL_CODE, STOCK_CODE_LENGTH
+from utils.decoder import decode_ascii, decode_packed_bcd, decode_packed_bcd_int, decode_hexacode
+from utils.compression import is_splittable, iter_buffers
+from utils.framer import IntegrityReport, iter_frames
+from utils.sequence import SequenceTracker
+from utils.format_converter import format_number_string, convert_match_time, convert_match_time_us, encode_match_time, convert_reveal_flags, convert_limit_flags, convert_status_flags, convert_instant_quotes, calculate_checksum
+from record import Record, MIN_RECORD_LENGTH
+from profiling import Profiler
+
+
+def iter_records(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, workers: int = 1, report: IntegrityReport = None, lazy: bool = False, profiler: Profiler = None, sequence: SequenceTracker = None, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+	"""
+	逐筆解析二進位數據文件，每解析完一筆記錄即產出，不保留已產出的記錄。
+
+	參數:
+	file_path(str): 解析的數據文件的路徑。
+	skip_conditions(list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes(Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range(tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	workers(int): 平行解析的行程數；大於 1 時將檔案切成多個區段交由行程池解析（區塊壓縮檔以外的壓縮檔依序解析）。
+	report(IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	lazy(bool): 為 True 時產出延遲解碼的 Record，欄位在存取時才解碼。
+	profiler(Profiler): 提供時累計切分、條件判斷與解碼各階段的耗時（僅單一行程時量測各階段）。
+	sequence(SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+	numeric(bool): 為 True 時價格、數量與累計成交量為整數，撮合時間為午夜起算的微秒數（見 decode_record）。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄（dict，lazy 時為 Record）。
+	"""
+	if workers > 1 and is_splittable(file_path):
+		from parallel import iter_records_parallel
+		yield from iter_records_parallel(file_path, workers, skip_conditions, stock_codes, time_range, report=report, lazy=lazy, sequence=sequence, numeric=numeric)
+		return
+
+	# 條件在開始前編譯一次，之後直接檢查原始位元組
+	skip = compile_filter(skip_conditions, stock_codes, time_range)
+
+	# 未壓縮的檔案以 mmap 映射；壓縮檔逐段解壓縮，lazy 的 Record 參照緩衝區，此時不重複使用緩衝區
+	for base, buffer, end in iter_buffers(file_path, reuse=not lazy):
+		# 第一段的位置即檔案位置；之後各段的驗證結果加上 base 後合併
+		chunk_report = report if report is None or base == 0 else IntegrityReport()
+		yield from iter_buffer_records(buffer, skip, end=end, report=chunk_report, lazy=lazy, profiler=profiler, sequence=sequence, numeric=numeric)
+		if chunk_report is not report:
+			report.merge(chunk_report, base)
+
+
+
+def iter_buffer_records(buffer, skip: Optional[Callable[[bytes], bool]] = None, start: int = 0, end: int = None, report: IntegrityReport = None, lazy: bool = False, profiler: Profiler = None, sequence: SequenceTracker = None, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+	"""
+	逐筆解析緩衝區中的記錄。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes、bytearray 或 mmap）。
+	skip(Callable): compile_filter 產生的判斷函數；None 表示不跳過。
+	start(int): 開始解析的位置，應為記錄起始位置。
+	end(int): 只解析起始位置小於 end 的記錄；None 表示解析到緩衝區結尾。
+	report(IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	lazy(bool): 為 True 時產出延遲解碼的 Record，不複製原始資料。
+	profiler(Profiler): 提供時累計各階段的耗時與記錄數。
+	sequence(SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+	numeric(bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄（dict，lazy 時為 Record）。
+	"""
+	if profiler is not None:
+		yield from iter_profiled_records(buffer, profiler, skip, start, end, report, lazy, sequence, numeric)
+		return
+
+	# 依 HEADER 的 message_length 切分記錄，ESC-CODE 與 TERMINAL-CODE 僅用於驗證與重新同步
+	for record in iter_frames(buffer, start, end, report):
+		# 追蹤傳輸序號（在條件判斷之前，被跳過的記錄也需計入）
+		if sequence is not None and not sequence.observe(decode_packed_bcd_int(record[6:10])) and sequence.drop_duplicates:
+			continue  # 略過重複的記錄
+
+		# 檢查是否跳過資料
+		if skip is not None and skip(record):
+			continue  # 跳過該資料
+
+		if lazy:
+			if len(record) >= MIN_RECORD_LENGTH:
+				yield Record(record)
+			continue
+
+		decoded = decode_record(record, numeric=numeric)  # 處理完整記錄
+		if decoded is not None:
+			yield decoded
+
+
+
+def iter_profiled_records(buffer, profiler: Profiler, skip: Optional[Callable[[bytes], bool]] = None, start: int = 0, end: int = None, report: IntegrityReport = None, lazy: bool = False, sequence: SequenceTracker = None, numeric: bool = False) -> Iterator[Union[Dict[str, Any], Record]]:
+	"""
+	與 iter_buffer_records 相同，另外量測切分（parse.framing）、條件判斷（parse.filter）
+	與解碼（parse.decode）各階段的耗時，並累計記錄筆數、位元組數與跳過筆數。
+
+	參數:
+	buffer: 原始資料緩衝區（bytes、bytearray 或 mmap）。
+	profiler(Profiler): 累計結果的物件。
+	skip(Callable): compile_filter 產生的判斷函數；None 表示不跳過。
+	start(int): 開始解析的位置，應為記錄起始位置。
+	end(int): 只解析起始位置小於 end 的記錄；None 表示解析到緩衝區結尾。
+	report(IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	lazy(bool): 為 True 時產出延遲解碼的 Record。
+	sequence(SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+	numeric(bool): 為 True 時以數值型別輸出價格、數量、累計成交量與撮合時間。
+
+	返回:
+	Iterator: 逐筆產出解析後的數據記錄。
+	"""
+	frames = iter_frames(buffer, start, end, report)
+	counters = profiler.counters
+	framing = filtering = decoding = 0.0
+
+	try:
+		while True:
+			started = perf_counter()
+			record = next(frames, None)
+			framed = perf_counter()
+			framing += framed - started
+			if record is None:
+				return
+
+			counters['frames'] += 1
+			counters['frame_bytes'] += len(record)
+
+			if sequence is not None and not sequence.observe(decode_packed_bcd_int(record[6:10])) and sequence.drop_duplicates:
+				filtering += perf_counter() - framed
+				counters['skipped'] += 1
+				continue
+
+			if skip is not None and skip(record):
+				filtering += perf_counter() - framed
+				counters['skipped'] += 1
+				continue
+
+			filtered = perf_counter()
+			filtering += filtered - framed
+
+			if lazy:
+				decoded = Record(record) if len(record) >= MIN_RECORD_LENGTH else None
+			else:
+				decoded = decode_record(record, profiler, numeric)
+			decoding += perf_counter() - filtered
+
+			if decoded is not None:
+				yield decoded
+	finally:
+		profiler.add('parse.framing', framing)
+		profiler.add('parse.filter', filtering)
+		profiler.add('parse.decode', decoding)
+
 
 
-def parse_file(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None) -> List[Dict[str, Any]]:
+def parse_file(file_path: str, skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None, workers: int = 1, report: IntegrityReport = None, lazy: bool = False, sequence: SequenceTracker = None, numeric: bool = False) -> List[Union[Dict[str, Any], Record]]:
 	"""
 	解析二進位數據文件，提取並處理每筆記錄。
 
 	參數:
 	file_path(str): 解析的數據文件的路徑。
 	skip_conditions(list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes(Iterable): 只保留這些證券代碼的記錄；None 表示不限。
+	time_range(tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+	workers(int): 平行解析的行程數。
+	report(IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並將驗證結果累計於此。
+	lazy(bool): 為 True 時返回延遲解碼的 Record，record.to_dict() 與預設模式的結果相同。
+	sequence(SequenceTracker): 提供時追蹤傳輸序號的缺漏與重複；sequence.drop_duplicates 為 True 時略過重複的記錄。
+	numeric(bool): 為 True 時價格為 0.0001 元為單位的整數、數量與累計成交量為整數、撮合時間為午夜起算的微秒數；
+		lazy 時不適用，可改用 record.to_dict(numeric=True)。
 
 	返回:
-	list: 包含解析後的數據記錄的列表，每條記錄以 dict 形式儲存。
+	list: 包含解析後的數據記錄的列表，每條記錄以 dict 形式儲存（lazy 時為 Record）。
 	"""
-	data = []
-	with open(file_path, 'rb') as file:  # 使用二進位讀取資料
-		buffer = b''
-		while True:
-			chunk = file.read(1024)  # 一次讀取 1024 Bytes
-			if len(chunk) == 0:
-				if buffer:
-					process_chunk(buffer, data)
-				break  # 文件結束
+	return list(iter_records(file_path, skip_conditions, stock_codes, time_range, workers, report, lazy, sequence=sequence, numeric=numeric))
+
+
+
+def validate_stock_codes(stock_codes: Iterable[str]) -> List[str]:
+	"""
+	檢查證券代碼條件：每個代碼需為 1 至 6 個 ASCII 字元，否則無法與記錄中的 6 位元組代碼比較。
+
+	參數:
+	stock_codes(Iterable): 證券代碼。
+
+	返回:
+	list: 證券代碼。
+	"""
+	stock_codes = list(stock_codes)
+	for code in stock_codes:
+		if not code or len(code) > STOCK_CODE_LENGTH or not code.isascii():
+			raise ValueError(f'Invalid stock code {code!r}: expected 1 to {STOCK_CODE_LENGTH} ASCII characters')
+	return stock_codes
 
-			buffer += chunk
 
-			# 如果 buffer 存在 TERMINAL_CODE
-			while TERMINAL_CODE in buffer:
-				record_end = buffer.index(TERMINAL_CODE) + len(TERMINAL_CODE)
-				record = buffer[:record_end]
-				buffer = buffer[record_end:]
+def compile_filter(skip_conditions: List[Dict[str, Union[int, Tuple[int, int], str]]] = None, stock_codes: Iterable[str] = None, time_range: Tuple[Optional[str], Optional[str]] = None) -> Optional[Callable[[bytes], bool]]:
+	"""
+	將跳過條件、證券代碼與撮合時間範圍編譯為單一判斷函數，直接檢查原始位元組，不需先解碼。
+
+	情境條件依位置預先算出 256 種數值是否通過的查表：
+	include 取交集、exclude 取聯集，與 should_skip 的結果相同。
+	證券代碼比較位置 11-16 的 ASCII 位元組；撮合時間直接比較位置 17-22 的 PACK BCD 位元組。
+
+	參數:
+	skip_conditions(list): 包含多個條件的列表，每個條件是包含位置、指定數值和模式的 dict。
+	stock_codes(Iterable): 只保留這些證券代碼的記錄；None 表示不限。代碼不是 1 至 6 個 ASCII 字元時拋出 ValueError。
+	time_range(tuple): 撮合時間範圍 (起, 迄)，包含起點、不含迄點；任一端為 None 表示不限。
+
+	返回:
+	Callable: 判斷函數，需要跳過時返回 True；沒有任何條件時返回 None。
+	"""
+	skip_conditions = skip_conditions or []
+
+	# 依位置建立查表：table[value] 為 True 表示該位置的所有條件皆通過
+	tables = {}
+	for position in sorted({condition['position'] for condition in skip_conditions}):
+		conditions = [condition for condition in skip_conditions if condition['position'] == position]
+		tables[position] = tuple(
+			all((value & condition['value'][0] == condition['value'][1]) == (condition['mode'] != 'exclude') for condition in conditions if condition['mode'] in ('include', 'exclude'))
+			for value in range(256)
+		)
+	flag_tables = tuple(tables.items())
+
+	# 證券代碼以原始 6 位元組 ASCII（右側補空白）比較
+	codes = frozenset(code.encode('ascii').ljust(STOCK_CODE_LENGTH) for code in validate_stock_codes(stock_codes)) if stock_codes is not None else None
 
-				# 檢查記錄是否以 ESC_CODE 開頭
-				if record.startswith(ESC_CODE):
-					# 檢查是否跳過資料
-					if skip_conditions and should_skip(record, skip_conditions):
-						continue  # 跳過該資料
+	# 撮合時間以 PACK BCD 位元組比較，位元組順序與時間先後一致
+	time_from, time_to = time_range or (None, None)
+	low = encode_match_time(time_from) if time_from else None
+	high = encode_match_time(time_to) if time_to else None
 
-					process_chunk(record, data)  # 處理完整記錄
+	if not flag_tables and codes is None and low is None and high is None:
+		return None
 
-	return data
+	# 位置 25 之後才有完整的註記與時間
+	min_length = max([25] + [position + 1 for position in tables])
+	filters_body = codes is not None or low is not None or high is not None
+
+	def skip(record: bytes) -> bool:
+		if len(record) < min_length:
+			# 記錄過短：有代碼或時間條件時跳過，否則沿用逐條件判斷
+			return filters_body or should_skip(record, skip_conditions)
+
+		for position, table in flag_tables:
+			if not table[record[position]]:
+				return True
+
+		if codes is not None and bytes(record[10:16]) not in codes:
+			return True
+
+		if low is not None or high is not None:
+			matching_time = bytes(record[16:22])
+			if low is not None and matching_time < low:
+				return True
+			if high is not None and matching_time >= high:
+				return True
+
+		return False
+
+	return skip
 
 
 
@@ -100,16 +316,40 @@ def process_chunk(chunk: bytes, data: List[Dict[str, Any]]) -> None:
 	處理單一筆數據記錄，解析其中的各部分並將結果添加到data。
 
 	參數:
-	chunk (bytes): 單一筆數據記錄。
+	chunk (bytes): 單一筆數據記錄（bytes 或 memoryview）。
 	data (list): 用於儲存解析後記錄的列表。
 
 	返回:
 	None
 	"""
+	record = decode_record(chunk)
+	if record is not None:
+		data.append(record)
+
+
+
+def decode_record(chunk: bytes, profiler: Profiler = None, numeric: bool = False, quotes: Tuple[list, list, tuple] = None) -> Optional[Dict[str, Any]]:
+	"""
+	解析單一筆數據記錄的各部分。
+
+	numeric 為 True 時，數值欄位直接由 PACK BCD 轉為整數，不經過格式化字串：
+	- matching_time：午夜起算的微秒數。
+	- total_volume：整數。
+	- instant_quotes 的 price：以 0.0001 元為單位的整數（5 位整數 + 4 位小數，如 40.61 元為 406100）；quantity：整數。
+
+	參數:
+	chunk (bytes): 單一筆數據記錄（bytes 或 memoryview）。
+	profiler (Profiler): 提供時另外累計 instant_quotes 與檢查碼的耗時。
+	numeric (bool): 為 True 時以數值型別輸出上述欄位。
+	quotes (tuple): (價格, 數量, 轉換函數)；提供時不由 chunk 切出價量，改以 convert_instant_quotes 的 converters 轉換已解碼的價量（如快取中的整數）。
+
+	返回:
+	dict: 解析後的記錄；資料不完整時返回 None。
+	"""
 
 	# 檢查資料長度是否符合最小要求
-	if len(chunk) < 19:
-		return  # 跳過不完整紀錄(沒有BODY)
+	if len(chunk) < MIN_RECORD_LENGTH:
+		return None  # 跳過不完整紀錄(沒有BODY)
 
 	# 解析 ESC-CODE
 	esc_code = decode_ascii(chunk[0:1])  # 位置 1，長度 1
@@ -126,16 +366,20 @@ def process_chunk(chunk: bytes, data: List[Dict[str, Any]]) -> None:
 	# 解析 BODY
 
 	# 提取即時行情的價格和數量
-	offset = 29
-	prices = []
-	quantities = []
-	# 剩餘的長度小於 9 位，退出迴圈。
-	while offset + 9 <= len(chunk) - len(TERMINAL_CODE):  # 減去TERMINAL_CODE長度
-		price = chunk[offset:offset + 5]  # 長度 5 (PACKED BCD)
-		quantity = chunk[offset + 5:offset + 9]  # 長度 4 (PACKED BCD)
-		prices.append(price)
-		quantities.append(quantity)
-		offset += 9
+	if quotes is not None:
+		prices, quantities, converters = quotes
+	else:
+		converters = None
+		offset = 29
+		prices = []
+		quantities = []
+		# 剩餘的長度小於 9 位，退出迴圈。
+		while offset + 9 <= len(chunk) - len(TERMINAL_CODE):  # 減去TERMINAL_CODE長度
+			price = chunk[offset:offset + 5]  # 長度 5 (PACKED BCD)
+			quantity = chunk[offset + 5:offset + 9]  # 長度 4 (PACKED BCD)
+			prices.append(price)
+			quantities.append(quantity)
+			offset += 9
 
 	# 轉換 BIT MAP 紀錄之資料
 	reveal_flags = convert_reveal_flags(chunk[22:23])  # 位置 23，長度 1 (BIT MAP)
@@ -144,36 +388,57 @@ def process_chunk(chunk: bytes, data: List[Dict[str, Any]]) -> None:
 
 	# 轉換證券代碼
 	stock_code =  decode_ascii(chunk[10:16])     # 位置 11-16，長度 6 (ASCII)
-	total_volume = decode_packed_bcd(chunk[25:29])    # 位置 26-29，長度 4 (PACKED BCD)
+	if numeric:
+		total_volume = decode_packed_bcd_int(chunk[25:29])  # 位置 26-29，長度 4 (PACKED BCD)
+		matching_time = convert_match_time_us(chunk[16:22])  # 位置 17-22，長度 6 (PACKED BCD)
+	else:
+		total_volume = format_number_string(decode_packed_bcd(chunk[25:29]), decimal_digits=0)  # 位置 26-29，長度 4 (PACKED BCD)
+		matching_time = convert_match_time(chunk[16:22])  # 位置 17-22，長度 6 (PACKED BCD，需轉換時間格式)
+
+	if profiler is not None:
+		started = perf_counter()
+
+	instant_quotes = convert_instant_quotes(
+		prices, 
+		quantities, 
+		reveal_flags,
+		limit_flags, 
+		status_flags,
+		stock_code,
+		numeric,
+		converters
+	)
+
+	if profiler is not None:
+		profiler.add('parse.decode.instant_quotes', perf_counter() - started)
 
 	body = {
 		'stock_code': stock_code,
-		'matching_time': convert_match_time(chunk[16:22]),  # 位置 17-22，長度 6 (PACKED BCD，需轉換時間格式)
+		'matching_time': matching_time,
 		'reveal_flags': reveal_flags,  
 		'limit_flags': limit_flags,
 		'status_flags': status_flags,   
-		'total_volume': format_number_string(total_volume, decimal_digits=0),
-		'instant_quotes': convert_instant_quotes(
-			prices, 
-			quantities, 
-			reveal_flags,
-			limit_flags, 
-			status_flags,
-			stock_code
-		)
+		'total_volume': total_volume,
+		'instant_quotes': instant_quotes
 	}
 
+	if profiler is not None:
+		started = perf_counter()
+
 	# 解析檢查碼
 	check_code = calculate_checksum(chunk[1:-len(TERMINAL_CODE)])  # 從第二個 Byte 到倒數 TERMINAL_CODE 之前
 
+	if profiler is not None:
+		profiler.add('parse.decode.checksum', perf_counter() - started)
+
 	# 解析 TERMINAL-CODE
 	terminal_code = decode_hexacode(chunk[-len(TERMINAL_CODE):])  # TERMINAL-CODE 位置
 
 	# 合併資料
-	data.append({
+	return {
 		'esc_code': esc_code,
 		'header': header,
 		'body': body,
 		'check_code': check_code,
 		'terminal_code': terminal_code,
-	})
\ No newline at end of file
+	}
\ No newline at end of file
@@ -0,0 +1,170 @@
+# src/profiling.py
+
+import signal
+from collections import Counter
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+
+class Profiler:
+	"""
+	累計各階段的耗時與記錄數。只有傳入 Profiler 時才會量測，未啟用時解析流程不受影響。
+
+	階段名稱以 "." 表示從屬關係，例如 parse.decode.instant_quotes 的時間包含在 parse.decode 之內。
+	"""
+
+	def __init__(self):
+		self.stages: Dict[str, float] = {}  # 階段名稱對應的累計秒數
+		self.counters: Dict[str, int] = {
+			'frames': 0,  # 切分出的記錄筆數
+			'frame_bytes': 0,  # 切分出的記錄位元組數
+			'skipped': 0,  # 被條件跳過的記錄筆數
+			'processed': 0,  # 輸出的記錄筆數
+			'input_bytes': 0,  # 輸入檔案大小
+		}
+		self.started = perf_counter()
+		self.elapsed: Optional[float] = None
+
+	def add(self, stage: str, seconds: float) -> None:
+		"""
+		累加一個階段的耗時。
+		"""
+		self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+	def stop(self) -> None:
+		"""
+		結束量測，固定總耗時。
+		"""
+		self.elapsed = perf_counter() - self.started
+
+	@property
+	def total_seconds(self) -> float:
+		return self.elapsed if self.elapsed is not None else perf_counter() - self.started
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+		"""
+		total = self.total_seconds
+		return {
+			'elapsed_seconds': total,
+			'records_per_sec': self.counters['processed'] / total if total else 0.0,
+			'mb_per_sec': self.counters['input_bytes'] / total / 1e6 if total else 0.0,
+			'counters': dict(self.counters),
+			'stages': {
+				stage: {'seconds': seconds, 'share': seconds / total if total else 0.0}
+				for stage, seconds in sorted(self.stages.items())
+			},
+		}
+
+	def format_table(self) -> str:
+		"""
+		產生各階段耗時與計數的摘要表格。
+		"""
+		summary = self.to_dict()
+		lines = [f'{"stage":<32} {"seconds":>10} {"share":>8}']
+		for stage, values in summary['stages'].items():
+			# 依層級縮排
+			label = '  ' * stage.count('.') + stage.rsplit('.', 1)[-1]
+			lines.append(f'{label:<32} {values["seconds"]:>10.4f} {values["share"]:>8.1%}')
+		lines.append(f'{"total":<32} {summary["elapsed_seconds"]:>10.4f} {1:>8.1%}')
+		lines.append('')
+		counters = summary['counters']
+		lines.append(f'records: {counters["processed"]} processed, {counters["skipped"]} skipped, {counters["frames"]} frames ({counters["frame_bytes"]} bytes)')
+		lines.append(f'throughput: {summary["records_per_sec"]:,.0f} records/sec, {summary["mb_per_sec"]:.2f} MB/sec')
+		return '\n'.join(lines)
+
+	def to_prometheus(self, prefix: str = 'format6_parser') -> str:
+		"""
+		產生 Prometheus 文字格式的指標。
+		"""
+		summary = self.to_dict()
+		lines = [
+			f'# HELP {prefix}_stage_seconds_total Cumulative time spent in each parsing stage.',
+			f'# TYPE {prefix}_stage_seconds_total counter',
+		]
+		lines.extend(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {values["seconds"]:.6f}' for stage, values in summary['stages'].items())
+		lines.extend([
+			f'# HELP {prefix}_events_total Record and byte counters.',
+			f'# TYPE {prefix}_events_total counter',
+		])
+		lines.extend(f'{prefix}_events_total{{kind="{name}"}} {value}' for name, value in summary['counters'].items())
+		lines.extend([
+			f'# HELP {prefix}_elapsed_seconds Wall-clock time of the run.',
+			f'# TYPE {prefix}_elapsed_seconds gauge',
+			f'{prefix}_elapsed_seconds {summary["elapsed_seconds"]:.6f}',
+			f'# HELP {prefix}_records_per_second Output records per second.',
+			f'# TYPE {prefix}_records_per_second gauge',
+			f'{prefix}_records_per_second {summary["records_per_sec"]:.3f}',
+		])
+		return '\n'.join(lines) + '\n'
+
+
+def profile_items(items: Iterable[Any], profiler: Profiler, stage: str = 'parse', size: Callable[[Any], int] = None) -> Iterator[Any]:
+	"""
+	包裝產生器：將取得下一筆所花的時間累計為 stage，並累計輸出筆數。
+	呼叫端處理的時間（如寫出）可由總耗時減去 stage 求得。
+
+	參數:
+	items (Iterable): 解析結果（記錄或欄位批次）。
+	profiler (Profiler): 累計結果的物件。
+	stage (str): 階段名稱。
+	size (Callable): 計算每項包含幾筆記錄；None 表示每項一筆。
+
+	返回:
+	Iterator: 原本的項目。
+	"""
+	iterator = iter(items)
+	counters = profiler.counters
+	elapsed = 0.0
+	try:
+		while True:
+			started = perf_counter()
+			try:
+				item = next(iterator)
+			finally:
+				elapsed += perf_counter() - started
+			counters['processed'] += size(item) if size is not None else 1
+			yield item
+	except StopIteration:
+		return
+	finally:
+		profiler.add(stage, elapsed)
+
+
+class StackSampler:
+	"""
+	以 SIGPROF 定時取樣主執行緒的呼叫堆疊，輸出可用於 flamegraph 的 collapsed stack 格式。
+	僅支援提供 setitimer 的平台（Linux、macOS）。
+	"""
+
+	def __init__(self, interval: float = 0.005):
+		self.interval = interval  # 取樣間隔（秒，以 CPU 時間計算）
+		self.samples: Counter = Counter()
+		self._previous_handler = None
+
+	def _sample(self, signum, frame) -> None:
+		stack = []
+		while frame is not None:
+			code = frame.f_code
+			stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{code.co_firstlineno})')
+			frame = frame.f_back
+		self.samples[';'.join(reversed(stack))] += 1
+
+	def start(self) -> None:
+		if not hasattr(signal, 'setitimer'):
+			raise RuntimeError('Stack sampling requires signal.setitimer')
+		self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+		signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+	def stop(self) -> None:
+		signal.setitimer(signal.ITIMER_PROF, 0, 0)
+		signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+	def write(self, output_file: str) -> None:
+		"""
+		寫出 collapsed stack（每行為「堆疊 次數」）。
+		"""
+		with open(output_file, 'w', encoding='utf-8') as stacks:
+			for stack, count in self.samples.most_common():
+				stacks.write(f'{stack} {count}\n')
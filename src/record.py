@@ -0,0 +1,202 @@
+# src/record.py
+
+from typing import Any, Dict, List, Optional
+from constants import TERMINAL_CODE, QUOTE_OFFSET, QUOTE_LENGTH
+from utils.decoder import decode_ascii, decode_packed_bcd, decode_hexacode
+from utils.format_converter import format_number_string, convert_match_time, convert_reveal_flags, convert_limit_flags, convert_status_flags, convert_instant_quotes, calculate_checksum
+
+# decode_record 要求的最小記錄長度：BODY 固定欄位（至累計成交數量）完整
+MIN_RECORD_LENGTH = QUOTE_OFFSET
+
+
+class Record:
+	"""
+	延遲解碼的記錄：只保存原始記錄的 memoryview（不複製），
+	各欄位在第一次存取時才解碼並快取，只讀取少數欄位時可省去大部分的解碼與配置。
+	to_dict() 產生的結果與 decode_record 相同。
+
+	記錄來自 mmap 時，會在記錄存在期間保留該映射。
+	"""
+
+	__slots__ = (
+		'_raw',
+		'_header',
+		'_transmission_number',
+		'_stock_code',
+		'_matching_time',
+		'_reveal_flags',
+		'_limit_flags',
+		'_status_flags',
+		'_total_volume',
+		'_instant_quotes',
+		'_trade',
+	)
+
+	def __init__(self, raw: bytes):
+		self._raw = raw if isinstance(raw, memoryview) else memoryview(raw)
+
+	def __reduce__(self):
+		# 跨行程傳遞時只傳送原始位元組，已解碼的欄位在接收端重新解碼
+		return Record, (bytes(self._raw),)
+
+	def __repr__(self) -> str:
+		return f'Record(stock_code={self.stock_code!r}, transmission_number={self.transmission_number!r}, matching_time={self.matching_time!r})'
+
+	@property
+	def raw(self) -> memoryview:
+		"""
+		原始記錄（含 ESC-CODE 至 TERMINAL-CODE）。
+		"""
+		return self._raw
+
+	@property
+	def esc_code(self) -> str:
+		return decode_ascii(self._raw[0:1])  # 位置 1，長度 1
+
+	@property
+	def transmission_number(self) -> str:
+		try:
+			return self._transmission_number
+		except AttributeError:
+			self._transmission_number = decode_packed_bcd(self._raw[6:10])  # 位置 7-10，長度 4 (PACKED BCD)
+			return self._transmission_number
+
+	@property
+	def header(self) -> Dict[str, str]:
+		try:
+			return self._header
+		except AttributeError:
+			raw = self._raw
+			self._header = {
+				'message_length': decode_packed_bcd(raw[1:3]),  # 位置 2-3，長度 2 (PACKED BCD)
+				'business_code': decode_packed_bcd(raw[3:4]),   # 位置 4，長度 1 (PACKED BCD)
+				'format_code': decode_packed_bcd(raw[4:5]),     # 位置 5，長度 1 (PACKED BCD)
+				'format_version': decode_packed_bcd(raw[5:6]),  # 位置 6，長度 1 (PACKED BCD)
+				'transmission_number': self.transmission_number,
+			}
+			return self._header
+
+	@property
+	def stock_code(self) -> str:
+		try:
+			return self._stock_code
+		except AttributeError:
+			self._stock_code = decode_ascii(self._raw[10:16])  # 位置 11-16，長度 6 (ASCII)
+			return self._stock_code
+
+	@property
+	def matching_time(self) -> str:
+		try:
+			return self._matching_time
+		except AttributeError:
+			self._matching_time = convert_match_time(self._raw[16:22])  # 位置 17-22，長度 6 (PACKED BCD)
+			return self._matching_time
+
+	@property
+	def reveal_flags(self) -> Dict[str, Any]:
+		try:
+			return self._reveal_flags
+		except AttributeError:
+			self._reveal_flags = convert_reveal_flags(self._raw[22:23])  # 位置 23，長度 1 (BIT MAP)
+			return self._reveal_flags
+
+	@property
+	def limit_flags(self) -> Dict[str, Any]:
+		try:
+			return self._limit_flags
+		except AttributeError:
+			self._limit_flags = convert_limit_flags(self._raw[23:24])  # 位置 24，長度 1 (BIT MAP)
+			return self._limit_flags
+
+	@property
+	def status_flags(self) -> Dict[str, Any]:
+		try:
+			return self._status_flags
+		except AttributeError:
+			self._status_flags = convert_status_flags(self._raw[24:25])  # 位置 25，長度 1 (BIT MAP)
+			return self._status_flags
+
+	@property
+	def total_volume(self) -> str:
+		try:
+			return self._total_volume
+		except AttributeError:
+			self._total_volume = format_number_string(decode_packed_bcd(self._raw[25:29]), decimal_digits=0)  # 位置 26-29，長度 4 (PACKED BCD)
+			return self._total_volume
+
+	@property
+	def instant_quotes(self) -> Dict[str, Any]:
+		try:
+			return self._instant_quotes
+		except AttributeError:
+			raw = self._raw
+			prices: List[bytes] = []
+			quantities: List[bytes] = []
+			end = len(raw) - len(TERMINAL_CODE)
+			for offset in range(QUOTE_OFFSET, end - QUOTE_LENGTH + 1, QUOTE_LENGTH):
+				prices.append(raw[offset:offset + 5])  # 長度 5 (PACKED BCD)
+				quantities.append(raw[offset + 5:offset + 9])  # 長度 4 (PACKED BCD)
+
+			self._instant_quotes = convert_instant_quotes(prices, quantities, self.reveal_flags, self.limit_flags, self.status_flags, self.stock_code)
+			return self._instant_quotes
+
+	@property
+	def trade(self) -> Optional[Dict[str, str]]:
+		"""
+		成交價量；沒有揭示成交價量（或為試算揭示）時為 None。
+		只解碼第一組價量，不需解碼整個 instant_quotes。
+		"""
+		try:
+			return self._trade
+		except AttributeError:
+			pass
+
+		try:
+			self._trade = self._instant_quotes['成交價量']
+		except AttributeError:
+			if self.status_flags['試算狀態註記'] == '試算揭示' or not self.reveal_flags['成交價成交量']:
+				self._trade = None
+			else:
+				raw = self._raw
+				self._trade = {
+					'price': format_number_string(decode_packed_bcd(raw[QUOTE_OFFSET:QUOTE_OFFSET + 5]), integer_digits=5, decimal_digits=4),
+					# 暫緩撮合時成交量以 0 揭示
+					'quantity': format_number_string(decode_packed_bcd(raw[QUOTE_OFFSET + 5:QUOTE_OFFSET + 9]), decimal_digits=0) if self.limit_flags['瞬間價格趨勢'] == '一般揭示' else '0',
+				}
+		return self._trade
+
+	@property
+	def body(self) -> Dict[str, Any]:
+		return {
+			'stock_code': self.stock_code,
+			'matching_time': self.matching_time,
+			'reveal_flags': self.reveal_flags,
+			'limit_flags': self.limit_flags,
+			'status_flags': self.status_flags,
+			'total_volume': self.total_volume,
+			'instant_quotes': self.instant_quotes,
+		}
+
+	@property
+	def check_code(self) -> int:
+		return calculate_checksum(self._raw[1:-len(TERMINAL_CODE)])  # 從第二個 Byte 到倒數 TERMINAL_CODE 之前
+
+	@property
+	def terminal_code(self) -> str:
+		return decode_hexacode(self._raw[-len(TERMINAL_CODE):])  # TERMINAL-CODE 位置
+
+	def to_dict(self, numeric: bool = False) -> Dict[str, Any]:
+		"""
+		解碼所有欄位，產生與 decode_record 相同的 dict；numeric 為 True 時與 decode_record(numeric=True) 相同。
+		"""
+		if numeric:
+			from parser import decode_record
+			return decode_record(self._raw, numeric=True)
+
+		return {
+			'esc_code': self.esc_code,
+			'header': self.header,
+			'body': self.body,
+			'check_code': self.check_code,
+			'terminal_code': self.terminal_code,
+		}
@@ -0,0 +1,393 @@
+# src/ring.py
+
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterator, List, Optional
+import numpy as np
+from columnar import Columns, iter_columnar_batches
+from constants import MAX_QUOTE_SLOTS
+
+# 預設的環形緩衝區容量（記錄筆數）
+DEFAULT_CAPACITY = 1 << 20
+
+# 預設可登記的證券代碼數量
+DEFAULT_MAX_SYMBOLS = 1 << 16
+
+# 發布端每批寫入、讀取端每次最多讀取的記錄筆數
+DEFAULT_PUBLISH_BATCH = 1000
+DEFAULT_READ_SIZE = 1 << 16
+
+# 共享記憶體開頭的識別碼與格式版本
+RING_MAGIC = 0x36465754  # "TWF6"
+RING_VERSION = 2
+
+# 共享記憶體開頭的控制區；write_sequence 獨佔一條 cache line
+HEADER_DTYPE = np.dtype({
+	'names': ['magic', 'version', 'closed', 'capacity', 'max_symbols', 'symbol_count', 'write_sequence'],
+	'formats': ['<u4', '<u2', 'u1', '<u8', '<u4', '<u4', '<u8'],
+	'offsets': [0, 4, 6, 8, 16, 20, 64],
+	'itemsize': 128,
+})
+
+# 固定長度的記錄：價格為 0.0001 元為單位的整數，撮合時間為午夜起算的微秒數，證券代碼以代碼表的編號表示
+RECORD_DTYPE = np.dtype([
+	('sequence', '<u8'),  # 寫入完成後才填入的序號（從 1 起算）；0 表示寫入中
+	('publish_time', '<i8'),  # 發布時的 time.monotonic_ns()，用於量測延遲
+	('offset', '<i8'),  # 記錄在原始檔案中的位置
+	('matching_time', '<i8'),
+	('transmission_number', '<u4'),
+	('symbol_id', '<u4'),
+	('total_volume', '<u4'),
+	('reveal_flags', 'u1'),
+	('limit_flags', 'u1'),
+	('status_flags', 'u1'),
+	('slot_count', 'i1'),
+	('quote_bcd_error', '?'),
+	('reserved', 'V7'),  # 補齊至 8 位元組邊界
+	('price', '<i4', (MAX_QUOTE_SLOTS,)),
+	('quantity', '<u4', (MAX_QUOTE_SLOTS,)),
+])
+
+# 證券代碼表的每一項
+SYMBOL_DTYPE = np.dtype('S6')
+
+# 與 columnar 欄位陣列相同型態的欄位
+COLUMN_FIELDS = ('offset', 'transmission_number', 'matching_time', 'reveal_flags', 'limit_flags', 'status_flags', 'total_volume', 'slot_count', 'price', 'quantity', 'quote_bcd_error')
+
+
+def _layout(capacity: int, max_symbols: int):
+	# 控制區、代碼表與記錄區的位置；記錄區對齊 cache line
+	symbols_offset = HEADER_DTYPE.itemsize
+	records_offset = -(-(symbols_offset + max_symbols * SYMBOL_DTYPE.itemsize) // 64) * 64
+	return symbols_offset, records_offset, records_offset + capacity * RECORD_DTYPE.itemsize
+
+
+def _ranges(position: int, count: int, capacity: int):
+	# 序號 position + 1 起的 count 筆記錄在環形緩衝區中的連續區段：(槽位起點, 批次起點, 筆數)
+	start = position % capacity
+	first = min(count, capacity - start)
+	yield start, 0, first
+	if count > first:
+		yield 0, first, count - first
+
+
+class _SharedRing:
+	"""
+	發布端與讀取端共用的共享記憶體視圖。
+	"""
+
+	def __init__(self, shm: shared_memory.SharedMemory, capacity: int, max_symbols: int):
+		symbols_offset, records_offset, _ = _layout(capacity, max_symbols)
+		self.shm = shm
+		self.capacity = capacity
+		self.max_symbols = max_symbols
+		self._header = np.ndarray((), HEADER_DTYPE, buffer=shm.buf)
+		self._symbols = np.ndarray((max_symbols,), SYMBOL_DTYPE, buffer=shm.buf, offset=symbols_offset)
+		self._slots = np.ndarray((capacity,), RECORD_DTYPE, buffer=shm.buf, offset=records_offset)
+
+	@property
+	def name(self) -> str:
+		return self.shm.name
+
+	@property
+	def write_sequence(self) -> int:
+		"""
+		已發布的記錄筆數（最後一筆的序號）。
+		"""
+		return int(self._header['write_sequence'])
+
+	@property
+	def symbol_count(self) -> int:
+		"""
+		已登記的證券代碼數量。
+		"""
+		return int(self._header['symbol_count'])
+
+	@property
+	def closed(self) -> bool:
+		"""
+		發布端是否已結束。
+		"""
+		return bool(self._header['closed'])
+
+	def _release(self) -> None:
+		# 共享記憶體仍有 NumPy 視圖時無法關閉
+		self._header = self._symbols = self._slots = None
+		self.shm.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+class RingPublisher(_SharedRing):
+	"""
+	將解碼後的記錄寫入 multiprocessing.shared_memory 的環形緩衝區，供同一主機上任意數量的讀取行程使用。
+
+	- 只有一個發布端；每筆記錄先以序號 0 寫入，內容完成後才填入序號，再更新控制區的 write_sequence。
+	- 讀取端各自記錄讀取進度，不需與發布端或其他讀取端溝通；發布端不會等待讀取端，
+	  落後超過 capacity 筆的讀取端會遺失最舊的記錄（見 RingReader.lost）。
+	- 證券代碼依首次出現的順序登記於代碼表，記錄中只存編號；登記完成後才發布使用該編號的記錄。
+	"""
+
+	def __init__(self, name: Optional[str] = None, capacity: int = DEFAULT_CAPACITY, max_symbols: int = DEFAULT_MAX_SYMBOLS):
+		shm = shared_memory.SharedMemory(name=name, create=True, size=_layout(capacity, max_symbols)[2])
+		super().__init__(shm, capacity, max_symbols)
+		self._header['capacity'] = capacity
+		self._header['max_symbols'] = max_symbols
+		self._header['version'] = RING_VERSION
+		self._header['magic'] = RING_MAGIC
+		self._symbol_ids = {}  # 證券代碼 -> 編號
+		self._sorted_codes = np.empty(0, dtype='U6')
+		self._sorted_ids = np.empty(0, dtype=np.int64)
+		self._sequence = 0
+
+	def _symbol_ids_for(self, stock_code: np.ndarray) -> np.ndarray:
+		# 將證券代碼轉為代碼表編號；以排序後的已登記代碼二分搜尋，只有新代碼需要逐一登記
+		ids = self._lookup(stock_code)
+		missing = ids < 0
+		if missing.any():
+			for code in np.unique(stock_code[missing]).tolist():
+				symbol_id = len(self._symbol_ids)
+				if symbol_id >= self.max_symbols:
+					raise ValueError(f'Ring buffer {self.name} is full of symbols ({self.max_symbols}); increase max_symbols')
+				self._symbols[symbol_id] = code.encode('ascii')
+				self._symbol_ids[code] = symbol_id
+			# 代碼登記完成後才更新 symbol_count，之後才發布使用這些編號的記錄
+			self._header['symbol_count'] = len(self._symbol_ids)
+			codes = sorted(self._symbol_ids)
+			self._sorted_codes = np.array(codes, dtype='U6')
+			self._sorted_ids = np.array([self._symbol_ids[code] for code in codes], dtype=np.int64)
+			ids = self._lookup(stock_code)
+		return ids
+
+	def _lookup(self, stock_code: np.ndarray) -> np.ndarray:
+		# 已登記代碼的編號，未登記者為 -1
+		if len(self._sorted_codes) == 0:
+			return np.full(len(stock_code), -1, dtype=np.int64)
+		position = np.minimum(np.searchsorted(self._sorted_codes, stock_code), len(self._sorted_codes) - 1)
+		return np.where(self._sorted_codes[position] == stock_code, self._sorted_ids[position], -1)
+
+	def publish_columns(self, columns: Columns) -> int:
+		"""
+		發布一批 columnar 格式的記錄。
+
+		參數:
+		columns (dict): columnar.decode_frames 格式的欄位陣列。
+
+		返回:
+		int: 發布後的 write_sequence。
+		"""
+		count = len(columns['matching_time'])
+		if count == 0:
+			return self._sequence
+
+		block = np.zeros(count, dtype=RECORD_DTYPE)
+		for field in COLUMN_FIELDS:
+			block[field] = columns[field]
+		block['symbol_id'] = self._symbol_ids_for(columns['stock_code'])
+		block['publish_time'] = time.monotonic_ns()
+
+		# 一次最多寫入 capacity 筆，避免同一批的記錄互相覆蓋
+		for begin in range(0, count, self.capacity):
+			chunk = block[begin:begin + self.capacity]
+			for slot, index, length in _ranges(self._sequence, len(chunk), self.capacity):
+				self._slots[slot:slot + length] = chunk[index:index + length]
+				self._slots['sequence'][slot:slot + length] = np.arange(self._sequence + index + 1, self._sequence + index + length + 1, dtype=np.uint64)
+			self._sequence += len(chunk)
+			self._header['write_sequence'] = self._sequence
+		return self._sequence
+
+	def close(self, unlink: bool = True) -> None:
+		"""
+		標記發布結束並釋放共享記憶體。已連接的讀取端仍可讀完剩餘的記錄。
+
+		參數:
+		unlink (bool): 是否刪除共享記憶體；刪除後新的讀取端無法連接。
+
+		返回:
+		None
+		"""
+		if self._header is None:
+			return
+		self._header['closed'] = 1
+		self._release()
+		if unlink:
+			self.shm.unlink()
+
+
+class RingReader(_SharedRing):
+	"""
+	讀取 RingPublisher 發布的記錄。每個讀取端各自保存讀取進度，讀取時只複製新記錄，
+	並以記錄的序號確認內容在複製期間未被覆蓋。
+	"""
+
+	def __init__(self, name: str, latest: bool = False):
+		try:
+			shm = shared_memory.SharedMemory(name=name, track=False)
+		except TypeError:
+			# Python 3.13 之前連接端也會登記於 resource_tracker，行程結束時會刪除發布端的共享記憶體；
+			# 事後取消登記又會與同一個 resource_tracker 下的發布端衝突，因此連接時暫停登記
+			register = resource_tracker.register
+			resource_tracker.register = lambda name, rtype: None
+			try:
+				shm = shared_memory.SharedMemory(name=name)
+			finally:
+				resource_tracker.register = register
+
+		header = np.ndarray((), HEADER_DTYPE, buffer=shm.buf)
+		if shm.size < HEADER_DTYPE.itemsize or int(header['magic']) != RING_MAGIC or int(header['version']) != RING_VERSION:
+			del header
+			shm.close()
+			raise ValueError(f'Shared memory {name} is not a Format 6 ring buffer (version {RING_VERSION})')
+		capacity, max_symbols = int(header['capacity']), int(header['max_symbols'])
+		del header
+		super().__init__(shm, capacity, max_symbols)
+
+		self.position = self.write_sequence if latest else max(0, self.write_sequence - capacity)  # 已讀取的最後一筆序號
+		self.lost = 0  # 因落後超過 capacity 筆而遺失的記錄數
+		self._symbol_names = np.empty(0, dtype='U6')
+
+	@property
+	def lag(self) -> int:
+		"""
+		已發布但尚未讀取的記錄筆數；超過 capacity 時下次讀取會遺失記錄。
+		"""
+		return self.write_sequence - self.position
+
+	def read(self, max_records: int = DEFAULT_READ_SIZE) -> np.ndarray:
+		"""
+		讀取下一批記錄（RECORD_DTYPE 結構陣列的複本），沒有新記錄時返回空陣列。
+		落後超過 capacity 筆，或複製期間記錄被覆蓋時，略過已被覆蓋的記錄並累計於 lost。
+
+		參數:
+		max_records (int): 最多讀取的記錄筆數。
+
+		返回:
+		np.ndarray: 依序號排列的記錄。
+		"""
+		write_sequence = self.write_sequence
+		if write_sequence - self.position > self.capacity:
+			self.lost += write_sequence - self.capacity - self.position
+			self.position = write_sequence - self.capacity
+
+		count = min(write_sequence - self.position, max_records)
+		batch = np.empty(count, dtype=RECORD_DTYPE)
+		after = np.empty(count, dtype=np.uint64)
+		ranges = list(_ranges(self.position, count, self.capacity))
+		for slot, index, length in ranges:
+			batch[index:index + length] = self._slots[slot:slot + length]
+		# 複製後再讀一次序號：前後皆與預期相同才表示內容完整
+		for slot, index, length in ranges:
+			after[index:index + length] = self._slots['sequence'][slot:slot + length]
+
+		expected = np.arange(self.position + 1, self.position + count + 1, dtype=np.uint64)
+		overwritten = np.flatnonzero((batch['sequence'] != expected) | (after != expected))
+		self.position += count
+		if len(overwritten):
+			# 發布端依序覆寫，被覆蓋的一定是最舊的記錄
+			skipped = int(overwritten[-1]) + 1
+			self.lost += skipped
+			batch = batch[skipped:]
+		return batch
+
+	def iter_batches(self, max_records: int = DEFAULT_READ_SIZE, poll_interval: float = 0.001, idle_timeout: Optional[float] = None) -> Iterator[np.ndarray]:
+		"""
+		持續讀取新記錄，直到發布端結束且已讀完所有記錄。
+
+		參數:
+		max_records (int): 每批最多讀取的記錄筆數。
+		poll_interval (float): 沒有新記錄時的等待秒數。
+		idle_timeout (float): 超過此秒數沒有新記錄即停止；None 表示等到發布端結束。
+
+		返回:
+		Iterator: 逐批產出 read 的結果。
+		"""
+		idle_since = time.monotonic()
+		while True:
+			closed = self.closed
+			batch = self.read(max_records)
+			if len(batch):
+				idle_since = time.monotonic()
+				yield batch
+			elif closed:
+				return
+			elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+				return
+			else:
+				time.sleep(poll_interval)
+
+	def symbols(self) -> List[str]:
+		"""
+		目前登記的證券代碼，索引即為 symbol_id。
+		"""
+		self._refresh_symbols()
+		return self._symbol_names.tolist()
+
+	def _refresh_symbols(self) -> None:
+		count = self.symbol_count
+		if count > len(self._symbol_names):
+			self._symbol_names = self._symbols[:count].astype('U6')
+
+	def to_columns(self, batch: np.ndarray) -> Columns:
+		"""
+		將 read 的結果轉為 columnar.decode_frames 格式的欄位陣列，可直接交給欄位式寫出或 K 棒彙整。
+
+		參數:
+		batch (np.ndarray): read 讀取的記錄。
+
+		返回:
+		dict: 欄位名稱對應的 NumPy 陣列。
+		"""
+		if len(batch) and int(batch['symbol_id'].max()) >= len(self._symbol_names):
+			self._refresh_symbols()
+		return {
+			'offset': batch['offset'].copy(),
+			'transmission_number': batch['transmission_number'].astype(np.int64),
+			'stock_code': self._symbol_names[batch['symbol_id']],
+			'matching_time': batch['matching_time'].copy(),
+			'reveal_flags': batch['reveal_flags'].copy(),
+			'limit_flags': batch['limit_flags'].copy(),
+			'status_flags': batch['status_flags'].copy(),
+			'total_volume': batch['total_volume'].astype(np.int64),
+			'slot_count': batch['slot_count'].copy(),
+			'price': batch['price'].astype(np.int64),
+			'quantity': batch['quantity'].astype(np.int64),
+			'quote_bcd_error': batch['quote_bcd_error'].copy(),
+		}
+
+	def close(self) -> None:
+		"""
+		中斷與共享記憶體的連接。
+		"""
+		if self._header is not None:
+			self._release()
+
+
+def publish_file(file_path: str, publisher: RingPublisher, batch_size: int = DEFAULT_PUBLISH_BATCH, rate: float = 0, **kwargs) -> int:
+	"""
+	以 columnar 引擎解碼原始數據文件，逐批發布至環形緩衝區。
+
+	參數:
+	file_path (str): 原始數據文件路徑。
+	publisher (RingPublisher): 發布端。
+	batch_size (int): 每批發布的記錄筆數；越小延遲越低。
+	rate (float): 每秒發布的記錄筆數；0 表示不限速。
+	kwargs: 傳給 iter_columnar_batches 的篩選條件（skip_conditions、stock_codes、time_range）。
+
+	返回:
+	int: 發布的記錄筆數。
+	"""
+	started = time.perf_counter()
+	published = 0
+	for columns in iter_columnar_batches(file_path, batch_size=batch_size, **kwargs):
+		publisher.publish_columns(columns)
+		published += len(columns['matching_time'])
+		if rate:
+			# 超前預定進度時暫停，讓平均速率維持在 rate
+			ahead = started + published / rate - time.perf_counter()
+			if ahead > 0:
+				time.sleep(ahead)
+	return published
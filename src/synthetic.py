@@ -0,0 +1,182 @@
+# src/synthetic.py
+
+import random
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from constants import ESC_CODE, TERMINAL_CODE, QUOTE_OFFSET, QUOTE_LENGTH
+from utils.format_converter import calculate_checksum, encode_match_time, convert_match_time_us
+
+# 各種記錄型態出現的機率，預設值參考 data/raw 中的樣本
+DEFAULT_PROFILE: Dict[str, float] = {
+	'trade': 0.2,  # 揭示成交價量
+	'trade_only': 0.012,  # 僅揭示成交價量，不揭示最佳五檔
+	'partial_depth': 0.01,  # 買賣揭示少於五檔
+	'trial': 0.03,  # 試算揭示
+	'limit_up': 0.01,  # 漲停成交
+	'limit_down': 0.005,  # 跌停成交
+	'price_pause': 0.002,  # 暫緩撮合
+	'central_bond': 0.02,  # 中央登錄公債代碼所佔的比例
+}
+
+# 每檔價格的升降單位（0.05 元，以 0.0001 元為單位）
+PRICE_STEP = 500
+
+# 最低價格：最佳五檔買進價仍為正數
+MIN_PRICE = 6 * PRICE_STEP
+
+# 成交量與委託量的取樣範圍
+TRADE_QUANTITIES = range(1, 50)
+BOOK_QUANTITIES = range(1, 500)
+
+# 一般交易時段長度（09:00 至 13:30），用於分配撮合時間
+SESSION_LENGTH_US = int(4.5 * 3600 * 1_000_000)
+
+
+def build_frame(transmission_number: int, stock_code: str, matching_time_us: int, reveal: int, limit: int, status: int, total_volume: int, slots: List[Tuple[int, int]]) -> bytes:
+	"""
+	組出一筆完整的 Format 6 記錄，含正確的 message_length 與檢查碼。
+
+	參數:
+	transmission_number (int): 傳輸序號。
+	stock_code (str): 證券代碼（最多 6 碼）。
+	matching_time_us (int): 午夜起算的撮合時間微秒數。
+	reveal (int): 揭示項目註記。
+	limit (int): 漲跌停註記。
+	status (int): 狀態註記。
+	total_volume (int): 累計成交數量。
+	slots (list): 依序排列的 (價格 tick 數, 數量)。
+
+	返回:
+	bytes: 記錄內容（ESC-CODE 至 TERMINAL-CODE）。
+	"""
+	seconds, microseconds = divmod(matching_time_us, 1_000_000)
+	minutes, seconds = divmod(seconds, 60)
+	hours, minutes = divmod(minutes, 60)
+	length = QUOTE_OFFSET + QUOTE_LENGTH * len(slots) + 1 + len(TERMINAL_CODE)
+
+	# 十進位欄位先串成一個十六進位字串，再一次轉為 PACK BCD
+	body = b''.join((
+		bytes.fromhex(f'{length:04d}010604{transmission_number:08d}'),  # 業務別 01、格式代碼 06、格式版本 04
+		stock_code.encode('ascii').ljust(6),
+		bytes.fromhex(
+			f'{hours:02d}{minutes:02d}{seconds:02d}{microseconds:06d}{reveal:02x}{limit:02x}{status:02x}{total_volume:08d}'
+			+ ''.join(f'{price:010d}{quantity:08d}' for price, quantity in slots)
+		),
+	))
+	return ESC_CODE + body + bytes((calculate_checksum(body),)) + TERMINAL_CODE
+
+
+def make_symbols(count: int, rng: random.Random, central_bond_ratio: float = DEFAULT_PROFILE['central_bond']) -> List[str]:
+	"""
+	產生不重複的證券代碼：以 4 碼股票為主，另含 ETF 與中央登錄公債代碼。
+
+	參數:
+	count (int): 代碼數量。
+	rng (random.Random): 亂數產生器。
+	central_bond_ratio (float): 中央登錄公債（A、C、D 開頭）所佔比例。
+
+	返回:
+	list: 證券代碼。
+	"""
+	symbols = set()
+	bonds = int(count * central_bond_ratio)
+	while len(symbols) < bonds:
+		symbols.add(f'{rng.choice("ACD")}{rng.randrange(100000):05d}')
+	while len(symbols) < count:
+		kind = rng.random()
+		if kind < 0.85:
+			symbols.add(f'{rng.randrange(1101, 9999)}')
+		elif kind < 0.95:
+			symbols.add(f'00{rng.randrange(50, 999):03d}')
+		else:
+			symbols.add(f'00{rng.randrange(600, 999)}{rng.choice("LRU")}')
+	return sorted(symbols)
+
+
+def generate_frames(count: int, seed: int = 0, symbols: int = 1800, start_transmission: int = 1, start_time: str = '09:00', profile: Optional[Dict[str, float]] = None) -> Iterator[bytes]:
+	"""
+	產生指定筆數的模擬 Format 6 記錄。傳輸序號連續遞增，撮合時間在交易時段內遞增，
+	各證券的價格以隨機漫步變動；記錄型態依 profile 的機率分佈產生。
+
+	參數:
+	count (int): 記錄筆數。
+	seed (int): 亂數種子，相同種子產生相同內容。
+	symbols (int): 證券代碼數量。
+	start_transmission (int): 第一筆記錄的傳輸序號。
+	start_time (str): 第一筆記錄的撮合時間（HH:MM[:SS[.ffffff]]）。
+	profile (dict): 覆寫 DEFAULT_PROFILE 中的機率。
+
+	返回:
+	Iterator: 逐筆產出記錄內容。
+	"""
+	profile = {**DEFAULT_PROFILE, **(profile or {})}
+	rng = random.Random(seed)
+	codes = make_symbols(symbols, rng, profile['central_bond'])
+	prices = {code: rng.randrange(100, 20000) * PRICE_STEP for code in codes}
+	volumes = dict.fromkeys(codes, 0)
+
+	matching_time = convert_match_time_us(encode_match_time(start_time))
+	mean_step = max(1, SESSION_LENGTH_US // max(count, 1))
+
+	for transmission_number in range(start_transmission, start_transmission + count):
+		code = rng.choice(codes)
+		matching_time += rng.randrange(2 * mean_step)
+		price = prices[code] = max(MIN_PRICE, prices[code] + rng.choice((-PRICE_STEP, 0, 0, PRICE_STEP)))
+
+		trial = rng.random() < profile['trial']
+		trade_only = not trial and rng.random() < profile['trade_only']
+		has_trade = trial or trade_only or rng.random() < profile['trade']
+
+		if trade_only:
+			bid_count = ask_count = 0
+		elif rng.random() < profile['partial_depth']:
+			bid_count, ask_count = rng.randrange(6), rng.randrange(6)
+		else:
+			bid_count = ask_count = 5
+		if code[0] in 'ACD':
+			# 中央登錄公債只揭示一檔
+			bid_count, ask_count = min(bid_count, 1), min(ask_count, 1)
+
+		limit = 0
+		draw = rng.random()
+		if draw < profile['limit_up']:
+			limit = 0b10100000  # 漲停成交、最佳一檔買進漲停
+		elif draw < profile['limit_up'] + profile['limit_down']:
+			limit = 0b01000100  # 跌停成交、最佳一檔賣出跌停
+		if rng.random() < profile['price_pause']:
+			limit |= rng.choice((0b01, 0b10))
+
+		status = 0b10000000 if trial else 0b00010000  # 試算揭示或逐筆撮合
+
+		slots = []
+		if has_trade:
+			quantity = rng.choice(TRADE_QUANTITIES)
+			slots.append((price, quantity))
+			if not trial:
+				volumes[code] += quantity
+		quantities = rng.choices(BOOK_QUANTITIES, k=bid_count + ask_count)
+		slots.extend(zip(range(price - PRICE_STEP, price - (bid_count + 1) * PRICE_STEP, -PRICE_STEP), quantities))
+		slots.extend(zip(range(price + PRICE_STEP, price + (ask_count + 1) * PRICE_STEP, PRICE_STEP), quantities[bid_count:]))
+
+		reveal = (has_trade << 7) | (bid_count << 4) | (ask_count << 1) | trade_only
+		yield build_frame(transmission_number, code, matching_time, reveal, limit, status, volumes[code], slots)
+
+
+def write_feed(file_path: str, count: int, seed: int = 0, **kwargs: Any) -> int:
+	"""
+	將模擬記錄寫成檔案。
+
+	參數:
+	file_path (str): 輸出檔案路徑。
+	count (int): 記錄筆數。
+	seed (int): 亂數種子。
+	kwargs: 傳給 generate_frames 的其他參數。
+
+	返回:
+	int: 寫出的位元組數。
+	"""
+	written = 0
+	with open(file_path, 'wb') as feed:
+		for frame in generate_frames(count, seed, **kwargs):
+			feed.write(frame)
+			written += len(frame)
+	return written
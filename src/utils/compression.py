@@ -0,0 +1,481 @@
+# utils/compression.py
+
+import bz2
+import gzip
+import lzma
+import operator
+import os
+import struct
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from .framer import Buffer, map_file, find_frame_start, scan_frames
+
+# 依檔頭判斷壓縮格式
+MAGIC_NUMBERS = (
+	(b'\x1f\x8b', 'gzip'),
+	(b'\xfd7zXZ\x00', 'xz'),
+	(b'BZh', 'bz2'),
+	(b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+# 壓縮檔的副檔名與對應格式
+SUFFIXES = {'.gz': 'gzip', '.xz': 'xz', '.bz2': 'bz2', '.zst': 'zstd'}
+
+# 串流解壓縮時每次填滿的緩衝區大小
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+# 在緩衝區結尾往回尋找最後一筆完整記錄時檢查的長度（需大於數筆記錄）
+TAIL_SIZE = 1 << 16
+
+# 區塊壓縮檔每個區塊的原始資料大小
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# 平行壓縮與解壓縮區塊的執行緒數（zlib 執行時釋放 GIL）
+DEFAULT_THREADS = min(4, os.cpu_count() or 1)
+
+# 隨機存取時保留的解壓縮區塊數
+MAX_CACHED_BLOCKS = 16
+
+# 保留的區塊表數，超過時移除最久未使用的
+MAX_CACHED_TABLES = 64
+
+# 區塊壓縮檔每個 gzip member 的檔頭：FEXTRA 中的 F6 子欄位記錄 member 長度與原始資料長度
+BLOCK_HEADER = struct.Struct('<4BI2BH2sH2I')
+BLOCK_SUBFIELD = b'F6'
+BLOCK_TRAILER = struct.Struct('<2I')
+
+# 區塊表的欄位：原始資料位置、原始資料長度、member 位置、member 長度
+RAW_OFFSET, RAW_LENGTH, BLOCK_OFFSET, BLOCK_LENGTH = range(4)
+
+# 已讀取的區塊表：檔案絕對路徑 -> ((大小, 修改時間, inode), 區塊表)
+_block_tables: Dict[str, Tuple[Tuple[int, int, int], Optional[np.ndarray]]] = {}
+
+
+def detect_compression(file_path: str) -> Optional[str]:
+	"""
+	依檔頭判斷檔案的壓縮格式。副檔名為壓縮格式但檔頭不符時視為錯誤，避免將損毀的壓縮檔當作原始資料解析。
+
+	參數:
+	file_path (str): 數據文件的路徑。
+
+	返回:
+	str: 'gzip'、'xz'、'bz2' 或 'zstd'；未壓縮（或空檔案）時返回 None。
+	"""
+	with open(file_path, 'rb') as file:
+		head = file.read(6)
+	for magic, compression in MAGIC_NUMBERS:
+		if head.startswith(magic):
+			return compression
+
+	suffix = os.path.splitext(file_path)[1]
+	if head and suffix in SUFFIXES:
+		raise ValueError(f'{file_path} has a {suffix} extension but is not a {SUFFIXES[suffix]} file')
+	return None
+
+
+def open_stream(file_path: str, compression: str) -> BinaryIO:
+	"""
+	開啟解壓縮串流。zstd 需要另外安裝 zstandard 套件。
+
+	參數:
+	file_path (str): 壓縮檔的路徑。
+	compression (str): detect_compression 返回的壓縮格式。
+
+	返回:
+	BinaryIO: 可 read 與 readinto 的解壓縮串流。
+	"""
+	if compression == 'gzip':
+		return gzip.open(file_path, 'rb')
+	if compression == 'xz':
+		return lzma.open(file_path, 'rb')
+	if compression == 'bz2':
+		return bz2.open(file_path, 'rb')
+	if compression == 'zstd':
+		try:
+			import zstandard
+		except ImportError:
+			raise ValueError(f'Reading {file_path} requires the zstandard package (pip install zstandard)') from None
+		return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True, closefd=True)
+	raise ValueError(f'Unsupported compression: {compression}')
+
+
+def read_block_table(file_path: str) -> Optional[np.ndarray]:
+	"""
+	讀取區塊壓縮檔（write_archive 寫出）的區塊表。區塊表由各 member 檔頭中的長度串接而成，
+	只需讀取每個檔頭；結果依檔案大小、修改時間與 inode 保留，檔案未改變時不重新讀取。
+
+	參數:
+	file_path (str): 數據文件的路徑。
+
+	返回:
+	np.ndarray: [N, 4] 的 (原始資料位置, 原始資料長度, member 位置, member 長度)；不是區塊壓縮檔時返回 None。
+	"""
+	path = os.path.abspath(file_path)
+	stat = os.stat(path)
+	key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+	cached = _block_tables.pop(path, None)
+	if cached is not None and cached[0] == key:
+		_block_tables[path] = cached  # 移到最後，表示最近使用
+		return cached[1]
+
+	rows = []
+	raw_offset = 0
+	offset = 0
+	with open(path, 'rb') as file:
+		while offset < stat.st_size:
+			header = os.pread(file.fileno(), BLOCK_HEADER.size, offset)
+			fields = BLOCK_HEADER.unpack(header) if len(header) == BLOCK_HEADER.size else None
+			if fields is None or fields[:4] != (0x1f, 0x8b, 8, 4) or fields[7:10] != (12, BLOCK_SUBFIELD, 8):
+				if not rows:
+					break  # 一般的 gzip 檔
+				raise ValueError(f'Damaged block header in {file_path} at offset {offset}')
+			length, raw_length = fields[10:12]
+			rows.append((raw_offset, raw_length, offset, length))
+			raw_offset += raw_length
+			offset += length
+
+	table = np.array(rows, dtype=np.int64).reshape(-1, 4) if rows else None
+	if table is not None and offset != stat.st_size:
+		raise ValueError(f'Truncated block-compressed file {file_path}')
+
+	_block_tables[path] = (key, table)
+	while len(_block_tables) > MAX_CACHED_TABLES:
+		del _block_tables[next(iter(_block_tables))]
+	return table
+
+
+def is_splittable(file_path: str) -> bool:
+	"""
+	判斷檔案能否切成多個區段平行解析：未壓縮的檔案與區塊壓縮檔。
+	"""
+	return detect_compression(file_path) is None or read_block_table(file_path) is not None
+
+
+def _decompress_block(fd: int, row: Tuple[int, int, int, int]) -> bytes:
+	# 讀取並解壓縮單一區塊（os.pread 不移動檔案位置，可由多個執行緒同時呼叫）
+	data = zlib.decompress(os.pread(fd, row[BLOCK_LENGTH], row[BLOCK_OFFSET]), 16 + zlib.MAX_WBITS)
+	if len(data) != row[RAW_LENGTH]:
+		raise ValueError(f'Block at offset {row[BLOCK_OFFSET]} decompressed to {len(data)} bytes, expected {row[RAW_LENGTH]}')
+	return data
+
+
+@contextmanager
+def _no_executor() -> Iterator[None]:
+	# 單一執行緒時不建立執行器
+	yield None
+
+
+def _iter_ordered(executor: Optional[ThreadPoolExecutor], func, items, window: int) -> Iterator:
+	# 依序產出 func(item) 的結果；有執行器時同時執行最多 window 個
+	if executor is None:
+		for item in items:
+			yield func(item)
+		return
+
+	pending = deque()
+	try:
+		for item in items:
+			pending.append(executor.submit(func, item))
+			if len(pending) >= window:
+				yield pending.popleft().result()
+		while pending:
+			yield pending.popleft().result()
+	finally:
+		for future in pending:
+			future.cancel()
+
+
+def _iter_block_buffers(file_path: str, table: np.ndarray, threads: int) -> Iterator[Tuple[int, bytes, None]]:
+	# 區塊壓縮檔：以執行緒平行解壓縮接下來的區塊，依序產出
+	with open(file_path, 'rb') as file, ThreadPoolExecutor(threads) if threads > 1 else _no_executor() as executor:
+		fd = file.fileno()
+		for row, data in zip(table.tolist(), _iter_ordered(executor, lambda row: _decompress_block(fd, row), table.tolist(), threads * 2)):
+			yield row[RAW_OFFSET], data, None
+
+
+def _complete_end(buffer: Buffer) -> int:
+	# 緩衝區中完整記錄的結尾位置，之後為尚未完整讀入的記錄
+	size = len(buffer)
+	start = find_frame_start(buffer, max(0, size - TAIL_SIZE))
+	if start >= size:
+		# 結尾附近找不到記錄邊界：整段交由呼叫端重新同步
+		return size
+	end = scan_frames(buffer, start)[1]
+	return end if end > 0 else size
+
+
+def _iter_stream_buffers(file_path: str, compression: str, chunk_size: int, reuse: bool) -> Iterator[Tuple[int, Buffer, Optional[int]]]:
+	# 其他壓縮檔：解壓縮填滿緩衝區，產出完整的記錄後將結尾不完整的記錄移到緩衝區開頭
+	buffer = bytearray(chunk_size)
+	filled = 0
+	base = 0
+	with open_stream(file_path, compression) as stream:
+		while True:
+			with memoryview(buffer) as view:
+				while filled < chunk_size:
+					count = stream.readinto(view[filled:])
+					if not count:
+						break
+					filled += count
+
+			if filled < chunk_size:
+				yield base, buffer[:filled], None
+				return
+
+			end = _complete_end(buffer)
+			yield base, buffer, end
+
+			tail = buffer[end:]
+			base += end
+			if not reuse:
+				buffer = bytearray(chunk_size)
+			buffer[:len(tail)] = tail
+			filled = len(tail)
+
+
+def iter_buffers(file_path: str, reuse: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE, threads: int = DEFAULT_THREADS) -> Iterator[Tuple[int, Buffer, Optional[int]]]:
+	"""
+	依序產出數據文件的內容，壓縮檔在讀取時解壓縮，不寫出暫存檔。
+
+	- 未壓縮的檔案：以 mmap 映射，產出一次。
+	- 區塊壓縮檔：以多個執行緒平行解壓縮，每個區塊產出一次。
+	- 其他壓縮檔：解壓縮至固定大小的緩衝區，每次填滿後產出其中完整的記錄。
+
+	每次產出的記錄皆完整，下一次產出的內容緊接在 base + end 之後。
+
+	參數:
+	file_path (str): 數據文件的路徑。
+	reuse (bool): 串流解壓縮時重複使用同一個緩衝區；產出的記錄參照緩衝區（如 lazy 的 Record）時需為 False。
+	chunk_size (int): 串流解壓縮的緩衝區大小。
+	threads (int): 解壓縮區塊壓縮檔的執行緒數。
+
+	返回:
+	Iterator: 產出 (base, buffer, end)：buffer[0] 位於解壓縮後資料的 base 位置，
+		只應處理起始位置小於 end 的記錄；end 為 None 表示到緩衝區結尾。
+	"""
+	compression = detect_compression(file_path)
+	if compression is None:
+		with map_file(file_path) as buffer:
+			yield 0, buffer, None
+		return
+
+	table = read_block_table(file_path) if compression == 'gzip' else None
+	if table is not None:
+		yield from _iter_block_buffers(file_path, table, threads)
+		return
+
+	yield from _iter_stream_buffers(file_path, compression, chunk_size, reuse)
+
+
+class BlockBuffer:
+	"""
+	區塊壓縮檔的隨機存取緩衝區：支援 len、索引與切片（位置為解壓縮後的位置）。
+	只解壓縮用到的區塊，並保留最近使用的 MAX_CACHED_BLOCKS 個區塊。
+	"""
+
+	__slots__ = ('_file', '_rows', '_starts', '_blocks', '_size')
+
+	def __init__(self, file_path: str, table: np.ndarray):
+		self._file = open(file_path, 'rb')
+		self._rows = table.tolist()
+		self._starts = table[:, RAW_OFFSET].tolist()
+		self._blocks: Dict[int, memoryview] = {}
+		self._size = int(table[-1, RAW_OFFSET] + table[-1, RAW_LENGTH]) if len(table) else 0
+
+	def __len__(self) -> int:
+		return self._size
+
+	def _block(self, index: int) -> memoryview:
+		block = self._blocks.pop(index, None)
+		if block is None:
+			block = memoryview(_decompress_block(self._file.fileno(), self._rows[index]))
+			while len(self._blocks) >= MAX_CACHED_BLOCKS:
+				del self._blocks[next(iter(self._blocks))]
+		self._blocks[index] = block  # 移到最後，表示最近使用
+		return block
+
+	def __getitem__(self, key: Union[int, slice]) -> Union[int, memoryview, bytes]:
+		if isinstance(key, slice):
+			start, stop, step = key.indices(self._size)
+			if step != 1:
+				raise ValueError('BlockBuffer only supports contiguous slices')
+			if start >= stop:
+				return b''
+
+			# 記錄不跨區塊時直接返回區塊的 memoryview 切片，不複製
+			index = bisect_right(self._starts, start) - 1
+			block_start = self._starts[index]
+			block = self._block(index)
+			if stop <= block_start + len(block):
+				return block[start - block_start:stop - block_start]
+
+			parts = [block[start - block_start:]]
+			for index in range(index + 1, bisect_left(self._starts, stop)):
+				block = self._block(index)
+				parts.append(block[:stop - self._starts[index]])
+			return b''.join(parts)
+
+		position = operator.index(key)
+		if position < 0:
+			position += self._size
+		if not 0 <= position < self._size:
+			raise IndexError('BlockBuffer index out of range')
+		index = bisect_right(self._starts, position) - 1
+		return self._block(index)[position - self._starts[index]]
+
+	def close(self) -> None:
+		"""
+		關閉檔案並釋放保留的區塊。
+		"""
+		self._blocks.clear()
+		self._file.close()
+
+
+@contextmanager
+def open_buffer(file_path: str) -> Iterator[Union[memoryview, BlockBuffer]]:
+	"""
+	以可隨機存取的緩衝區開啟數據文件，供索引與快取依記錄位置讀取。
+	區塊壓縮檔只解壓縮用到的區塊；其他壓縮檔無法隨機存取，會先解壓縮整個檔案。
+
+	參數:
+	file_path (str): 數據文件的路徑。
+
+	返回:
+	Iterator: 產出支援 len、索引與切片的緩衝區（位置為解壓縮後的位置）。
+	"""
+	compression = detect_compression(file_path)
+	if compression is None:
+		with map_file(file_path) as mapped:
+			view = memoryview(mapped)
+			try:
+				yield view
+			finally:
+				view.release()
+		return
+
+	table = read_block_table(file_path) if compression == 'gzip' else None
+	if table is not None:
+		buffer = BlockBuffer(file_path, table)
+		try:
+			yield buffer
+		finally:
+			buffer.close()
+		return
+
+	with open_stream(file_path, compression) as stream:
+		data = stream.read()
+	yield memoryview(data)
+
+
+@contextmanager
+def open_range(file_path: str, start: int, end: Optional[int]) -> Iterator[Tuple[Buffer, int]]:
+	"""
+	取得包含 [start, end) 的緩衝區，供平行解析的工作行程使用。
+	區塊壓縮檔只解壓縮該範圍內的區塊（start、end 應為區塊邊界）；其他壓縮檔解壓縮整個檔案。
+
+	參數:
+	file_path (str): 數據文件的路徑。
+	start (int): 區段起點（解壓縮後的位置）。
+	end (int): 區段終點；None 表示到檔案結尾。
+
+	返回:
+	Iterator: 產出 (buffer, base)：buffer[0] 位於解壓縮後資料的 base 位置。
+	"""
+	compression = detect_compression(file_path)
+	if compression is None:
+		with map_file(file_path) as buffer:
+			yield buffer, 0
+		return
+
+	table = read_block_table(file_path) if compression == 'gzip' else None
+	if table is None:
+		with open_stream(file_path, compression) as stream:
+			data = stream.read()
+		yield data, 0
+		return
+
+	starts = table[:, RAW_OFFSET].tolist()
+	first = max(bisect_right(starts, start) - 1, 0)
+	last = len(starts) if end is None else bisect_left(starts, end)
+	with open(file_path, 'rb') as file:
+		data = b''.join(_decompress_block(file.fileno(), row) for row in table[first:last].tolist())
+	yield data, starts[first] if starts else 0
+
+
+def plan_block_ranges(table: np.ndarray, range_size: int) -> List[Tuple[int, int]]:
+	"""
+	將區塊壓縮檔的區塊依序合併為約 range_size 大小的區段，區段邊界即區塊邊界（也是記錄邊界）。
+
+	參數:
+	table (np.ndarray): read_block_table 返回的區塊表。
+	range_size (int): 每個區段的大約長度（解壓縮後）。
+
+	返回:
+	list: 依檔案順序排列的 (start, end) 區段，相鄰區段首尾相接。
+	"""
+	boundaries = [0]
+	for offset in table[1:, RAW_OFFSET].tolist():
+		if offset - boundaries[-1] >= range_size:
+			boundaries.append(offset)
+	boundaries.append(int(table[-1, RAW_OFFSET] + table[-1, RAW_LENGTH]) if len(table) else 0)
+	return list(zip(boundaries, boundaries[1:]))
+
+
+def _block_member(data: bytes, level: int) -> bytes:
+	# 將一個區塊壓縮為獨立的 gzip member，FEXTRA 記錄 member 長度與原始資料長度
+	compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+	body = compressor.compress(data) + compressor.flush()
+	length = BLOCK_HEADER.size + len(body) + BLOCK_TRAILER.size
+	header = BLOCK_HEADER.pack(0x1f, 0x8b, 8, 4, 0, 0, 255, 12, BLOCK_SUBFIELD, 8, length, len(data))
+	return b''.join((header, body, BLOCK_TRAILER.pack(zlib.crc32(data), len(data))))
+
+
+def _iter_blocks(file_path: str, block_size: int) -> Iterator[bytes]:
+	# 依序切出約 block_size 大小、以記錄邊界為界的區塊（複製，不參照輸入的緩衝區）
+	for _, buffer, end in iter_buffers(file_path):
+		limit = len(buffer) if end is None else end
+		position = 0
+		while position < limit:
+			cut = limit if limit - position <= block_size else min(find_frame_start(buffer, position + block_size), limit)
+			yield bytes(buffer[position:cut])
+			position = cut
+
+
+def write_archive(input_path: str, output_path: str, block_size: int = DEFAULT_BLOCK_SIZE, level: int = 6, threads: int = DEFAULT_THREADS) -> np.ndarray:
+	"""
+	將數據文件寫成區塊壓縮檔：每個約 block_size 的區塊以記錄邊界切分，壓縮為獨立的 gzip member。
+	寫出的檔案仍是標準的 gzip 檔（可用 gzip -d 解壓縮），另可由檔頭重建區塊表，
+	供平行解析依區塊分段，以及索引與快取只解壓縮用到的區塊。
+
+	參數:
+	input_path (str): 輸入的數據文件（未壓縮或任一支援的壓縮格式）。
+	output_path (str): 輸出的區塊壓縮檔路徑。
+	block_size (int): 每個區塊的大約原始資料大小。
+	level (int): zlib 壓縮等級（1-9）。
+	threads (int): 平行壓縮的執行緒數。
+
+	返回:
+	np.ndarray: 寫出檔案的區塊表（格式同 read_block_table）。
+	"""
+	if not 0 < block_size < 1 << 31:
+		raise ValueError(f'block_size must be between 1 and {(1 << 31) - 1}')
+	if os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+		raise ValueError('The archive must be written to a different file than its input')
+
+	rows = []
+	raw_offset = 0
+	offset = 0
+	with open(output_path, 'wb') as output, ThreadPoolExecutor(threads) if threads > 1 else _no_executor() as executor:
+		for member in _iter_ordered(executor, lambda data: (len(data), _block_member(data, level)), _iter_blocks(input_path, block_size), threads * 2):
+			raw_length, data = member
+			output.write(data)
+			rows.append((raw_offset, raw_length, offset, len(data)))
+			raw_offset += raw_length
+			offset += len(data)
+
+	return np.array(rows, dtype=np.int64).reshape(-1, 4)
@@ -1,16 +1,22 @@
 # utils/decoder.py
 
+# 位元組對應兩位 BCD 數字字串的查表（高位 nibble 在前）
+BCD_DIGITS = tuple(f'{byte >> 4}{byte & 0xF}' for byte in range(256))
+
+# 位元組對應兩位 BCD 數值（0-99）的查表
+BCD_VALUES = tuple((byte >> 4) * 10 + (byte & 0xF) for byte in range(256))
+
 def decode_ascii(data: bytes) -> str:
 	"""
 	將 ASCII 編碼的資料解碼為可讀格式。
 
 	參數:
-	data (bytes): 以 ASCII 編碼的資料。
+	data (bytes): 以 ASCII 編碼的資料（亦接受 memoryview）。
 
 	返回:
 	str: 解碼後的字串（去除最後的空格）。
 	"""
-	return data.decode('ascii').rstrip()
+	return str(data, 'ascii').rstrip()
 
 def decode_packed_bcd(data: bytes) -> str:
 	"""
@@ -22,14 +28,25 @@ def decode_packed_bcd(data: bytes) -> str:
 	返回:
 	str: 解碼後的數字字串。
 	"""
-	result = ''
+	# 每個位元組查表取得兩位數字後一次串接
+	return ''.join(map(BCD_DIGITS.__getitem__, data))
+
+def decode_packed_bcd_int(data: bytes) -> int:
+	"""
+	將 PACK BCD 編碼的資料直接解碼為整數，不經過中間字串。
+
+	參數:
+	data (bytes): 以 PACK BCD 編碼的資料。
+
+	返回:
+	int: 解碼後的整數。
+	"""
+	# 每個位元組查表取得兩位數值，不需拆解 nibble
+	value = 0
 	for byte in data:
-		high_nibble = (byte >> 4) & 0xF
-		low_nibble = byte & 0xF
-		# 將高位和低位轉換為字串
-		result += f'{high_nibble}{low_nibble}'
+		value = value * 100 + BCD_VALUES[byte]
 
-	return result
+	return value
 
 def decode_hexacode(hexacode: bytes) -> str:
 	"""
@@ -1,7 +1,7 @@
 # utils/format_converter.py
 
-from typing import List, Dict, Any
-from .decoder import decode_packed_bcd
+from typing import Any, Callable, Dict, List, Tuple
+from .decoder import BCD_VALUES, decode_packed_bcd, decode_packed_bcd_int
 
 
 def format_number_string(number_str: str, integer_digits: int = None, decimal_digits: int = 0) -> str:
@@ -71,52 +71,113 @@ def convert_match_time(packed_bcd_data: bytes) -> str:
 	return formatted_time
 
 
-def convert_reveal_flags(binary_data: bytes) -> dict:
+def convert_match_time_us(packed_bcd_data: bytes) -> int:
 	"""
-	將揭示項目註記的二進位資料解碼為dict。
+	將 PACK BCD 編碼的撮合時間直接轉換為午夜起算的微秒數，不經過中間字串。
 
 	參數:
-	binary_data (bytes): 以二進位表示的揭示項目註記。
+	packed_bcd_data (bytes): 以 PACK BCD 編碼的撮合時間資料（HHMMSS + 6 位微秒）。
 
 	返回:
-	dict: 解碼後的揭示項目註記。
+	int: 午夜起算的微秒數。
 	"""
+	# 每個位元組查表取得兩位數值：時、分、秒各一個位元組，微秒三個位元組
+	data = packed_bcd_data
+	seconds = (BCD_VALUES[data[0]] * 60 + BCD_VALUES[data[1]]) * 60 + BCD_VALUES[data[2]]
+	return seconds * 1_000_000 + (BCD_VALUES[data[3]] * 100 + BCD_VALUES[data[4]]) * 100 + BCD_VALUES[data[5]]
 
-	# 確保 binary_data 是單位元組的資料
-	if len(binary_data) != 1:
-		raise ValueError("揭示項目註記應為長度為 1 的 bytes。")
 
-	byte = binary_data[0]
-	
+def format_match_time_us(matching_time_us: int) -> str:
+	"""
+	將午夜起算的微秒數轉為與 convert_match_time 相同格式的時間字串。
+
+	參數:
+	matching_time_us (int): 午夜起算的微秒數。
+
+	返回:
+	str: 時間字串，格式為 "HH:MM:SS.mmmuuu"。
+	"""
+	seconds, microseconds = divmod(matching_time_us, 1_000_000)
+	minutes, seconds = divmod(seconds, 60)
+	hours, minutes = divmod(minutes, 60)
+	return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{microseconds:06d}"
+
+
+def encode_match_time(time_str: str) -> bytes:
+	"""
+	將時間字串編碼為 6 位元組的 PACK BCD 撮合時間，用於直接比較原始資料。
+
+	參數:
+	time_str (str): 時間字串，格式為 "HH:MM"、"HH:MM:SS" 或 "HH:MM:SS.ffffff"。
+
+	返回:
+	bytes: PACK BCD 編碼的撮合時間（HHMMSS + 6 位微秒）。
+	"""
+	clock, _, fraction = time_str.partition('.')
+	parts = clock.split(':')
+	if not 2 <= len(parts) <= 3 or len(fraction) > 6:
+		raise ValueError(f"無法解析的時間格式：{time_str}")
+
+	# 不足的秒數與小數位以 0 補齊
+	digits = ''.join(part.zfill(2) for part in parts).ljust(6, '0') + fraction.ljust(6, '0')
+	if len(digits) != 12 or not digits.isdigit():
+		raise ValueError(f"無法解析的時間格式：{time_str}")
+
+	return bytes.fromhex(digits)
+
+
+class FrozenDict(dict):
+	"""
+	不可修改的 dict，用於查表共用的註記解碼結果。
+	繼承 dict，因此可直接比較與 JSON 序列化。
+	"""
+
+	def _readonly(self, *args, **kwargs):
+		raise TypeError("註記解碼結果為共用物件，不可修改。")
+
+	__setitem__ = __delitem__ = __ior__ = _readonly
+	clear = pop = popitem = setdefault = update = _readonly
+
+	def __copy__(self) -> dict:
+		return dict(self)
+
+	def __deepcopy__(self, memo: dict) -> dict:
+		return dict(self)
+
+	def __reduce__(self):
+		return (FrozenDict, (dict(self),))
+
+
+def _build_reveal_flags(byte: int) -> dict:
+	"""
+	依位元邏輯解碼揭示項目註記，用於建立查表。
+
+	參數:
+	byte (int): 揭示項目註記的數值。
+
+	返回:
+	dict: 解碼後的揭示項目註記。
+	"""
 	# 提取每一個 Bit 位
-	reveal_flags = {
+	return {
 		'成交價成交量': bool(byte & 0b10000000),  # Bit 7
 		'買進價買進量': (byte >> 4) & 0b00000111,  # Bit 6-4
 		'賣出價賣出量': (byte >> 1) & 0b00000111,  # Bit 3-1
 		'僅記成交價量': bool(byte & 0b00000001)    # Bit 0
 	}
-	
-	return reveal_flags
 
 
-def convert_limit_flags(byte_data: bytes) -> dict:
+def _build_limit_flags(byte: int) -> dict:
 	"""
-	將漲跌停註記的二進位資料解碼為dict。
-	
+	依位元邏輯解碼漲跌停註記，用於建立查表。
+
 	參數:
-	binary_data (bytes): 以二進位表示的漲跌停註記。
+	byte (int): 漲跌停註記的數值。
 
 	返回:
 	dict: 包含每一項漲跌停註記的描述。
 	"""
 
-	# 確保 binary_data 是單位元組的資料
-	if len(byte_data) != 1:
-		raise ValueError("漲跌停註記應為長度為 1 的 bytes。")
-	
-	# 將 bytes 轉換為整數
-	byte = byte_data[0]
-
 	# 成交漲跌停註記
 	limit_flags = {
 		0b00: '一般成交',
@@ -152,24 +213,18 @@ def convert_limit_flags(byte_data: bytes) -> dict:
 		'瞬間價格趨勢': price_trend
 	}
 
-def convert_status_flags(byte_data: bytes) -> dict:
+
+def _build_status_flags(byte: int) -> dict:
 	"""
-	將狀態註記的二進位資料解碼為 dict。
-	
+	依位元邏輯解碼狀態註記，用於建立查表。
+
 	參數:
-	byte_data (bytes): 以二進位表示的狀態註記。
+	byte (int): 狀態註記的數值。
 
 	返回:
 	dict: 包含每一項狀態註記的描述。
 	"""
 
-	# 確保 byte_data 是單位元組的資料
-	if len(byte_data) != 1:
-		raise ValueError("狀態註記應為長度為 1 的 bytes。")
-	
-	# 將 bytes 轉換為整數
-	byte = byte_data[0]
-
 	# 試算狀態註記
 	trial_status = '試算揭示' if (byte & 0b10000000) else '一般揭示'
 
@@ -202,9 +257,69 @@ def convert_status_flags(byte_data: bytes) -> dict:
 	}
 
 
-def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_flags: dict, limit_flags: dict, status_flags: dict, stock_code: str) -> dict:
+# 三種 BIT MAP 註記所有 256 種數值的預先解碼結果（共用、不可修改）
+REVEAL_FLAGS_TABLE = tuple(FrozenDict(_build_reveal_flags(byte)) for byte in range(256))
+LIMIT_FLAGS_TABLE = tuple(FrozenDict(_build_limit_flags(byte)) for byte in range(256))
+STATUS_FLAGS_TABLE = tuple(FrozenDict(_build_status_flags(byte)) for byte in range(256))
+
+
+def convert_reveal_flags(binary_data: bytes) -> dict:
+	"""
+	將揭示項目註記的二進位資料解碼為dict。
+
+	參數:
+	binary_data (bytes): 以二進位表示的揭示項目註記。
+
+	返回:
+	dict: 解碼後的揭示項目註記（查表取得的共用物件，不可修改）。
+	"""
+
+	# 確保 binary_data 是單位元組的資料
+	if len(binary_data) != 1:
+		raise ValueError("揭示項目註記應為長度為 1 的 bytes。")
+
+	return REVEAL_FLAGS_TABLE[binary_data[0]]
+
+
+def convert_limit_flags(byte_data: bytes) -> dict:
+	"""
+	將漲跌停註記的二進位資料解碼為dict。
+	
+	參數:
+	binary_data (bytes): 以二進位表示的漲跌停註記。
+
+	返回:
+	dict: 包含每一項漲跌停註記的描述（查表取得的共用物件，不可修改）。
+	"""
+
+	# 確保 binary_data 是單位元組的資料
+	if len(byte_data) != 1:
+		raise ValueError("漲跌停註記應為長度為 1 的 bytes。")
+
+	return LIMIT_FLAGS_TABLE[byte_data[0]]
+
+def convert_status_flags(byte_data: bytes) -> dict:
+	"""
+	將狀態註記的二進位資料解碼為 dict。
+	
+	參數:
+	byte_data (bytes): 以二進位表示的狀態註記。
+
+	返回:
+	dict: 包含每一項狀態註記的描述（查表取得的共用物件，不可修改）。
+	"""
+
+	# 確保 byte_data 是單位元組的資料
+	if len(byte_data) != 1:
+		raise ValueError("狀態註記應為長度為 1 的 bytes。")
+
+	return STATUS_FLAGS_TABLE[byte_data[0]]
+
+
+def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_flags: dict, limit_flags: dict, status_flags: dict, stock_code: str, numeric: bool = False, converters: Tuple[Callable[[Any], Any], Callable[[Any], Any], Any] = None) -> dict:
 	"""
 	將即時行情的價格和數量資料轉換為可讀格式。
+	numeric 為 True 時直接由 PACK BCD 轉為整數：價格以 0.0001 元為單位（5 位整數 + 4 位小數），數量為整數。
 
 	參數:
 	prices (list): 價格欄位的資料，每個元素為 bytes。
@@ -213,6 +328,9 @@ def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_
 	limit_flags (dict): 漲跌停註記。
 	status_flags (dict): 狀態註記。
 	stock_code (str): 股票代碼。
+	numeric (bool): 為 True 時價格與數量為整數。
+	converters (tuple): (價格轉換函數, 數量轉換函數, 暫緩撮合時的數量)；提供時取代 PACK BCD 的轉換，
+	prices 與 quantities 可為轉換函數接受的任何值（如快取中已解碼的整數）。
 
 	返回:
 	dict: 包含轉換後的即時行情資料。
@@ -237,10 +355,24 @@ def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_
 		return result
 
 	# 定義格式化函數
+	if converters is not None:
+		convert_price, convert_quantity, zero_quantity = converters
+	elif numeric:
+		convert_price = convert_quantity = decode_packed_bcd_int
+		zero_quantity = 0
+	else:
+		def convert_price(price_bytes: bytes) -> str:
+			return format_number_string(decode_packed_bcd(price_bytes), integer_digits=5, decimal_digits=4)
+
+		def convert_quantity(quantity_bytes: bytes) -> str:
+			return format_number_string(decode_packed_bcd(quantity_bytes), decimal_digits=0)
+
+		zero_quantity = '0'
+
 	def format_values(price_bytes: bytes, quantity_bytes: bytes) -> dict:
 		return {
-			'price': format_number_string(decode_packed_bcd(price_bytes), integer_digits=5, decimal_digits=4),
-			'quantity': format_number_string(decode_packed_bcd(quantity_bytes), decimal_digits=0)
+			'price': convert_price(price_bytes),
+			'quantity': convert_quantity(quantity_bytes)
 		}
 
 	# 判斷 1：是否紀錄成交價量（Bit 7）
@@ -250,8 +382,8 @@ def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_
 			result['成交價量'] = format_values(prices[0], quantities[0])
 		else:  # '暫緩撮合' 或 '市價'
 			result['成交價量'] = {
-				'price': format_number_string(decode_packed_bcd(prices[0]), integer_digits=5, decimal_digits=4),
-				'quantity': '0'  # 成交量以 0 揭示
+				'price': convert_price(prices[0]),
+				'quantity': zero_quantity  # 成交量以 0 揭示
 			}
 		start_index = 1  # 成交價量佔用 index 0，買進價量從 index 1 開始
 	else:
@@ -286,19 +418,32 @@ def convert_instant_quotes(prices: List[bytes], quantities: List[bytes], reveal_
 
 
 
+# 將整數對半折疊時使用的位移量與遮罩（512 位元組起逐次減半至 1 位元組）
+_CHECKSUM_FOLDS = tuple((width * 8, (1 << (width * 8)) - 1) for width in (512, 256, 128, 64, 32, 16, 8, 4, 2, 1))
+
+
 def calculate_checksum(data: bytes) -> int:
 	"""
 	計算數據記錄的 XOR 檢查碼。
 
+	將資料視為一個大整數後反覆對半折疊 XOR，只需約 10 次整數運算，不需逐位元組迴圈。
+
 	參數:
-	data (bytes): 需要計算檢查碼的部分。
+	data (bytes): 需要計算檢查碼的部分（亦接受 memoryview）。
 
 	返回:
 	int: 計算出的 XOR 檢查碼。
 	"""
-	checksum = 0
-	for byte in data:
-		checksum ^= byte
+	checksum = int.from_bytes(data, 'little')
+
+	# 超過 1024 位元組時，先以位元組為單位對半折疊到 1024 位元組以內
+	while checksum >> 8192:
+		bits = (checksum.bit_length() + 15) // 16 * 8
+		checksum = (checksum >> bits) ^ (checksum & ((1 << bits) - 1))
+
+	for bits, mask in _CHECKSUM_FOLDS:
+		if checksum > mask:
+			checksum = (checksum >> bits) ^ (checksum & mask)
 	return checksum
 
 
@@ -0,0 +1,373 @@
+# utils/framer.py
+
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from constants import ESC_CODE, TERMINAL_CODE, MESSAGE_LENGTH_SLICE, MIN_MESSAGE_LENGTH
+from .decoder import decode_packed_bcd, decode_packed_bcd_int
+from .format_converter import calculate_checksum
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+ESC_BYTE = ESC_CODE[0]
+
+# 保留映射時最多保留的檔案數，超過時關閉最久未使用的映射
+MAX_RETAINED_MAPS = 64
+
+# 保留的映射：檔案絕對路徑 -> ((大小, 修改時間, inode), mmap)；None 表示每次使用後即關閉
+_retained_maps: Optional[Dict[str, Tuple[Tuple[int, int, int], mmap.mmap]]] = None
+
+
+def retain_maps(enabled: bool = True) -> None:
+	"""
+	設定 map_file 是否保留映射供之後重複使用（常駐服務使用）。檔案大小、修改時間或 inode 改變時重新映射。
+
+	參數:
+	enabled (bool): 是否保留映射；False 時關閉所有保留的映射。
+
+	返回:
+	None
+	"""
+	global _retained_maps
+	if not enabled and _retained_maps:
+		for _, mapped in _retained_maps.values():
+			_close_map(mapped)
+	_retained_maps = {} if enabled else None
+
+
+def _close_map(mapped: mmap.mmap) -> None:
+	try:
+		mapped.close()
+	except BufferError:
+		# 呼叫端仍持有 memoryview，待其被回收後由 GC 釋放映射
+		pass
+
+
+def _retained_map(file_path: str) -> Buffer:
+	# 取得保留的映射，檔案改變或尚未映射時重新映射
+	path = os.path.abspath(file_path)
+	stat = os.stat(path)
+	key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+	cached = _retained_maps.pop(path, None)
+	if cached is not None and cached[0] == key:
+		_retained_maps[path] = cached  # 移到最後，表示最近使用
+		return cached[1]
+	if cached is not None:
+		_close_map(cached[1])
+	if stat.st_size == 0:
+		return b''
+
+	with open(path, 'rb') as file:
+		mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+	_retained_maps[path] = (key, mapped)
+	while len(_retained_maps) > MAX_RETAINED_MAPS:
+		_close_map(_retained_maps.pop(next(iter(_retained_maps)))[1])
+	return mapped
+
+
+@contextmanager
+def map_file(file_path: str) -> Iterator[Buffer]:
+	"""
+	以唯讀 mmap 映射整個檔案，避免逐塊讀取與重複複製。
+
+	參數:
+	file_path (str): 要映射的檔案路徑。
+
+	返回:
+	Iterator: 產出映射後的緩衝區；空檔案產出 b''。retain_maps 啟用時映射在結束後保留。
+	"""
+	if _retained_maps is not None:
+		yield _retained_map(file_path)
+		return
+
+	with open(file_path, 'rb') as file:
+		try:
+			mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:
+			# 空檔案無法映射
+			yield b''
+			return
+
+		try:
+			yield mapped
+		finally:
+			_close_map(mapped)
+
+
+def read_message_length(buffer: Buffer, offset: int) -> int:
+	"""
+	讀取指定位置記錄 HEADER 中的 message_length。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區。
+	offset (int): 記錄起始位置（ESC-CODE 所在位置）。
+
+	返回:
+	int: 記錄總長度（含 ESC-CODE、檢查碼與 TERMINAL-CODE）。
+	"""
+	return decode_packed_bcd_int(buffer[offset + MESSAGE_LENGTH_SLICE.start:offset + MESSAGE_LENGTH_SLICE.stop])
+
+
+def is_valid_frame(buffer: Buffer, offset: int, length: int) -> bool:
+	"""
+	以 ESC-CODE 與 TERMINAL-CODE 驗證依 message_length 切出的記錄是否完整。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區。
+	offset (int): 記錄起始位置。
+	length (int): 記錄長度。
+
+	返回:
+	bool: 記錄邊界正確時返回 True。
+	"""
+	end = offset + length
+	return (
+		length >= MIN_MESSAGE_LENGTH
+		and end <= len(buffer)
+		and buffer[offset] == ESC_BYTE
+		and buffer[end - len(TERMINAL_CODE):end] == TERMINAL_CODE
+	)
+
+
+def verify_checksum(record: bytes) -> bool:
+	"""
+	比對記錄中的檢查碼與 HEADER 至 BODY 的 XOR 結果。
+	檢查碼位於 TERMINAL-CODE 之前，計算範圍為第 2 個 Byte 到檢查碼之前。
+
+	參數:
+	record (bytes): 單一筆完整記錄（bytes 或 memoryview）。
+
+	返回:
+	bool: 檢查碼正確時返回 True。
+	"""
+	checksum_index = len(record) - len(TERMINAL_CODE) - 1
+	return calculate_checksum(record[1:checksum_index]) == record[checksum_index]
+
+
+class IntegrityReport:
+	"""
+	記錄驗證結果：檢查碼錯誤的記錄與重新同步時略過的位元組。
+	"""
+
+	def __init__(self):
+		self.frames = 0  # 邊界正確的記錄筆數
+		self.valid = 0  # 檢查碼正確的記錄筆數
+		self.bad_checksum = 0  # 檢查碼錯誤的記錄筆數
+		self.resyncs = 0  # 重新同步次數
+		self.skipped_bytes = 0  # 重新同步時略過的位元組數
+		self.bad_offsets: List[int] = []  # 檢查碼錯誤的記錄位置
+		self.bad_transmission_numbers: List[str] = []  # 檢查碼錯誤的記錄傳輸序號
+		self.resync_offsets: List[int] = []  # 開始略過資料的位置
+
+	def add_gap(self, offset: int, size: int) -> None:
+		"""
+		記錄一段無法切分為記錄而被略過的資料。
+		"""
+		if size > 0:
+			self.resyncs += 1
+			self.skipped_bytes += size
+			self.resync_offsets.append(offset)
+
+	def add_bad_frame(self, offset: int, record: bytes) -> None:
+		"""
+		記錄一筆檢查碼錯誤的記錄。
+		"""
+		self.bad_checksum += 1
+		self.bad_offsets.append(offset)
+		self.bad_transmission_numbers.append(decode_packed_bcd(record[6:10]))
+
+	def merge(self, other: 'IntegrityReport', offset: int = 0) -> None:
+		"""
+		合併另一個區段的驗證結果（依檔案順序呼叫）。other 的位置相對於 offset 時（如解壓縮的區塊），合併時加上 offset。
+		"""
+		self.frames += other.frames
+		self.valid += other.valid
+		self.bad_checksum += other.bad_checksum
+		self.resyncs += other.resyncs
+		self.skipped_bytes += other.skipped_bytes
+		self.bad_offsets.extend(position + offset for position in other.bad_offsets)
+		self.bad_transmission_numbers.extend(other.bad_transmission_numbers)
+		self.resync_offsets.extend(position + offset for position in other.resync_offsets)
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+		"""
+		return {
+			'frames': self.frames,
+			'valid': self.valid,
+			'bad_checksum': self.bad_checksum,
+			'resyncs': self.resyncs,
+			'skipped_bytes': self.skipped_bytes,
+			'bad_offsets': self.bad_offsets,
+			'bad_transmission_numbers': self.bad_transmission_numbers,
+			'resync_offsets': self.resync_offsets,
+		}
+
+
+def iter_frame_spans(buffer: Buffer, start: int = 0, end: int = None) -> Iterator[Tuple[int, int]]:
+	"""
+	依 HEADER 的 message_length 逐筆走訪記錄，產出每筆記錄的位置與長度。
+	邊界不正確時，從下一個 ESC-CODE 重新同步。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區（bytes、bytearray 或 mmap）。
+	start (int): 開始走訪的位置，應為記錄起始位置。
+	end (int): 只產出起始位置小於 end 的記錄；None 表示走訪到緩衝區結尾。
+
+	返回:
+	Iterator: 產出 (offset, length)。
+	"""
+	offset = start
+	size = len(buffer)
+	if end is None:
+		end = size
+
+	while offset < end and offset + MIN_MESSAGE_LENGTH <= size:
+		if buffer[offset] == ESC_BYTE:
+			length = read_message_length(buffer, offset)
+			if is_valid_frame(buffer, offset, length):
+				yield offset, length
+				offset += length
+				continue
+
+		# 重新同步：尋找下一個 ESC-CODE
+		offset = buffer.find(ESC_CODE, offset + 1)
+		if offset < 0:
+			break
+
+
+def scan_frames(buffer: Buffer, start: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+	"""
+	切分持續增長的緩衝區（如 socket 或持續寫入的檔案）中已完整到達的記錄。
+	與 iter_frame_spans 不同，結尾不完整的記錄不會被視為損毀，而是等待後續資料。
+
+	參數:
+	buffer (Buffer): 目前已收到的資料。
+	start (int): 開始切分的位置。
+
+	返回:
+	tuple: (完整記錄的 (offset, length) 列表, 尚未處理的資料起始位置)。
+	"""
+	spans = []
+	offset = start
+	size = len(buffer)
+
+	while offset < size:
+		if buffer[offset] != ESC_BYTE:
+			# 重新同步：尋找下一個 ESC-CODE，找不到時捨棄目前所有資料
+			offset = buffer.find(ESC_CODE, offset + 1)
+			if offset < 0:
+				return spans, size
+			continue
+
+		# 長度欄位或記錄本身尚未完整到達
+		if offset + MESSAGE_LENGTH_SLICE.stop > size:
+			break
+		length = read_message_length(buffer, offset)
+		if length >= MIN_MESSAGE_LENGTH and offset + length > size:
+			break
+
+		if is_valid_frame(buffer, offset, length):
+			spans.append((offset, length))
+			offset += length
+		else:
+			offset += 1
+
+	return spans, offset
+
+
+def find_frame_start(buffer: Buffer, offset: int, confirm: int = 3) -> int:
+	"""
+	從指定位置往後尋找記錄起始位置，用於將任意位元組位置對齊到記錄邊界。
+	候選位置之後需連續 confirm 筆記錄的邊界都正確（或剛好到達緩衝區結尾），
+	以避免把價量資料中的 ESC-CODE 誤判為記錄開頭。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區。
+	offset (int): 開始尋找的位置。
+	confirm (int): 需要連續驗證的記錄筆數。
+
+	返回:
+	int: 記錄起始位置；找不到時返回緩衝區長度。
+	"""
+	size = len(buffer)
+	candidate = buffer.find(ESC_CODE, offset)
+
+	while 0 <= candidate < size:
+		position = candidate
+		for _ in range(confirm):
+			if position == size:
+				break
+			length = read_message_length(buffer, position)
+			if not is_valid_frame(buffer, position, length):
+				break
+			position += length
+		else:
+			return candidate
+
+		if position == size:
+			return candidate
+
+		candidate = buffer.find(ESC_CODE, candidate + 1)
+
+	return size
+
+
+def iter_verified_spans(buffer: Buffer, report: IntegrityReport, start: int = 0, end: int = None) -> Iterator[Tuple[int, int]]:
+	"""
+	逐筆走訪記錄並驗證檢查碼，只產出檢查碼正確的記錄，驗證結果累計至 report。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區。
+	report (IntegrityReport): 累計驗證結果的物件。
+	start (int): 開始走訪的位置，應為記錄起始位置。
+	end (int): 只產出起始位置小於 end 的記錄；None 表示走訪到緩衝區結尾。
+
+	返回:
+	Iterator: 產出 (offset, length)。
+	"""
+	end = len(buffer) if end is None else min(end, len(buffer))
+	expected = start
+	view = memoryview(buffer)
+
+	try:
+		for offset, length in iter_frame_spans(buffer, start, end):
+			# 與上一筆記錄結尾之間的資料為重新同步時略過的部分
+			report.add_gap(expected, offset - expected)
+			expected = offset + length
+			report.frames += 1
+
+			record = view[offset:expected]
+			if verify_checksum(record):
+				report.valid += 1
+				yield offset, length
+			else:
+				report.add_bad_frame(offset, record)
+	finally:
+		view.release()
+
+	report.add_gap(expected, end - expected)
+
+
+def iter_frames(buffer: Buffer, start: int = 0, end: int = None, report: IntegrityReport = None) -> Iterator[memoryview]:
+	"""
+	逐筆產出記錄的 memoryview 切片，不複製原始資料。
+
+	參數:
+	buffer (Buffer): 原始資料緩衝區（bytes、bytearray 或 mmap）。
+	start (int): 開始走訪的位置，應為記錄起始位置。
+	end (int): 只產出起始位置小於 end 的記錄；None 表示走訪到緩衝區結尾。
+	report (IntegrityReport): 提供時驗證每筆記錄的檢查碼，略過錯誤記錄並累計驗證結果。
+
+	返回:
+	Iterator: 產出每筆完整記錄的 memoryview。
+	"""
+	view = memoryview(buffer)
+	spans = iter_frame_spans(buffer, start, end) if report is None else iter_verified_spans(buffer, report, start, end)
+	try:
+		for offset, length in spans:
+			yield view[offset:offset + length]
+	finally:
+		view.release()
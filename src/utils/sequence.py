@@ -0,0 +1,191 @@
+# utils/sequence.py
+
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# 報告中保留的重複傳輸序號數量上限
+MAX_DUPLICATE_SAMPLES = 1000
+
+# 位元圖每次擴充的最小位元組數
+BITMAP_GROWTH = 1 << 16
+
+
+class SequenceTracker:
+	"""
+	追蹤傳輸序號的缺漏、重複與亂序。
+
+	已收到的序號以位元圖保存（每個序號 1 bit，只涵蓋收到的最小至最大序號）：判斷重複與記錄收到皆為 O(1)，
+	大量缺漏或亂序也不需搬移資料；8 位數的傳輸序號最多約佔 12.5 MB。
+	亂序以前一筆記錄為準：序號小於前一筆記錄、且先前未收到的記錄。
+	"""
+
+	def __init__(self, drop_duplicates: bool = False, keep_numbers: bool = False):
+		self.drop_duplicates = drop_duplicates  # 是否捨棄重複的記錄
+		self.received = 0  # 收到的記錄筆數（含重複）
+		self.duplicates = 0  # 重複的記錄筆數
+		self.out_of_order = 0  # 小於前一筆記錄序號、但先前未收到的記錄筆數
+		self.duplicate_samples: List[int] = []  # 重複的序號（最多 MAX_DUPLICATE_SAMPLES 個）
+		self.first: Optional[int] = None  # 收到的最小序號
+		self.last: Optional[int] = None  # 收到的最大序號
+		self._seen = bytearray()  # 位元圖：第 i 個位元組的第 j 位元為序號 (base + i) * 8 + j
+		self._base = 0
+		self._previous: Optional[int] = None  # 前一筆記錄的序號
+		self._numbers = array('q') if keep_numbers else None  # 依序收到的序號，供 merge 重新觀察
+
+	def _reserve(self, low: int, high: int) -> None:
+		# 擴充位元圖以涵蓋 low 至 high 的序號
+		seen = self._seen
+		if not seen:
+			self._base = low >> 3
+		if low >> 3 < self._base:
+			grow = min(max(self._base - (low >> 3), len(seen), BITMAP_GROWTH), self._base)
+			seen[0:0] = bytes(grow)
+			self._base -= grow
+		size = (high >> 3) - self._base + 1
+		if size > len(seen):
+			seen.extend(bytes(max(size - len(seen), len(seen), BITMAP_GROWTH)))
+
+	def observe(self, number: int) -> bool:
+		"""
+		記錄收到一個傳輸序號。
+
+		參數:
+		number (int): 傳輸序號。
+
+		返回:
+		bool: 第一次收到時返回 True，重複時返回 False。
+		"""
+		self.received += 1
+		if self._numbers is not None:
+			self._numbers.append(number)
+		previous, self._previous = self._previous, number
+
+		index = (number >> 3) - self._base
+		if index < 0 or index >= len(self._seen):
+			self._reserve(number, number)
+			index = (number >> 3) - self._base
+		bit = 1 << (number & 7)
+
+		if self._seen[index] & bit:
+			self.duplicates += 1
+			if len(self.duplicate_samples) < MAX_DUPLICATE_SAMPLES:
+				self.duplicate_samples.append(number)
+			return False
+
+		self._seen[index] |= bit
+		if previous is not None and number < previous:
+			self.out_of_order += 1
+		if self.first is None or number < self.first:
+			self.first = number
+		if self.last is None or number > self.last:
+			self.last = number
+		return True
+
+	def observe_array(self, numbers: np.ndarray) -> np.ndarray:
+		"""
+		依序記錄一批傳輸序號，結果與逐筆 observe 相同。
+
+		參數:
+		numbers (np.ndarray): 傳輸序號陣列。
+
+		返回:
+		np.ndarray: bool 陣列，第一次收到的序號為 True。
+		"""
+		numbers = np.asarray(numbers, dtype=np.int64)
+		count = len(numbers)
+		if not count:
+			return np.zeros(0, dtype=bool)
+		if self._numbers is not None:
+			self._numbers.frombytes(numbers.tobytes())
+		self.received += count
+
+		self._reserve(int(numbers.min()), int(numbers.max()))
+		seen = np.frombuffer(self._seen, dtype=np.uint8)
+		index = (numbers >> 3) - self._base
+		bits = np.left_shift(1, numbers & 7).astype(np.uint8)
+		first_seen = (seen[index] & bits) == 0
+
+		# 同一批內重複的序號只有第一次出現算收到；嚴格遞增時不需檢查
+		increasing = np.diff(numbers) > 0
+		if not increasing.all():
+			_, first_index = np.unique(numbers, return_index=True)
+			if len(first_index) < count:
+				first_in_batch = np.zeros(count, dtype=bool)
+				first_in_batch[first_index] = True
+				first_seen &= first_in_batch
+		np.bitwise_or.at(seen, index[first_seen], bits[first_seen])
+		del seen  # 釋放對位元圖的參照，之後才能擴充
+
+		# 亂序：小於前一筆記錄的序號（第一筆與上一批最後一筆比較）
+		previous = np.empty(count, dtype=np.int64)
+		previous[0] = numbers[0] if self._previous is None else self._previous
+		previous[1:] = numbers[:-1]
+		self.out_of_order += int(np.count_nonzero(first_seen & (numbers < previous)))
+		self._previous = int(numbers[-1])
+
+		duplicates = count - int(np.count_nonzero(first_seen))
+		if duplicates:
+			self.duplicates += duplicates
+			self.duplicate_samples.extend(numbers[~first_seen][:MAX_DUPLICATE_SAMPLES - len(self.duplicate_samples)].tolist())
+
+		received = numbers[first_seen]
+		if len(received):
+			low, high = int(received.min()), int(received.max())
+			self.first = low if self.first is None else min(self.first, low)
+			self.last = high if self.last is None else max(self.last, high)
+		return first_seen
+
+	def merge(self, other: 'SequenceTracker') -> None:
+		"""
+		依序重新觀察另一個追蹤器收到的每個序號（依檔案順序呼叫），
+		結果與單一追蹤器依序觀察所有記錄相同，不因區段或行程數而改變。other 需以 keep_numbers=True 建立。
+		"""
+		if other._numbers is None:
+			raise ValueError('merge requires a tracker created with keep_numbers=True')
+		if len(other._numbers):
+			self.observe_array(np.frombuffer(other._numbers, dtype=np.int64))
+
+	def gaps(self) -> List[Tuple[int, int]]:
+		"""
+		返回缺漏的傳輸序號範圍 (起, 迄)，兩端皆包含。
+		"""
+		if self.first is None:
+			return []
+
+		# 只展開未全部收到的位元組
+		low = (self.first >> 3) - self._base
+		seen = np.frombuffer(self._seen, dtype=np.uint8)[low:(self.last >> 3) - self._base + 1]
+		partial = np.flatnonzero(seen != 0xFF)
+		rows, columns = np.nonzero(np.unpackbits(seen[partial, None], axis=1, bitorder='little') == 0)
+		missing = (partial[rows] + low + self._base) * 8 + columns
+		missing = missing[(missing > self.first) & (missing < self.last)]
+		if not len(missing):
+			return []
+
+		breaks = np.flatnonzero(np.diff(missing) != 1)
+		starts = np.concatenate((missing[:1], missing[breaks + 1]))
+		ends = np.concatenate((missing[breaks], missing[-1:]))
+		return list(zip(starts.tolist(), ends.tolist()))
+
+	@property
+	def missing(self) -> int:
+		if self.first is None:
+			return 0
+		return self.last - self.first + 1 - (self.received - self.duplicates)
+
+	def to_dict(self) -> Dict[str, Any]:
+		"""
+		轉為可輸出成 JSON 的 dict。
+		"""
+		return {
+			'first': self.first,
+			'last': self.last,
+			'received': self.received,
+			'unique': self.received - self.duplicates,
+			'duplicates': self.duplicates,
+			'out_of_order': self.out_of_order,
+			'missing': self.missing,
+			'gaps': [list(gap) for gap in self.gaps()],
+			'duplicate_samples': self.duplicate_samples,
+		}
@@ -0,0 +1,195 @@
+# src/writers.py
+
+from typing import Any, Callable, Dict, Iterable, Iterator
+import numpy as np
+from encoder import COMPACT_SEPARATORS, iter_json_array, iter_json_lines
+
+# JSON 輸出的寫入緩衝大小
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def write_json(records: Iterable[Dict[str, Any]], output_file: str, compact: bool = False) -> None:
+	"""
+	將記錄寫成單一 JSON 陣列（縮排 4 格），逐段序列化並寫出，不需保留所有記錄。
+	輸出與 json.dump(list(records), ensure_ascii=False, indent=4) 完全相同。
+
+	參數:
+	records (Iterable): 解析後的記錄。
+	output_file (str): 輸出檔案路徑。
+	compact (bool): 為 True 時不換行、不留空白。
+
+	返回:
+	None
+	"""
+	if compact:
+		chunks = iter_json_array(records, indent=None, separators=COMPACT_SEPARATORS)
+	else:
+		chunks = iter_json_array(records, indent=4)
+	with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as json_file:
+		for chunk in chunks:
+			json_file.write(chunk)
+
+
+def write_ndjson(records: Iterable[Dict[str, Any]], output_file: str, append: bool = False, compact: bool = False, line_buffered: bool = False) -> None:
+	"""
+	以 NDJSON 格式串流寫出，每行與 json.dumps(record, ensure_ascii=False) 完全相同。
+
+	參數:
+	records (Iterable): 解析後的記錄。
+	output_file (str): 輸出檔案路徑。
+	append (bool): 為 True 時接在既有檔案之後寫出（如從進度檔繼續解析）。
+	compact (bool): 為 True 時不留空白。
+	line_buffered (bool): 為 True 時每解析一筆記錄即寫出一行，下游可即時讀取（如持續解析）。
+
+	返回:
+	None
+	"""
+	separators = COMPACT_SEPARATORS if compact else None
+	if line_buffered:
+		chunks = iter_json_lines(records, separators, chunk_size=1)
+		buffering = 1
+	else:
+		chunks = iter_json_lines(records, separators)
+		buffering = WRITE_BUFFER_SIZE
+	with open(output_file, 'a' if append else 'w', encoding='utf-8', buffering=buffering) as ndjson_file:
+		for chunk in chunks:
+			ndjson_file.write(chunk)
+
+
+# 欄位式輸出的資料型別：價格以 0.0001 元為單位的整數、時間為午夜起算的微秒數、註記保留原始位元
+COLUMN_DTYPES = {
+	'offset': np.int64,
+	'transmission_number': np.int32,
+	'matching_time': np.int64,
+	'reveal_flags': np.uint8,
+	'limit_flags': np.uint8,
+	'status_flags': np.uint8,
+	'total_volume': np.int32,
+	'slot_count': np.int8,
+	'price': np.int32,
+	'quantity': np.int32,
+}
+
+
+def _to_arrow_table(columns: Dict[str, np.ndarray], symbols: Dict[str, int]):
+	"""
+	將一批欄位陣列轉為 Arrow Table，證券代碼以字典編碼。
+
+	參數:
+	columns (dict): columnar 產出的欄位陣列。
+	symbols (dict): 跨批次共用的證券代碼字典（代碼對應索引），依首次出現順序遞增。
+
+	返回:
+	pyarrow.Table: 轉換後的資料表。
+	"""
+	import pyarrow as pa
+
+	# 只對批次內不重複的代碼查字典，再展開為每筆記錄的索引
+	unique_codes, inverse = np.unique(columns['stock_code'], return_inverse=True)
+	codes = np.array([symbols.setdefault(str(code), len(symbols)) for code in unique_codes], dtype=np.int32)
+	stock_code = pa.DictionaryArray.from_arrays(pa.array(codes[inverse], type=pa.int32()), pa.array(list(symbols), type=pa.string()))
+
+	arrays = {'stock_code': stock_code}
+	for name, dtype in COLUMN_DTYPES.items():
+		column = columns[name].astype(dtype, copy=False)
+		if column.ndim == 2:
+			# 價量矩陣以固定長度 list 儲存
+			arrays[name] = pa.FixedSizeListArray.from_arrays(pa.array(column.ravel()), column.shape[1])
+		else:
+			arrays[name] = pa.array(column)
+
+	return pa.table(arrays)
+
+
+def write_parquet(batches: Iterator[Dict[str, np.ndarray]], output_file: str) -> None:
+	"""
+	將欄位批次逐批寫成 Parquet，每批為一個 row group。
+
+	參數:
+	batches (Iterator): columnar.iter_columnar_batches 產出的欄位批次。
+	output_file (str): 輸出檔案路徑。
+
+	返回:
+	None
+	"""
+	import pyarrow.parquet as pq
+
+	symbols = {}
+	writer = None
+	try:
+		for columns in batches:
+			table = _to_arrow_table(columns, symbols)
+			if writer is None:
+				writer = pq.ParquetWriter(output_file, table.schema, compression='zstd')
+			writer.write_table(table)
+	finally:
+		if writer is not None:
+			writer.close()
+
+
+def write_arrow(batches: Iterator[Dict[str, np.ndarray]], output_file: str) -> None:
+	"""
+	將欄位批次逐批寫成 Arrow IPC 檔案，新出現的證券代碼以字典增量寫出。
+
+	參數:
+	batches (Iterator): columnar.iter_columnar_batches 產出的欄位批次。
+	output_file (str): 輸出檔案路徑。
+
+	返回:
+	None
+	"""
+	import pyarrow as pa
+
+	symbols = {}
+	writer = None
+	options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+	try:
+		for columns in batches:
+			table = _to_arrow_table(columns, symbols)
+			if writer is None:
+				writer = pa.ipc.new_file(output_file, table.schema, options=options)
+			writer.write_table(table)
+	finally:
+		if writer is not None:
+			writer.close()
+
+
+def write_npz(batches: Iterator[Dict[str, np.ndarray]], output_file: str) -> None:
+	"""
+	將欄位批次合併後寫成壓縮的 .npz。npz 無法附加寫入，因此會先合併所有批次。
+
+	參數:
+	batches (Iterator): columnar.iter_columnar_batches 產出的欄位批次。
+	output_file (str): 輸出檔案路徑。
+
+	返回:
+	None
+	"""
+	batches = list(batches)
+	arrays = {}
+	for name, dtype in COLUMN_DTYPES.items():
+		arrays[name] = np.concatenate([batch[name].astype(dtype, copy=False) for batch in batches]) if batches else np.zeros(0, dtype=dtype)
+
+	# 證券代碼以字典編碼：symbols 為代碼表，stock_code 為索引
+	stock_code = np.concatenate([batch['stock_code'] for batch in batches]) if batches else np.zeros(0, dtype='U6')
+	symbols, inverse = np.unique(stock_code, return_inverse=True)
+	arrays['symbols'] = symbols
+	arrays['stock_code'] = inverse.astype(np.int32)
+
+	# 以開啟的檔案寫出，避免 numpy 自動補上 .npz 副檔名
+	with open(output_file, 'wb') as npz_file:
+		np.savez_compressed(npz_file, **arrays)
+
+
+# 輸出格式名稱與對應的寫出函數
+WRITERS: Dict[str, Callable[[Iterable[Dict[str, Any]], str], None]] = {
+	'json': write_json,
+	'ndjson': write_ndjson,
+}
+
+# 欄位式輸出格式：輸入為 columnar 的欄位批次
+COLUMNAR_WRITERS: Dict[str, Callable[[Iterator[Dict[str, np.ndarray]], str], None]] = {
+	'parquet': write_parquet,
+	'arrow': write_arrow,
+	'npz': write_npz,
+}
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# src 下的模組以 src 為根目錄互相匯入（如 from constants import ...）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,13 @@
+# tests/helpers.py
+
+# 多個測試共用的記錄組裝函數
+
+
+def build_record(body: bytes, transmission_number: int = 1) -> bytes:
+	# 依 body 長度組出 message_length 與檢查碼正確的記錄
+	length = 10 + len(body) + 3
+	header = bytes.fromhex(f'1B{length:04d}010604{transmission_number:08d}')
+	checksum = 0
+	for byte in header[1:] + body:
+		checksum ^= byte
+	return header + body + bytes([checksum]) + b'\x0D\x0A'
@@ -0,0 +1,111 @@
+# tests/test_bars.py
+
+import os
+import random
+import tempfile
+import unittest
+from bars import BarAggregator, iter_bars, iter_bars_columnar, parse_interval
+from columnar import iter_columnar_batches
+from parser import decode_record, parse_file
+from synthetic import build_frame, generate_frames, write_feed
+
+MINUTE = 60_000_000
+NINE = 9 * 3600 * 1_000_000
+
+
+def trade(transmission_number: int, stock_code: str, matching_time: int, price: int, quantity: int, limit: int = 0, status: int = 0) -> dict:
+	# 只揭示成交價量的記錄
+	return decode_record(build_frame(transmission_number, stock_code, matching_time, 0b10000001, limit, status, 0, [(price, quantity)]))
+
+
+class TestBars(unittest.TestCase):
+
+	def test_parse_interval(self):
+		# 測試週期字串的單位換算
+		self.assertEqual(parse_interval('1s'), 1_000_000)
+		self.assertEqual(parse_interval('5m'), 5 * MINUTE)
+		self.assertEqual(parse_interval('250ms'), 250_000)
+		with self.assertRaises(ValueError):
+			parse_interval('0m')
+		with self.assertRaises(ValueError):
+			parse_interval('1d')
+
+	def test_ohlcv_and_vwap(self):
+		# 測試開高低收、成交量、加權平均價，以及週期與代碼的排序
+		records = [
+			trade(1, '2330', NINE + 1, 5000000, 10),
+			trade(2, '1101', NINE + 2, 400000, 5),
+			trade(3, '2330', NINE + 3, 5010000, 30),
+			trade(4, '2330', NINE + 4, 4990000, 10),
+			trade(5, '2330', NINE + MINUTE, 5020000, 1),
+		]
+		bars = [bar.to_dict(numeric=True) for bar in iter_bars(records, MINUTE)]
+		self.assertEqual([(bar['stock_code'], bar['start']) for bar in bars], [('1101', NINE), ('2330', NINE), ('2330', NINE + MINUTE)])
+		self.assertEqual(bars[1], {
+			'stock_code': '2330', 'start': NINE, 'open': 5000000, 'high': 5010000, 'low': 4990000, 'close': 4990000,
+			'volume': 50, 'vwap': 5004000, 'trades': 3,
+		})
+		self.assertEqual(next(iter_bars(records, MINUTE)).to_dict(), {
+			'stock_code': '1101', 'start': '09:00:00.000000', 'open': '40', 'high': '40', 'low': '40', 'close': '40',
+			'volume': '5', 'vwap': '40', 'trades': 1,
+		})
+
+	def test_trial_and_halted_records_excluded(self):
+		# 測試試算揭示與暫緩撮合（成交量以 0 揭示）的記錄不計入
+		records = [
+			trade(1, '2330', NINE + 1, 5000000, 10),
+			trade(2, '2330', NINE + 2, 6000000, 99, status=0b10000000),
+			trade(3, '2330', NINE + 3, 4000000, 99, limit=0b01),
+			trade(4, '2330', NINE + 4, 5100000, 20),
+		]
+		bars = [bar.to_dict(numeric=True) for bar in iter_bars(records, MINUTE)]
+		self.assertEqual(len(bars), 1)
+		self.assertEqual((bars[0]['high'], bars[0]['low'], bars[0]['volume'], bars[0]['trades']), (5100000, 5000000, 30, 2))
+
+	def test_late_records(self):
+		# 測試 lateness 內的亂序記錄仍計入，超過後的記錄計入 late
+		aggregator = BarAggregator(MINUTE, lateness=1_000_000)
+		self.assertEqual(aggregator.add_record(trade(1, '2330', NINE + 1, 5000000, 1)), [])
+		self.assertEqual(aggregator.add_record(trade(2, '2330', NINE + MINUTE + 500_000, 5000000, 1)), [])
+		self.assertEqual(aggregator.add_record(trade(3, '2330', NINE + 2, 5000000, 1)), [])
+		closed = aggregator.add_record(trade(4, '2330', NINE + MINUTE + 1_000_000, 5000000, 1))
+		self.assertEqual([(bar.start, bar.trades) for bar in closed], [(NINE, 2)])
+		aggregator.add_record(trade(5, '2330', NINE + 3, 5000000, 1))
+		self.assertEqual(aggregator.late, 1)
+		self.assertEqual([(bar.start, bar.trades) for bar in aggregator.flush()], [(NINE + MINUTE, 2)])
+
+	def test_columnar_matches_records(self):
+		# 測試 columnar 批次彙整的結果與逐筆彙整相同
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = os.path.join(directory, 'feed.new')
+			write_feed(file_path, 5000, seed=5)
+			expected = [bar.to_dict(numeric=True) for bar in iter_bars(parse_file(file_path), parse_interval('1s'))]
+			bars = iter_bars_columnar(iter_columnar_batches(file_path, batch_size=700), parse_interval('1s'))
+			self.assertEqual([bar.to_dict(numeric=True) for bar in bars], expected)
+			self.assertGreater(len(expected), 100)
+
+
+	def test_columnar_matches_records_out_of_order(self):
+		# 測試亂序記錄的晚到判斷與逐筆彙整相同，且不因批次大小改變
+		rng = random.Random(3)
+		frames = list(generate_frames(6000, seed=9))
+		for index in range(0, len(frames), 3):
+			other = min(index + rng.randrange(1, 400), len(frames) - 1)
+			frames[index], frames[other] = frames[other], frames[index]
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = os.path.join(directory, 'feed.new')
+			with open(file_path, 'wb') as feed:
+				feed.write(b''.join(frames))
+			for interval, lateness in ((parse_interval('1s'), 100_000), (parse_interval('250ms'), 0)):
+				expected_aggregator = BarAggregator(interval, lateness)
+				expected = [bar.to_dict(numeric=True) for bar in iter_bars(parse_file(file_path), interval, aggregator=expected_aggregator)]
+				self.assertGreater(expected_aggregator.late, 100)
+				for batch_size in (1, 7, 250, 6000):
+					aggregator = BarAggregator(interval, lateness)
+					bars = iter_bars_columnar(iter_columnar_batches(file_path, batch_size=batch_size), interval, aggregator=aggregator)
+					self.assertEqual([bar.to_dict(numeric=True) for bar in bars], expected, msg=batch_size)
+					self.assertEqual(aggregator.late, expected_aggregator.late, msg=batch_size)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+# tests/test_batch.py
+
+import json
+import os
+import tempfile
+import unittest
+from itertools import islice
+from unittest import mock
+import batch
+from batch import convert_files, expand_inputs, iter_merged_records, merge_key
+from parser import iter_records, parse_file
+from synthetic import write_feed
+from utils.sequence import SequenceTracker
+
+
+class TestBatch(unittest.TestCase):
+
+	def setUp(self):
+		# 兩個時間相接的分段檔案，與一個時間重疊的檔案
+		self.directory = tempfile.TemporaryDirectory()
+		self.root = self.directory.name
+		self.segments = [
+			os.path.join(self.root, 'f6_00000001_00000500_TP03.new'),
+			os.path.join(self.root, 'f6_00000501_00001000_TP03.new'),
+			os.path.join(self.root, 'f6_00001001_00001500_TP03.new'),
+		]
+		write_feed(self.segments[0], 500, seed=1, start_transmission=1, start_time='09:00')
+		write_feed(self.segments[1], 500, seed=2, start_transmission=501, start_time='11:30')
+		write_feed(self.segments[2], 500, seed=3, start_transmission=1001, start_time='10:00')
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def expected(self):
+		records = [record for file_path in self.segments for record in parse_file(file_path)]
+		return sorted(records, key=merge_key)
+
+	def test_expand_inputs(self):
+		# 測試目錄、萬用字元與單一檔案的展開結果
+		self.assertEqual(expand_inputs('.', self.root), self.segments)
+		self.assertEqual(expand_inputs('f6_000005*', self.root), self.segments[1:2])
+		self.assertEqual(expand_inputs('f6_00000001_00000500_TP03.new', self.root), self.segments[:1])
+
+	def test_merged_records_in_time_order(self):
+		# 測試合併結果依撮合時間排列，且與全部載入後排序的結果相同
+		self.assertEqual(list(iter_merged_records(self.segments)), self.expected())
+
+	def test_merged_records_parallel(self):
+		# 測試以行程池解析時合併結果相同，且序號追蹤涵蓋所有檔案
+		sequence = SequenceTracker()
+		self.assertEqual(list(iter_merged_records(self.segments, workers=2, sequence=sequence)), self.expected())
+		self.assertEqual((sequence.received, sequence.first, sequence.last, sequence.missing), (1500, 1, 1500, 0))
+
+	def test_files_opened_when_needed(self):
+		# 測試時間較晚的檔案在需要時才開啟
+		opened = []
+
+		def tracked(file_path, *args, **kwargs):
+			opened.append(file_path)
+			return iter_records(file_path, *args, **kwargs)
+
+		with mock.patch.object(batch, 'iter_records', tracked):
+			records = iter_merged_records(self.segments)
+			list(islice(records, 10))
+			self.assertEqual(opened, self.segments[:1])
+			list(records)
+			self.assertEqual(opened, [self.segments[0], self.segments[2], self.segments[1]])
+
+	def test_convert_files(self):
+		# 測試各檔案分別寫出，內容與單獨解析相同
+		output_dir = os.path.join(self.root, 'processed')
+		counts = convert_files(self.segments, output_dir, 'ndjson', workers=2, skip_conditions=[{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}])
+
+		self.assertEqual(sorted(os.listdir(output_dir)), ['f6_00000001_00000500_TP03.ndjson', 'f6_00000501_00001000_TP03.ndjson', 'f6_00001001_00001500_TP03.ndjson'])
+		for file_path in self.segments:
+			output_file = os.path.join(output_dir, os.path.basename(file_path).replace('.new', '.ndjson'))
+			with open(output_file, encoding='utf-8') as ndjson_file:
+				records = [json.loads(line) for line in ndjson_file]
+			self.assertEqual(records, parse_file(file_path, [{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}]))
+			self.assertEqual(counts[output_file], len(records))
+
+
+if __name__ == '__main__':
+	unittest.main()
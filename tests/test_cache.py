@@ -0,0 +1,130 @@
+# tests/test_cache.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import cache
+from cache import ParseCache, iter_cached_batches, iter_cached_records, select_rows
+from columnar import parse_file_columnar
+from parser import iter_records
+from constants import QUOTE_OFFSET, QUOTE_LENGTH, TERMINAL_CODE
+from synthetic import generate_frames, write_feed
+from utils.format_converter import calculate_checksum
+from utils.sequence import SequenceTracker
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestParseCache(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.cache_dir = os.path.join(self.directory.name, 'cache')
+		self.feed = os.path.join(self.directory.name, 'feed.new')
+		write_feed(self.feed, 3000, seed=11)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_cached_records_match_iter_records(self):
+		# 測試以快取篩選並產生的記錄與直接解析相同
+		parse_cache = ParseCache(self.cache_dir)
+		cases = [
+			([], None, (None, None)),
+			([{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}], None, (None, None)),
+			([{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'exclude'}], None, ('09:30', '11:00')),
+		]
+		for file_path in (RAW_FILE, self.feed):
+			columns, hit = parse_cache.load(file_path)
+			self.assertFalse(hit)
+			for skip_conditions, stock_codes, time_range in cases:
+				rows = select_rows(columns, skip_conditions, stock_codes, time_range)
+				for numeric in (False, True):
+					expected = list(iter_records(file_path, skip_conditions, stock_codes, time_range, numeric=numeric))
+					self.assertEqual(list(iter_cached_records(file_path, columns, rows, numeric, batch_size=700)), expected)
+
+	def test_cached_records_with_invalid_bcd(self):
+		# 測試價量含無效 PACK BCD nibble 的記錄，快取產生的字串與直接解析相同
+		feed = os.path.join(self.directory.name, 'corrupted.new')
+		with open(feed, 'wb') as output:
+			for index, frame in enumerate(generate_frames(2000, seed=5)):
+				slots = (len(frame) - len(TERMINAL_CODE) - 1 - QUOTE_OFFSET) // QUOTE_LENGTH
+				if slots and index % 3 == 0:
+					frame = bytearray(frame)
+					frame[QUOTE_OFFSET + 1] = 0x5A  # 價格
+					frame[QUOTE_OFFSET + (slots - 1) * QUOTE_LENGTH + 6] = 0xF3  # 數量
+					frame[-len(TERMINAL_CODE) - 1] = calculate_checksum(bytes(frame[1:-len(TERMINAL_CODE) - 1]))
+				output.write(frame)
+
+		columns, _ = ParseCache(self.cache_dir).load(feed)
+		self.assertTrue(columns['quote_bcd_error'].any())
+		rows = select_rows(columns, [], None, (None, None))
+		for numeric in (False, True):
+			expected = list(iter_records(feed, [], None, (None, None), numeric=numeric))
+			self.assertEqual(list(iter_cached_records(feed, columns, rows, numeric, batch_size=300)), expected)
+
+	def test_cache_hit_and_batches(self):
+		# 測試第二次讀取來自快取，分批結果與 columnar 解析相同
+		parse_cache = ParseCache(self.cache_dir)
+		parse_cache.load(self.feed)
+		columns, hit = parse_cache.load(self.feed)
+		self.assertTrue(hit)
+
+		stock_codes = [str(columns['stock_code'][0])]
+		batches = list(iter_cached_batches(columns, select_rows(columns, stock_codes=stock_codes), batch_size=10))
+		expected = parse_file_columnar(self.feed, stock_codes=stock_codes)
+		for name, column in expected.items():
+			np.testing.assert_array_equal(np.concatenate([batch[name] for batch in batches]), column)
+
+	def test_sequence_on_cached_columns(self):
+		# 測試快取篩選時追蹤傳輸序號並略過重複的記錄
+		duplicated = os.path.join(self.directory.name, 'duplicated.new')
+		with open(self.feed, 'rb') as source, open(duplicated, 'wb') as target:
+			data = source.read()
+			target.write(data + data)
+		columns, _ = ParseCache(self.cache_dir).load(duplicated)
+		sequence = SequenceTracker(drop_duplicates=True)
+		rows = select_rows(columns, sequence=sequence)
+		self.assertEqual((len(rows), sequence.duplicates), (3000, 3000))
+
+	def test_invalidation(self):
+		# 測試檔案內容或解析器版本改變時不使用舊的快取
+		parse_cache = ParseCache(self.cache_dir)
+		parse_cache.load(self.feed)
+		key = parse_cache.key_for(self.feed)
+
+		write_feed(self.feed, 3000, seed=12)
+		self.assertNotEqual(parse_cache.key_for(self.feed), key)
+		self.assertFalse(parse_cache.load(self.feed)[1])
+
+		with mock.patch.object(cache, '_parser_version', 'changed'):
+			self.assertFalse(parse_cache.load(self.feed)[1])
+			# 舊版解析器的項目在寫入時刪除
+			self.assertEqual([entry['parser_version'] for entry in parse_cache.entries()], ['changed'])
+
+	def test_lru_eviction(self):
+		# 測試超過容量時刪除最久未使用的項目
+		files = []
+		for seed in range(3):
+			file_path = os.path.join(self.directory.name, f'feed_{seed}.new')
+			write_feed(file_path, 3000, seed=seed)
+			files.append(file_path)
+
+		parse_cache = ParseCache(self.cache_dir)
+		parse_cache.load(files[0])
+		entry_size = parse_cache.entries()[0]['size']
+		# 項目大小含 meta.json，建立時間的長度每次不同，容量需保留餘裕
+		parse_cache.max_bytes = entry_size * 2 + entry_size // 2
+		parse_cache.load(files[1])
+		os.utime(os.path.join(self.cache_dir, parse_cache.key_for(files[1])), (0, 0))
+		parse_cache.load(files[2])
+
+		keys = {entry['key'] for entry in parse_cache.entries()}
+		self.assertEqual(keys, {parse_cache.key_for(files[0]), parse_cache.key_for(files[2])})
+		self.assertEqual(parse_cache.clear(), 2)
+
+
+if __name__ == '__main__':
+	unittest.main()
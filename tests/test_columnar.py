@@ -0,0 +1,113 @@
+# tests/test_columnar.py
+
+import os
+import unittest
+import numpy as np
+import tempfile
+from columnar import decode_bcd_columns, parse_file_columnar
+from constants import ESC_CODE, TERMINAL_CODE
+from utils.framer import IntegrityReport
+from parser import parse_file
+from synthetic import build_frame
+from utils.format_converter import calculate_checksum, format_number_string
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+def format_time(microseconds: int) -> str:
+	seconds, fraction = divmod(microseconds, 1_000_000)
+	return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{fraction:06d}'
+
+
+class TestColumnar(unittest.TestCase):
+
+	def test_decode_bcd_columns(self):
+		# 測試向量化 PACK BCD 解碼
+		raw = np.array([[0x00, 0x00, 0x40, 0x61, 0x00], [0x12, 0x34, 0x56, 0x78, 0x90]], dtype=np.uint8)
+		self.assertEqual(decode_bcd_columns(raw).tolist(), [406100, 1234567890])
+
+	def test_matches_parse_file(self):
+		# 測試欄位結果與逐筆解析一致
+		columns = parse_file_columnar(RAW_FILE, batch_size=300)
+		records = parse_file(RAW_FILE)
+		self.assertEqual(len(columns['stock_code']), len(records))
+
+		for i, record in enumerate(records):
+			body = record['body']
+			self.assertEqual(columns['transmission_number'][i], int(record['header']['transmission_number']))
+			self.assertEqual(columns['stock_code'][i], body['stock_code'])
+			self.assertEqual(format_time(int(columns['matching_time'][i])), body['matching_time'])
+			self.assertEqual(str(columns['total_volume'][i]), body['total_volume'])
+
+			trade = body['instant_quotes']['成交價量']
+			if trade is not None:
+				self.assertEqual(format_number_string(f"{columns['price'][i, 0]:09d}", integer_digits=5, decimal_digits=4), trade['price'])
+
+	def test_skip_conditions(self):
+		# 測試向量化跳過條件與 should_skip 結果一致
+		skip_conditions = [{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}]
+		columns = parse_file_columnar(RAW_FILE, skip_conditions)
+		records = parse_file(RAW_FILE, skip_conditions)
+		self.assertEqual(columns['transmission_number'].tolist(), [int(record['header']['transmission_number']) for record in records])
+
+	def test_stock_codes_and_time_range(self):
+		# 測試證券代碼與撮合時間範圍條件與逐筆解析一致
+		columns = parse_file_columnar(RAW_FILE, stock_codes=['0050', '00675L'], time_range=('09:09:35', '09:10'))
+		records = parse_file(RAW_FILE, stock_codes=['0050', '00675L'], time_range=('09:09:35', '09:10'))
+		self.assertEqual(columns['transmission_number'].tolist(), [int(record['header']['transmission_number']) for record in records])
+
+	def test_invalid_stock_codes(self):
+		# 測試不合法的證券代碼與逐筆解析同樣拒絕
+		with self.assertRaises(ValueError):
+			parse_file_columnar(RAW_FILE, stock_codes=['0050ABC'])
+
+	def test_verify_matches_record_path(self):
+		# 測試向量化檢查碼驗證與逐筆驗證結果一致
+		with open(RAW_FILE, 'rb') as file:
+			data = bytearray(file.read())
+		for offset in (200, 5000, 60000):
+			data[offset] ^= 0x01
+		data[7000:7000] = b'\x1B\x00\x0D\x0A'
+
+		with tempfile.NamedTemporaryFile(delete=False) as file:
+			file.write(data)
+			path = file.name
+		try:
+			columnar_report = IntegrityReport()
+			columns = parse_file_columnar(path, batch_size=300, report=columnar_report)
+			record_report = IntegrityReport()
+			records = parse_file(path, report=record_report)
+		finally:
+			os.remove(path)
+
+		self.assertGreater(columnar_report.bad_checksum + columnar_report.resyncs, 0)
+		self.assertEqual(columnar_report.to_dict(), record_report.to_dict())
+		self.assertEqual(columns['transmission_number'].tolist(), [int(record['header']['transmission_number']) for record in records])
+
+	def test_short_frames(self):
+		# 測試短於 BODY 固定欄位的記錄（檔案中間與檔尾）與逐筆解析同樣不輸出，也不影響相鄰記錄
+		body = bytes.fromhex('0022') + build_frame(99999999, '2330', 0, 0, 0, 0, 0, [])[3:19]
+		short = ESC_CODE + body + bytes((calculate_checksum(body),)) + TERMINAL_CODE
+		with open(RAW_FILE, 'rb') as file:
+			data = file.read()
+		offset = int(parse_file_columnar(RAW_FILE)['offset'][500])
+
+		with tempfile.NamedTemporaryFile(delete=False) as file:
+			file.write(data[:offset] + short + data[offset:] + short)
+			path = file.name
+		try:
+			columnar_report = IntegrityReport()
+			columns = parse_file_columnar(path, batch_size=300, report=columnar_report)
+			record_report = IntegrityReport()
+			records = parse_file(path, report=record_report)
+		finally:
+			os.remove(path)
+
+		self.assertEqual(columnar_report.to_dict(), record_report.to_dict())
+		self.assertEqual(len(records), len(parse_file(RAW_FILE)))
+		self.assertEqual(columns['transmission_number'].tolist(), [int(record['header']['transmission_number']) for record in records])
+		self.assertEqual(columns['stock_code'].tolist(), [record['body']['stock_code'] for record in records])
+		self.assertEqual(columns['total_volume'].tolist(), [int(record['body']['total_volume'].replace(',', '')) for record in records])
+
+if __name__ == '__main__':
+	unittest.main()
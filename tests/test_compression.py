@@ -0,0 +1,145 @@
+# tests/test_compression.py
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from batch import expand_inputs, output_path_for
+from cache import ParseCache, iter_cached_records
+from columnar import parse_file_columnar
+from index import RecordIndex, build_index
+from parallel import iter_columnar_batches_parallel, iter_records_parallel, plan_ranges
+from parser import iter_buffer_records, parse_file
+from utils.compression import detect_compression, iter_buffers, open_buffer, read_block_table, write_archive
+from utils.framer import IntegrityReport
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestCompression(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.mkdtemp()
+		with open(RAW_FILE, 'rb') as raw:
+			cls.raw = raw.read()
+
+		# 損毀的副本：改壞一筆記錄的檢查碼，並在中間插入無法切分的資料
+		corrupted = bytearray(cls.raw)
+		corrupted[200] ^= 0xFF
+		middle = len(corrupted) // 2
+		corrupted[middle:middle] = b'\x00' * 37
+		cls.corrupted = os.path.join(cls.directory, 'corrupted.new')
+		with open(cls.corrupted, 'wb') as output:
+			output.write(corrupted)
+
+		cls.files = {}
+		for suffix, module in (('.gz', gzip), ('.xz', lzma), ('.bz2', bz2)):
+			cls.files[suffix] = os.path.join(cls.directory, 'feed.new' + suffix)
+			with open(cls.files[suffix], 'wb') as output:
+				output.write(module.compress(bytes(corrupted)))
+
+		# 區塊設小以涵蓋多個區塊
+		cls.archive = os.path.join(cls.directory, 'archive.new.gz')
+		cls.table = write_archive(cls.corrupted, cls.archive, block_size=8192, threads=2)
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.directory)
+
+	def verified(self, file_path: str, **kwargs) -> tuple:
+		report = IntegrityReport()
+		return parse_file(file_path, report=report, **kwargs), report.to_dict()
+
+	def test_detect_compression(self):
+		# 測試依檔頭判斷格式，副檔名與檔頭不符時拒絕
+		self.assertIsNone(detect_compression(RAW_FILE))
+		for suffix, path in self.files.items():
+			self.assertEqual(detect_compression(path), {'.gz': 'gzip', '.xz': 'xz', '.bz2': 'bz2'}[suffix])
+		mislabeled = os.path.join(self.directory, 'raw.new.gz')
+		shutil.copyfile(RAW_FILE, mislabeled)
+		try:
+			with self.assertRaises(ValueError):
+				detect_compression(mislabeled)
+		finally:
+			os.remove(mislabeled)
+
+	def test_streaming_matches_raw(self):
+		# 測試各壓縮格式的解析與驗證結果（含位置）與未壓縮檔相同
+		expected = self.verified(self.corrupted)
+		self.assertGreater(expected[1]['bad_checksum'], 0)
+		self.assertGreater(expected[1]['resyncs'], 0)
+		columns = parse_file_columnar(self.corrupted)
+		for path in list(self.files.values()) + [self.archive]:
+			self.assertEqual(self.verified(path), expected, path)
+			self.assertEqual([record.to_dict() for record in parse_file(path, lazy=True)], parse_file(self.corrupted), path)
+			for name, column in parse_file_columnar(path).items():
+				np.testing.assert_array_equal(column, columns[name], err_msg=f'{path} {name}')
+
+	def test_small_chunks(self):
+		# 測試緩衝區小於檔案時，跨緩衝區的記錄接續正確
+		records = []
+		report = IntegrityReport()
+		position = 0
+		for base, buffer, end in iter_buffers(self.files['.gz'], chunk_size=4096):
+			self.assertEqual(base, position)
+			chunk_report = IntegrityReport()
+			records.extend(iter_buffer_records(buffer, end=end, report=chunk_report))
+			report.merge(chunk_report, base)
+			position = base + (len(buffer) if end is None else end)
+		self.assertEqual((records, report.to_dict()), self.verified(self.corrupted))
+
+	def test_archive(self):
+		# 測試區塊壓縮檔仍為標準 gzip 檔，且區塊表與寫出時相同、區塊以記錄邊界切分
+		with open(self.archive, 'rb') as archive:
+			self.assertEqual(gzip.decompress(archive.read()), open(self.corrupted, 'rb').read())
+		table = read_block_table(self.archive)
+		np.testing.assert_array_equal(table, self.table)
+		self.assertGreater(len(table), 4)
+		self.assertIsNone(read_block_table(self.files['.gz']))
+
+		offsets = set(parse_file_columnar(self.corrupted)['offset'].tolist())
+		self.assertTrue(set(table[1:, 0].tolist()) <= offsets)
+
+		with open_buffer(self.archive) as buffer:
+			self.assertEqual(len(buffer), len(self.raw) + 37)
+			self.assertEqual(bytes(buffer[8000:20000]), open(self.corrupted, 'rb').read()[8000:20000])
+
+	def test_parallel_archive(self):
+		# 測試區塊壓縮檔依區塊分段平行解析；其他壓縮檔為單一區段
+		ranges = plan_ranges(self.archive, 2, range_size=16384)
+		self.assertGreater(len(ranges), 1)
+		self.assertEqual(plan_ranges(self.files['.xz'], 2), [(0, None)])
+
+		expected = self.verified(self.corrupted)
+		for path in (self.archive, self.files['.xz']):
+			report = IntegrityReport()
+			records = list(iter_records_parallel(path, 2, range_size=16384, report=report))
+			self.assertEqual((records, report.to_dict()), expected)
+
+		batches = list(iter_columnar_batches_parallel(self.archive, 2, range_size=16384))
+		np.testing.assert_array_equal(np.concatenate([batch['offset'] for batch in batches]), parse_file_columnar(self.corrupted)['offset'])
+
+	def test_index_and_cache(self):
+		# 測試索引與快取直接使用區塊壓縮檔
+		build_index(self.archive, block_size=64)
+		index = RecordIndex(self.archive)
+		self.assertEqual(list(index.query(stock_codes=['0050'])), parse_file(self.corrupted, stock_codes=['0050']))
+
+		columns, _ = ParseCache(os.path.join(self.directory, 'cache')).load(self.archive)
+		rows = np.flatnonzero(columns['stock_code'] == '2330')
+		self.assertEqual(list(iter_cached_records(self.archive, columns, rows)), parse_file(self.corrupted, stock_codes=['2330']))
+
+	def test_batch_inputs(self):
+		# 測試目錄輸入包含壓縮檔，輸出檔名去除壓縮副檔名
+		inputs = [os.path.basename(path) for path in expand_inputs(self.directory, root='')]
+		self.assertEqual(inputs, ['archive.new.gz', 'corrupted.new', 'feed.new.bz2', 'feed.new.gz', 'feed.new.xz'])
+		self.assertEqual(output_path_for(self.files['.xz'], 'out', 'json'), os.path.join('out', 'feed.json'))
+
+
+if __name__ == '__main__':
+	unittest.main()
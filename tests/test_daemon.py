@@ -0,0 +1,103 @@
+# tests/test_daemon.py
+
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from client import request
+from daemon import ParseDaemon
+from main import main
+
+DATA_FILE = 'f6_01000001_01001000_TP03.new'
+
+
+class TestDaemon(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.temp_dir = tempfile.mkdtemp()
+		cls.socket_path = os.path.join(cls.temp_dir, 'daemon.sock')
+		cls.daemon = ParseDaemon(cls.socket_path, workers=2)
+		ready = threading.Event()
+		cls.thread = threading.Thread(target=lambda: asyncio.run(cls.daemon.serve(ready=ready.set)))
+		cls.thread.start()
+		if not ready.wait(60):
+			raise RuntimeError('daemon did not start')
+
+	@classmethod
+	def tearDownClass(cls):
+		request({'command': 'shutdown'}, cls.socket_path)
+		cls.thread.join(30)
+		shutil.rmtree(cls.temp_dir)
+
+	def output_name(self, name: str) -> str:
+		# 輸出檔案名稱相對於 data/processed
+		return os.path.relpath(os.path.join(self.temp_dir, name), 'data/processed')
+
+	def parse(self, argv: list) -> dict:
+		return request({'argv': argv, 'cwd': os.getcwd()}, self.socket_path)
+
+	def test_same_output_as_main(self):
+		# 測試服務寫出的檔案與訊息和直接執行 main.py 相同
+		argv = [DATA_FILE, self.output_name('daemon.json'), '--scenarios', '1:include', '--verify']
+		response = self.parse(argv)
+		self.assertEqual(response['exit_code'], 0, response['stderr'])
+
+		stdout = io.StringIO()
+		with redirect_stdout(stdout):
+			main([DATA_FILE, self.output_name('direct.json'), '--scenarios', '1:include', '--verify'])
+		self.assertEqual(response['stdout'], stdout.getvalue().replace('direct.json', 'daemon.json'))
+		with open(os.path.join(self.temp_dir, 'daemon.json'), 'rb') as daemon_file, open(os.path.join(self.temp_dir, 'direct.json'), 'rb') as direct_file:
+			self.assertEqual(daemon_file.read(), direct_file.read())
+
+	def test_concurrent_requests(self):
+		# 測試多個連線同時送出請求
+		stocks = ['2330', '1101', '2317', '0050', '2603', '2881']
+		with ThreadPoolExecutor(len(stocks)) as executor:
+			responses = list(executor.map(lambda stock: self.parse([DATA_FILE, self.output_name(f'{stock}.ndjson'), '--format', 'ndjson', '--stocks', stock]), stocks))
+		self.assertEqual([response['exit_code'] for response in responses], [0] * len(stocks))
+		for stock in stocks:
+			self.assertTrue(os.path.exists(os.path.join(self.temp_dir, f'{stock}.ndjson')))
+
+	def test_errors(self):
+		# 測試參數錯誤、長時間執行的命令與格式錯誤的請求
+		response = self.parse([DATA_FILE])
+		self.assertEqual(response['exit_code'], 2)
+		self.assertIn('usage: main.py', response['stderr'])
+
+		response = self.parse([DATA_FILE, 'out.ndjson', '--format', 'ndjson', '--follow'])
+		self.assertEqual(response['exit_code'], 2)
+		self.assertIn('--follow', response['stderr'])
+
+		response = self.parse([DATA_FILE, 'out.parquet', '--format', 'parquet', '--use-index'])
+		self.assertEqual(response['exit_code'], 2)
+		self.assertIn('--use-index', response['stderr'])
+
+		response = self.parse([DATA_FILE, 'out.json', '--drop-duplicates', '--workers', '2'])
+		self.assertEqual(response['exit_code'], 2)
+		self.assertIn('--drop-duplicates', response['stderr'])
+
+		# 沒有索引時提示先建立索引
+		response = self.parse(['missing.new', self.output_name('missing.json'), '--use-index'])
+		self.assertEqual(response['exit_code'], 2)
+		self.assertIn('main.py index missing.new', response['stderr'])
+
+		response = self.parse(['missing.new', self.output_name('missing.json')])
+		self.assertEqual(response['exit_code'], 1)
+		self.assertIn('FileNotFoundError', response['stderr'])
+
+		self.assertEqual(request({'argv': 'not a list'}, self.socket_path)['exit_code'], 2)
+
+	def test_status(self):
+		# 測試狀態查詢
+		before = request({'command': 'status'}, self.socket_path)
+		self.parse([DATA_FILE])
+		after = request({'command': 'status'}, self.socket_path)
+		self.assertEqual(after['workers'], 2)
+		self.assertEqual(after['requests'], before['requests'] + 1)
+		self.assertEqual(after['failed'], before['failed'] + 1)
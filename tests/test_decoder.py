@@ -1,7 +1,7 @@
 # tests/test_decoder.py
 
 import unittest
-from src.utils.decoder import decode_ascii, decode_packed_bcd, decode_hexacode
+from src.utils.decoder import decode_ascii, decode_packed_bcd, decode_packed_bcd_int, decode_hexacode
 
 class TestDecoder(unittest.TestCase):
 
@@ -19,6 +19,16 @@ class TestDecoder(unittest.TestCase):
 		result = decode_packed_bcd(data)
 		self.assertEqual(result, expected)
 
+	def test_decode_packed_bcd_all_bytes(self):
+		# 測試查表結果與逐 nibble 計算一致
+		for byte in range(256):
+			self.assertEqual(decode_packed_bcd(bytes([byte])), f'{byte >> 4}{byte & 0xF}')
+
+	def test_decode_packed_bcd_int(self):
+		# 測試 PACK BCD 直接解碼為整數
+		self.assertEqual(decode_packed_bcd_int(bytes([0x01, 0x22])), 122)
+		self.assertEqual(decode_packed_bcd_int(bytes([0x00, 0x00, 0x40, 0x61, 0x00])), 406100)
+
 	def test_decode_hexacode(self):
 		# 測試 HEXACODE 編碼解碼
 		hexacode = b'\x12\x34\x56\x78'
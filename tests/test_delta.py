@@ -0,0 +1,102 @@
+# tests/test_delta.py
+
+import os
+import tempfile
+import unittest
+from delta import apply_delta, encode_delta, iter_deltas, iter_snapshots, read_deltas
+from parser import decode_record, parse_file
+from synthetic import build_frame, generate_frames
+from writers import write_json, write_ndjson
+
+NINE = 9 * 3600 * 1_000_000
+
+
+def quote(transmission_number: int, stock_code: str, bids: list, asks: list, trade: tuple = None, limit: int = 0) -> dict:
+	# 揭示成交價量（可省略）與最佳五檔的記錄
+	reveal = (0b10000000 if trade else 0) | (len(bids) << 4) | (len(asks) << 1)
+	slots = ([trade] if trade else []) + bids + asks
+	return decode_record(build_frame(transmission_number, stock_code, NINE + transmission_number, reveal, limit, 0, 0, slots))
+
+
+class TestDelta(unittest.TestCase):
+
+	def test_only_changed_levels(self):
+		# 測試只輸出改變的檔位與註記，以及檔數改變
+		previous = quote(1, '2330', [(5000000, 10), (4990000, 20)], [(5010000, 5)])
+		record = quote(2, '2330', [(5000000, 10), (4990000, 25), (4980000, 1)], [(5010000, 5)], trade=(5005000, 3))
+
+		delta = encode_delta(previous, record)
+		self.assertEqual(delta['transmission_number'], record['header']['transmission_number'])
+		self.assertEqual(delta['trade'], record['body']['instant_quotes']['成交價量'])
+		self.assertEqual([level[0] for level in delta['bids']], [1, 2])
+		self.assertEqual(delta['bid_count'], 3)
+		self.assertNotIn('asks', delta)
+		self.assertIn('reveal_flags', delta)
+		self.assertNotIn('limit_flags', delta)
+		self.assertEqual(apply_delta(previous, delta), record)
+
+		# 檔數減少
+		fewer = quote(3, '2330', [(5000000, 10)], [])
+		delta = encode_delta(record, fewer)
+		self.assertEqual(delta['bid_count'], 1)
+		self.assertEqual(delta['ask_count'], 0)
+		self.assertEqual(apply_delta(record, delta), fewer)
+
+	def test_unchanged_trade_and_flags(self):
+		# 測試成交價量未改變時不輸出，註記只輸出改變的項目
+		previous = quote(1, '2330', [(5000000, 10)], [], trade=(5005000, 3))
+		record = quote(2, '2330', [(5000000, 12)], [], trade=(5005000, 3), limit=0b00000100)
+		delta = encode_delta(previous, record)
+		self.assertNotIn('trade', delta)
+		self.assertNotIn('reveal_flags', delta)
+		changed = {key: value for key, value in record['body']['limit_flags'].items() if previous['body']['limit_flags'][key] != value}
+		self.assertEqual(delta['limit_flags'], changed)
+		self.assertLess(len(changed), len(record['body']['limit_flags']))
+		self.assertEqual(apply_delta(previous, delta), record)
+
+		# 成交價量消失時輸出 null
+		fewer = quote(3, '2330', [(5000000, 12)], [])
+		delta = encode_delta(record, fewer)
+		self.assertIsNone(delta['trade'])
+		self.assertEqual(apply_delta(record, delta), fewer)
+
+	def test_keyframe_interval(self):
+		# 測試每檔證券的第一筆與每隔 keyframe_interval 筆輸出關鍵幀
+		records = [quote(index, code, [(5000000, index)], []) for index, code in enumerate(['2330', '1101'] * 5, 1)]
+		entries = list(iter_deltas(records, keyframe_interval=2))
+		self.assertEqual(['keyframe' in entry for entry in entries], [True, True, False, False] * 2 + [True, True])
+		self.assertEqual(sum('keyframe' in entry for entry in iter_deltas(records, keyframe_interval=0)), 2)
+
+	def test_round_trip(self):
+		# 測試實際檔案與模擬資料（含 numeric 模式）重建後與原始記錄相同
+		records = parse_file('data/raw/f6_01000001_01001000_TP03.new')
+		self.assertEqual(list(iter_snapshots(iter_deltas(records))), records)
+
+		frames = list(generate_frames(3000, seed=5, symbols=20))
+		for numeric in (False, True):
+			records = [decode_record(frame, numeric=numeric) for frame in frames]
+			entries = list(iter_deltas(records, keyframe_interval=16))
+			self.assertEqual(list(iter_snapshots(entries)), records)
+
+	def test_resync_mid_stream(self):
+		# 測試從串流中途開始時，各證券從下一個關鍵幀起重建
+		records = [decode_record(frame) for frame in generate_frames(2000, seed=7, symbols=5)]
+		entries = list(iter_deltas(records, keyframe_interval=10))
+		start = 500
+		rebuilt = list(iter_snapshots(entries[start:]))
+
+		first_keyframe = {}
+		for position, entry in enumerate(entries[start:], start):
+			if 'keyframe' in entry:
+				first_keyframe.setdefault(entry['keyframe']['body']['stock_code'], position)
+		expected = [record for position, record in enumerate(records[start:], start) if position >= first_keyframe.get(record['body']['stock_code'], len(records))]
+		self.assertEqual(rebuilt, expected)
+
+	def test_read_written_file(self):
+		# 測試 json 與 ndjson 寫出的差異串流皆可讀回重建
+		records = [decode_record(frame) for frame in generate_frames(500, seed=3, symbols=10)]
+		with tempfile.TemporaryDirectory() as temp_dir:
+			for writer, name in ((write_json, 'delta.json'), (write_ndjson, 'delta.ndjson')):
+				path = os.path.join(temp_dir, name)
+				writer(iter_deltas(records), path, compact=True)
+				self.assertEqual(list(iter_snapshots(read_deltas(path))), records)
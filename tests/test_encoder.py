@@ -0,0 +1,66 @@
+# tests/test_encoder.py
+
+import json
+import os
+import tempfile
+import unittest
+from encoder import COMPACT_SEPARATORS, RecordEncoder, iter_json_array, iter_json_lines
+from parser import decode_record, parse_file
+from synthetic import generate_frames
+from writers import write_json, write_ndjson
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestEncoder(unittest.TestCase):
+
+	def setUp(self):
+		self.records = parse_file(RAW_FILE)
+		# 合成資料涵蓋試算、僅成交價量、中央登錄公債等情形
+		self.synthetic = [decode_record(frame) for frame in generate_frames(2000, seed=7)]
+		self.numeric = [decode_record(frame, numeric=True) for frame in generate_frames(500, seed=8)]
+
+	def test_encode_matches_json_dumps(self):
+		# 測試各種縮排與分隔符號下，單筆輸出與 json.dumps 完全相同
+		for indent, separators in ((None, None), (None, COMPACT_SEPARATORS), (4, None), (2, COMPACT_SEPARATORS)):
+			encoder = RecordEncoder(indent, separators)
+			for record in self.records + self.synthetic + self.numeric:
+				expected = json.dumps(record, ensure_ascii=False, indent=indent, separators=separators)
+				self.assertEqual(encoder.encode(record), expected)
+
+	def test_encode_unknown_structure(self):
+		# 測試非 decode_record 結構時改用 json 模組
+		record = {'header': {'transmission_number': '00000001'}, 'note': 'x'}
+		self.assertEqual(RecordEncoder(4).encode(record), json.dumps(record, ensure_ascii=False, indent=4))
+
+	def test_json_array_matches_json_dump(self):
+		# 測試分段輸出串接後與整個陣列的 json.dumps 相同
+		for records in (self.records, self.synthetic[:1], []):
+			self.assertEqual(''.join(iter_json_array(iter(records), chunk_size=300)), json.dumps(records, ensure_ascii=False, indent=4))
+			self.assertEqual(''.join(iter_json_array(iter(records), indent=None, separators=COMPACT_SEPARATORS)), json.dumps(records, ensure_ascii=False, separators=COMPACT_SEPARATORS))
+
+	def test_json_lines_chunks(self):
+		# 測試 NDJSON 依筆數分段，每行與 json.dumps 相同
+		chunks = list(iter_json_lines(iter(self.records), chunk_size=300))
+		self.assertEqual(len(chunks), 4)
+		self.assertEqual(''.join(chunks), ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.records))
+
+	def test_writers_are_byte_identical(self):
+		# 測試寫出的檔案與原本以 json 模組寫出的內容相同
+		with tempfile.TemporaryDirectory() as directory:
+			json_file = os.path.join(directory, 'out.json')
+			ndjson_file = os.path.join(directory, 'out.ndjson')
+			write_json(iter(self.records), json_file)
+			write_ndjson(iter(self.records), ndjson_file)
+			with open(json_file, encoding='utf-8') as file:
+				self.assertEqual(file.read(), json.dumps(self.records, ensure_ascii=False, indent=4))
+			with open(ndjson_file, encoding='utf-8') as file:
+				self.assertEqual(file.read(), ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.records))
+
+			write_json(iter(self.records), json_file, compact=True)
+			with open(json_file, encoding='utf-8') as file:
+				self.assertEqual(json.load(file), self.records)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,97 @@
+# tests/test_follow.py
+
+import os
+import tempfile
+import unittest
+from itertools import islice
+from follow import follow_file, load_checkpoint
+from parser import parse_file
+from synthetic import generate_frames
+
+
+class TestFollow(unittest.TestCase):
+
+	def setUp(self):
+		self.frames = list(generate_frames(300, seed=4))
+		self.directory = tempfile.TemporaryDirectory()
+		self.file_path = os.path.join(self.directory.name, 'capture.new')
+		self.checkpoint_file = os.path.join(self.directory.name, 'capture.checkpoint')
+
+		# 完整寫出後的解析結果
+		with open(self.file_path, 'wb') as capture:
+			capture.write(b''.join(self.frames))
+		self.expected = parse_file(self.file_path)
+		os.remove(self.file_path)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def append(self, data: bytes) -> None:
+		with open(self.file_path, 'ab') as capture:
+			capture.write(data)
+
+	def follow(self, **kwargs):
+		return follow_file(self.file_path, checkpoint_file=self.checkpoint_file, poll_interval=0.001, idle_timeout=0.05, **kwargs)
+
+	def test_follow_growing_file(self):
+		# 測試檔案增長時只解析新增部分，結尾不完整的記錄等待後續資料
+		self.append(b''.join(self.frames[:100]) + self.frames[100][:20])
+		records = self.follow()
+		first = list(islice(records, 100))
+
+		self.append(self.frames[100][20:] + b''.join(self.frames[101:]))
+		self.assertEqual(first + list(records), self.expected)
+
+	def test_resume_from_checkpoint(self):
+		# 測試中斷後從進度檔繼續；最後取走的記錄不確定是否處理完成，重新啟動後會再產出一次
+		self.append(b''.join(self.frames[:150]))
+		records = self.follow()
+		first = list(islice(records, 120))
+		records.close()
+
+		checkpoint = load_checkpoint(self.checkpoint_file)
+		self.assertEqual(checkpoint['offset'], sum(map(len, self.frames[:119])))
+		self.assertEqual(checkpoint['transmission_number'], 119)
+
+		self.append(b''.join(self.frames[150:]))
+		self.assertEqual(first[:119] + list(self.follow()), self.expected)
+		self.assertEqual(load_checkpoint(self.checkpoint_file)['offset'], sum(map(len, self.frames)))
+
+	def test_truncated_file_restarts(self):
+		# 測試檔案被截短（如新交易日重新寫入）時從頭解析
+		self.append(b''.join(self.frames))
+		list(self.follow())
+
+		with open(self.file_path, 'wb') as capture:
+			capture.write(b''.join(self.frames[:10]))
+		self.assertEqual(list(self.follow()), self.expected[:10])
+
+	def test_reset_callback(self):
+		# 測試截短或替換時先呼叫 on_reset，返回 True 時結束走訪並將進度重設為從頭開始
+		self.append(b''.join(self.frames[:50]))
+		list(self.follow())
+
+		resets = []
+		replacement = os.path.join(self.directory.name, 'replacement.new')
+		with open(replacement, 'wb') as capture:
+			capture.write(b''.join(self.frames[:10]))
+		os.replace(replacement, self.file_path)
+		self.assertEqual(list(self.follow(on_reset=lambda: resets.append(True) or True)), [])
+		self.assertEqual(resets, [True])
+		self.assertEqual(load_checkpoint(self.checkpoint_file)['offset'], 0)
+
+		# 重新開始後不再視為重設
+		self.assertEqual(list(self.follow(on_reset=lambda: resets.append(True) or True)), self.expected[:10])
+		self.assertEqual(resets, [True])
+
+	def test_skip_conditions(self):
+		# 測試跳過條件與 parse_file 相同
+		self.append(b''.join(self.frames))
+		skip_conditions = [{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}]
+		records = list(follow_file(self.file_path, skip_conditions, idle_timeout=0.05, poll_interval=0.001))
+
+		self.assertEqual(records, parse_file(self.file_path, skip_conditions))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -4,8 +4,12 @@ import unittest
 from src.utils.format_converter import (
 	format_number_string,
 	convert_match_time,
+	convert_match_time_us,
+	format_match_time_us,
+	encode_match_time,
 	convert_reveal_flags,
 	convert_limit_flags,
+	convert_status_flags,
 	convert_instant_quotes,
 	calculate_checksum
 )
@@ -30,6 +34,24 @@ class TestFormatConverter(unittest.TestCase):
 		result = convert_match_time(packed_bcd_data)
 		self.assertEqual(result, expected)
 
+	def test_convert_match_time_us(self):
+		# 測試撮合時間直接轉換為微秒數
+		packed_bcd_data = bytes([0x12, 0x34, 0x56, 0x78, 0x12, 0x34])
+		expected = ((12 * 60 + 34) * 60 + 56) * 1_000_000 + 781234
+		self.assertEqual(convert_match_time_us(packed_bcd_data), expected)
+
+	def test_format_match_time_us(self):
+		# 測試微秒數轉回與 convert_match_time 相同格式的時間字串
+		packed_bcd_data = bytes([0x09, 0x05, 0x06, 0x00, 0x12, 0x34])
+		self.assertEqual(format_match_time_us(convert_match_time_us(packed_bcd_data)), convert_match_time(packed_bcd_data))
+
+	def test_encode_match_time(self):
+		# 測試時間字串編碼為 PACK BCD
+		self.assertEqual(encode_match_time('12:34:56.781234'), bytes([0x12, 0x34, 0x56, 0x78, 0x12, 0x34]))
+		self.assertEqual(encode_match_time('13:00'), bytes([0x13, 0x00, 0x00, 0x00, 0x00, 0x00]))
+		with self.assertRaises(ValueError):
+			encode_match_time('1300')
+
 	def test_convert_reveal_flags(self):
 		# 測試揭示項目註記的二進位資料解碼
 		binary_data = bytes([0b10000000])
@@ -54,6 +76,30 @@ class TestFormatConverter(unittest.TestCase):
 		result = convert_limit_flags(byte_data)
 		self.assertEqual(result, expected)
 
+	def test_convert_status_flags(self):
+		# 測試狀態註記的二進位資料解碼
+		byte_data = bytes([0b11010000])
+		expected = {
+			'試算狀態註記': '試算揭示',
+			'試算後延後開盤註記': '是',
+			'試算後延後收盤註記': '否',
+			'撮合方式註記': '逐筆撮合',
+			'開盤註記': '否',
+			'收盤註記': '否'
+		}
+		result = convert_status_flags(byte_data)
+		self.assertEqual(result, expected)
+
+	def test_flags_are_shared_and_immutable(self):
+		# 測試查表取得的註記為共用且不可修改的物件
+		first = convert_reveal_flags(bytes([0b10000000]))
+		second = convert_reveal_flags(bytes([0b10000000]))
+		self.assertIs(first, second)
+		with self.assertRaises(TypeError):
+			first['成交價成交量'] = False
+		with self.assertRaises(TypeError):
+			convert_limit_flags(bytes([0])).update({})
+
 	def test_convert_instant_quotes(self):
 		# 測試即時行情的價格和數量資料轉換
 		prices = [
@@ -102,6 +148,19 @@ class TestFormatConverter(unittest.TestCase):
 		result = convert_instant_quotes(prices, quantities, reveal_flags, limit_flags, status_flags, stock_code)
 		self.assertEqual(result, expected)
 
+		# numeric 模式：價格為 0.0001 元為單位的整數，數量為整數
+		expected_numeric = {
+			'成交價量': {'price': 123400, 'quantity': 1212},
+			'最佳五檔買進價量': [{'price': 567800, 'quantity': 2323}],
+			'最佳五檔賣出價量': [{'price': 123400, 'quantity': 3434}]
+		}
+		result = convert_instant_quotes(prices, quantities, reveal_flags, limit_flags, status_flags, stock_code, numeric=True)
+		self.assertEqual(result, expected_numeric)
+
+		# 暫緩撮合時成交量以 0 揭示
+		paused = dict(limit_flags, 瞬間價格趨勢='暫緩撮合且瞬間趨漲')
+		self.assertEqual(convert_instant_quotes(prices, quantities, reveal_flags, paused, status_flags, stock_code, numeric=True)['成交價量'], {'price': 123400, 'quantity': 0})
+
 	def test_calculate_checksum(self):
 		# 測試 XOR 檢查碼計算
 		data = bytes([0x01, 0x02, 0x03])
@@ -109,5 +168,13 @@ class TestFormatConverter(unittest.TestCase):
 		result = calculate_checksum(data)
 		self.assertEqual(result, expected)
 
+	def test_calculate_checksum_long_data(self):
+		# 測試超過折疊表長度的資料
+		data = bytes(range(256)) * 20 + b'\x5A'
+		expected = 0
+		for byte in data:
+			expected ^= byte
+		self.assertEqual(calculate_checksum(data), expected)
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
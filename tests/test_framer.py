@@ -0,0 +1,108 @@
+# tests/test_framer.py
+
+import os
+import tempfile
+import unittest
+from utils.framer import IntegrityReport, map_file, retain_maps, iter_frames, iter_frame_spans, read_message_length, scan_frames, verify_checksum
+from helpers import build_record
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestFramer(unittest.TestCase):
+
+	def test_read_message_length(self):
+		# 測試 PACK BCD 的 message_length 解析
+		record = build_record(b'\x00' * 29)
+		self.assertEqual(read_message_length(record, 0), 42)
+
+	def test_terminal_code_inside_body(self):
+		# 測試 body 中出現 0D 0A 時仍依 message_length 正確切分
+		first = build_record(b'\x0D\x0A' * 10)
+		second = build_record(b'\x11' * 20)
+		frames = [bytes(frame) for frame in iter_frames(first + second)]
+		self.assertEqual(frames, [first, second])
+
+	def test_resync_after_garbage(self):
+		# 測試遇到損毀資料時，從下一個 ESC-CODE 重新同步
+		record = build_record(b'\x22' * 20)
+		buffer = b'\x01\x02\x1B\x99' + record + record[:-5]
+		self.assertEqual(list(iter_frame_spans(buffer)), [(4, len(record))])
+
+	def test_verify_checksum(self):
+		# 測試檢查碼驗證
+		record = bytearray(build_record(b'\x12\x34' * 10))
+		self.assertTrue(verify_checksum(record))
+		record[12] ^= 0x01
+		self.assertFalse(verify_checksum(record))
+
+	def test_integrity_report(self):
+		# 測試略過檢查碼錯誤的記錄與重新同步時略過的資料
+		good = build_record(b'\x11' * 20, 1)
+		bad = bytearray(build_record(b'\x22' * 20, 2))
+		bad[15] ^= 0xFF
+		buffer = good + bytes(bad) + b'\x00\x1B\x00' + build_record(b'\x33' * 20, 3) + b'\x0D'
+		report = IntegrityReport()
+		frames = [bytes(frame) for frame in iter_frames(buffer, report=report)]
+		self.assertEqual(len(frames), 2)
+		self.assertEqual(report.to_dict(), {
+			'frames': 3,
+			'valid': 2,
+			'bad_checksum': 1,
+			'resyncs': 2,
+			'skipped_bytes': 4,
+			'bad_offsets': [len(good)],
+			'bad_transmission_numbers': ['00000002'],
+			'resync_offsets': [2 * len(good), len(buffer) - 1],
+		})
+
+	def test_scan_frames_waits_for_incomplete_record(self):
+		# 測試結尾不完整的記錄保留到後續資料到達
+		first = build_record(b'\x11' * 20)
+		second = build_record(b'\x22' * 20)
+		buffer = b'\x00' + first + second[:10]
+		self.assertEqual(scan_frames(buffer), ([(1, len(first))], 1 + len(first)))
+		self.assertEqual(scan_frames(buffer + second[10:], 1 + len(first)), ([(1 + len(first), len(second))], len(buffer) + len(second) - 10))
+
+	def test_map_file(self):
+		# 測試整份原始檔案的切分結果
+		with map_file(RAW_FILE) as buffer:
+			spans = list(iter_frame_spans(buffer))
+			self.assertEqual(len(spans), 1000)
+			self.assertEqual(sum(length for _, length in spans), len(buffer))
+
+	def test_map_empty_file(self):
+		# 測試空檔案
+		with tempfile.NamedTemporaryFile(delete=False) as file:
+			path = file.name
+		try:
+			with map_file(path) as buffer:
+				self.assertEqual(list(iter_frames(buffer)), [])
+		finally:
+			os.remove(path)
+
+	def test_retain_maps(self):
+		# 測試保留映射時重複使用同一個 mmap，檔案改變後重新映射
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'feed.new')
+			with open(RAW_FILE, 'rb') as raw, open(path, 'wb') as copy:
+				copy.write(raw.read())
+			retain_maps(True)
+			try:
+				with map_file(path) as first:
+					size = len(first)
+				with map_file(path) as second:
+					self.assertIs(second, first)
+					self.assertFalse(second.closed)
+				with open(path, 'ab') as copy:
+					copy.write(b'\x00')
+				with map_file(path) as third:
+					self.assertIsNot(third, first)
+					self.assertTrue(first.closed)
+					self.assertEqual(len(third), size + 1)
+			finally:
+				retain_maps(False)
+			self.assertTrue(third.closed)
+
+if __name__ == '__main__':
+	unittest.main()
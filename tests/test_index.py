@@ -0,0 +1,115 @@
+# tests/test_index.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from index import RecordIndex, build_index, index_path_for, open_index
+from parser import parse_file
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestIndex(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		# 索引建立在暫存目錄中的原始檔案副本旁，區塊設小以涵蓋多個區塊
+		cls.directory = tempfile.mkdtemp()
+		cls.raw_file = os.path.join(cls.directory, os.path.basename(RAW_FILE))
+		shutil.copyfile(RAW_FILE, cls.raw_file)
+		build_index(cls.raw_file, block_size=64)
+		cls.index = RecordIndex(cls.raw_file)
+
+	@classmethod
+	def tearDownClass(cls):
+		shutil.rmtree(cls.directory)
+
+	def test_query_matches_parse_file(self):
+		# 測試以索引查詢的結果與整份解析後篩選相同
+		skip_conditions = [{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}]
+		cases = [
+			(None, ['6451'], ('09:09', None)),
+			(None, ['0050', '00675L'], ('09:09:35', '09:10')),
+			(None, None, ('09:09:40', '09:09:50')),
+			(skip_conditions, ['6451', '2330'], (None, None)),
+			(None, ['XXXX'], (None, None)),
+		]
+		for skip, stocks, time_range in cases:
+			self.assertEqual(list(self.index.query(skip, stocks, time_range)), parse_file(RAW_FILE, skip, stocks, time_range))
+
+	def test_stock_postings(self):
+		# 測試每檔證券的列號依檔案順序排列
+		rows = self.index.rows_for_stocks(['0050'])
+		records = parse_file(RAW_FILE, stock_codes=['0050'])
+		self.assertEqual(len(rows), len(records))
+		self.assertEqual(rows.tolist(), sorted(rows.tolist()))
+
+	def test_get_transmission(self):
+		# 測試以傳輸序號取得單筆記錄
+		expected = parse_file(RAW_FILE)[123]
+		self.assertEqual(self.index.get_transmission(expected['header']['transmission_number']), expected)
+		self.assertEqual(self.index.get_transmission(123, lazy=True), None)
+
+	def test_stale_index(self):
+		# 測試原始檔案改變時拒絕使用舊索引
+		with open(self.raw_file, 'ab') as raw:
+			raw.write(b'\x00')
+		try:
+			with self.assertRaises(ValueError):
+				RecordIndex(self.raw_file)
+		finally:
+			with open(self.raw_file, 'r+b') as raw:
+				raw.truncate(os.path.getsize(RAW_FILE))
+
+	def test_stale_index_same_size(self):
+		# 測試大小不變但內容改變時拒絕使用舊索引，只有修改時間改變時仍可使用
+		stat = os.stat(self.raw_file)
+		os.utime(self.raw_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+		self.assertEqual(len(RecordIndex(self.raw_file)), len(self.index))
+
+		# 內容相同時寫回新的簽章，之後不再計算雜湊
+		with mock.patch('index.file_digest', side_effect=AssertionError('file hashed again')):
+			self.assertEqual(len(RecordIndex(self.raw_file)), len(self.index))
+
+		with open(self.raw_file, 'r+b') as raw:
+			raw.seek(200)
+			original = raw.read(1)
+			raw.seek(200)
+			raw.write(bytes([original[0] ^ 0xFF]))
+		try:
+			with self.assertRaises(ValueError):
+				RecordIndex(self.raw_file)
+		finally:
+			with open(self.raw_file, 'r+b') as raw:
+				raw.seek(200)
+				raw.write(original)
+
+	def test_memory_mapped(self):
+		# 測試索引陣列以記憶體映射載入，列號為 uint32
+		self.assertIsInstance(self.index.offsets, np.memmap)
+		self.assertEqual(self.index.postings.dtype, np.uint32)
+		self.assertEqual(self.index.transmission_rows.dtype, np.uint32)
+
+	def test_invalid_block_size(self):
+		# 測試區塊大小小於 1 時拒絕建立索引
+		for block_size in (0, -5):
+			with self.assertRaises(ValueError):
+				build_index(self.raw_file, os.path.join(self.directory, 'invalid.idx'), block_size=block_size)
+		self.assertFalse(os.path.exists(os.path.join(self.directory, 'invalid.idx')))
+
+	def test_open_index(self):
+		# 測試重複開啟時沿用已載入的索引，重建索引後重新載入
+		index = open_index(self.raw_file)
+		self.assertIs(open_index(self.raw_file), index)
+		self.assertEqual(len(index), len(self.index))
+
+		meta_path = os.path.join(index_path_for(self.raw_file), 'meta.json')
+		stat = os.stat(meta_path)
+		os.utime(meta_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+		self.assertIsNot(open_index(self.raw_file), index)
+
+if __name__ == '__main__':
+	unittest.main()
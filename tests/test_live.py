@@ -0,0 +1,62 @@
+# tests/test_live.py
+
+import asyncio
+import os
+import unittest
+from live import CallbackSink, LiveReceiver, replay
+from parser import parse_file
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+async def receive(proto: str, skip_conditions=None, queue_size: int = 10000, rate: float = 0, callback=None):
+	# 啟動接收器、重播原始檔案，並收集所有寫出的記錄
+	records = []
+	receiver = LiveReceiver([CallbackSink(callback or records.append)], skip_conditions, queue_size=queue_size)
+	host, port = await receiver.start('127.0.0.1', 0, proto)
+	await replay(RAW_FILE, host, port, proto, rate)
+
+	# 等待接收端處理完所有已送出的資料
+	for _ in range(200):
+		if receiver.stats.received_bytes >= os.path.getsize(RAW_FILE):
+			break
+		await asyncio.sleep(0.01)
+
+	await receiver.close()
+	return records, receiver.stats
+
+
+class TestLive(unittest.TestCase):
+
+	def test_tcp_matches_parse_file(self):
+		# 測試 TCP 接收的結果與解析檔案相同
+		skip_conditions = [{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}]
+		records, stats = asyncio.run(receive('tcp', skip_conditions, queue_size=8))
+		self.assertEqual(records, parse_file(RAW_FILE, skip_conditions))
+		self.assertEqual(stats.frames, 1000)
+		self.assertEqual(stats.written, len(records))
+
+	def test_udp_matches_parse_file(self):
+		# 測試 UDP 每筆記錄一個封包
+		records, stats = asyncio.run(receive('udp', rate=5000))
+		self.assertEqual(stats.dropped, 0)
+		self.assertEqual(records, parse_file(RAW_FILE))
+
+	def test_sink_error(self):
+		# 測試 sink 寫出失敗時持續消化佇列，close() 不會卡住並重新拋出第一個錯誤
+		records = []
+
+		def flaky(record):
+			if len(records) % 10 == 9:
+				records.append(None)
+				raise RuntimeError('sink failed')
+			records.append(record)
+
+		with self.assertRaisesRegex(RuntimeError, 'sink failed'):
+			asyncio.run(asyncio.wait_for(receive('tcp', queue_size=8, callback=flaky), 30))
+		self.assertEqual(len(records), len(parse_file(RAW_FILE)))
+		self.assertEqual(records.count(None), len(records) // 10)
+
+
+if __name__ == '__main__':
+	unittest.main()
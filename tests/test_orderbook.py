@@ -0,0 +1,89 @@
+# tests/test_orderbook.py
+
+import os
+import unittest
+from helpers import build_record
+from orderbook import OrderBookStore, price_to_ticks, time_to_us
+from parser import parse_file
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+def build_body(stock_code: str, reveal: int, status: int = 0, limit: int = 0, slots=(), time_hex: str = '090000000000') -> bytes:
+	# 組出 BODY：證券代碼、撮合時間、三個註記、累計成交量與價量
+	body = stock_code.encode('ascii').ljust(6) + bytes.fromhex(time_hex) + bytes([reveal, limit, status]) + bytes.fromhex('00001234')
+	for price, quantity in slots:
+		body += bytes.fromhex(f'{price:010d}{quantity:08d}')
+	return body
+
+
+class TestOrderBook(unittest.TestCase):
+
+	def test_price_to_ticks(self):
+		# 測試價格字串轉為 tick 數
+		self.assertEqual(price_to_ticks('40.61'), 406100)
+		self.assertEqual(price_to_ticks('0.0001'), 1)
+		self.assertEqual(price_to_ticks('125'), 1250000)
+
+	def test_time_to_us(self):
+		# 測試時間字串轉為午夜起算的微秒數
+		self.assertEqual(time_to_us('09:09:34.447698'), 32974447698)
+		self.assertEqual(time_to_us(32974447698), 32974447698)
+
+	def test_apply_frame_levels(self):
+		# 測試成交價量與買賣檔位的配置：一筆成交、兩檔買進、一檔賣出
+		store = OrderBookStore()
+		record = build_record(build_body('2330', 0b10100010, slots=[(5000000, 3), (4990000, 10), (4980000, 20), (5010000, 7)]), 5)
+		book = store.apply_frame(record)
+		self.assertIs(store.get('2330'), book)
+		self.assertEqual((book.last_price, book.last_quantity, book.total_volume, book.transmission_number), (5000000, 3, 1234, 5))
+		self.assertEqual(book.to_dict()['bids'], [[4990000, 10], [4980000, 20]])
+		self.assertEqual(book.to_dict()['asks'], [[5010000, 7]])
+		self.assertEqual(book.matching_time, 9 * 3600 * 1_000_000)
+
+	def test_trade_only_keeps_book(self):
+		# 測試僅記成交價量的記錄不覆寫最佳五檔
+		store = OrderBookStore()
+		store.apply_frame(build_record(build_body('2330', 0b00010010, slots=[(4990000, 10), (5010000, 7)])))
+		book = store.apply_frame(build_record(build_body('2330', 0b10000001, slots=[(5000000, 2)])))
+		self.assertEqual(book.last_price, 5000000)
+		self.assertEqual(book.to_dict()['bids'], [[4990000, 10]])
+		self.assertEqual(book.to_dict()['asks'], [[5010000, 7]])
+
+	def test_trial_record_does_not_touch_book(self):
+		# 測試試算揭示只更新試算價量
+		store = OrderBookStore()
+		store.apply_frame(build_record(build_body('2330', 0b10010010, slots=[(5000000, 1), (4990000, 10), (5010000, 7)])))
+		book = store.apply_frame(build_record(build_body('2330', 0b10010010, status=0b10000000, slots=[(5100000, 99), (5090000, 1), (5110000, 1)])))
+		self.assertTrue(book.in_trial)
+		self.assertEqual((book.trial_price, book.trial_quantity), (5100000, 99))
+		self.assertEqual((book.last_price, book.last_quantity), (5000000, 1))
+		self.assertEqual(book.to_dict()['bids'], [[4990000, 10]])
+
+	def test_suspended_trade_quantity(self):
+		# 測試瞬間價格趨勢為暫緩撮合時成交量記為 0，中央登錄公債只取一檔，賣出價量仍從買進檔數之後開始
+		store = OrderBookStore()
+		book = store.apply_frame(build_record(build_body('A00001', 0b10100100, limit=0b10, slots=[(1000000, 5), (990000, 1), (980000, 1), (1010000, 1), (1020000, 1)])))
+		self.assertEqual(book.last_quantity, 0)
+		self.assertEqual(book.to_dict()['bids'], [[990000, 1]])
+		self.assertEqual(book.to_dict()['asks'], [[1010000, 1]])
+
+	def test_frames_match_decoded_records(self):
+		# 測試由原始記錄與由解析後記錄建立的狀態一致（試算價量只存在於原始記錄）
+		from_frames = OrderBookStore()
+		self.assertEqual(from_frames.load_file(RAW_FILE), 1000)
+
+		from_records = OrderBookStore()
+		for record in parse_file(RAW_FILE):
+			from_records.apply_record(record)
+
+		self.assertEqual(len(from_frames), len(from_records))
+		for book in from_frames:
+			expected = book.to_dict()
+			actual = from_records.get(book.stock_code).to_dict()
+			for key in ('trial_price', 'trial_quantity', 'limit_flags', 'status_flags'):
+				del expected[key], actual[key]
+			self.assertEqual(actual, expected)
+
+if __name__ == '__main__':
+	unittest.main()
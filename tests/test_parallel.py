@@ -0,0 +1,42 @@
+# tests/test_parallel.py
+
+import os
+import unittest
+import numpy as np
+from columnar import parse_file_columnar
+from parallel import split_ranges, iter_records_parallel, iter_columnar_batches_parallel
+from parser import parse_file
+from utils.framer import map_file, iter_frame_spans
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestParallel(unittest.TestCase):
+
+	def test_split_ranges_align_to_records(self):
+		# 測試每個切點都對齊記錄起始位置，且區段首尾相接
+		with map_file(RAW_FILE) as buffer:
+			starts = {offset for offset, _ in iter_frame_spans(buffer)}
+			ranges = split_ranges(buffer, 4096)
+			self.assertGreater(len(ranges), 1)
+			self.assertEqual(ranges[0][0], 0)
+			self.assertEqual(ranges[-1][1], len(buffer))
+			for (_, end), (start, _) in zip(ranges, ranges[1:]):
+				self.assertEqual(end, start)
+				self.assertIn(start, starts)
+
+	def test_iter_records_parallel(self):
+		# 測試平行解析結果與順序皆與單一行程相同
+		skip_conditions = [{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}]
+		records = list(iter_records_parallel(RAW_FILE, 3, skip_conditions, range_size=8192))
+		self.assertEqual(records, parse_file(RAW_FILE, skip_conditions))
+
+	def test_iter_columnar_batches_parallel(self):
+		# 測試平行欄位解碼結果與單一行程相同
+		batches = list(iter_columnar_batches_parallel(RAW_FILE, 3, range_size=8192))
+		columns = parse_file_columnar(RAW_FILE)
+		for name, column in columns.items():
+			np.testing.assert_array_equal(np.concatenate([batch[name] for batch in batches]), column)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,87 @@
+# tests/test_parser.py
+
+import os
+import types
+import unittest
+from parser import parse_file, iter_records, compile_filter, should_skip
+from utils.framer import map_file, iter_frames
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestParser(unittest.TestCase):
+
+	def test_iter_records_is_streaming(self):
+		# 測試 iter_records 為產生器，且第一筆記錄可立即取得
+		records = iter_records(RAW_FILE)
+		self.assertIsInstance(records, types.GeneratorType)
+		first = next(records)
+		self.assertEqual(first['header']['transmission_number'], '01000001')
+		records.close()
+
+	def test_iter_records_matches_parse_file(self):
+		# 測試串流結果與一次解析的結果相同
+		skip_conditions = [{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}]
+		self.assertEqual(list(iter_records(RAW_FILE, skip_conditions)), parse_file(RAW_FILE, skip_conditions))
+
+	def test_compile_filter_matches_should_skip(self):
+		# 測試編譯後的判斷函數與逐條件判斷結果一致
+		skip_conditions = [
+			{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'},
+			{'position': 23, 'value': (0b11000000, 0b01000000), 'mode': 'exclude'},
+			{'position': 24, 'value': (0b10000000, 0b00000000), 'mode': 'include'},
+		]
+		skip = compile_filter(skip_conditions)
+		with map_file(RAW_FILE) as buffer:
+			for record in iter_frames(buffer):
+				self.assertEqual(skip(record), should_skip(record, skip_conditions))
+
+	def test_compile_filter_without_conditions(self):
+		# 測試沒有任何條件時不需判斷
+		self.assertIsNone(compile_filter([], None, (None, None)))
+
+	def test_stock_codes_and_time_range(self):
+		# 測試證券代碼與撮合時間範圍條件
+		records = parse_file(RAW_FILE, stock_codes=['0050', '00675L'], time_range=('09:09:35', '09:10'))
+		expected = [
+			record for record in parse_file(RAW_FILE)
+			if record['body']['stock_code'] in ('0050', '00675L') and '09:09:35' <= record['body']['matching_time'] < '09:10'
+		]
+		self.assertTrue(expected)
+		self.assertEqual(records, expected)
+
+	def test_invalid_stock_codes(self):
+		# 測試超過 6 個字元、非 ASCII 或空白的證券代碼不會被補齊或截斷，直接拒絕
+		for code in ('0050ABC', '台積電', ''):
+			with self.assertRaises(ValueError):
+				compile_filter(stock_codes=['2330', code])
+			with self.assertRaises(ValueError):
+				parse_file(RAW_FILE, stock_codes=[code])
+
+	def test_numeric_mode(self):
+		# 測試 numeric 模式的數值與預設模式的字串一致
+		from orderbook import price_to_ticks
+		for record, numeric in zip(parse_file(RAW_FILE), parse_file(RAW_FILE, numeric=True)):
+			body, numeric_body = record['body'], numeric['body']
+			hours, minutes, seconds = body['matching_time'].split(':')
+			self.assertEqual(numeric_body['matching_time'], round(((int(hours) * 60 + int(minutes)) * 60 + float(seconds)) * 1_000_000))
+			self.assertEqual(numeric_body['total_volume'], int(body['total_volume']))
+			self.assertEqual(numeric['header'], record['header'])
+
+			for key in ('最佳五檔買進價量', '最佳五檔賣出價量'):
+				self.assertEqual(
+					numeric_body['instant_quotes'][key],
+					[{'price': price_to_ticks(level['price']), 'quantity': int(level['quantity'])} for level in body['instant_quotes'][key]]
+				)
+			trade = body['instant_quotes']['成交價量']
+			if trade is not None:
+				self.assertEqual(numeric_body['instant_quotes']['成交價量'], {'price': price_to_ticks(trade['price']), 'quantity': int(trade['quantity'])})
+
+	def test_numeric_mode_parallel(self):
+		# 測試平行解析與延遲解碼的 numeric 結果相同
+		expected = parse_file(RAW_FILE, numeric=True)
+		self.assertEqual(parse_file(RAW_FILE, workers=2, numeric=True), expected)
+		self.assertEqual([record.to_dict(numeric=True) for record in parse_file(RAW_FILE, lazy=True)], expected)
+
+if __name__ == '__main__':
+	unittest.main()
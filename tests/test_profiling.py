@@ -0,0 +1,48 @@
+# tests/test_profiling.py
+
+import os
+import unittest
+from parser import iter_records, parse_file
+from profiling import Profiler, profile_items
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestProfiling(unittest.TestCase):
+
+	def test_profiled_records_match(self):
+		# 測試量測時的解析結果與未量測時相同，並累計各階段與記錄數
+		skip_conditions = [{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}]
+		profiler = Profiler()
+		records = list(profile_items(iter_records(RAW_FILE, skip_conditions, profiler=profiler), profiler))
+		profiler.stop()
+
+		self.assertEqual(records, parse_file(RAW_FILE, skip_conditions))
+		self.assertEqual(profiler.counters['frames'], 1000)
+		self.assertEqual(profiler.counters['processed'], len(records))
+		self.assertEqual(profiler.counters['skipped'], 1000 - len(records))
+		self.assertEqual(profiler.counters['frame_bytes'], os.path.getsize(RAW_FILE))
+		for stage in ('parse', 'parse.framing', 'parse.filter', 'parse.decode', 'parse.decode.instant_quotes', 'parse.decode.checksum'):
+			self.assertIn(stage, profiler.stages)
+		self.assertLessEqual(profiler.stages['parse.decode.instant_quotes'], profiler.stages['parse.decode'])
+
+	def test_prometheus_text(self):
+		# 測試 Prometheus 文字格式
+		profiler = Profiler()
+		profiler.add('parse.decode', 1.5)
+		profiler.counters['processed'] = 10
+		profiler.stop()
+		lines = profiler.to_prometheus().splitlines()
+		self.assertIn('format6_parser_stage_seconds_total{stage="parse.decode"} 1.500000', lines)
+		self.assertIn('format6_parser_events_total{kind="processed"} 10', lines)
+		self.assertIn('# TYPE format6_parser_elapsed_seconds gauge', lines)
+
+	def test_profile_items_counts_batches(self):
+		# 測試以 size 計算每批的記錄數
+		profiler = Profiler()
+		self.assertEqual(list(profile_items([[1, 2], [3]], profiler, size=len)), [[1, 2], [3]])
+		self.assertEqual(profiler.counters['processed'], 3)
+		self.assertIn('parse', profiler.stages)
+
+if __name__ == '__main__':
+	unittest.main()
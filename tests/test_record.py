@@ -0,0 +1,47 @@
+# tests/test_record.py
+
+import os
+import pickle
+import unittest
+from parser import parse_file
+from record import Record
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestRecord(unittest.TestCase):
+
+	def test_to_dict_matches_decode_record(self):
+		# 測試延遲解碼的結果與預設模式完全相同
+		records = parse_file(RAW_FILE, lazy=True)
+		self.assertTrue(all(isinstance(record, Record) for record in records))
+		self.assertEqual([record.to_dict() for record in records], parse_file(RAW_FILE))
+
+	def test_fields_decoded_on_access(self):
+		# 測試只解碼存取過的欄位
+		record = parse_file(RAW_FILE, lazy=True)[0]
+		self.assertEqual(record.transmission_number, '01000001')
+		self.assertFalse(hasattr(record, '_instant_quotes'))
+		self.assertIs(record.stock_code, record.stock_code)
+
+	def test_trade_matches_instant_quotes(self):
+		# 測試直接解碼的成交價量與 instant_quotes 相同（含試算揭示與暫緩撮合）
+		expected = [record['body']['instant_quotes']['成交價量'] for record in parse_file(RAW_FILE)]
+		self.assertEqual([record.trade for record in parse_file(RAW_FILE, lazy=True)], expected)
+
+	def test_lazy_with_filters(self):
+		# 測試延遲解碼搭配條件與多行程
+		skip_conditions = [{'position': 23, 'value': (0b11000000, 0b10000000), 'mode': 'include'}]
+		expected = parse_file(RAW_FILE, skip_conditions)
+		self.assertEqual([record.to_dict() for record in parse_file(RAW_FILE, skip_conditions, lazy=True)], expected)
+		self.assertEqual([record.to_dict() for record in parse_file(RAW_FILE, skip_conditions, workers=2, lazy=True)], expected)
+
+	def test_pickle(self):
+		# 測試跨行程傳遞時以原始位元組重建
+		record = parse_file(RAW_FILE, lazy=True)[5]
+		restored = pickle.loads(pickle.dumps(record))
+		self.assertEqual(bytes(restored.raw), bytes(record.raw))
+		self.assertEqual(restored.to_dict(), record.to_dict())
+
+if __name__ == '__main__':
+	unittest.main()
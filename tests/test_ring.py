@@ -0,0 +1,121 @@
+# tests/test_ring.py
+
+import multiprocessing
+import unittest
+import numpy as np
+from columnar import parse_file_columnar
+from ring import RingPublisher, RingReader, publish_file
+
+DATA_FILE = 'data/raw/f6_01000001_01001000_TP03.new'
+
+
+def slice_columns(columns: dict, begin: int, end: int) -> dict:
+	return {key: value[begin:end] for key, value in columns.items()}
+
+
+def concat_columns(batches: list) -> dict:
+	return {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+
+def count_records(name: str, attached, results) -> None:
+	# 子行程中的讀取端：回報讀取筆數與傳輸序號總和
+	reader = RingReader(name)
+	attached.set()
+	received = 0
+	total = 0
+	for batch in reader.iter_batches(idle_timeout=10):
+		received += len(batch)
+		total += int(batch['transmission_number'].sum())
+	results.put((received, total, reader.lost))
+	reader.close()
+
+
+class TestRing(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.columns = parse_file_columnar(DATA_FILE)
+
+	def test_round_trip_across_wrap(self):
+		# 測試跨越環形緩衝區結尾的記錄與 columnar 解碼結果相同
+		with RingPublisher(capacity=256) as publisher:
+			reader = RingReader(publisher.name)
+			batches = []
+			for begin in range(0, 1000, 150):
+				publisher.publish_columns(slice_columns(self.columns, begin, begin + 150))
+				batches.append(reader.to_columns(reader.read()))
+			rebuilt = concat_columns(batches)
+			for key, value in self.columns.items():
+				np.testing.assert_array_equal(rebuilt[key], value, err_msg=key)
+			self.assertEqual(reader.lost, 0)
+			self.assertEqual(reader.lag, 0)
+			self.assertEqual(len(reader.symbols()), publisher.symbol_count)
+			reader.close()
+
+	def test_overflow_and_lag(self):
+		# 測試落後超過容量時只讀到最新的 capacity 筆，並累計遺失筆數
+		with RingPublisher(capacity=100) as publisher:
+			reader = RingReader(publisher.name)
+			publisher.publish_columns(slice_columns(self.columns, 0, 350))
+			self.assertEqual(reader.lag, 350)
+
+			batch = reader.read()
+			self.assertEqual(reader.lost, 250)
+			self.assertEqual(batch['sequence'].tolist(), list(range(251, 351)))
+			np.testing.assert_array_equal(reader.to_columns(batch)['offset'], self.columns['offset'][250:350])
+
+			# 讀取量受 max_records 限制時分批讀完
+			publisher.publish_columns(slice_columns(self.columns, 350, 400))
+			self.assertEqual(len(reader.read(30)), 30)
+			self.assertEqual(len(reader.read(30)), 20)
+			self.assertEqual(reader.lost, 250)
+			reader.close()
+
+	def test_independent_readers(self):
+		# 測試讀取端各自的進度，以及 latest 只讀取連接後的記錄
+		with RingPublisher(capacity=1024) as publisher:
+			publisher.publish_columns(slice_columns(self.columns, 0, 100))
+			first = RingReader(publisher.name)
+			latest = RingReader(publisher.name, latest=True)
+			publisher.publish_columns(slice_columns(self.columns, 100, 200))
+			self.assertEqual(len(first.read(50)), 50)
+			self.assertEqual(len(latest.read()), 100)
+			self.assertEqual(len(first.read()), 150)
+			first.close()
+			latest.close()
+
+	def test_iter_batches_until_closed(self):
+		# 測試發布端結束後讀取端讀完剩餘記錄即停止
+		publisher = RingPublisher(capacity=4096)
+		reader = RingReader(publisher.name)
+		self.assertEqual(publish_file(DATA_FILE, publisher, batch_size=300), 1000)
+		publisher.close()
+		batches = list(reader.iter_batches())
+		self.assertEqual([len(batch) for batch in batches], [1000])
+		reader.close()
+
+	def test_reader_process(self):
+		# 測試其他行程透過名稱連接並讀取
+		context = multiprocessing.get_context('spawn')
+		attached = context.Event()
+		results = context.Queue()
+		with RingPublisher(capacity=4096) as publisher:
+			process = context.Process(target=count_records, args=(publisher.name, attached, results))
+			process.start()
+			self.assertTrue(attached.wait(30))
+			publisher.publish_columns(self.columns)
+			publisher.close()
+			received, total, lost = results.get(timeout=30)
+			process.join()
+		self.assertEqual((received, total, lost), (1000, int(self.columns['transmission_number'].sum()), 0))
+
+	def test_rejects_other_segments(self):
+		# 測試連接非環形緩衝區的共享記憶體
+		from multiprocessing import shared_memory
+		shm = shared_memory.SharedMemory(create=True, size=4096)
+		try:
+			with self.assertRaises(ValueError):
+				RingReader(shm.name)
+		finally:
+			shm.close()
+			shm.unlink()
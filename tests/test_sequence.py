@@ -0,0 +1,176 @@
+# tests/test_sequence.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from columnar import parse_file_columnar
+from parallel import iter_columnar_batches_parallel, iter_records_parallel
+from parser import parse_file
+from synthetic import generate_frames
+from utils.sequence import SequenceTracker
+
+
+class TestSequenceTracker(unittest.TestCase):
+
+	def test_gaps_and_duplicates(self):
+		# 測試缺漏以範圍回報、重複與亂序以筆數回報
+		tracker = SequenceTracker()
+		results = [tracker.observe(number) for number in [1, 2, 3, 6, 7, 3, 10, 5, 11]]
+
+		self.assertEqual(results, [True, True, True, True, True, False, True, True, True])
+		self.assertEqual(tracker.gaps(), [(4, 4), (8, 9)])
+		self.assertEqual((tracker.received, tracker.duplicates, tracker.out_of_order, tracker.missing), (9, 1, 1, 3))
+		self.assertEqual((tracker.first, tracker.last), (1, 11))
+		self.assertEqual(tracker.duplicate_samples, [3])
+
+	def test_filling_gap(self):
+		# 測試補上缺漏後不再回報缺漏
+		tracker = SequenceTracker()
+		for number in [1, 3, 2, 5, 4]:
+			tracker.observe(number)
+
+		self.assertEqual(tracker.gaps(), [])
+		self.assertEqual(tracker.to_dict()['unique'], 5)
+
+	def test_out_of_order_relative_to_previous(self):
+		# 測試亂序以前一筆記錄為準：單一錯誤的大序號不會使之後依序的記錄都算亂序
+		tracker = SequenceTracker()
+		for number in [1, 2, 3, 99999999, 4, 5, 6, 7]:
+			tracker.observe(number)
+
+		self.assertEqual(tracker.out_of_order, 1)
+		self.assertEqual(tracker.gaps(), [(8, 99999998)])
+
+	def test_heavy_loss_and_reordering(self):
+		# 測試大量缺漏與亂序時逐筆與整批結果一致
+		rng = np.random.default_rng(1)
+		numbers = np.sort(rng.choice(2_000_000, 200_000, replace=False)) + 1000
+		numbers = np.concatenate((numbers[::2], numbers[1::2], numbers[:1000]))
+		single = SequenceTracker()
+		first_seen = [single.observe(number) for number in numbers.tolist()]
+		batch = SequenceTracker()
+		self.assertEqual(np.concatenate([batch.observe_array(part) for part in np.array_split(numbers, 7)]).tolist(), first_seen)
+		self.assertEqual(batch.to_dict(), single.to_dict())
+		self.assertEqual(single.duplicates, 1000)
+
+	def test_observe_array(self):
+		# 測試整批觀察與逐筆觀察的結果一致
+		numbers = np.array([1, 2, 3, 4, 8, 9, 4, 10, 7, 7, 12, 11], dtype=np.int64)
+		batch = SequenceTracker()
+		single = SequenceTracker()
+
+		first_seen = batch.observe_array(numbers[:4])
+		self.assertTrue(first_seen.all())
+		first_seen = np.concatenate((first_seen, batch.observe_array(numbers[4:])))
+
+		self.assertEqual(first_seen.tolist(), [single.observe(number) for number in numbers.tolist()])
+		self.assertEqual(batch.to_dict(), single.to_dict())
+
+	def test_merge(self):
+		# 測試依序合併兩個區段的結果與依序觀察所有序號相同，重疊的序號計為重複
+		left, right = SequenceTracker(keep_numbers=True), SequenceTracker(keep_numbers=True)
+		for number in [1, 2, 3, 5]:
+			left.observe(number)
+		for number in [5, 6, 4, 9]:
+			right.observe(number)
+		merged = SequenceTracker()
+		merged.merge(left)
+		merged.merge(right)
+
+		single = SequenceTracker()
+		for number in [1, 2, 3, 5, 5, 6, 4, 9]:
+			single.observe(number)
+		self.assertEqual(merged.to_dict(), single.to_dict())
+		self.assertEqual(merged.gaps(), [(7, 8)])
+		self.assertEqual((merged.received, merged.duplicates, merged.out_of_order), (8, 1, 1))
+
+		with self.assertRaises(ValueError):
+			merged.merge(SequenceTracker())
+
+
+class TestSequenceParsing(unittest.TestCase):
+
+	def setUp(self):
+		# 移除部分記錄並重送部分記錄：缺 11-12、50，重複 20 與 30
+		frames = list(generate_frames(200, seed=3))
+		self.unique = frames[:10] + frames[12:49] + frames[50:]
+		self.feed = frames[:10] + frames[12:30] + [frames[19]] + frames[30:49] + frames[50:] + [frames[29]]
+
+		self.directory = tempfile.TemporaryDirectory()
+		self.unique_file = os.path.join(self.directory.name, 'unique.new')
+		self.feed_file = os.path.join(self.directory.name, 'feed.new')
+		with open(self.unique_file, 'wb') as unique_file:
+			unique_file.write(b''.join(self.unique))
+		with open(self.feed_file, 'wb') as feed_file:
+			feed_file.write(b''.join(self.feed))
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def test_parse_file_reports_sequence(self):
+		# 測試解析時回報缺漏與重複，預設仍保留重複的記錄
+		sequence = SequenceTracker()
+		records = parse_file(self.feed_file, sequence=sequence)
+
+		self.assertEqual(len(records), len(self.feed))
+		self.assertEqual(sequence.gaps(), [(11, 12), (50, 50)])
+		self.assertEqual((sequence.duplicates, sequence.duplicate_samples), (2, [20, 30]))
+
+	def test_drop_duplicates(self):
+		# 測試略過重複的記錄後，結果與沒有重複的資料相同
+		sequence = SequenceTracker(drop_duplicates=True)
+		self.assertEqual(parse_file(self.feed_file, sequence=sequence), parse_file(self.unique_file))
+		self.assertEqual(sequence.duplicates, 2)
+
+		# 被跳過條件排除的記錄仍計入傳輸序號
+		sequence = SequenceTracker()
+		parse_file(self.feed_file, [{'position': 22, 'value': (0b10000000, 0b10000000), 'mode': 'include'}], sequence=sequence)
+		self.assertEqual((sequence.received, sequence.missing), (len(self.feed), 3))
+
+	def test_columnar_drop_duplicates(self):
+		# 測試欄位式解碼的追蹤結果與逐筆解析相同
+		sequence = SequenceTracker(drop_duplicates=True)
+		columns = parse_file_columnar(self.feed_file, batch_size=64, sequence=sequence)
+		expected = parse_file_columnar(self.unique_file)
+
+		self.assertEqual(columns['transmission_number'].tolist(), expected['transmission_number'].tolist())
+		self.assertEqual((sequence.gaps(), sequence.duplicates), ([(11, 12), (50, 50)], 2))
+
+	def test_parallel_merge(self):
+		# 測試平行解析時各區段的追蹤結果合併後與單一行程相同
+		single = SequenceTracker()
+		parse_file(self.feed_file, sequence=single)
+		merged = SequenceTracker()
+		records = list(iter_records_parallel(self.feed_file, 2, range_size=4096, sequence=merged))
+
+		self.assertEqual(len(records), len(self.feed))
+		self.assertEqual(merged.to_dict(), single.to_dict())
+
+	def test_workers_do_not_change_report(self):
+		# 測試亂序、重複與錯誤序號的資料，1 與 4 個行程的追蹤結果完全相同
+		frames = list(generate_frames(3000, seed=8))
+		feed = frames[:500] + frames[700:1500] + frames[600:700] + frames[1500:] + frames[100:300:7]
+		path = os.path.join(self.directory.name, 'disordered.new')
+		with open(path, 'wb') as feed_file:
+			feed_file.write(b''.join(feed))
+
+		single = SequenceTracker()
+		parse_file(path, sequence=single)
+		self.assertGreater(single.out_of_order, 0)
+		self.assertGreater(single.duplicates, 0)
+		for workers in (1, 4):
+			merged = SequenceTracker()
+			list(iter_records_parallel(path, workers, range_size=4096, sequence=merged))
+			self.assertEqual(merged.to_dict(), single.to_dict())
+			columnar = SequenceTracker()
+			list(iter_columnar_batches_parallel(path, workers, range_size=4096, sequence=columnar))
+			self.assertEqual(columnar.to_dict(), single.to_dict())
+
+		columnar = SequenceTracker()
+		parse_file_columnar(path, batch_size=100, sequence=columnar)
+		self.assertEqual(columnar.to_dict(), single.to_dict())
+
+
+if __name__ == '__main__':
+	unittest.main()
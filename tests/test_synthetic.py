@@ -0,0 +1,48 @@
+# tests/test_synthetic.py
+
+import os
+import tempfile
+import unittest
+from collections import Counter
+from parser import parse_file
+from synthetic import generate_frames, write_feed
+from utils.framer import IntegrityReport, iter_frames, verify_checksum
+
+
+class TestSynthetic(unittest.TestCase):
+
+	def test_frames_are_valid(self):
+		# 測試產生的記錄長度與檢查碼正確，且可依 message_length 切分
+		frames = list(generate_frames(2000, seed=1))
+		self.assertTrue(all(verify_checksum(frame) for frame in frames))
+		self.assertEqual([bytes(frame) for frame in iter_frames(b''.join(frames))], frames)
+
+	def test_same_seed_same_feed(self):
+		# 測試相同種子產生相同內容
+		self.assertEqual(list(generate_frames(100, seed=7)), list(generate_frames(100, seed=7)))
+		self.assertNotEqual(list(generate_frames(100, seed=7)), list(generate_frames(100, seed=8)))
+
+	def test_record_mix(self):
+		# 測試產生的記錄涵蓋試算揭示、僅記成交價量、漲跌停與中央登錄公債
+		with tempfile.TemporaryDirectory() as directory:
+			file_path = os.path.join(directory, 'synthetic.new')
+			write_feed(file_path, 5000, seed=2, start_transmission=1000001)
+			report = IntegrityReport()
+			records = parse_file(file_path, report=report)
+
+		self.assertEqual((len(records), report.valid, report.resyncs), (5000, 5000, 0))
+		self.assertEqual(records[0]['header']['transmission_number'], '01000001')
+		self.assertEqual([record['body']['matching_time'] for record in records], sorted(record['body']['matching_time'] for record in records))
+
+		mix = Counter()
+		for record in records:
+			body = record['body']
+			mix['trial'] += body['status_flags']['試算狀態註記'] == '試算揭示'
+			mix['trade_only'] += body['reveal_flags']['僅記成交價量']
+			mix['limit_up'] += body['limit_flags']['成交漲跌停註記'] == '漲停成交'
+			mix['limit_down'] += body['limit_flags']['成交漲跌停註記'] == '跌停成交'
+			mix['central_bond'] += body['stock_code'][0] in 'ACD'
+		self.assertTrue(all(mix[kind] > 0 for kind in ('trial', 'trade_only', 'limit_up', 'limit_down', 'central_bond')), mix)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,71 @@
+# tests/test_writers.py
+
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from columnar import iter_columnar_batches, parse_file_columnar
+from parser import parse_file
+from writers import write_ndjson, write_parquet, write_arrow, write_npz
+
+RAW_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'raw', 'f6_01000001_01001000_TP03.new')
+
+
+class TestWriters(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.columns = parse_file_columnar(RAW_FILE)
+
+	def tearDown(self):
+		self.directory.cleanup()
+
+	def output(self, name: str) -> str:
+		return os.path.join(self.directory.name, name)
+
+	def test_write_ndjson(self):
+		# 測試 NDJSON 每行一筆記錄
+		write_ndjson(iter(parse_file(RAW_FILE)), self.output('out.ndjson'))
+		with open(self.output('out.ndjson'), encoding='utf-8') as file:
+			records = [json.loads(line) for line in file]
+		self.assertEqual(records, parse_file(RAW_FILE))
+
+	def test_write_parquet(self):
+		# 測試 Parquet 逐批寫出為多個 row group
+		write_parquet(iter_columnar_batches(RAW_FILE, batch_size=400), self.output('out.parquet'))
+		parquet_file = pq.ParquetFile(self.output('out.parquet'))
+		self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+		table = parquet_file.read()
+		self.assertEqual(table.column('stock_code').to_pylist(), self.columns['stock_code'].tolist())
+		self.assertEqual(table.column('price').to_pylist(), self.columns['price'].tolist())
+
+	def test_write_arrow(self):
+		# 測試 Arrow IPC 跨批次的字典編碼
+		write_arrow(iter_columnar_batches(RAW_FILE, batch_size=400), self.output('out.arrow'))
+		table = pa.ipc.open_file(self.output('out.arrow')).read_all()
+		self.assertEqual(table.column('stock_code').to_pylist(), self.columns['stock_code'].tolist())
+		self.assertEqual(table.column('matching_time').to_pylist(), self.columns['matching_time'].tolist())
+
+	def test_write_npz(self):
+		# 測試 npz 的字典編碼證券代碼
+		write_npz(iter_columnar_batches(RAW_FILE, batch_size=400), self.output('out.npz'))
+		with np.load(self.output('out.npz')) as arrays:
+			self.assertEqual(arrays['symbols'][arrays['stock_code']].tolist(), self.columns['stock_code'].tolist())
+			self.assertEqual(arrays['quantity'].tolist(), self.columns['quantity'].tolist())
+
+	def test_many_symbols(self):
+		# 測試超過 int16 範圍的證券代碼數量
+		count = 40000
+		columns = {name: np.repeat(value[:1], count, axis=0) for name, value in self.columns.items()}
+		columns['stock_code'] = np.array([f'{index:06d}' for index in range(count)])
+		write_parquet(iter([columns]), self.output('out.parquet'))
+		self.assertEqual(pq.read_table(self.output('out.parquet')).column('stock_code').to_pylist(), columns['stock_code'].tolist())
+		write_npz(iter([columns]), self.output('out.npz'))
+		with np.load(self.output('out.npz')) as arrays:
+			self.assertEqual(arrays['symbols'][arrays['stock_code']].tolist(), columns['stock_code'].tolist())
+
+if __name__ == '__main__':
+	unittest.main()